@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the NOVIS Python SDK.
+
+Runs the SDK clients against an in-process stub relayer and JSON-RPC node
+(see ``benchmarks.stubs``) so no mainnet access or funded key is needed.
+"""
@@ -0,0 +1,74 @@
+"""
+Run the offline benchmark suite.
+
+Usage:
+    python -m benchmarks                          # all scenarios, no faults
+    python -m benchmarks transfer_burst --n 500   # one scenario
+    python -m benchmarks --rpc-latency-ms 20 --relayer-latency-ms 80 \\
+        --relayer-error-rate 0.02 --json out.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import sys
+
+from .report import compare, print_table
+from .scenarios import SCENARIOS, BenchEnv
+from .stubs import Faults
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--n', type=int, help='Operations per scenario')
+    parser.add_argument('--concurrency', type=int, help='Worker threads')
+    parser.add_argument('--rpc-latency-ms', type=float, default=0.0)
+    parser.add_argument('--rpc-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rpc-error-rate', type=float, default=0.0)
+    parser.add_argument('--relayer-latency-ms', type=float, default=0.0)
+    parser.add_argument('--relayer-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--relayer-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-verify', action='store_true',
+                        help='Skip signature recovery in the stub relayer')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Fail if results regress against this file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    rpc_faults = Faults(args.rpc_latency_ms, args.rpc_jitter_ms, args.rpc_error_rate, seed=args.seed)
+    relayer_faults = Faults(args.relayer_latency_ms, args.relayer_jitter_ms,
+                            args.relayer_error_rate, seed=args.seed)
+    kwargs = {}
+    if args.concurrency:
+        kwargs['concurrency'] = args.concurrency
+
+    results = []
+    for name in args.scenarios or SCENARIOS:
+        scenario = SCENARIOS[name]
+        scenario_kwargs = dict(kwargs)
+        if args.n:
+            scenario_kwargs['batches' if name == 'batch_pay_payouts' else 'n'] = args.n
+        with BenchEnv(rpc_faults, relayer_faults, verify_signatures=not args.no_verify) as env:
+            results.append(scenario(env, **scenario_kwargs).summary())
+
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
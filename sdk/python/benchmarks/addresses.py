@@ -0,0 +1,84 @@
+"""
+Address validation benchmark on a large recipient list.
+
+Validates and checksums ``n`` recipients three ways:
+
+    web3        Web3.is_address + Web3.to_checksum_address per item
+    cold        novis.addresses.validate_addresses with an empty table
+    warm        the same call again (e.g. the next payout run)
+
+for a list of distinct addresses and for one where payees repeat (drawn
+from a pool of ``distinct`` addresses, in lowercase as exported by most
+tools).
+
+Usage:
+    python -m benchmarks.addresses
+    python -m benchmarks.addresses --n 100000 --distinct 2000
+"""
+
+import argparse
+import os
+import random
+import time
+
+from web3 import Web3
+
+from novis import addresses
+
+
+def _web3(values: list) -> list:
+    return [Web3.to_checksum_address(v) for v in values if Web3.is_address(v)]
+
+
+def _novis(values: list) -> list:
+    return addresses.validate_addresses(values, strict=False)[0]
+
+
+def _timed(fn, values) -> tuple:
+    started = time.perf_counter()
+    result = fn(values)
+    return time.perf_counter() - started, result
+
+
+def run(n: int = 100_000, distinct: int = 2000) -> list:
+    pool = ['0x' + os.urandom(20).hex() for _ in range(distinct)]
+    lists = {
+        'distinct': ['0x' + os.urandom(20).hex() for _ in range(n)],
+        f'repeat ({distinct} payees)': [random.choice(pool) for _ in range(n)],
+    }
+    results = []
+    for name, values in lists.items():
+        web3_s, expected = _timed(_web3, values)
+        addresses.clear_cache()
+        cold_s, cold = _timed(_novis, values)
+        warm_s, warm = _timed(_novis, values)
+        if not expected == cold == warm:
+            raise AssertionError(f'{name}: checksums differ from web3')
+        results.append({
+            'list': name,
+            'n': n,
+            'web3_ms': round(web3_s * 1000, 1),
+            'cold_ms': round(cold_s * 1000, 1),
+            'warm_ms': round(warm_s * 1000, 1),
+            'speedup_cold': round(web3_s / cold_s, 1),
+            'speedup_warm': round(web3_s / warm_s, 1)
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.addresses')
+    parser.add_argument('--n', type=int, default=100_000, help='Recipients per list')
+    parser.add_argument('--distinct', type=int, default=2000,
+                        help='Distinct payees in the repeating list')
+    args = parser.parse_args(argv)
+
+    print(f"{'list':<22}{'web3 ms':>10}{'cold ms':>10}{'warm ms':>10}{'cold x':>8}{'warm x':>8}")
+    print('-' * 68)
+    for r in run(args.n, args.distinct):
+        print(f"{r['list']:<22}{r['web3_ms']:>10}{r['cold_ms']:>10}{r['warm_ms']:>10}"
+              f"{r['speedup_cold']:>8}{r['speedup_warm']:>8}")
+
+
+if __name__ == '__main__':
+    main()
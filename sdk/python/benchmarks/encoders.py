@@ -0,0 +1,108 @@
+"""
+Calldata encoding microbenchmarks: novis.encoders vs web3.
+
+For each hot method, times ``contract.functions.X(...).build_transaction``
+against ``encoders.X(...)`` + ``encoders.build_tx`` with the same nonce,
+gas and gas price (so neither side makes an RPC call), and checks both
+produce the same transaction dict.
+
+Usage:
+    python -m benchmarks.encoders
+    python -m benchmarks.encoders --batch 1000 --repeat 2000
+"""
+
+import argparse
+import os
+import time
+
+from web3 import Web3
+
+import novis
+from novis import encoders
+
+SENDER = Web3.to_checksum_address(os.urandom(20))
+TX_FIELDS = {'from': SENDER, 'nonce': 7, 'gas': 300000, 'gasPrice': 10**9, 'chainId': 8453}
+
+
+def _cases(batch: int) -> list:
+    """[(name, web3 callable, fast callable, iterations divisor)]"""
+    w3 = Web3()
+    token_address = novis.ADDRESSES['NOVIS_TOKEN']
+    router_address = novis.ADDRESSES['PAYMENT_ROUTER']
+    token = w3.eth.contract(address=token_address, abi=novis.TOKEN_ABI)
+    router = w3.eth.contract(address=router_address, abi=novis.ROUTER_ABI)
+    to = Web3.to_checksum_address(os.urandom(20))
+    signature = os.urandom(65)
+    recipients = [Web3.to_checksum_address(os.urandom(20)) for _ in range(batch)]
+    amounts = [(i + 1) * 10**18 for i in range(batch)]
+    memos = [f'invoice-{i:06d}' for i in range(batch)]
+
+    def fast(address, data):
+        return encoders.build_tx(SENDER, address, data, 7, 300000, 10**9, 8453)
+
+    return [
+        ('transfer',
+         lambda: token.functions.transfer(to, 10**18).build_transaction(TX_FIELDS),
+         lambda: fast(token_address, encoders.transfer(to, 10**18)), 1),
+        ('payWithMemo',
+         lambda: router.functions.payWithMemo(to, 10**18, 'invoice-1').build_transaction(TX_FIELDS),
+         lambda: fast(router_address, encoders.pay_with_memo(to, 10**18, 'invoice-1')), 1),
+        ('metaTransferV2',
+         lambda: token.functions.metaTransferV2(SENDER, to, 10**18, 3, 2**40, signature)
+         .build_transaction(TX_FIELDS),
+         lambda: fast(token_address, encoders.meta_transfer_v2(SENDER, to, 10**18, 3, 2**40,
+                                                               signature)), 1),
+        ('createEscrow',
+         lambda: router.functions.createEscrow(to, 10**18, 3600).build_transaction(TX_FIELDS),
+         lambda: fast(router_address, encoders.create_escrow(to, 10**18, 3600)), 1),
+        ('releaseEscrow',
+         lambda: router.functions.releaseEscrow(42).build_transaction(TX_FIELDS),
+         lambda: fast(router_address, encoders.release_escrow(42)), 1),
+        (f'batchPay x{batch}',
+         lambda: router.functions.batchPay(recipients, amounts, memos).build_transaction(TX_FIELDS),
+         lambda: fast(router_address, encoders.batch_pay(recipients, amounts, memos)),
+         max(1, batch // 10)),
+    ]
+
+
+def _time(fn, repeat: int) -> float:
+    """Best-of-3 seconds per call."""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+def run(batch: int = 1000, repeat: int = 2000) -> list:
+    results = []
+    for name, slow, fast, divisor in _cases(batch):
+        if slow() != fast():
+            raise AssertionError(f'{name}: encoders disagree with web3')
+        n = max(1, repeat // divisor)
+        web3_s, fast_s = _time(slow, n), _time(fast, n)
+        results.append({
+            'method': name,
+            'web3_us': round(web3_s * 1e6, 1),
+            'encoders_us': round(fast_s * 1e6, 1),
+            'speedup': round(web3_s / fast_s, 1)
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.encoders')
+    parser.add_argument('--batch', type=int, default=1000, help='batchPay recipients')
+    parser.add_argument('--repeat', type=int, default=2000, help='Calls per single-call timing')
+    args = parser.parse_args(argv)
+
+    print(f"{'method':<18}{'web3 us':>12}{'encoders us':>14}{'speedup':>10}")
+    print('-' * 54)
+    for r in run(args.batch, args.repeat):
+        print(f"{r['method']:<18}{r['web3_us']:>12}{r['encoders_us']:>14}{r['speedup']:>9}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+"""
+Simulated-chain backend that runs the repo's real contracts.
+
+Builds the Solidity sources with ``forge build``, starts a local ``anvil``
+node (or attaches to one), and deploys:
+
+    MockUSDC                 -> USDC
+    NOVISv2UpgradeableV2     -> NOVIS_TOKEN   (behind ERC1967Proxy)
+    VaultV3UpgradeableV3     -> VAULT         (behind ERC1967Proxy, owns the token)
+    MockPaymentRouter        -> PAYMENT_ROUTER
+    NOVISAccountFactoryV4    -> FACTORY / SMART_ACCOUNTS
+
+``LocalChain.addresses`` is passed to the SDK clients as an address override,
+so the same client code that talks to Base runs against real bytecode.
+
+Usage:
+    python -m benchmarks.evm                 # deploy, gas report, SDK checks
+    python -m benchmarks.evm --rpc-url http://127.0.0.1:8545 --no-build
+
+Requires Foundry (forge, anvil) and the lib/ submodules.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+from decimal import Decimal
+
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+from web3 import Web3
+
+import novis
+import novis_sdk
+
+from .stubs import meta_transfer_typed_data
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+# Default anvil dev accounts (mnemonic "test test ... junk")
+ANVIL_KEYS = [
+    '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80',
+    '0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d',
+    '0x5de4111afa1a4b94908f83103eb1f1706367c2e68ca870fc3fb9a804cdab365a',
+    '0x7c852118294e51e653712a81e05800f419141751be58f605c371e15141b007a6',
+]
+
+TREASURY = '0x4709280aef7A496EA84e72dB3CAbAd5e324d593e'
+NOVIS = 10**18
+
+
+class LocalChain:
+    """
+    Local EVM with the NOVIS contracts deployed.
+
+    Args:
+        rpc_url: Attach to a running node instead of spawning anvil
+        port: Port for the spawned anvil
+        chain_id: Chain ID for anvil (8453 so the SDK defaults match)
+        build: Run ``forge build`` before loading artifacts
+        repo_root: Repository root containing foundry.toml
+    """
+
+    def __init__(self, rpc_url: str = None, port: int = 8545, chain_id: int = 8453,
+                 build: bool = True, repo_root: str = REPO_ROOT):
+        self.repo_root = repo_root
+        self.chain_id = chain_id
+        self.port = port
+        self.rpc_url = rpc_url
+        self.build = build
+        self._anvil = None
+        self.w3 = None
+        self.deployer = Account.from_key(ANVIL_KEYS[0])
+        self.relayer = Account.from_key(ANVIL_KEYS[1])
+        self.addresses = {}
+        self.contracts = {}
+
+    # ---- lifecycle ----
+
+    def start(self):
+        if self.build:
+            subprocess.run(['forge', 'build'], cwd=self.repo_root, check=True)
+        if self.rpc_url is None:
+            self._anvil = subprocess.Popen(
+                ['anvil', '--port', str(self.port), '--chain-id', str(self.chain_id),
+                 '--silent'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            self.rpc_url = f'http://127.0.0.1:{self.port}'
+        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        deadline = time.time() + 15
+        while not self.w3.is_connected():
+            if time.time() > deadline:
+                raise RuntimeError(f'no EVM node at {self.rpc_url}')
+            time.sleep(0.1)
+        self.deploy()
+        return self
+
+    def stop(self):
+        if self._anvil is not None:
+            self._anvil.terminate()
+            self._anvil.wait()
+            self._anvil = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---- deployment ----
+
+    def artifact(self, source: str, name: str) -> dict:
+        path = os.path.join(self.repo_root, 'out', source, f'{name}.json')
+        with open(path) as fh:
+            return json.load(fh)
+
+    def _transact(self, fn, account=None, value: int = 0):
+        account = account or self.deployer
+        tx = fn.build_transaction({
+            'from': account.address,
+            'nonce': self.w3.eth.get_transaction_count(account.address),
+            'value': value,
+            'chainId': self.chain_id
+        })
+        signed = account.sign_transaction(tx)
+        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        if receipt.status != 1:
+            raise RuntimeError(f'transaction reverted: {tx_hash.hex()}')
+        return receipt
+
+    def _deploy(self, source: str, name: str, *args):
+        artifact = self.artifact(source, name)
+        factory = self.w3.eth.contract(abi=artifact['abi'],
+                                       bytecode=artifact['bytecode']['object'])
+        receipt = self._transact(factory.constructor(*args))
+        return self.w3.eth.contract(address=receipt.contractAddress, abi=artifact['abi'])
+
+    def _deploy_proxy(self, source: str, name: str, init: str, *init_args):
+        impl = self._deploy(source, name)
+        init_data = impl.encode_abi(init, args=list(init_args))
+        proxy = self._deploy('ERC1967Proxy.sol', 'ERC1967Proxy', impl.address, init_data)
+        return self.w3.eth.contract(address=proxy.address, abi=impl.abi)
+
+    def deploy(self) -> dict:
+        """Deploy and wire the contracts; returns the address map."""
+        me = self.deployer.address
+        usdc = self._deploy('MockUSDC.sol', 'MockUSDC', me)
+        token = self._deploy_proxy('NOVISv2UpgradeableV2.sol', 'NOVISv2UpgradeableV2',
+                                   'initialize', me)
+        self._transact(token.functions.initializeV2(TREASURY))
+        # Deployer hands out NOVIS in fund(); keep those transfers fee-free
+        self._transact(token.functions.setFeeExempt(me, True))
+
+        # Router/factory are only used by buy-and-burn, which is switched off
+        vault = self._deploy_proxy(
+            'VaultV3UpgradeableV3.sol', 'VaultV3UpgradeableV3', 'initialize',
+            me, usdc.address, token.address, me, me, TREASURY
+        )
+        self._transact(vault.functions.toggleAutoBurn(False))
+        self._transact(token.functions.transferOwnership(vault.address))
+
+        router = self._deploy('MockPaymentRouter.sol', 'MockPaymentRouter', token.address)
+        factory = self._deploy('NOVISAccountFactoryV4.sol', 'NOVISAccountFactoryV4',
+                               novis_sdk.ADDRESSES['ENTRYPOINT'], token.address)
+
+        self.contracts = {'usdc': usdc, 'token': token, 'vault': vault,
+                          'router': router, 'factory': factory}
+        self.addresses = {
+            'NOVIS_TOKEN': token.address,
+            'VAULT': vault.address,
+            'PAYMENT_ROUTER': router.address,
+            'USDC': usdc.address,
+            'FACTORY': factory.address,
+            'SMART_ACCOUNTS': factory.address,
+            'TREASURY': TREASURY,
+            'RPC_URL': self.rpc_url,
+            'CHAIN_ID': self.chain_id
+        }
+        return self.addresses
+
+    # ---- accounts ----
+
+    def fund(self, address: str, novis_amount: int = 0, usdc_amount: int = 0,
+             eth_wei: int = 10 * NOVIS):
+        """Give an address NOVIS (minted through the vault), USDC and ETH."""
+        usdc, token, vault = (self.contracts[k] for k in ('usdc', 'token', 'vault'))
+        me = self.deployer.address
+        if novis_amount:
+            # Deposit below the fee threshold is fee-free; scale up to cover the 0.5% fee
+            usdc_in = novis_amount * 10**6
+            if usdc_in >= vault.functions.feeThreshold().call():
+                usdc_in = usdc_in * 10000 // 9950 + 1
+            self._transact(usdc.functions.mint(me, usdc_in))
+            self._transact(usdc.functions.approve(vault.address, usdc_in))
+            self._transact(vault.functions.deposit(usdc_in))
+            self._transact(token.functions.transfer(address, novis_amount * NOVIS))
+        if usdc_amount:
+            self._transact(usdc.functions.mint(address, usdc_amount * 10**6))
+        if eth_wei:
+            self.w3.provider.make_request('anvil_setBalance', [address, hex(eth_wei)])
+
+    def new_wallet(self, novis_amount: int = 1000, usdc_amount: int = 1000) -> str:
+        account = Account.create()
+        self.fund(account.address, novis_amount, usdc_amount)
+        return account.key.hex()
+
+    def client(self, key: str, **kwargs):
+        """novis.NOVISClient pointed at this chain."""
+        return novis.NOVISClient(key, rpc_url=self.rpc_url, addresses=self.addresses,
+                                 chain_id=self.chain_id, **kwargs)
+
+    def sdk_client(self, key: str, **kwargs):
+        """novis_sdk.NOVISClient pointed at this chain."""
+        return novis_sdk.NOVISClient(key, rpc_url=self.rpc_url,
+                                     addresses=self.addresses, **kwargs)
+
+
+# ============================================
+# GAS REPORT & SDK CHECKS
+# ============================================
+
+def gas_report(chain: LocalChain) -> dict:
+    """Run each SDK write once and return gas used per operation."""
+    client = chain.client(chain.new_wallet())
+    sdk = chain.sdk_client(chain.new_wallet())
+    payee = Account.create().address
+    report = {}
+
+    report['transfer'] = client.transfer(payee, 1)['gas_used']
+    report['transfer (fee)'] = client.transfer(payee, 25)['gas_used']
+    client.pay_with_memo(payee, 1, 'warmup')  # first call also approves the router
+    report['pay_with_memo'] = client.pay_with_memo(payee, 1, 'task:gas')['gas_used']
+    for size in (1, 10, 100):
+        payments = [{'to': Account.create().address, 'amount': 0.1, 'memo': f'task:{i}'}
+                    for i in range(size)]
+        report[f'batch_pay[{size}]'] = client.batch_pay(payments)['gas_used']
+    created = client.create_escrow(payee, 2)
+    report['create_escrow'] = created['gas_used']
+    receipt = chain.w3.eth.get_transaction_receipt(created['tx_hash'])
+    escrow_id = chain.contracts['router'].events.EscrowCreated().process_receipt(receipt)[0].args.escrowId
+    report['release_escrow'] = client.release_escrow(escrow_id)['gas_used']
+    client.mint(1)  # first call also approves the vault
+    report['mint'] = client.mint(1)['gas_used']
+    report['mint (fee)'] = client.mint(50)['gas_used']
+    report['redeem'] = client.redeem(1)['gas_used']
+    report['transfer_direct'] = sdk.transfer_direct(payee, '1')['gas_used']
+
+    owner = Account.from_key(chain.new_wallet())
+    receipt = _relay_meta_transfer(chain, owner, payee, 5 * NOVIS)
+    report['metaTransfer'] = receipt.gasUsed
+
+    sdk.create_smart_account('100')
+    block = chain.w3.eth.get_block('latest')
+    report['createAccount'] = chain.w3.eth.get_transaction_receipt(block.transactions[0]).gasUsed
+    return report
+
+
+def _meta_transfer_digest(chain, owner, to, amount, nonce, deadline) -> bytes:
+    """EIP-712 digest the SDK signs, using the token's on-chain domain."""
+    token = chain.contracts['token']
+    _, name, version, chain_id, verifying, _, _ = token.functions.eip712Domain().call()
+    domain = {'name': name, 'version': version, 'chainId': chain_id,
+              'verifyingContract': verifying}
+    typed = meta_transfer_typed_data(domain, owner.address, to, amount, nonce, deadline)
+    return encode_typed_data(full_message=typed)
+
+
+def _relay_meta_transfer(chain, owner, to, amount):
+    token = chain.contracts['token']
+    nonce = token.functions.getMetaTxNonce(owner.address).call()
+    deadline = chain.w3.eth.get_block('latest').timestamp + 3600
+    signed = owner.sign_message(_meta_transfer_digest(chain, owner, to, amount, nonce, deadline))
+    return chain._transact(
+        token.functions.metaTransfer(owner.address, to, amount, deadline, signed.signature),
+        account=chain.relayer
+    )
+
+
+def verify_sdk(chain: LocalChain) -> list:
+    """
+    Check SDK fee and nonce logic against on-chain results.
+
+    Returns a list of (check, expected, actual, ok) tuples.
+    """
+    results = []
+    token = chain.contracts['token']
+    sdk = chain.sdk_client(chain.new_wallet(novis_amount=10_000))
+    payee = Account.create().address
+
+    # Fee: calculate_fee() preview must equal what the recipient receives
+    for amount in ('1', '9.99', '10', '123.456'):
+        preview = sdk.calculate_fee(payee, amount)
+        before = token.functions.balanceOf(payee).call()
+        sdk.transfer_direct(payee, amount)
+        received = token.functions.balanceOf(payee).call() - before
+        results.append((f'fee net_amount_wei({amount})', int(preview.net_amount_wei),
+                        received, int(preview.net_amount_wei) == received))
+
+    # Docs fee rule (0.1% at >= 10 NOVIS) against the contract
+    amount_wei = Web3.to_wei(Decimal('10'), 'ether')
+    expected_fee = amount_wei // 1000
+    fee, _ = token.functions.calculateTransferFee(sdk.address, payee, amount_wei).call()
+    results.append(('fee at threshold', expected_fee, fee, expected_fee == fee))
+
+    # Nonce + digest: SDK-side EIP-712 digest equals getMetaTransferDigest
+    owner = Account.from_key(chain.new_wallet())
+    nonce = token.functions.getMetaTxNonce(owner.address).call()
+    deadline = chain.w3.eth.get_block('latest').timestamp + 3600
+    signable = _meta_transfer_digest(chain, owner, payee, NOVIS, nonce, deadline)
+    local = Web3.keccak(b'\x19' + signable.version + signable.header + signable.body)
+    onchain = token.functions.getMetaTransferDigest(owner.address, payee, NOVIS, nonce, deadline).call()
+    results.append(('metaTransfer digest', onchain.hex(), local.hex(), local == onchain))
+
+    for i in range(3):
+        _relay_meta_transfer(chain, owner, payee, NOVIS)
+        after = token.functions.getMetaTxNonce(owner.address).call()
+        results.append((f'meta nonce after relay #{i + 1}', nonce + i + 1, after,
+                        after == nonce + i + 1))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.evm')
+    parser.add_argument('--rpc-url', help='Attach to a running node instead of anvil')
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--no-build', action='store_true', help='Skip forge build')
+    parser.add_argument('--json', help='Write the gas report to this file')
+    args = parser.parse_args(argv)
+
+    with LocalChain(args.rpc_url, port=args.port, build=not args.no_build) as chain:
+        print('Deployed:')
+        for key in ('NOVIS_TOKEN', 'VAULT', 'PAYMENT_ROUTER', 'USDC', 'FACTORY'):
+            print(f'  {key:<15} {chain.addresses[key]}')
+
+        report = gas_report(chain)
+        print('\nGas per operation:')
+        for op, gas in report.items():
+            print(f'  {op:<18} {gas:>9,}')
+
+        print('\nSDK vs chain:')
+        failed = 0
+        for check, expected, actual, ok in verify_sdk(chain):
+            failed += not ok
+            print(f"  {'OK ' if ok else 'BAD'} {check}: expected {expected}, got {actual}")
+
+        if args.json:
+            with open(args.json, 'w') as fh:
+                json.dump(report, fh, indent=2)
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Memory and build-time comparison of transfer result representations.
+
+Compares, for ``n`` transfer results:
+
+    dataclass   the previous novis_sdk.TransferResult (formatted strings)
+    dict        the shape novis.NOVISClient returns
+    slotted     novis.records.TransferResult (wei-backed, lazy formatting)
+    columnar    novis.records.TransferBatch
+
+Usage:
+    python -m benchmarks.memory
+    python -m benchmarks.memory --n 1000000
+"""
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from web3 import Web3
+
+from novis.records import TransferBatch, TransferResult
+
+
+@dataclass
+class LegacyTransferResult:
+    """novis_sdk.TransferResult before it became a slotted record."""
+    success: bool
+    tx_hash: str
+    block_number: int
+    from_address: str
+    to_address: str
+    amount: str
+    explorer_url: str
+
+
+def _inputs(n: int) -> list:
+    """
+    Raw rows as they come off the wire: 32-byte hash, block, sender and
+    recipient (from a small shared set, as repeat payees are), amount.
+    Every builder decodes them itself, so each pays for what it retains.
+    """
+    sender = Web3.to_checksum_address(os.urandom(20))
+    recipients = [Web3.to_checksum_address(os.urandom(20)) for _ in range(256)]
+    return [(os.urandom(32), 1_000_000 + i, sender, recipients[i % 256], i % 5000 + 1)
+            for i in range(n)]
+
+
+def build_dataclass(rows):
+    out = []
+    for h, b, f, t, units in rows:
+        tx_hash = '0x' + h.hex()
+        out.append(LegacyTransferResult(True, tx_hash, b, f, t,
+                                        str(Web3.from_wei(units * 10**15, 'ether')),
+                                        f'https://basescan.org/tx/{tx_hash}'))
+    return out
+
+
+def build_dict(rows):
+    return [{'tx_hash': '0x' + h.hex(), 'block_number': b, 'from': f, 'to': t,
+             'amount_wei': units * 10**15, 'status': 1} for h, b, f, t, units in rows]
+
+
+def build_slotted(rows):
+    return [TransferResult(True, '0x' + h.hex(), b, f, t, units * 10**15)
+            for h, b, f, t, units in rows]
+
+
+def build_columnar(rows):
+    batch = TransferBatch()
+    for h, b, f, t, units in rows:
+        batch.append(h, b, f, t, units * 10**15)
+    return batch
+
+
+BUILDERS = {
+    'dataclass': build_dataclass,
+    'dict': build_dict,
+    'slotted': build_slotted,
+    'columnar': build_columnar,
+}
+
+
+def measure(name: str, rows: list) -> dict:
+    build = BUILDERS[name]
+    gc.collect()
+    started = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+    # Separate pass: tracemalloc slows allocation-heavy builders unevenly
+    tracemalloc.start()
+    result = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        'representation': name,
+        'n': len(rows),
+        'bytes_per_result': round(current / len(rows), 1),
+        'total_mb': round(current / 2**20, 2),
+        'build_s': round(elapsed, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.memory')
+    parser.add_argument('--n', type=int, default=200_000, help='Results per representation')
+    args = parser.parse_args(argv)
+
+    rows = _inputs(args.n)
+    print(f"{'representation':<16}{'bytes/result':>14}{'total MB':>11}{'build s':>10}")
+    print('-' * 51)
+    for name in BUILDERS:
+        r = measure(name, rows)
+        print(f"{r['representation']:<16}{r['bytes_per_result']:>14}{r['total_mb']:>11}"
+              f"{r['build_s']:>10}")
+
+
+if __name__ == '__main__':
+    main()
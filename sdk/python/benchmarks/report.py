@@ -0,0 +1,128 @@
+"""
+Latency/throughput recording and regression checks for benchmark runs.
+"""
+
+import json
+import math
+import threading
+import time
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """
+    Collects per-operation latencies for one scenario.
+
+    Example:
+        rec = Recorder('transfer_burst')
+        with rec.measure():
+            client.transfer(to, '1')
+        print(rec.summary())
+    """
+
+    def __init__(self, name: str, unit: str = 'op'):
+        self.name = name
+        self.unit = unit
+        self.latencies = []
+        self.errors = 0
+        self.items = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def record(self, seconds: float, items: int = 1):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.items += items
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def measure(self, items: int = 1):
+        return _Measure(self, items)
+
+    def summary(self) -> dict:
+        values = sorted(self.latencies)
+        elapsed = (self.finished or time.perf_counter()) - (self.started or 0)
+        return {
+            'scenario': self.name,
+            'ops': len(values),
+            'items': self.items,
+            'errors': self.errors,
+            'elapsed_s': round(elapsed, 4),
+            'throughput_ops_s': round(len(values) / elapsed, 2) if elapsed else 0.0,
+            'throughput_items_s': round(self.items / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+        }
+
+
+class _Measure:
+    __slots__ = ('recorder', 'items', 't0')
+
+    def __init__(self, recorder, items):
+        self.recorder = recorder
+        self.items = items
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.recorder.error()
+            return True
+        self.recorder.record(time.perf_counter() - self.t0, self.items)
+        return False
+
+
+def print_table(results: list):
+    """Print scenario summaries as a fixed-width table."""
+    header = f"{'scenario':<22}{'ops':>7}{'err':>6}{'ops/s':>10}{'items/s':>11}{'p50 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['scenario']:<22}{r['ops']:>7}{r['errors']:>6}"
+              f"{r['throughput_ops_s']:>10.1f}{r['throughput_items_s']:>11.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+def compare(results: list, baseline_path: str, tolerance: float = 0.2) -> list:
+    """
+    Compare results against a saved baseline.
+
+    Returns a list of human-readable regressions: throughput more than
+    ``tolerance`` below baseline, or p99 more than ``tolerance`` above it.
+    """
+    with open(baseline_path) as fh:
+        baseline = {r['scenario']: r for r in json.load(fh)}
+    regressions = []
+    for r in results:
+        base = baseline.get(r['scenario'])
+        if base is None:
+            continue
+        if r['throughput_ops_s'] < base['throughput_ops_s'] * (1 - tolerance):
+            regressions.append(
+                f"{r['scenario']}: throughput {r['throughput_ops_s']} ops/s "
+                f"< baseline {base['throughput_ops_s']}"
+            )
+        if r['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{r['scenario']}: p99 {r['p99_ms']} ms > baseline {base['p99_ms']}"
+            )
+    return regressions
@@ -0,0 +1,614 @@
+"""
+Scenario drivers that exercise the real SDK clients against the stubs.
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_account import Account
+from eth_utils import to_checksum_address
+from web3 import Web3
+
+import novis
+import novis_sdk
+from novis.accelerator import Accelerator
+from novis.ledger import TransferStore
+from novis.preflight import Preflight
+from novis.vault import VaultPipeline
+from novis.memos import MemoIndex
+from novis.rollups import DAY, GAS_SPONSORED, HOUR, TRANSFER_FEE, RevenueRollup
+from novis.listener import PaymentListener
+from novis.ratelimit import Limiter
+from novis.relayer import RelayerService
+from novis.routing import RelayerHealth, TransferRouter
+from novis.userop import SmartAccountOps
+
+from .report import Recorder
+from .stubs import (ESCROW_CREATED_TOPIC, Faults, StubBundler, StubChain, StubRelayer,
+                    StubRPCNode)
+
+NOVIS = 10**18
+
+
+class BenchEnv:
+    """
+    A StubChain with an RPC node, relayer and bundler running in-process.
+
+    Args:
+        rpc_faults: Faults for the JSON-RPC node
+        relayer_faults: Faults for the relayer
+        verify_signatures: Have the relayer (and the token's metaTransfer)
+            recover EIP-712 signatures
+    """
+
+    def __init__(self, rpc_faults: Faults = None, relayer_faults: Faults = None,
+                 verify_signatures: bool = True):
+        self.chain = StubChain()
+        self.rpc = StubRPCNode(self.chain, rpc_faults)
+        self.relayer = StubRelayer(self.chain, relayer_faults,
+                                   verify_signatures=verify_signatures)
+        self.chain.verify_meta_signatures = verify_signatures
+        self.bundler = StubBundler(self.chain, rpc_faults)
+
+    def __enter__(self):
+        self.rpc.start()
+        self.relayer.start()
+        self.bundler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.bundler.stop()
+        self.relayer.stop()
+        self.rpc.stop()
+
+    def wallets(self, n: int, novis_amount: int = 1_000_000, usdc_amount: int = 0) -> list:
+        """Create n funded private keys."""
+        keys = []
+        for _ in range(n):
+            account = Account.create()
+            self.chain.fund(account.address, novis_wei=novis_amount * NOVIS,
+                            usdc=usdc_amount * 10**6)
+            keys.append(account.key.hex())
+        return keys
+
+    def sdk_client(self, key: str, **kwargs):
+        """novis_sdk.NOVISClient wired to the stubs."""
+        return novis_sdk.NOVISClient(key, rpc_url=self.rpc.url,
+                                     relayer_url=self.relayer.url, **kwargs)
+
+    def client(self, key: str, **kwargs):
+        """novis.NOVISClient wired to the stub RPC node."""
+        return novis.NOVISClient(key, rpc_url=self.rpc.url, **kwargs)
+
+
+    def relayer_service(self, wallets: int = 4, **kwargs) -> RelayerService:
+        """novis.relayer.RelayerService on the stub RPC node with funded hot wallets."""
+        keys = []
+        for _ in range(wallets):
+            account = Account.create()
+            self.chain.fund(account.address)
+            keys.append(account.key)
+        return RelayerService(Web3(Web3.HTTPProvider(self.rpc.url)), keys,
+                              addresses=self.chain.addresses, chain_id=self.chain.chain_id,
+                              port=0, **kwargs)
+
+    def smart_account(self, key: str, daily_limit: int = 10**9, novis_amount: int = 1_000_000) -> str:
+        """Deploy a funded NOVISSmartAccountV4 owned by key."""
+        account = _random_address()
+        self.chain.add_smart_account(account, Account.from_key(key).address, daily_limit * NOVIS)
+        self.chain.fund(account, novis_wei=novis_amount * NOVIS, eth_wei=0)
+        return account
+
+
+def _random_address() -> str:
+    return Account.create().address
+
+
+def _run_workers(workers: int, fn, jobs: list):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fn, jobs))
+
+
+def transfer_burst(env: BenchEnv, n: int = 200, concurrency: int = 16) -> Recorder:
+    """Gasless transfers through the relayer, one wallet per worker."""
+    rec = Recorder('transfer_burst')
+    clients = [env.sdk_client(k) for k in env.wallets(concurrency)]
+    recipients = [_random_address() for _ in range(32)]
+
+    def worker(i):
+        client = clients[i]
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                client.transfer(recipients[j % len(recipients)], '1.5')
+
+    rec.start()
+    _run_workers(concurrency, worker, range(concurrency))
+    rec.stop()
+    return rec
+
+
+def batch_pay_payouts(env: BenchEnv, batches: int = 20, size: int = 100,
+                      concurrency: int = 4) -> Recorder:
+    """PaymentRouter.batchPay payouts of ``size`` recipients each."""
+    rec = Recorder('batch_pay_payouts', unit='payment')
+    clients = [env.client(k) for k in env.wallets(concurrency)]
+    payments = [
+        {'to': _random_address(), 'amount': 2, 'memo': f'task:bench_{i:06d}'}
+        for i in range(size)
+    ]
+
+    def worker(i):
+        client = clients[i]
+        for _ in range(i, batches, concurrency):
+            with rec.measure(items=size):
+                client.batch_pay(payments)
+
+    rec.start()
+    _run_workers(concurrency, worker, range(concurrency))
+    rec.stop()
+    return rec
+
+
+def escrow_churn(env: BenchEnv, n: int = 100, concurrency: int = 8) -> Recorder:
+    """Create an escrow and immediately release or refund it."""
+    rec = Recorder('escrow_churn')
+    clients = [env.client(k) for k in env.wallets(concurrency)]
+    payee = _random_address()
+
+    def escrow_id(tx_hash):
+        receipt = env.chain.receipts[bytes.fromhex(tx_hash.removeprefix('0x'))]
+        for log in receipt['logs']:
+            if log['topics'][0] == ESCROW_CREATED_TOPIC:
+                return int.from_bytes(log['topics'][1], 'big')
+        raise RuntimeError('EscrowCreated not emitted')
+
+    def worker(i):
+        client = clients[i]
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                result = client.create_escrow(payee, 5, timeout=3600)
+                eid = escrow_id(result['tx_hash'])
+                if j % 2:
+                    client.refund_escrow(eid)
+                else:
+                    client.release_escrow(eid)
+
+    rec.start()
+    _run_workers(concurrency, worker, range(concurrency))
+    rec.stop()
+    return rec
+
+
+def balance_reads(env: BenchEnv, n: int = 2000, concurrency: int = 16) -> Recorder:
+    """Bulk NOVIS balanceOf reads across many distinct addresses."""
+    rec = Recorder('balance_reads')
+    reader = env.sdk_client(Account.create().key.hex())
+    addresses = []
+    for i in range(min(n, 500)):
+        address = _random_address()
+        env.chain.fund(address, novis_wei=(i + 1) * NOVIS, eth_wei=0)
+        addresses.append(to_checksum_address(address))
+
+    def worker(i):
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                reader.get_balance(addresses[j % len(addresses)])
+
+    rec.start()
+    _run_workers(concurrency, worker, range(concurrency))
+    rec.stop()
+    return rec
+
+
+def user_op_transfers(env: BenchEnv, n: int = 200, concurrency: int = 16) -> Recorder:
+    """NOVIS transfers from one smart account, one 2D nonce lane per worker."""
+    rec = Recorder('user_op_transfers')
+    key = env.wallets(1)[0]
+    client = env.client(key)
+    ops = SmartAccountOps(client, env.smart_account(key), env.bundler.url, lanes=concurrency)
+    recipients = [_random_address() for _ in range(32)]
+
+    def worker(i):
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                ops.transfer(recipients[j % len(recipients)], 2)
+
+    rec.start()
+    _run_workers(concurrency, worker, range(concurrency))
+    rec.stop()
+    return rec
+
+
+def fee_spike(env: BenchEnv, n: int = 20, stuck_blocks: int = 3) -> Recorder:
+    """
+    Sequential transfers while the inclusion fee floor sits above the
+    client's gas price; the Accelerator has to bump each one in.
+    """
+    rec = Recorder('fee_spike')
+    client = env.client(env.wallets(1)[0])
+    client.accelerator = Accelerator(client.w3, client.account, stuck_blocks=stuck_blocks,
+                                     poll_interval=0.01)
+    recipient = _random_address()
+    env.chain.set_min_fee(env.chain.gas_price * 2)
+    stop = threading.Event()
+
+    def miner():
+        while not stop.wait(0.005):
+            env.chain.mine_empty()
+
+    threading.Thread(target=miner, daemon=True).start()
+    rec.start()
+    try:
+        for _ in range(n):
+            with rec.measure():
+                client.transfer(recipient, 1)
+    finally:
+        stop.set()
+        env.chain.set_min_fee(0)
+    rec.stop()
+    return rec
+
+
+def relay_overload(env: BenchEnv, n: int = 400, concurrency: int = 64,
+                   capacity: int = 8) -> Recorder:
+    """
+    Gasless transfers from ``concurrency`` wallets against a relayer that
+    serves only ``capacity`` requests at once (429 beyond that), with one
+    shared adaptive Limiter in front of it.
+    """
+    rec = Recorder('relay_overload')
+    limiter = Limiter(initial=4, max_limit=concurrency, base_backoff=0.02, max_retries=10)
+    clients = [env.sdk_client(k, relayer_limiter=limiter) for k in env.wallets(concurrency)]
+    recipients = [_random_address() for _ in range(32)]
+    faults = env.relayer.faults
+    latency_ms = faults.latency_ms
+    faults.capacity, faults.latency_ms = capacity, latency_ms or 5
+
+    def worker(i):
+        client = clients[i]
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                client.transfer(recipients[j % len(recipients)], '1.5')
+
+    rec.start()
+    try:
+        _run_workers(concurrency, worker, range(concurrency))
+    finally:
+        faults.capacity, faults.latency_ms = None, latency_ms
+    rec.stop()
+    return rec
+
+
+def self_hosted_relay(env: BenchEnv, n: int = 200, concurrency: int = 16,
+                      wallets: int = 4) -> Recorder:
+    """Gasless transfers through novis.relayer.RelayerService instead of the stub relayer."""
+    rec = Recorder('self_hosted_relay')
+    keys = env.wallets(concurrency)
+    recipients = [_random_address() for _ in range(32)]
+
+    with env.relayer_service(wallets) as relayer:
+        clients = [novis_sdk.NOVISClient(k, rpc_url=env.rpc.url, relayer_url=relayer.url)
+                   for k in keys]
+
+        def worker(i):
+            client = clients[i]
+            for j in range(i, n, concurrency):
+                with rec.measure():
+                    client.transfer(recipients[j % len(recipients)], '1.5')
+
+        rec.start()
+        _run_workers(concurrency, worker, range(concurrency))
+        rec.stop()
+    return rec
+
+
+def relay_brownout(env: BenchEnv, n: int = 300, concurrency: int = 16,
+                   brownout_ms: float = 1500) -> Recorder:
+    """
+    smart_transfer from ``concurrency`` wallets (with ETH) sharing one
+    RelayerHealth, while the relayer slows to ``brownout_ms`` per request
+    for the middle third of the run.
+    """
+    rec = Recorder('relay_brownout')
+    health = RelayerHealth(latency_slo=0.5, min_samples=5, cooldown=1.0)
+    clients = []
+    for key in env.wallets(concurrency):
+        client = env.sdk_client(key)
+        client.router = TransferRouter(client, health)
+        clients.append(client)
+    recipients = [_random_address() for _ in range(32)]
+    faults = env.relayer.faults
+    latency_ms = faults.latency_ms
+    done = [0]
+    lock = threading.Lock()
+
+    def worker(i):
+        client = clients[i]
+        for j in range(i, n, concurrency):
+            with rec.measure():
+                client.smart_transfer(recipients[j % len(recipients)], '1.5')
+            with lock:
+                done[0] += 1
+                if done[0] == n // 3:
+                    faults.latency_ms = brownout_ms
+                elif done[0] == 2 * n // 3:
+                    faults.latency_ms = latency_ms
+
+    rec.start()
+    try:
+        _run_workers(concurrency, worker, range(concurrency))
+    finally:
+        faults.latency_ms = latency_ms
+    rec.stop()
+    return rec
+
+
+def incoming_payments(env: BenchEnv, n: int = 200, concurrency: int = 8,
+                      watched: int = 100_000) -> Recorder:
+    """
+    Gasless transfers to a few of ``watched`` addresses, picked up by one
+    PaymentListener; latency is from the transfer's return (mined) to
+    delivery.
+    """
+    rec = Recorder('incoming_payments')
+    clients = [env.sdk_client(k) for k in env.wallets(concurrency)]
+    payees = [_random_address() for _ in range(16)]
+    mined, seen = {}, {}
+
+    def delivered(payment):
+        seen[payment.tx_hash] = time.perf_counter()
+
+    listener = PaymentListener(Web3(Web3.HTTPProvider(env.rpc.url)),
+                               payees + ['0x' + os.urandom(20).hex() for _ in range(watched)],
+                               delivered, addresses=env.chain.addresses, poll_interval=0.05)
+
+    def worker(i):
+        client = clients[i]
+        for j in range(i, n, concurrency):
+            result = client.transfer(payees[j % len(payees)], '1.5')
+            mined[result.tx_hash] = time.perf_counter()
+
+    rec.start()
+    with listener:
+        _run_workers(concurrency, worker, range(concurrency))
+        deadline = time.monotonic() + 5
+        while len(seen) < len(mined) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    rec.stop()
+    for tx_hash, started in mined.items():
+        if tx_hash in seen:
+            # The listener can see the block before /relay has answered
+            rec.record(max(0.0, seen[tx_hash] - started))
+        else:
+            rec.error()
+    return rec
+
+
+def snapshot_reports(env: BenchEnv, n: int = 200, accounts: int = 200) -> Recorder:
+    """
+    Repeated reports (protocol stats plus balances of a fixed account set)
+    from one pinned snapshot: the first report fetches by multicall, the
+    rest come from the read cache.
+    """
+    rec = Recorder('snapshot_reports')
+    reader = env.sdk_client(Account.create().key.hex())
+    addresses = []
+    for i in range(accounts):
+        address = _random_address()
+        env.chain.fund(address, novis_wei=(i + 1) * NOVIS, eth_wei=0)
+        addresses.append(to_checksum_address(address))
+    snap = reader.snapshot()
+
+    rec.start()
+    for _ in range(n):
+        with rec.measure():
+            snap.get_protocol_stats()
+            snap.get_balances(addresses)
+    rec.stop()
+    return rec
+
+
+def point_in_time_balances(env: BenchEnv, n: int = 100, accounts: int = 2000,
+                           blocks: int = 200, per_block: int = 250,
+                           query_size: int = 1000) -> Recorder:
+    """
+    Balances of many addresses at past blocks from a TransferStore synced
+    over a history of direct transfers. Answers are checked against the
+    stub's balances recorded while the history was built, and a sample
+    against balanceOf at the head.
+    """
+    rec = Recorder('point_in_time_balances', unit='balance')
+    rng = random.Random(7)
+    token = env.chain.token
+    addresses = [to_checksum_address(_random_address()) for _ in range(accounts)]
+    for address in addresses[:accounts // 10]:
+        env.chain.fund(address, novis_wei=1000 * NOVIS, eth_wei=0)
+    history = {}
+    for _ in range(blocks):
+        env.chain.transfers([(rng.choice(addresses[:accounts // 10]), rng.choice(addresses),
+                              rng.randrange(1, NOVIS)) for _ in range(per_block)])
+        if rng.random() < 0.1:
+            history[env.chain.block_number] = [env.chain.balance_of(token, a) for a in addresses]
+
+    with tempfile.TemporaryDirectory() as path:
+        store = TransferStore(path, Web3(Web3.HTTPProvider(env.rpc.url)), token,
+                              checkpoint_every=10_000)
+        store.sync()
+        check = store.verify(sample=200, seed=1)
+        if check['mismatches']:
+            raise AssertionError(f"store disagrees with balanceOf: {check['mismatches'][:3]}")
+        for block, expected in history.items():
+            if store.balances_at(addresses, block) != expected:
+                raise AssertionError(f'store disagrees with the chain at block {block}')
+
+        heights = list(history) or [store.synced_block]
+        rec.start()
+        for _ in range(n):
+            block = rng.choice(heights) - rng.randrange(0, 10)
+            with rec.measure(items=query_size):
+                store.balances_at(rng.sample(addresses, query_size), block)
+        rec.stop()
+    return rec
+
+
+def memo_reconcile(env: BenchEnv, n: int = 5, tasks: int = 10_000,
+                   batch: int = 500) -> Recorder:
+    """
+    Reconcile a table of ``tasks`` expected payments against a synced
+    MemoIndex. The history has skipped, repeated and under-paid tasks
+    planted in it, and each run must report them exactly.
+    """
+    rec = Recorder('memo_reconcile', unit='task')
+    client = env.client(env.wallets(1, novis_amount=10 * tasks)[0])
+    payee = _random_address()
+    expected = [{'memo': f'task:research_topic_{i:06d}', 'to': payee, 'amount': '2'}
+                for i in range(tasks)]
+    missing = set(range(0, tasks, 97))
+    duplicate = set(range(1, tasks, 101)) - missing
+    short = set(range(2, tasks, 103)) - missing
+    payments = [{'to': payee, 'amount': 1 if i in short else 2, 'memo': row['memo']}
+                for i, row in enumerate(expected) if i not in missing]
+    payments += [{'to': payee, 'amount': 2, 'memo': expected[i]['memo']} for i in sorted(duplicate)]
+    for i in range(0, len(payments), batch):
+        client.batch_pay(payments[i:i + batch])
+
+    index = MemoIndex(Web3(Web3.HTTPProvider(env.rpc.url)), client.addresses['PAYMENT_ROUTER'])
+    index.sync()
+    rec.start()
+    for _ in range(n):
+        with rec.measure(items=tasks):
+            result = index.reconcile(expected, payer=client.address)
+        if (len(result['missing']) != len(missing) or len(result['duplicate']) != len(duplicate)
+                or len(result['amount_mismatch']) != len(short - duplicate)):
+            rec.error()
+    rec.stop()
+    return rec
+
+
+def revenue_rollups(env: BenchEnv, n: int = 500, payers: int = 200, blocks: int = 400,
+                    per_block: int = 50) -> Recorder:
+    """
+    Fee-by-payer window queries against a RevenueRollup over ~4 days of
+    fee-paying transfers, deposits and sponsored UserOps (15-minute
+    blocks). The rollup is synced block by block as the history is mined.
+    A sample of windows is checked against a rescan of the raw events.
+    """
+    rec = Recorder('revenue_rollups', unit='query')
+    rng = random.Random(11)
+    env.chain.block_time = 900
+    accounts = [to_checksum_address(_random_address()) for _ in range(payers)]
+    for account in accounts:
+        env.chain.fund(account, novis_wei=10**6 * NOVIS, eth_wei=0)
+    rollup = RevenueRollup(Web3(Web3.HTTPProvider(env.rpc.url)))
+    fees = []
+    for _ in range(blocks):
+        moves = [(rng.choice(accounts), _random_address(), rng.randrange(1, 5000) * NOVIS)
+                 for _ in range(per_block)]
+        env.chain.transfers(moves)
+        t = env.chain.genesis_time + env.chain.block_number * env.chain.block_time
+        fees += [(t, frm, env.chain._fee(env.chain.token, frm, to, amount))
+                 for frm, to, amount in moves]
+        rollup.sync()
+    key = env.wallets(1, usdc_amount=10_000)[0]
+    client = env.client(key)
+    client.mint(5_000)
+    SmartAccountOps(client, env.smart_account(key), env.bundler.url,
+                    paymaster='sponsor').transfer(_random_address(), 2)
+    rollup.sync()
+    if not rollup.window(GAS_SPONSORED, 0, 2**40)['count']:
+        raise AssertionError('sponsored UserOp missing from the rollup')
+
+    start = env.chain.genesis_time
+    end = start + blocks * env.chain.block_time
+    rec.start()
+    for i in range(n):
+        a = rng.randrange(start, end)
+        b = a + rng.randrange(HOUR, 3 * DAY)
+        with rec.measure():
+            top = rollup.top(TRANSFER_FEE, a, b, n=10)
+        if i % 50 == 0:
+            a, b = a - a % HOUR, -(-b // HOUR) * HOUR
+            expected = sum(fee for t, _, fee in fees if a <= t < b)
+            if rollup.window(TRANSFER_FEE, a, b)['value'] != expected or len(top) > 10:
+                rec.error()
+    rec.stop()
+    return rec
+
+
+def preflight_bisect(env: BenchEnv, n: int = 20, chunk: int = 200, bad: int = 3) -> Recorder:
+    """
+    Pre-flight of ``chunk``-payment batchPay chunks with ``bad`` payments
+    to the zero address planted in each. Every run must quarantine exactly
+    the planted rows.
+    """
+    rec = Recorder('preflight_bisect', unit='payment')
+    rng = random.Random(5)
+    client = env.client(env.wallets(1, novis_amount=10 * chunk)[0])
+    client._ensure_router_allowance(10 * chunk)
+    preflight = Preflight(client)
+    rec.start()
+    for _ in range(n):
+        planted = set(rng.sample(range(chunk), bad))
+        payments = [{'to': '0x' + '00' * 20 if i in planted else _random_address(),
+                     'amount': 1, 'memo': f'row{i}'} for i in range(chunk)]
+        with rec.measure(items=chunk):
+            result = preflight.batch_pay(payments)
+        if {i for i, _, _ in result['quarantined']} != planted:
+            rec.error()
+    rec.stop()
+    return rec
+
+
+def vault_treasury(env: BenchEnv, n: int = 10, wallets: int = 24, concurrency: int = 8) -> Recorder:
+    """
+    Daily treasury rounds: ``wallets`` wallets each mint three amounts
+    (below and above the fee threshold) and redeem two through a
+    VaultPipeline, all wallets in parallel. One op is one round. Every
+    minted and returned amount must equal its offline preview.
+    """
+    rec = Recorder('vault_treasury', unit='tx')
+    clients = [env.client(key) for key in env.wallets(wallets, novis_amount=0,
+                                                      usdc_amount=100_000)]
+    pipeline = VaultPipeline(max_workers=concurrency)
+    mints, redeems = [5, 120, 2_500], [1, 60]
+    rec.start()
+    for _ in range(n):
+        with rec.measure(items=wallets * (len(mints) + len(redeems))):
+            results = pipeline.mint_many([(c, mints) for c in clients])
+            results += pipeline.redeem_many([(c, redeems) for c in clients])
+        for result in results:
+            if 'error' in result or result['skipped'] or not all(
+                    tx['status'] == 1 and _as_previewed(tx) for tx in result['transactions']):
+                rec.error()
+    rec.stop()
+    return rec
+
+
+def _as_previewed(tx: dict) -> bool:
+    if 'minted' in tx:
+        return tx['minted'] == tx['preview']['novis'] and tx['fee'] == tx['preview']['fee']
+    return tx['returned'] == tx['preview']
+
+
+SCENARIOS = {
+    'transfer_burst': transfer_burst,
+    'batch_pay_payouts': batch_pay_payouts,
+    'escrow_churn': escrow_churn,
+    'balance_reads': balance_reads,
+    'user_op_transfers': user_op_transfers,
+    'fee_spike': fee_spike,
+    'relay_overload': relay_overload,
+    'self_hosted_relay': self_hosted_relay,
+    'relay_brownout': relay_brownout,
+    'incoming_payments': incoming_payments,
+    'snapshot_reports': snapshot_reports,
+    'point_in_time_balances': point_in_time_balances,
+    'memo_reconcile': memo_reconcile,
+    'revenue_rollups': revenue_rollups,
+    'preflight_bisect': preflight_bisect,
+    'vault_treasury': vault_treasury,
+}
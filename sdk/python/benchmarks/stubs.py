@@ -0,0 +1,1418 @@
+"""
+In-process stand-ins for the NOVIS relayer, a Base JSON-RPC node and an
+ERC-4337 bundler.
+
+All servers share one ``StubChain`` so a gasless transfer relayed through
+``StubRelayer`` (or a UserOperation sent to ``StubBundler``) shows up in
+``balanceOf`` calls made through ``StubRPCNode``.
+Latency, jitter and error injection are configured per server with ``Faults``.
+
+Example:
+    chain = StubChain()
+    with StubRPCNode(chain, Faults(latency_ms=20)) as rpc, \\
+         StubRelayer(chain, Faults(latency_ms=50)) as relayer:
+        client = NOVISClient(pk, rpc_url=rpc.url, relayer_url=relayer.url)
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_account import Account
+from eth_account.messages import encode_defunct, encode_typed_data
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+
+import novis
+import novis_sdk
+
+TRANSFER_TOPIC = keccak(text='Transfer(address,address,uint256)')
+META_TRANSFER_TOPIC = keccak(text='MetaTransferExecuted(address,address,uint256,address)')
+ESCROW_CREATED_TOPIC = keccak(text='EscrowCreated(uint256,address,address,uint256,uint256)')
+ESCROW_RELEASED_TOPIC = keccak(text='EscrowReleased(uint256)')
+ESCROW_REFUNDED_TOPIC = keccak(text='EscrowRefunded(uint256)')
+PAYMENT_WITH_MEMO_TOPIC = keccak(text='PaymentWithMemo(address,address,uint256,string)')
+DEPOSIT_TOPIC = keccak(text='Deposit(address,uint256,uint256,uint256)')
+REDEEM_TOPIC = keccak(text='Redeem(address,uint256,uint256)')
+SPENDING_TRACKED_TOPIC = keccak(text='SpendingTracked(uint256,uint256,uint256)')
+DAILY_LIMIT_SET_TOPIC = keccak(text='DailyLimitSet(uint256)')
+SESSION_KEY_CREATED_TOPIC = keccak(text='SessionKeyCreated(address,uint256,uint256)')
+FEE_COLLECTED_TOPIC = keccak(text='FeeCollected(address,address,uint256)')
+TOKEN_FEE_COLLECTED_TOPIC = keccak(text='FeeCollected(address,address,uint256,uint256)')
+GAS_SPONSORED_TOPIC = keccak(text='GasSponsored(address,uint256,uint256,bool)')
+TRANSACTION_EXECUTED_TOPIC = keccak(text='TransactionExecuted(address,uint256,bytes)')
+ACCOUNT_CREATED_TOPIC = keccak(text='AccountCreated(address,address,uint256)')
+USER_OPERATION_EVENT_TOPIC = keccak(
+    text='UserOperationEvent(bytes32,address,address,uint256,bool,uint256,uint256)')
+
+SCALE = 10**12  # USDC (6 decimals) -> NOVIS (18 decimals)
+
+
+_MISSING = object()
+
+
+class Revert(Exception):
+    """Raised by stub contract handlers to revert a call or transaction."""
+
+
+# ============================================
+# FAULT INJECTION
+# ============================================
+
+class Faults:
+    """
+    Latency and error injection for a stub server.
+
+    Args:
+        latency_ms: Base delay added to every request
+        jitter_ms: Uniform +/- jitter around the base delay
+        error_rate: Probability (0.0 - 1.0) that a request fails
+        error_status: HTTP status returned for injected failures
+        retry_after: Optional Retry-After header (seconds) on failures
+        capacity: Requests served concurrently; beyond it the server
+            answers 429 (None for unlimited)
+        seed: Seed for reproducible runs
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 retry_after: float = None, capacity: int = None, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.capacity = capacity
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if not self.latency_ms and not self.jitter_ms:
+            return
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+# ============================================
+# CHAIN STATE
+# ============================================
+
+def _selector(signature: str) -> bytes:
+    return function_signature_to_4byte_selector(signature)
+
+
+def _addr(value) -> str:
+    if isinstance(value, bytes):
+        value = '0x' + value.hex()
+    return value.lower()
+
+
+def _topic(address: str) -> bytes:
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def _bloom(logs) -> bytes:
+    """2048-bit logs bloom (yellow paper M3:2048) over addresses and topics."""
+    bits = 0
+    for log in logs:
+        for item in [bytes.fromhex(log['address'][2:])] + list(log['topics']):
+            digest = keccak(item)
+            for i in (0, 2, 4):
+                bits |= 1 << (int.from_bytes(digest[i:i + 2], 'big') & 2047)
+    return bits.to_bytes(256, 'big')
+
+
+class StubChain:
+    """
+    Minimal automining chain that models the NOVIS contracts.
+
+    Token, PaymentRouter and Vault behaviour follows ``docs/API.md``: the
+    token charges ``fee_bps`` on transfers of at least ``fee_threshold``,
+    the vault charges 0.5% on deposits of at least 10 USDC.
+
+    Args:
+        addresses: Contract addresses (defaults to the SDK mainnet map)
+        chain_id: Chain ID reported by ``eth_chainId`` and ``/domain``
+        gas_price: Value returned by ``eth_gasPrice``
+        block_time: Seconds between mined blocks
+    """
+
+    def __init__(self, addresses: dict = None, chain_id: int = 8453,
+                 gas_price: int = 10**7, block_time: int = 2):
+        addrs = dict(novis_sdk.ADDRESSES)
+        addrs.update(novis.ADDRESSES)
+        addrs.update(addresses or {})
+        self.addresses = addrs
+        self.token = _addr(addrs['NOVIS_TOKEN'])
+        self.usdc = _addr(addrs['USDC'])
+        self.vault = _addr(addrs['VAULT'])
+        self.router = _addr(addrs['PAYMENT_ROUTER'])
+        self.treasury = _addr(addrs['TREASURY'])
+        self.entry_point = _addr(addrs['ENTRYPOINT'])
+        self.paymaster = _addr(addrs['PAYMASTER'])
+        self.factory = _addr(addrs['FACTORY'])
+        self.multicall = _addr(addrs['MULTICALL3'])
+        self.chain_id = chain_id
+        self.gas_price = gas_price
+        self.block_time = block_time
+        self.genesis_time = int(time.time())
+
+        self.fee_threshold = 10 * 10**18
+        self.fee_bps = 10
+        self.deposit_fee_threshold = 10 * 10**6
+        self.deposit_fee_bps = 50
+        self.account_fee_bps = 5
+        self.account_treasury = '0x4709280aef7a496ea84e72db3cabad5e324d593e'
+
+        self.lock = threading.RLock()
+        self.block_number = 0
+        self.blocks = {0: self._block(0, [])}
+        self.balances = {}        # (token, account) -> int
+        self.allowances = {}      # (token, owner, spender) -> int
+        self.total_supply = {}    # token -> int
+        self.eth_balances = {}
+        self.tx_nonces = {}
+        self.meta_nonces = {}
+        self.escrows = {}         # escrow id -> [payer, payee, amount, deadline, released, refunded]
+        self.receipts = {}
+        self.queued = {}          # sender -> {nonce: (tx_hash, to, data, fee)}
+        self.min_fee = 0          # txs paying less wait in the mempool (fee spike)
+        self.verify_meta_signatures = True  # recover metaTransfer signers on-chain
+        self.smart_accounts = {}  # account -> NOVISSmartAccountV4 state dict
+        self.factory_accounts = []  # (account, owner) in creation order
+        self.code = {}            # address -> runtime bytecode, where it matters
+        self.aa_nonces = {}       # (sender, key) -> sequence
+        self.user_op_receipts = {}
+        self.logs = []
+        self.stats = {'total_fees': 0, 'total_meta_tx': 0}
+        self._pending_logs = []
+        self._undo = None
+
+        self._methods = {}
+        self._register_methods()
+
+    # ---- seeding ----
+
+    def fund(self, account: str, novis_wei: int = 0, usdc: int = 0, eth_wei: int = 10**18):
+        """Credit an account with NOVIS, USDC (6 decimals) and ETH."""
+        account = _addr(account)
+        with self.lock:
+            self._pending_logs = []
+            if novis_wei:
+                self._mint(self.token, account, novis_wei)
+            if usdc:
+                self._mint(self.usdc, account, usdc)
+            self.eth_balances[account] = self.eth_balances.get(account, 0) + eth_wei
+            if self._pending_logs:
+                tx_hash = keccak(b'fund' + account.encode() + os.urandom(8))
+                self._mine(tx_hash, '0x' + '00' * 20, None, 0, 1, 0, self._pending_logs)
+
+    def transfers(self, moves: list):
+        """Mine one block of direct NOVIS transfers [(from, to, wei), ...]."""
+        with self.lock:
+            self._pending_logs = []
+            for frm, to, amount in moves:
+                self._move(self.token, _addr(frm), _addr(to), amount)
+            tx_hash = keccak(b'transfers' + os.urandom(8))
+            self._mine(tx_hash, '0x' + '00' * 20, self.token, 0, 1, 0, self._pending_logs)
+
+    def _set(self, mapping, key, value):
+        if self._undo is not None:
+            self._undo.append((mapping, key, mapping.get(key, _MISSING)))
+        mapping[key] = value
+
+    # ---- token primitives ----
+
+    def balance_of(self, token: str, account: str) -> int:
+        return self.balances.get((token, _addr(account)), 0)
+
+    def _mint(self, token, to, amount):
+        self._set(self.balances, (token, to), self.balances.get((token, to), 0) + amount)
+        self._set(self.total_supply, token, self.total_supply.get(token, 0) + amount)
+        self._log(token, [TRANSFER_TOPIC, bytes(32), _topic(to)], abi_encode(['uint256'], [amount]))
+
+    def _burn(self, token, frm, amount):
+        if self.balance_of(token, frm) < amount:
+            raise Revert('ERC20InsufficientBalance')
+        self._set(self.balances, (token, frm), self.balances[(token, frm)] - amount)
+        self._set(self.total_supply, token, self.total_supply[token] - amount)
+        self._log(token, [TRANSFER_TOPIC, _topic(frm), bytes(32)], abi_encode(['uint256'], [amount]))
+
+    def _fee(self, token, frm, to, amount) -> int:
+        if token != self.token or amount < self.fee_threshold:
+            return 0
+        return amount * self.fee_bps // 10000
+
+    def _move(self, token, frm, to, amount):
+        if to == '0x' + '00' * 20:
+            raise Revert('ERC20InvalidReceiver')
+        if self.balance_of(token, frm) < amount:
+            raise Revert('ERC20InsufficientBalance')
+        fee = self._fee(token, frm, to, amount)
+        self._set(self.balances, (token, frm), self.balances[(token, frm)] - amount)
+        if fee:
+            key = (token, self.treasury)
+            self._set(self.balances, key, self.balances.get(key, 0) + fee)
+            self._set(self.stats, 'total_fees', self.stats['total_fees'] + fee)
+            self._log(token, [TRANSFER_TOPIC, _topic(frm), _topic(self.treasury)],
+                      abi_encode(['uint256'], [fee]))
+            self._log(token, [TOKEN_FEE_COLLECTED_TOPIC, _topic(frm), _topic(to)],
+                      abi_encode(['uint256', 'uint256'], [amount, fee]))
+        key = (token, to)
+        self._set(self.balances, key, self.balances.get(key, 0) + amount - fee)
+        self._log(token, [TRANSFER_TOPIC, _topic(frm), _topic(to)],
+                  abi_encode(['uint256'], [amount - fee]))
+
+    def _spend_allowance(self, token, owner, spender, amount):
+        allowed = self.allowances.get((token, owner, spender), 0)
+        if allowed < amount:
+            raise Revert('ERC20InsufficientAllowance')
+        if allowed != 2**256 - 1:
+            self._set(self.allowances, (token, owner, spender), allowed - amount)
+
+    def _log(self, address, topics, data):
+        self._pending_logs.append({'address': address, 'topics': topics, 'data': data})
+
+    # ---- blocks ----
+
+    def _block(self, number, tx_hashes):
+        return {
+            'number': number,
+            'hash': keccak(b'block' + number.to_bytes(32, 'big')),
+            'timestamp': self.genesis_time + number * self.block_time,
+            'transactions': tx_hashes,
+            'logsBloom': bytes(256)
+        }
+
+    def _mine(self, tx_hash, sender, to, nonce, status, gas_used, logs, data=b''):
+        self.block_number += 1
+        block = self._block(self.block_number, [tx_hash])
+        block['logsBloom'] = _bloom(logs)
+        self.blocks[self.block_number] = block
+        receipt_logs = []
+        for i, log in enumerate(logs):
+            entry = dict(log, blockNumber=self.block_number, blockHash=block['hash'],
+                         transactionHash=tx_hash, transactionIndex=0, logIndex=i)
+            receipt_logs.append(entry)
+            self.logs.append(entry)
+        self.receipts[tx_hash] = {
+            'transactionHash': tx_hash,
+            'blockNumber': self.block_number,
+            'blockHash': block['hash'],
+            'from': sender,
+            'to': to,
+            'nonce': nonce,
+            'status': status,
+            'gasUsed': gas_used,
+            'logs': receipt_logs,
+            'input': bytes(data)
+        }
+        return self.receipts[tx_hash]
+
+    # ---- execution ----
+
+    def _register_methods(self):
+        m = self._methods
+        token, usdc, vault, router = self.token, self.usdc, self.vault, self.router
+
+        def reg(address, signature, outputs, handler, gas=None):
+            name, args = signature[:-1].split('(', 1)
+            types = _split_types(args)
+            m[(address, _selector(signature))] = (types, outputs, handler, gas)
+
+        for t in (token, usdc):
+            reg(t, 'balanceOf(address)', ['uint256'],
+                lambda s, a, t=t: [self.balance_of(t, a)])
+            reg(t, 'allowance(address,address)', ['uint256'],
+                lambda s, o, sp, t=t: [self.allowances.get((t, _addr(o), _addr(sp)), 0)])
+            reg(t, 'totalSupply()', ['uint256'],
+                lambda s, t=t: [self.total_supply.get(t, 0)])
+            reg(t, 'approve(address,uint256)', ['bool'], self._approve_handler(t), 46000)
+            reg(t, 'transfer(address,uint256)', ['bool'], self._transfer_handler(t), 52000)
+
+        reg(token, 'nonces(address)', ['uint256'], lambda s, a: [self.meta_nonces.get(_addr(a), 0)])
+        reg(token, 'getMetaTxNonce(address)', ['uint256'], lambda s, a: [self.meta_nonces.get(_addr(a), 0)])
+        reg(token, 'metaTransfer(address,address,uint256,uint256,bytes)', ['bool'],
+            self._meta_transfer_call, 65000)
+        reg(token, 'feeThreshold()', ['uint256'], lambda s: [self.fee_threshold])
+        reg(token, 'feePercentageBps()', ['uint16'], lambda s: [self.fee_bps])
+        reg(token, 'totalFeesCollected()', ['uint256'], lambda s: [self.stats['total_fees']])
+        reg(token, 'totalMetaTxRelayed()', ['uint256'], lambda s: [self.stats['total_meta_tx']])
+        reg(token, 'calculateTransferFee(address,address,uint256)', ['uint256', 'uint256'],
+            lambda s, f, t, a: [self._fee(token, f, t, a), a - self._fee(token, f, t, a)])
+
+        reg(router, 'payWithMemo(address,uint256,string)', [], self._pay_with_memo, 70000)
+        reg(router, 'batchPay(address[],uint256[],string[])', [], self._batch_pay, 40000)
+        reg(router, 'createEscrow(address,uint256,uint256)', ['uint256'], self._create_escrow, 120000)
+        reg(router, 'releaseEscrow(uint256)', [], self._release_escrow, 60000)
+        reg(router, 'refundEscrow(uint256)', [], self._refund_escrow, 60000)
+        reg(router, 'getEscrow(uint256)',
+            ['address', 'address', 'uint256', 'uint256', 'bool', 'bool'], self._get_escrow)
+
+        reg(vault, 'deposit(uint256)', ['uint256'], self._deposit, 150000)
+        reg(vault, 'redeem(uint256)', ['uint256'], self._redeem, 150000)
+        reg(vault, 'totalBackingUSDC()', ['uint256'], lambda s: [self.balance_of(usdc, vault)])
+        reg(vault, 'totalAssets()', ['uint256'], lambda s: [self.balance_of(usdc, vault)])
+        reg(vault, 'backingRatioBps()', ['uint256'], lambda s: [self._backing_bps()])
+        reg(vault, 'calculateDepositFee(uint256)', ['uint256', 'uint256'],
+            lambda s, a: [self._deposit_fee(a), a - self._deposit_fee(a)])
+        reg(vault, 'feeThreshold()', ['uint256'], lambda s: [self.deposit_fee_threshold])
+        reg(vault, 'depositFeeBps()', ['uint16'], lambda s: [self.deposit_fee_bps])
+        reg(vault, 'feesEnabled()', ['bool'], lambda s: [True])
+        reg(vault, 'paused()', ['bool'], lambda s: [False])
+
+        reg(self.entry_point, 'getNonce(address,uint192)', ['uint256'],
+            lambda s, a, k: [(k << 64) | self.aa_nonces.get((_addr(a), k), 0)])
+        self._reg = reg
+        self._register_factory()
+
+        m[(self.multicall, _selector('aggregate3((address,bool,bytes)[])'))] = (
+            ['(address,bool,bytes)[]'], ['(bool,bytes)[]'], self._aggregate3, None)
+        reg(self.multicall, 'getBlockNumber()', ['uint256'], lambda s: [self.block_number])
+        reg(self.multicall, 'getEthBalance(address)', ['uint256'],
+            lambda s, a: [self.eth_balances.get(_addr(a), 0)])
+
+    def _approve_handler(self, token):
+        def handler(sender, spender, amount):
+            self._set(self.allowances, (token, sender, _addr(spender)), amount)
+            return [True]
+        return handler
+
+    def _transfer_handler(self, token):
+        def handler(sender, to, amount):
+            self._move(token, sender, _addr(to), amount)
+            return [True]
+        return handler
+
+    def _pay_with_memo(self, sender, to, amount, memo):
+        self._spend_allowance(self.token, sender, self.router, amount)
+        self._move(self.token, sender, _addr(to), amount)
+        self._log(self.router, [PAYMENT_WITH_MEMO_TOPIC, _topic(sender), _topic(_addr(to))],
+                  abi_encode(['uint256', 'string'], [amount, memo]))
+        return []
+
+    def _batch_pay(self, sender, recipients, amounts, memos):
+        if not (len(recipients) == len(amounts) == len(memos)):
+            raise Revert('Length mismatch')
+        for to, amount, memo in zip(recipients, amounts, memos):
+            self._pay_with_memo(sender, to, amount, memo)
+        return []
+
+    def meta_domain(self) -> dict:
+        """EIP-712 domain of the token (empty name/version, as deployed)."""
+        return {
+            'name': '',
+            'version': '',
+            'chainId': str(self.chain_id),
+            'verifyingContract': to_checksum_address(self.token)
+        }
+
+    def _meta_transfer_call(self, sender, frm, to, amount, deadline, signature):
+        # Deadlines are checked against wall-clock time: blocks here are
+        # mined per transaction, so block timestamps run ahead of real time
+        if deadline < time.time():
+            raise Revert('Expired')
+        frm, to = _addr(frm), _addr(to)
+        nonce = self.meta_nonces.get(frm, 0)
+        if self.verify_meta_signatures:
+            signer = Account.recover_message(
+                encode_typed_data(full_message=meta_transfer_typed_data(
+                    self.meta_domain(), frm, to, amount, nonce, deadline)),
+                signature=signature)
+            if _addr(signer) != frm:
+                raise Revert('Invalid sig')
+        self._move(self.token, frm, to, amount)
+        self._set(self.meta_nonces, frm, nonce + 1)
+        self._set(self.stats, 'total_meta_tx', self.stats['total_meta_tx'] + 1)
+        self._log(self.token, [META_TRANSFER_TOPIC, _topic(frm), _topic(to), _topic(sender)],
+                  abi_encode(['uint256'], [amount]))
+        return [True]
+
+    def _create_escrow(self, sender, to, amount, timeout):
+        self._spend_allowance(self.token, sender, self.router, amount)
+        self._move(self.token, sender, self.router, amount)
+        escrow_id = len(self.escrows)
+        deadline = self._block(self.block_number + 1, [])['timestamp'] + timeout
+        self._set(self.escrows, escrow_id, [sender, _addr(to), amount, deadline, False, False])
+        self._log(self.router, [ESCROW_CREATED_TOPIC, escrow_id.to_bytes(32, 'big'),
+                                _topic(sender), _topic(_addr(to))],
+                  abi_encode(['uint256', 'uint256'], [amount, deadline]))
+        return [escrow_id]
+
+    def _escrow(self, escrow_id):
+        if escrow_id not in self.escrows:
+            raise Revert('Escrow not found')
+        escrow = self.escrows[escrow_id]
+        if escrow[4] or escrow[5]:
+            raise Revert('Escrow closed')
+        escrow = list(escrow)
+        self._set(self.escrows, escrow_id, escrow)
+        return escrow
+
+    def _release_escrow(self, sender, escrow_id):
+        escrow = self._escrow(escrow_id)
+        if sender != escrow[0]:
+            raise Revert('Not payer')
+        escrow[4] = True
+        self._move(self.token, self.router, escrow[1], escrow[2])
+        self._log(self.router, [ESCROW_RELEASED_TOPIC, escrow_id.to_bytes(32, 'big')], b'')
+        return []
+
+    def _refund_escrow(self, sender, escrow_id):
+        escrow = self._escrow(escrow_id)
+        now = self._block(self.block_number + 1, [])['timestamp']
+        if sender != escrow[0] and now <= escrow[3]:
+            raise Revert('Not refundable')
+        escrow[5] = True
+        self._move(self.token, self.router, escrow[0], escrow[2])
+        self._log(self.router, [ESCROW_REFUNDED_TOPIC, escrow_id.to_bytes(32, 'big')], b'')
+        return []
+
+    def _get_escrow(self, sender, escrow_id):
+        if escrow_id not in self.escrows:
+            return ['0x' + '00' * 20, '0x' + '00' * 20, 0, 0, False, False]
+        return list(self.escrows[escrow_id])
+
+    def _deposit_fee(self, usdc_amount):
+        if usdc_amount < self.deposit_fee_threshold:
+            return 0
+        return usdc_amount * self.deposit_fee_bps // 10000
+
+    def _deposit(self, sender, usdc_amount):
+        if usdc_amount == 0:
+            raise Revert('amount zero')
+        self._spend_allowance(self.usdc, sender, self.vault, usdc_amount)
+        self._move(self.usdc, sender, self.vault, usdc_amount)
+        fee = self._deposit_fee(usdc_amount)
+        if fee:
+            self._move(self.usdc, self.vault, self.treasury, fee)
+        minted = (usdc_amount - fee) * SCALE
+        self._mint(self.token, sender, minted)
+        self._log(self.vault, [DEPOSIT_TOPIC, _topic(sender)],
+                  abi_encode(['uint256', 'uint256', 'uint256'], [usdc_amount, minted, fee]))
+        return [minted]
+
+    def _redeem(self, sender, novis_amount):
+        usdc_amount = novis_amount // SCALE
+        if usdc_amount == 0:
+            raise Revert('amount too small')
+        # VaultV3UpgradeableV3 pulls the NOVIS with safeTransferFrom before burning
+        self._spend_allowance(self.token, sender, self.vault, novis_amount)
+        self._burn(self.token, sender, novis_amount)
+        self._move(self.usdc, self.vault, sender, usdc_amount)
+        self._log(self.vault, [REDEEM_TOPIC, _topic(sender)],
+                  abi_encode(['uint256', 'uint256'], [novis_amount, usdc_amount]))
+        return [usdc_amount]
+
+    def _backing_bps(self):
+        supply = self.total_supply.get(self.token, 0) // SCALE
+        if supply == 0:
+            return 10000
+        return self.balance_of(self.usdc, self.vault) * 10000 // supply
+
+    # ---- smart accounts (NOVISSmartAccountV4) ----
+
+    def add_smart_account(self, account: str, owner: str, daily_limit: int) -> str:
+        """Deploy a NOVISSmartAccountV4 at ``account`` (perTxLimit = daily_limit)."""
+        account = _addr(account)
+        with self.lock:
+            self.smart_accounts[account] = {
+                'owner': _addr(owner), 'daily_limit': daily_limit, 'per_tx_limit': daily_limit,
+                'spent': 0, 'last_day': self.timestamp() // 86400, 'session_keys': {}
+            }
+            self.code[account] = bytes.fromhex('363d3d373d3d3d363d73')
+            reg = self._reg
+            state = lambda a=account: self.smart_accounts[a]
+            reg(account, 'owner()', ['address'], lambda s: [state()['owner']])
+            reg(account, 'entryPoint()', ['address'], lambda s: [self.entry_point])
+            reg(account, 'novisToken()', ['address'], lambda s: [self.token])
+            reg(account, 'dailyLimit()', ['uint256'], lambda s: [state()['daily_limit']])
+            reg(account, 'dailySpent()', ['uint256'], lambda s: [state()['spent']])
+            reg(account, 'lastResetDay()', ['uint256'], lambda s: [state()['last_day']])
+            reg(account, 'perTxLimit()', ['uint256'], lambda s: [state()['per_tx_limit']])
+            reg(account, 'isPaused()', ['bool'], lambda s: [False])
+            reg(account, 'getDailySpending()', ['uint256', 'uint256', 'uint256'],
+                lambda s: self._daily_spending(state()))
+            reg(account, 'sessionKeys(address)', ['uint256', 'uint256', 'uint256', 'bool'],
+                lambda s, k: state()['session_keys'].get(_addr(k), [0, 0, 0, False]))
+            reg(account, 'execute(address,uint256,bytes)', ['bytes'],
+                lambda s, to, value, data: self._account_execute(account, s, to, value, data), 90000)
+            reg(account, 'setDailyLimit(uint256)', [],
+                lambda s, limit: self._set_daily_limit(account, s, limit), 30000)
+            reg(account, 'createSessionKey(address,uint256,uint256)', [],
+                lambda s, k, d, l: self._create_session_key(account, s, k, d, l), 70000)
+        return account
+
+    def timestamp(self) -> int:
+        """block.timestamp of the next block to be mined."""
+        return self.genesis_time + (self.block_number + 1) * self.block_time
+
+    def _daily_spending(self, state):
+        if self.timestamp() // 86400 > state['last_day']:
+            return [0, state['daily_limit'], state['daily_limit']]
+        return [state['spent'], state['daily_limit'], state['daily_limit'] - state['spent']]
+
+    def _only_owner(self, account, sender):
+        if sender != self.smart_accounts[account]['owner']:
+            raise Revert('Not owner')
+
+    def _check_spending_limits(self, account, amount):
+        if amount == 0:
+            return
+        state = self.smart_accounts[account]
+        if amount > state['per_tx_limit']:
+            raise Revert('Exceeds per-tx limit')
+        day = self.timestamp() // 86400
+        if day > state['last_day']:
+            self._set(state, 'spent', 0)
+            self._set(state, 'last_day', day)
+        if state['spent'] + amount > state['daily_limit']:
+            raise Revert('Exceeds daily limit')
+        self._set(state, 'spent', state['spent'] + amount)
+        self._log(account, [SPENDING_TRACKED_TOPIC],
+                  abi_encode(['uint256'] * 3, [amount, state['spent'], state['daily_limit']]))
+
+    def _account_execute(self, account, sender, to, value, data):
+        if sender not in (self.smart_accounts[account]['owner'], self.entry_point):
+            raise Revert('Not authorized')
+        to = _addr(to)
+        if to == self.token and len(data) >= 68 and data[:4] == _selector('transfer(address,uint256)'):
+            recipient, amount = abi_decode(['address', 'uint256'], data[4:68])
+            self._check_spending_limits(account, amount)
+            if amount >= self.fee_threshold:
+                fee = amount * self.account_fee_bps // 10000
+                self._move(self.token, account, self.account_treasury, fee)
+                self._log(account, [FEE_COLLECTED_TOPIC, _topic(account), _topic(self.account_treasury)],
+                          abi_encode(['uint256'], [fee]))
+                self._move(self.token, account, _addr(recipient), amount - fee)
+                self._log(account, [TRANSACTION_EXECUTED_TOPIC, _topic(to)],
+                          abi_encode(['uint256', 'bytes'], [value, data]))
+                return [abi_encode(['bool'], [True])]
+        elif value > 0:
+            self._check_spending_limits(account, value)
+        try:
+            result = self._invoke(account, to, data)[0] if data else b''
+        except Revert:
+            raise Revert('Transaction failed')
+        self._log(account, [TRANSACTION_EXECUTED_TOPIC, _topic(to)],
+                  abi_encode(['uint256', 'bytes'], [value, data]))
+        return [result]
+
+    def _set_daily_limit(self, account, sender, limit):
+        self._only_owner(account, sender)
+        self._set(self.smart_accounts[account], 'daily_limit', limit)
+        self._log(account, [DAILY_LIMIT_SET_TOPIC], abi_encode(['uint256'], [limit]))
+        return []
+
+    def _create_session_key(self, account, sender, key, duration, limit):
+        self._only_owner(account, sender)
+        if int(key, 16) == 0:
+            raise Revert('Invalid key')
+        expires = self.timestamp() + duration
+        self._set(self.smart_accounts[account]['session_keys'], _addr(key), [expires, limit, 0, True])
+        self._log(account, [SESSION_KEY_CREATED_TOPIC, _topic(_addr(key))],
+                  abi_encode(['uint256', 'uint256'], [expires, limit]))
+        return []
+
+    def _aggregate3(self, sender, calls):
+        results = []
+        for target, allow_failure, data in calls:
+            try:
+                results.append((True, self._invoke(sender, target, data)[0]))
+            except Revert:
+                if not allow_failure:
+                    raise Revert('Multicall3: call failed')
+                results.append((False, b''))
+        return [results]
+
+    # ---- account factory (NOVISAccountFactoryV4) ----
+
+    def _register_factory(self):
+        factory, reg = self.factory, self._reg
+        metadata = lambda tag: (b'\xa2\x64ipfs\x58\x22\x12\x20' + keccak(tag)
+                                + b'\x64solc\x43\x00\x08\x18\x00\x33')
+        prologue = bytes.fromhex('6080604052')
+        # Stand-in ERC1967Proxy creation code, embedded in the factory's
+        # runtime code the way solc embeds type(C).creationCode
+        self.proxy_creation_code = prologue + b'\x5b' * 48 + prologue + b'\x5b' * 32 + metadata(b'proxy')
+        self.code[factory] = (prologue + b'\x5b' * 64 + self.proxy_creation_code
+                              + b'\x5b' * 16 + metadata(b'factory'))
+        self.account_implementation = _addr(keccak(b'NOVISSmartAccountV4')[12:])
+
+        reg(factory, 'accountImplementation()', ['address'], lambda s: [self.account_implementation])
+        reg(factory, 'entryPoint()', ['address'], lambda s: [self.entry_point])
+        reg(factory, 'novisToken()', ['address'], lambda s: [self.token])
+        reg(factory, 'accountCount()', ['uint256'], lambda s: [len(self.factory_accounts)])
+        reg(factory, 'accounts(uint256)', ['address'], lambda s, i: [self._factory_account(i)])
+        reg(factory, 'isAccount(address)', ['bool'],
+            lambda s, a: [_addr(a) in self.smart_accounts])
+        reg(factory, 'getAccountsByOwner(address)', ['address[]'],
+            lambda s, o: [[a for a, owner in self.factory_accounts if owner == _addr(o)]])
+        reg(factory, 'createAccount(address,uint256,bytes32)', ['address'], self._create_account, 280000)
+
+    def _factory_account(self, index):
+        if index >= len(self.factory_accounts):
+            raise Revert('index out of bounds')
+        return self.factory_accounts[index][0]
+
+    def _create_account(self, sender, owner, daily_limit, salt):
+        owner = _addr(owner)
+        init_data = _selector('initialize(address,address,address,uint256)') + abi_encode(
+            ['address', 'address', 'address', 'uint256'],
+            [owner, self.entry_point, self.token, daily_limit])
+        init_code = self.proxy_creation_code + abi_encode(
+            ['address', 'bytes'], [self.account_implementation, init_data])
+        full_salt = keccak(bytes.fromhex(owner[2:]) + salt)
+        account = _addr(keccak(b'\xff' + bytes.fromhex(self.factory[2:]) + full_salt
+                               + keccak(init_code))[12:])
+        if account in self.smart_accounts:
+            raise Revert('Failed to create account')
+        self.add_smart_account(account, owner, daily_limit)
+        self.factory_accounts.append((account, owner))
+        self._log(self.factory, [ACCOUNT_CREATED_TOPIC, _topic(account), _topic(owner)],
+                  abi_encode(['uint256'], [daily_limit]))
+        return [account]
+
+    # ---- EntryPoint v0.6 ----
+
+    def user_op_hash(self, op: dict) -> bytes:
+        """EntryPoint.getUserOpHash() for an RPC-formatted UserOperation."""
+        h = lambda field: keccak(bytes.fromhex(op.get(field, '0x')[2:]))
+        n = lambda field: int(op[field], 16)
+        packed = abi_encode(
+            ['address', 'uint256', 'bytes32', 'bytes32', 'uint256', 'uint256', 'uint256',
+             'uint256', 'uint256', 'bytes32'],
+            [op['sender'], n('nonce'), h('initCode'), h('callData'), n('callGasLimit'),
+             n('verificationGasLimit'), n('preVerificationGas'), n('maxFeePerGas'),
+             n('maxPriorityFeePerGas'), h('paymasterAndData')]
+        )
+        return keccak(abi_encode(['bytes32', 'address', 'uint256'],
+                                 [keccak(packed), self.entry_point, self.chain_id]))
+
+    def validate_user_op(self, op: dict, check_signature: bool = True) -> bytes:
+        """Run EntryPoint validation; raises ValueError with an AAxx reason."""
+        sender = _addr(op['sender'])
+        state = self.smart_accounts.get(sender)
+        if state is None:
+            raise ValueError('AA20 account not deployed')
+        nonce = int(op['nonce'], 16)
+        if nonce & (2**64 - 1) != self.aa_nonces.get((sender, nonce >> 64), 0):
+            raise ValueError('AA25 invalid account nonce')
+        paymaster_and_data = op.get('paymasterAndData', '0x')
+        if len(paymaster_and_data) > 2:
+            if len(paymaster_and_data) < 42 or _addr(paymaster_and_data[:42]) != self.paymaster:
+                raise ValueError('AA30 paymaster not deployed')
+        op_hash = self.user_op_hash(op)
+        if check_signature:
+            try:
+                signer = Account.recover_message(encode_defunct(primitive=op_hash),
+                                                 signature=op['signature'])
+            except Exception:
+                signer = None
+            if signer is None or _addr(signer) != state['owner']:
+                raise ValueError('AA24 signature error')
+        return op_hash
+
+    def handle_user_op(self, op: dict, bundler: str) -> dict:
+        """Validate and execute one UserOperation in its own handleOps transaction."""
+        with self.lock:
+            op_hash = self.validate_user_op(op)
+            sender, nonce = _addr(op['sender']), int(op['nonce'], 16)
+            self.aa_nonces[(sender, nonce >> 64)] = (nonce & (2**64 - 1)) + 1
+            try:
+                gas_used = self._dispatch(self.entry_point, sender, bytes.fromhex(op['callData'][2:]))[1]
+                success, logs = True, self._pending_logs
+            except Revert:
+                gas_used, success, logs = 30000, False, []
+            self._undo = None
+            gas_used += int(op['preVerificationGas'], 16) + 40000
+            paymaster = _addr(op['paymasterAndData'][:42]) if len(op.get('paymasterAndData', '0x')) > 2 \
+                else '0x' + '00' * 20
+            gas_cost = gas_used * min(int(op['maxFeePerGas'], 16), self.gas_price)
+            if paymaster == self.paymaster:
+                logs = logs + [{
+                    'address': self.paymaster,
+                    'topics': [GAS_SPONSORED_TOPIC, _topic(sender)],
+                    'data': abi_encode(['uint256', 'uint256', 'bool'], [0, gas_cost, True])
+                }]
+            logs = logs + [{
+                'address': self.entry_point,
+                'topics': [USER_OPERATION_EVENT_TOPIC, op_hash, _topic(sender), _topic(paymaster)],
+                'data': abi_encode(['uint256', 'bool', 'uint256', 'uint256'],
+                                   [nonce, success, gas_cost, gas_used])
+            }]
+            bundler = _addr(bundler)
+            tx_nonce = self.tx_nonces.get(bundler, 0)
+            self.tx_nonces[bundler] = tx_nonce + 1
+            tx_hash = keccak(b'handleOps' + op_hash)
+            receipt = self._mine(tx_hash, bundler, self.entry_point, tx_nonce, 1, gas_used, logs)
+            self.user_op_receipts[op_hash] = {
+                'userOpHash': op_hash, 'sender': sender, 'nonce': nonce, 'paymaster': paymaster,
+                'success': success, 'actualGasUsed': gas_used, 'actualGasCost': gas_cost,
+                'receipt': receipt
+            }
+            return self.user_op_receipts[op_hash]
+
+    def estimate_user_op(self, op: dict) -> int:
+        """Gas used by the op's callData, or Revert if it would fail."""
+        with self.lock:
+            self.validate_user_op(op, check_signature=False)
+            try:
+                return self._dispatch(self.entry_point, op['sender'],
+                                      bytes.fromhex(op['callData'][2:]))[1]
+            finally:
+                self._rollback()
+
+    def _dispatch(self, sender, to, data):
+        self._pending_logs = []
+        self._undo = []
+        try:
+            return self._invoke(sender, to, data)
+        except Revert:
+            self._rollback()
+            raise
+
+    def _invoke(self, sender, to, data):
+        method = self._methods.get((_addr(to or '0x'), bytes(data[:4])))
+        if method is None:
+            raise Revert('unknown method')
+        types, outputs, handler, gas = method
+        args = abi_decode(types, bytes(data[4:])) if types else ()
+        result = handler(sender, *args)
+        extra = 35000 * max(0, len(args[0]) - 1) if types and types[0].endswith('[]') else 0
+        return abi_encode(outputs, result) if outputs else b'', (gas or 30000) + extra
+
+    def _rollback(self):
+        for mapping, key, old in reversed(self._undo or []):
+            if old is _MISSING:
+                del mapping[key]
+            else:
+                mapping[key] = old
+        self._undo = None
+
+    def call(self, sender, to, data) -> bytes:
+        """Execute a read-only call and return the ABI-encoded result."""
+        with self.lock:
+            try:
+                return self._dispatch(_addr(sender or '0x' + '00' * 20), to, data)[0]
+            finally:
+                self._rollback()
+
+    def estimate_gas(self, sender, to, data) -> int:
+        with self.lock:
+            try:
+                return self._dispatch(_addr(sender or '0x' + '00' * 20), to, data)[1]
+            except Revert:
+                return 300000
+            finally:
+                self._rollback()
+
+    def send_raw_transaction(self, raw: bytes) -> bytes:
+        """
+        Queue a signed transaction and mine it once its nonce is next and
+        its fee is at least ``min_fee``.
+
+        A transaction for an already queued nonce replaces it only with a
+        fee at least 10% higher, as geth's mempool requires.
+        """
+        tx_hash = keccak(raw)
+        sender = _addr(Account.recover_transaction(raw))
+        nonce, to, data, fee = _decode_raw(raw)
+        with self.lock:
+            if nonce < self.tx_nonces.get(sender, 0):
+                raise ValueError('nonce too low')
+            queue = self.queued.setdefault(sender, {})
+            if nonce in queue:
+                if queue[nonce][0] == tx_hash:
+                    raise ValueError('already known')
+                if fee * 10 < queue[nonce][3] * 11:
+                    raise ValueError('replacement transaction underpriced')
+            queue[nonce] = (tx_hash, to, data, fee)
+            self._drain(sender)
+        return tx_hash
+
+    def _drain(self, sender):
+        expected = self.tx_nonces.get(sender, 0)
+        queue = self.queued.get(sender, {})
+        while expected in queue and queue[expected][3] >= self.min_fee:
+            queued_hash, queued_to, queued_data, _ = queue.pop(expected)
+            self._execute(queued_hash, sender, queued_to, queued_data, expected)
+            expected += 1
+        self.tx_nonces[sender] = expected
+
+    def set_min_fee(self, fee: int):
+        """Change the inclusion fee floor and mine whatever now qualifies."""
+        with self.lock:
+            self.min_fee = fee
+            for sender in list(self.queued):
+                self._drain(sender)
+
+    def mine_empty(self, n: int = 1):
+        """Advance the chain by ``n`` empty blocks."""
+        with self.lock:
+            for _ in range(n):
+                self.block_number += 1
+                self.blocks[self.block_number] = self._block(self.block_number, [])
+
+    def _execute(self, tx_hash, sender, to, data, nonce):
+        try:
+            gas_used = self._dispatch(sender, to, data)[1]
+            status, logs = 1, self._pending_logs
+        except Revert:
+            gas_used, status, logs = 30000, 0, []
+        self._undo = None
+        return self._mine(tx_hash, sender, to, nonce, status, gas_used, logs, data)
+
+    def meta_transfer(self, relayer, frm, to, amount) -> dict:
+        """Execute a relayed metaTransfer and return its receipt."""
+        frm, to = _addr(frm), _addr(to)
+        with self.lock:
+            self._pending_logs = []
+            self._move(self.token, frm, to, amount)
+            self.meta_nonces[frm] = self.meta_nonces.get(frm, 0) + 1
+            self.stats['total_meta_tx'] += 1
+            self._log(self.token, [META_TRANSFER_TOPIC, _topic(frm), _topic(to), _topic(relayer)],
+                      abi_encode(['uint256'], [amount]))
+            nonce = self.tx_nonces.get(relayer, 0)
+            self.tx_nonces[relayer] = nonce + 1
+            tx_hash = keccak(b'meta' + frm.encode() + nonce.to_bytes(32, 'big') + os.urandom(8))
+            return self._mine(tx_hash, relayer, self.token, nonce, 1, 65000, self._pending_logs)
+
+    def get_logs(self, address=None, topics=None, from_block=0, to_block=None) -> list:
+        to_block = self.block_number if to_block is None else to_block
+        addresses = None
+        if address:
+            addresses = {_addr(a) for a in (address if isinstance(address, list) else [address])}
+        with self.lock:
+            out = []
+            for log in self.logs:
+                if not from_block <= log['blockNumber'] <= to_block:
+                    continue
+                if addresses and log['address'] not in addresses:
+                    continue
+                if topics and not _topics_match(log['topics'], topics):
+                    continue
+                out.append(log)
+            return out
+
+
+def _split_types(args: str) -> list:
+    return [t for t in args.split(',') if t]
+
+
+def _topics_match(log_topics, wanted) -> bool:
+    for i, want in enumerate(wanted):
+        if want is None:
+            continue
+        if i >= len(log_topics):
+            return False
+        options = want if isinstance(want, list) else [want]
+        if not any(bytes.fromhex(o[2:]) == log_topics[i] for o in options):
+            return False
+    return True
+
+
+def _decode_raw(raw: bytes):
+    """Return (nonce, to, data, fee) from a legacy or typed raw transaction."""
+    if raw[0] >= 0xc0:
+        fields = rlp.decode(raw)
+        nonce, fee, to, data = fields[0], fields[1], fields[3], fields[5]
+    elif raw[0] == 0x02:
+        fields = rlp.decode(raw[1:])
+        nonce, fee, to, data = fields[1], fields[3], fields[5], fields[7]
+    elif raw[0] == 0x01:
+        fields = rlp.decode(raw[1:])
+        nonce, fee, to, data = fields[1], fields[2], fields[4], fields[6]
+    else:
+        raise ValueError('unsupported transaction type')
+    return (int.from_bytes(nonce, 'big'), _addr(to) if to else None, data,
+            int.from_bytes(fee, 'big'))
+
+
+# ============================================
+# HTTP SERVERS
+# ============================================
+
+class _StubServer:
+    """Threaded HTTP server on 127.0.0.1 with fault injection."""
+
+    def __init__(self, chain: StubChain, faults: Faults = None, port: int = 0):
+        self.chain = chain
+        self.faults = faults or Faults()
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._serve(self, 'GET')
+
+            def do_POST(self):
+                server._serve(self, 'POST')
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self, handler, method):
+        self.requests += 1
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        with self._in_flight_lock:
+            self.in_flight += 1
+            over = self.faults.capacity is not None and self.in_flight > self.faults.capacity
+        try:
+            if over:
+                self.rejected += 1
+                headers = {}
+                if self.faults.retry_after is not None:
+                    headers['Retry-After'] = str(self.faults.retry_after)
+                self._reply(handler, 429, {'error': 'Too many requests', 'code': 'RATE_LIMITED'},
+                            headers)
+                return
+            self._serve_admitted(handler, method, body)
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+
+    def _serve_admitted(self, handler, method, body):
+        self.faults.delay()
+        if self.faults.should_fail():
+            self.failures += 1
+            headers = {}
+            if self.faults.retry_after is not None:
+                headers['Retry-After'] = str(self.faults.retry_after)
+            self._reply(handler, self.faults.error_status,
+                        {'error': 'Injected fault', 'code': 'UNAVAILABLE'}, headers)
+            return
+        status, payload = self.handle(method, handler.path, body)
+        self._reply(handler, status, payload)
+
+    def _reply(self, handler, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, method: str, path: str, body: bytes):
+        raise NotImplementedError
+
+
+def _hex(value) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    return hex(value)
+
+
+class RPCError(Exception):
+    """JSON-RPC error with an explicit code (e.g. ERC-4337 bundler errors)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class _JSONRPCServer(_StubServer):
+    """Dispatches JSON-RPC (single or batch) requests to ``rpc_<method>``."""
+
+    def handle(self, method, path, body):
+        request = json.loads(body)
+        if isinstance(request, list):
+            return 200, [self._rpc(r) for r in request]
+        return 200, self._rpc(request)
+
+    def _rpc(self, request):
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            fn = getattr(self, 'rpc_' + request['method'], None)
+            if fn is None:
+                response['error'] = {'code': -32601, 'message': f"method {request['method']} not found"}
+            else:
+                response['result'] = fn(*request.get('params', []))
+        except RPCError as e:
+            response['error'] = {'code': e.code, 'message': str(e)}
+        except Revert as e:
+            response['error'] = {
+                'code': 3,
+                'message': f'execution reverted: {e}',
+                'data': '0x08c379a0' + abi_encode(['string'], [str(e)]).hex()
+            }
+        except ValueError as e:
+            response['error'] = {'code': -32000, 'message': str(e)}
+        return response
+
+
+class StubRPCNode(_JSONRPCServer):
+    """
+    JSON-RPC node backed by a StubChain.
+
+    Implements the subset of ``eth_*`` methods web3.py uses for reads,
+    legacy/EIP-1559 sends, receipts and logs. Supports batch requests.
+    """
+
+    def rpc_eth_chainId(self):
+        return hex(self.chain.chain_id)
+
+    def rpc_net_version(self):
+        return str(self.chain.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return hex(self.chain.block_number)
+
+    def rpc_eth_gasPrice(self):
+        return hex(self.chain.gas_price)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return hex(self.chain.gas_price // 10)
+
+    def rpc_eth_getBalance(self, address, block='latest'):
+        return hex(self.chain.eth_balances.get(_addr(address), 0))
+
+    def rpc_eth_getTransactionCount(self, address, block='latest'):
+        address = _addr(address)
+        with self.chain.lock:
+            count = self.chain.tx_nonces.get(address, 0)
+            if block == 'pending':
+                while count in self.chain.queued.get(address, {}):
+                    count += 1
+            return hex(count)
+
+    def rpc_eth_getCode(self, address, block='latest'):
+        if _addr(address) in self.chain.code:
+            return _hex(self.chain.code[_addr(address)])
+        return '0x60' if any(k[0] == _addr(address) for k in self.chain._methods) else '0x'
+
+    def rpc_eth_call(self, tx, block='latest'):
+        return _hex(self.chain.call(tx.get('from'), tx.get('to'), bytes.fromhex(tx.get('data', tx.get('input', '0x'))[2:])))
+
+    def rpc_eth_estimateGas(self, tx, block='latest'):
+        return hex(self.chain.estimate_gas(tx.get('from'), tx.get('to'), bytes.fromhex(tx.get('data', tx.get('input', '0x'))[2:])))
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        return _hex(self.chain.send_raw_transaction(bytes.fromhex(raw[2:])))
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        receipt = self.chain.receipts.get(bytes.fromhex(tx_hash[2:]))
+        if receipt is None:
+            return None
+        return {
+            'transactionHash': _hex(receipt['transactionHash']),
+            'transactionIndex': '0x0',
+            'blockNumber': hex(receipt['blockNumber']),
+            'blockHash': _hex(receipt['blockHash']),
+            'from': receipt['from'],
+            'to': receipt['to'],
+            'cumulativeGasUsed': hex(receipt['gasUsed']),
+            'gasUsed': hex(receipt['gasUsed']),
+            'effectiveGasPrice': hex(self.chain.gas_price),
+            'contractAddress': None,
+            'logs': [self._format_log(log) for log in receipt['logs']],
+            'logsBloom': '0x' + '00' * 256,
+            'status': hex(receipt['status']),
+            'type': '0x0'
+        }
+
+    def rpc_eth_getTransactionByHash(self, tx_hash):
+        receipt = self.chain.receipts.get(bytes.fromhex(tx_hash[2:]))
+        if receipt is None:
+            return None
+        return {
+            'hash': _hex(receipt['transactionHash']),
+            'blockNumber': hex(receipt['blockNumber']),
+            'blockHash': _hex(receipt['blockHash']),
+            'transactionIndex': '0x0',
+            'from': to_checksum_address(receipt['from']),
+            'to': receipt['to'] and to_checksum_address(receipt['to']),
+            'nonce': hex(receipt['nonce']),
+            'input': _hex(receipt['input']),
+            'value': '0x0',
+            'gas': hex(receipt['gasUsed']),
+            'gasPrice': hex(self.chain.gas_price),
+            'type': '0x0',
+            'v': '0x0', 'r': '0x0', 's': '0x0'
+        }
+
+    def rpc_eth_getBlockByNumber(self, number, full=False):
+        if number in ('latest', 'pending', 'safe', 'finalized'):
+            number = self.chain.block_number
+        elif number == 'earliest':
+            number = 0
+        else:
+            number = int(number, 16)
+        block = self.chain.blocks.get(number)
+        if block is None:
+            return None
+        return {
+            'number': hex(block['number']),
+            'hash': _hex(block['hash']),
+            'parentHash': _hex(self.chain.blocks.get(number - 1, block)['hash']),
+            'timestamp': hex(block['timestamp']),
+            'baseFeePerGas': hex(self.chain.gas_price),
+            'gasLimit': hex(30_000_000),
+            'gasUsed': hex(0),
+            'miner': '0x' + '00' * 20,
+            'logsBloom': _hex(block['logsBloom']),
+            'transactions': [_hex(h) for h in block['transactions']]
+        }
+
+    def rpc_eth_getLogs(self, params):
+        def block(value, default):
+            if value in (None, 'latest', 'pending', 'safe', 'finalized'):
+                return default
+            return 0 if value == 'earliest' else int(value, 16)
+        logs = self.chain.get_logs(
+            params.get('address'), params.get('topics'),
+            block(params.get('fromBlock'), self.chain.block_number),
+            block(params.get('toBlock'), self.chain.block_number)
+        )
+        return [self._format_log(log) for log in logs]
+
+    def _format_log(self, log):
+        return {
+            'address': to_checksum_address(log['address']),
+            'topics': [_hex(t) for t in log['topics']],
+            'data': _hex(log['data']),
+            'blockNumber': hex(log['blockNumber']),
+            'blockHash': _hex(log['blockHash']),
+            'transactionHash': _hex(log['transactionHash']),
+            'transactionIndex': hex(log['transactionIndex']),
+            'logIndex': hex(log['logIndex']),
+            'removed': False
+        }
+
+
+class StubBundler(_JSONRPCServer):
+    """
+    ERC-4337 bundler for the v0.6 EntryPoint backed by a StubChain.
+
+    Each accepted UserOperation is validated (account, 2D nonce, owner
+    signature, paymaster) and mined immediately in its own handleOps
+    transaction. Errors use the ERC-4337 bundler RPC codes.
+    """
+
+    BUNDLER_ADDRESS = '0xb0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0'
+
+    def _entry_point(self, entry_point):
+        if _addr(entry_point) != self.chain.entry_point:
+            raise RPCError(-32602, f'unsupported EntryPoint {entry_point}')
+
+    def rpc_eth_chainId(self):
+        return hex(self.chain.chain_id)
+
+    def rpc_eth_supportedEntryPoints(self):
+        return [to_checksum_address(self.chain.entry_point)]
+
+    def rpc_eth_sendUserOperation(self, op, entry_point):
+        self._entry_point(entry_point)
+        try:
+            receipt = self.chain.handle_user_op(op, self.BUNDLER_ADDRESS)
+        except ValueError as e:
+            raise RPCError(-32507 if 'AA24' in str(e) else -32500, str(e))
+        return _hex(receipt['userOpHash'])
+
+    def rpc_eth_estimateUserOperationGas(self, op, entry_point):
+        self._entry_point(entry_point)
+        try:
+            call_gas = self.chain.estimate_user_op(op)
+        except ValueError as e:
+            raise RPCError(-32500, str(e))
+        except Revert as e:
+            raise RPCError(-32521, f'execution reverted: {e}')
+        return {
+            'callGasLimit': hex(call_gas),
+            'verificationGasLimit': hex(100000),
+            'preVerificationGas': hex(45000)
+        }
+
+    def rpc_pm_sponsorUserOperation(self, op, context=None):
+        gas = self.rpc_eth_estimateUserOperationGas(
+            op, (context or {}).get('entryPoint', self.chain.entry_point))
+        return dict(gas, paymasterAndData=to_checksum_address(self.chain.paymaster))
+
+    def rpc_eth_getUserOperationReceipt(self, op_hash):
+        result = self.chain.user_op_receipts.get(bytes.fromhex(op_hash[2:]))
+        if result is None:
+            return None
+        receipt = result['receipt']
+        return {
+            'userOpHash': _hex(result['userOpHash']),
+            'entryPoint': to_checksum_address(self.chain.entry_point),
+            'sender': to_checksum_address(result['sender']),
+            'nonce': hex(result['nonce']),
+            'paymaster': to_checksum_address(result['paymaster']),
+            'actualGasCost': hex(result['actualGasCost']),
+            'actualGasUsed': hex(result['actualGasUsed']),
+            'success': result['success'],
+            'logs': [self._format_log(log) for log in receipt['logs']],
+            'receipt': {
+                'transactionHash': _hex(receipt['transactionHash']),
+                'blockNumber': hex(receipt['blockNumber']),
+                'blockHash': _hex(receipt['blockHash']),
+                'from': to_checksum_address(receipt['from']),
+                'to': to_checksum_address(receipt['to']),
+                'gasUsed': hex(receipt['gasUsed']),
+                'status': hex(receipt['status'])
+            }
+        }
+
+    _format_log = StubRPCNode._format_log
+
+
+class StubRelayer(_StubServer):
+    """
+    Relayer implementing the endpoints documented in docs/API.md.
+
+    Args:
+        chain: Shared StubChain
+        faults: Latency/error injection
+        verify_signatures: Recover and check EIP-712 signatures on /relay
+    """
+
+    RELAYER_ADDRESS = '0xfbffbff486e6682e5d5b5e6bf87345285581ec58'
+
+    _routes = [
+        ('GET', re.compile(r'^/health$'), '_health'),
+        ('GET', re.compile(r'^/nonce/(0x[0-9a-fA-F]{40})$'), '_nonce'),
+        ('GET', re.compile(r'^/domain$'), '_domain'),
+        ('GET', re.compile(r'^/fee/(0x[0-9a-fA-F]{40})/(0x[0-9a-fA-F]{40})/(\d+)$'), '_fee'),
+        ('POST', re.compile(r'^/relay$'), '_relay'),
+    ]
+
+    def __init__(self, chain: StubChain, faults: Faults = None, port: int = 0,
+                 verify_signatures: bool = True):
+        super().__init__(chain, faults, port)
+        self.verify_signatures = verify_signatures
+
+    def handle(self, method, path, body):
+        for route_method, pattern, name in self._routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                return getattr(self, name)(body, *match.groups())
+        return 404, {'error': 'Not found'}
+
+    def _health(self, body):
+        return 200, {'status': 'ok', 'relayer': to_checksum_address(self.RELAYER_ADDRESS)}
+
+    def _nonce(self, body, address):
+        return 200, {'nonce': str(self.chain.meta_nonces.get(_addr(address), 0))}
+
+    def domain(self) -> dict:
+        return self.chain.meta_domain()
+
+    def _domain(self, body):
+        return 200, self.domain()
+
+    def _fee(self, body, frm, to, amount):
+        amount = int(amount)
+        fee = self.chain._fee(self.chain.token, _addr(frm), _addr(to), amount)
+        return 200, {
+            'amount': str(amount),
+            'fee': str(fee),
+            'netAmount': str(amount - fee),
+            'feePercent': '0.1%' if fee else '0%'
+        }
+
+    def _relay(self, body):
+        req = json.loads(body)
+        frm, to = _addr(req['from']), _addr(req['to'])
+        amount, deadline = int(req['amount']), int(req['deadline'])
+        if deadline < time.time():
+            return 400, {'error': 'Signature expired', 'code': 'EXPIRED'}
+        if self.verify_signatures:
+            nonce = self.chain.meta_nonces.get(frm, 0)
+            signer = Account.recover_message(
+                encode_typed_data(full_message=meta_transfer_typed_data(
+                    self.domain(), frm, to, amount, nonce, deadline)),
+                signature=req['signature']
+            )
+            if _addr(signer) != frm:
+                return 400, {'error': 'Invalid signature', 'code': 'INVALID_SIG'}
+        try:
+            receipt = self.chain.meta_transfer(self.RELAYER_ADDRESS, frm, to, amount)
+        except Revert:
+            return 400, {'error': 'Insufficient balance', 'code': 'INSUFFICIENT_BALANCE'}
+        return 200, {
+            'success': True,
+            'txHash': _hex(receipt['transactionHash']),
+            'blockNumber': receipt['blockNumber']
+        }
+
+
+def meta_transfer_typed_data(domain, frm, to, amount, nonce, deadline) -> dict:
+    """EIP-712 payload for a MetaTransfer, as signed by novis_sdk."""
+    return {
+        'types': {
+            'EIP712Domain': [
+                {'name': 'name', 'type': 'string'},
+                {'name': 'version', 'type': 'string'},
+                {'name': 'chainId', 'type': 'uint256'},
+                {'name': 'verifyingContract', 'type': 'address'}
+            ],
+            'MetaTransfer': [
+                {'name': 'from', 'type': 'address'},
+                {'name': 'to', 'type': 'address'},
+                {'name': 'amount', 'type': 'uint256'},
+                {'name': 'nonce', 'type': 'uint256'},
+                {'name': 'deadline', 'type': 'uint256'}
+            ]
+        },
+        'primaryType': 'MetaTransfer',
+        'domain': {
+            'name': domain['name'],
+            'version': domain['version'],
+            'chainId': int(domain['chainId']),
+            'verifyingContract': domain['verifyingContract']
+        },
+        'message': {
+            'from': to_checksum_address(frm),
+            'to': to_checksum_address(to),
+            'amount': amount,
+            'nonce': nonce,
+            'deadline': deadline
+        }
+    }
@@ -11,10 +11,19 @@ Example:
 """
 
 from web3 import Web3
+from web3.exceptions import Web3RPCError
 from eth_account import Account
 from eth_account.messages import encode_typed_data
 import time
 
+from . import encoders
+from .addresses import to_address, to_addresses
+from .tracing import NOOP_TRACER
+from .journal import DROPPED, FAILED, INCLUDED, PENDING
+from .ratelimit import RateLimitedHTTPProvider
+from .snapshot import BlockView, ReadCache, Snapshot
+from .preflight import Preflight, PreflightError
+
 # Contract addresses (Base Mainnet)
 ADDRESSES = {
     'NOVIS_TOKEN': '0x1fb5e1C0c3DEc8da595E531b31C7B30c540E6B85',
@@ -22,6 +31,9 @@ ADDRESSES = {
     'PAYMENT_ROUTER': '0xc95D114A333d0394e562BD398c4787fd22d27110',
     'GENESIS': '0xa23a81b1F7fB96DF6d12a579c2660b1ffbAAB2b7',
     'SMART_ACCOUNTS': '0x4b84E3a0D640c9139426f55204Fb34dB9B1123EA',
+    'ENTRYPOINT': '0x5FF137D4b0FDCD49DcA30c7CF57E578a026d2789',
+    'PAYMASTER': '0x5cf66c7D045aeedAd3db18bc4951aeF12f8f9d9F',
+    'MULTICALL3': '0xcA11bde05977b3631167028862bE2a173976CA11',
     'USDC': '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913'
 }
 
@@ -127,29 +139,51 @@ class NOVISClient:
     Args:
         private_key: Wallet private key
         rpc_url: Custom RPC URL (optional)
+        tracer: novis.tracing.Tracer for per-call span trees (optional)
+        addresses: Contract address overrides, merged over ADDRESSES (optional)
+        chain_id: Chain ID override (optional)
+        journal: novis.journal.SubmissionJournal; every transaction is
+            journaled before broadcast (optional)
+        accelerator: novis.accelerator.Accelerator; stuck transactions are
+            re-sent with bumped fees while waiting (optional)
+        rpc_limiter: novis.ratelimit.Limiter applied to every RPC request (optional)
+        receipt_timeout: Seconds to wait for a transaction to be mined,
+            bumps included (default: 120, web3's receipt timeout)
     
     Example:
         client = NOVISClient(private_key='0x...')
         client.transfer('0xRecipient...', 100)
     """
     
-    def __init__(self, private_key: str, rpc_url: str = NETWORK['rpc_url']):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+    def __init__(self, private_key: str, rpc_url: str = NETWORK['rpc_url'],
+                 tracer=None, addresses: dict = None, chain_id: int = None, journal=None,
+                 accelerator=None, rpc_limiter=None, receipt_timeout: float = 120):
+        if rpc_limiter is not None:
+            self.w3 = Web3(RateLimitedHTTPProvider(rpc_url, rpc_limiter))
+        else:
+            self.w3 = Web3(Web3.HTTPProvider(rpc_url))
         self.account = Account.from_key(private_key)
-        self.chain_id = NETWORK['chain_id']
+        self.chain_id = chain_id or NETWORK['chain_id']
+        self.tracer = tracer or NOOP_TRACER
+        self.addresses = {name: to_address(address)
+                          for name, address in {**ADDRESSES, **(addresses or {})}.items()}
+        self.journal = journal
+        self.accelerator = accelerator
+        self.receipt_timeout = receipt_timeout
+        self.read_cache = ReadCache()
         
         # Contract instances
         self.token = self.w3.eth.contract(
-            address=ADDRESSES['NOVIS_TOKEN'], abi=TOKEN_ABI
+            address=self.addresses['NOVIS_TOKEN'], abi=TOKEN_ABI
         )
         self.router = self.w3.eth.contract(
-            address=ADDRESSES['PAYMENT_ROUTER'], abi=ROUTER_ABI
+            address=self.addresses['PAYMENT_ROUTER'], abi=ROUTER_ABI
         )
         self.vault = self.w3.eth.contract(
-            address=ADDRESSES['VAULT'], abi=VAULT_ABI
+            address=self.addresses['VAULT'], abi=VAULT_ABI
         )
         self.usdc = self.w3.eth.contract(
-            address=ADDRESSES['USDC'], abi=USDC_ABI
+            address=self.addresses['USDC'], abi=USDC_ABI
         )
     
     @property
@@ -163,14 +197,12 @@ class NOVISClient:
     
     def get_balance(self, address: str = None) -> float:
         """Get NOVIS balance."""
-        addr = address or self.address
-        balance = self.token.functions.balanceOf(addr).call()
+        balance = self._balance_of(self.addresses['NOVIS_TOKEN'], address or self.address)
         return float(self.w3.from_wei(balance, 'ether'))
     
     def get_usdc_balance(self, address: str = None) -> float:
         """Get USDC balance."""
-        addr = address or self.address
-        balance = self.usdc.functions.balanceOf(addr).call()
+        balance = self._balance_of(self.addresses['USDC'], address or self.address)
         return float(balance) / 1e6
     
     def get_total_backing(self) -> float:
@@ -178,28 +210,47 @@ class NOVISClient:
         backing = self.vault.functions.totalBackingUSDC().call()
         return float(backing) / 1e6
     
+    def at_block(self, block) -> BlockView:
+        """
+        View whose reads are all pinned to ``block`` (number or tag,
+        resolved once). Results are cached in ``read_cache`` for good.
+        """
+        return BlockView(self, Snapshot(self.w3, block, self.addresses['MULTICALL3'],
+                                        self.read_cache))
+    
+    def snapshot(self) -> BlockView:
+        """View pinned to the current head."""
+        return self.at_block('latest')
+    
     # ============================================
     # TRANSFERS
     # ============================================
     
-    def transfer(self, to: str, amount: float) -> dict:
+    def transfer(self, to: str, amount: float, idempotency_key: str = None) -> dict:
         """
         Transfer NOVIS tokens.
         
         Args:
             to: Recipient address
             amount: Amount in NOVIS
+            idempotency_key: With a journal, a repeated key returns the
+                earlier result instead of paying again
             
         Returns:
             Transaction receipt
         """
-        amount_wei = self.w3.to_wei(amount, 'ether')
-        tx = self._build_tx(
-            self.token.functions.transfer(to, amount_wei)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('transfer', to=to, amount=amount):
+            replay = self._replay(idempotency_key)
+            if replay is not None:
+                return replay
+            amount_wei = self.w3.to_wei(amount, 'ether')
+            tx = self._build_call(
+                self.addresses['NOVIS_TOKEN'], encoders.transfer(to, amount_wei)
+            )
+            return self._send_tx(tx, idempotency_key)
     
-    def pay_with_memo(self, to: str, amount: float, memo: str) -> dict:
+    def pay_with_memo(self, to: str, amount: float, memo: str,
+                      idempotency_key: str = None) -> dict:
         """
         Pay with memo (attach reference to payment).
         
@@ -207,44 +258,74 @@ class NOVISClient:
             to: Recipient address
             amount: Amount in NOVIS
             memo: Payment reference/memo
+            idempotency_key: See transfer()
             
         Returns:
             Transaction receipt
         """
-        self._ensure_router_allowance(amount)
-        amount_wei = self.w3.to_wei(amount, 'ether')
-        tx = self._build_tx(
-            self.router.functions.payWithMemo(to, amount_wei, memo)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('pay_with_memo', to=to, amount=amount, memo=memo):
+            replay = self._replay(idempotency_key)
+            if replay is not None:
+                return replay
+            self._ensure_router_allowance(amount)
+            amount_wei = self.w3.to_wei(amount, 'ether')
+            tx = self._build_call(
+                self.addresses['PAYMENT_ROUTER'], encoders.pay_with_memo(to, amount_wei, memo)
+            )
+            return self._send_tx(tx, idempotency_key)
     
-    def batch_pay(self, payments: list) -> dict:
+    def batch_pay(self, payments: list, idempotency_key: str = None,
+                  preflight: bool = False) -> dict:
         """
         Batch pay multiple recipients.
         
         Args:
             payments: List of {'to': address, 'amount': float, 'memo': str}
+            idempotency_key: See transfer()
+            preflight: Simulate first; payments that would make batchPay
+                revert are left out (see novis.preflight)
             
         Returns:
-            Transaction receipt
+            Transaction receipt; with preflight, plus 'quarantined':
+            [(index, payment, reason)]
         """
-        total = sum(p['amount'] for p in payments)
-        self._ensure_router_allowance(total)
-        
-        recipients = [p['to'] for p in payments]
-        amounts = [self.w3.to_wei(p['amount'], 'ether') for p in payments]
-        memos = [p.get('memo', '') for p in payments]
-        
-        tx = self._build_tx(
-            self.router.functions.batchPay(recipients, amounts, memos)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('batch_pay', recipients=len(payments)):
+            replay = self._replay(idempotency_key)
+            if replay is not None:
+                return replay
+            quarantined = None
+            if preflight:
+                # Simulations need the allowance in place; amounts are not validated yet
+                self._ensure_router_allowance()
+                with self.tracer.span('preflight') as span:
+                    result = Preflight(self).batch_pay(payments)
+                    quarantined = result['quarantined']
+                    span.set_attribute('quarantined', len(quarantined))
+                    span.set_attribute('simulations', result['simulations'])
+                if not result['ok']:
+                    raise PreflightError('every payment fails simulation', quarantined)
+                payments = result['ok']
+            else:
+                self._ensure_router_allowance(sum(p['amount'] for p in payments))
+            recipients = to_addresses([p['to'] for p in payments])
+            
+            amounts = [self.w3.to_wei(p['amount'], 'ether') for p in payments]
+            memos = [p.get('memo', '') for p in payments]
+            
+            tx = self._build_call(
+                self.addresses['PAYMENT_ROUTER'], encoders.batch_pay(recipients, amounts, memos)
+            )
+            receipt = self._send_tx(tx, idempotency_key)
+            if quarantined is not None:
+                receipt['quarantined'] = quarantined
+            return receipt
     
     # ============================================
     # ESCROW
     # ============================================
     
-    def create_escrow(self, to: str, amount: float, timeout: int = 3600) -> dict:
+    def create_escrow(self, to: str, amount: float, timeout: int = 3600,
+                      idempotency_key: str = None) -> dict:
         """
         Create escrow payment.
         
@@ -252,30 +333,37 @@ class NOVISClient:
             to: Payee address
             amount: Amount in NOVIS
             timeout: Timeout in seconds (default: 1 hour)
+            idempotency_key: See transfer()
             
         Returns:
             Transaction receipt
         """
-        self._ensure_router_allowance(amount)
-        amount_wei = self.w3.to_wei(amount, 'ether')
-        tx = self._build_tx(
-            self.router.functions.createEscrow(to, amount_wei, timeout)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('create_escrow', to=to, amount=amount, timeout=timeout):
+            replay = self._replay(idempotency_key)
+            if replay is not None:
+                return replay
+            self._ensure_router_allowance(amount)
+            amount_wei = self.w3.to_wei(amount, 'ether')
+            tx = self._build_call(
+                self.addresses['PAYMENT_ROUTER'], encoders.create_escrow(to, amount_wei, timeout)
+            )
+            return self._send_tx(tx, idempotency_key)
     
     def release_escrow(self, escrow_id: int) -> dict:
         """Release escrow (send funds to payee)."""
-        tx = self._build_tx(
-            self.router.functions.releaseEscrow(escrow_id)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('release_escrow', escrow_id=escrow_id):
+            tx = self._build_call(
+                self.addresses['PAYMENT_ROUTER'], encoders.release_escrow(escrow_id)
+            )
+            return self._send_tx(tx)
     
     def refund_escrow(self, escrow_id: int) -> dict:
         """Refund escrow (return funds to payer)."""
-        tx = self._build_tx(
-            self.router.functions.refundEscrow(escrow_id)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('refund_escrow', escrow_id=escrow_id):
+            tx = self._build_call(
+                self.addresses['PAYMENT_ROUTER'], encoders.refund_escrow(escrow_id)
+            )
+            return self._send_tx(tx)
     
     def get_escrow(self, escrow_id: int) -> dict:
         """Get escrow details."""
@@ -303,23 +391,27 @@ class NOVISClient:
         Returns:
             Transaction receipt
         """
-        amount_wei = int(usdc_amount * 1e6)
-        
-        # Approve USDC
-        allowance = self.usdc.functions.allowance(
-            self.address, ADDRESSES['VAULT']
-        ).call()
-        
-        if allowance < amount_wei:
-            approve_tx = self._build_tx(
-                self.usdc.functions.approve(ADDRESSES['VAULT'], 2**256 - 1)
-            )
-            self._send_tx(approve_tx)
-        
-        tx = self._build_tx(
-            self.vault.functions.deposit(amount_wei)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('mint', usdc_amount=usdc_amount):
+            amount_wei = int(usdc_amount * 1e6)
+            
+            # Approve USDC
+            with self.tracer.span('allowance'):
+                allowance = self.usdc.functions.allowance(
+                    self.address, self.addresses['VAULT']
+                ).call()
+            
+            if allowance < amount_wei:
+                with self.tracer.span('approve'):
+                    approve_tx = self._build_tx(
+                        self.usdc.functions.approve(self.addresses['VAULT'], 2**256 - 1)
+                    )
+                    self._send_tx(approve_tx)
+            
+            with self.tracer.span('deposit'):
+                tx = self._build_tx(
+                    self.vault.functions.deposit(amount_wei)
+                )
+                return self._send_tx(tx)
     
     def redeem(self, novis_amount: float) -> dict:
         """
@@ -331,49 +423,138 @@ class NOVISClient:
         Returns:
             Transaction receipt
         """
-        amount_wei = self.w3.to_wei(novis_amount, 'ether')
-        tx = self._build_tx(
-            self.vault.functions.redeem(amount_wei)
-        )
-        return self._send_tx(tx)
+        with self.tracer.span('redeem', novis_amount=novis_amount):
+            amount_wei = self.w3.to_wei(novis_amount, 'ether')
+            
+            # The vault pulls the NOVIS with transferFrom before burning it
+            with self.tracer.span('allowance'):
+                allowance = self.token.functions.allowance(
+                    self.address, self.addresses['VAULT']
+                ).call()
+            
+            if allowance < amount_wei:
+                with self.tracer.span('approve'):
+                    approve_tx = self._build_call(
+                        self.addresses['NOVIS_TOKEN'],
+                        encoders.approve(self.addresses['VAULT'], 2**256 - 1)
+                    )
+                    self._send_tx(approve_tx)
+            
+            tx = self._build_tx(
+                self.vault.functions.redeem(amount_wei)
+            )
+            return self._send_tx(tx)
     
     # ============================================
     # HELPERS
     # ============================================
     
-    def _ensure_router_allowance(self, amount: float):
-        """Ensure router has sufficient allowance."""
-        amount_wei = self.w3.to_wei(amount, 'ether')
-        allowance = self.token.functions.allowance(
-            self.address, ADDRESSES['PAYMENT_ROUTER']
-        ).call()
+    def _balance_of(self, token: str, account: str) -> int:
+        """ERC-20 balance via a raw eth_call (see novis.encoders)."""
+        result = self.w3.eth.call({'to': token, 'data': encoders.balance_of(account)})
+        return int.from_bytes(result, 'big')
+    
+    def _ensure_router_allowance(self, amount: float = None):
+        """Ensure router has sufficient allowance (None: an unlimited one)."""
+        amount_wei = 2**255 if amount is None else self.w3.to_wei(amount, 'ether')
+        with self.tracer.span('allowance'):
+            allowance = self.token.functions.allowance(
+                self.address, self.addresses['PAYMENT_ROUTER']
+            ).call()
         
         if allowance < amount_wei:
-            approve_tx = self._build_tx(
-                self.token.functions.approve(ADDRESSES['PAYMENT_ROUTER'], 2**256 - 1)
-            )
-            self._send_tx(approve_tx)
+            with self.tracer.span('approve'):
+                approve_tx = self._build_call(
+                    self.addresses['NOVIS_TOKEN'],
+                    encoders.approve(self.addresses['PAYMENT_ROUTER'], 2**256 - 1)
+                )
+                self._send_tx(approve_tx)
     
     def _build_tx(self, func):
         """Build transaction dict."""
-        return func.build_transaction({
-            'from': self.address,
-            'nonce': self.w3.eth.get_transaction_count(self.address),
-            'gas': 300000,
-            'gasPrice': self.w3.eth.gas_price,
-            'chainId': self.chain_id
-        })
+        with self.tracer.span('build') as span:
+            tx = func.build_transaction({
+                'from': self.address,
+                'nonce': self.w3.eth.get_transaction_count(self.address),
+                'gas': 300000,
+                'gasPrice': self.w3.eth.gas_price,
+                'chainId': self.chain_id
+            })
+            span.set_attribute('nonce', tx['nonce'])
+            return tx
+    
+    def _build_call(self, to: str, data: bytes):
+        """Build transaction dict from precompiled calldata (see novis.encoders)."""
+        with self.tracer.span('build') as span:
+            tx = encoders.build_tx(
+                self.address, to, data,
+                nonce=self.w3.eth.get_transaction_count(self.address),
+                gas=300000,
+                gas_price=self.w3.eth.gas_price,
+                chain_id=self.chain_id
+            )
+            span.set_attribute('nonce', tx['nonce'])
+            return tx
+    
+    def _replay(self, idempotency_key: str):
+        """Result of an earlier journaled submission with this key, if any."""
+        if self.journal is None or idempotency_key is None:
+            return None
+        entry = self.journal.get(idempotency_key)
+        if entry is None:
+            return None
+        if entry.status == PENDING:
+            with self.tracer.span('settle', tx_hash=entry.tx_hash):
+                entry = self.journal.settle(self.w3, entry)
+        if entry.status == DROPPED:
+            return None
+        return entry.result()
     
-    def _send_tx(self, tx: dict) -> dict:
-        """Sign and send transaction."""
-        signed = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+    def _send_tx(self, tx: dict, idempotency_key: str = None) -> dict:
+        """Sign and send transaction (journaled first when a journal is set)."""
+        with self.tracer.span('sign'):
+            signed = self.account.sign_transaction(tx)
+        key = None
+        if self.journal is not None:
+            key = idempotency_key or Web3.to_hex(signed.hash)
+            with self.tracer.span('journal'):
+                self.journal.record(key, self.address, tx['nonce'],
+                                    Web3.to_hex(signed.hash), Web3.to_hex(signed.raw_transaction))
+        with self.tracer.span('send', nonce=tx['nonce']) as span:
+            try:
+                tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            except Web3RPCError:
+                # Rejected by the node: never broadcast, so not left pending
+                if key is not None:
+                    self.journal.mark(key, DROPPED, wait=True)
+                raise
+            span.set_attribute('tx_hash', tx_hash.hex())
+        cancelled = False
+        with self.tracer.span('wait', tx_hash=tx_hash.hex()) as span:
+            if self.accelerator is None:
+                receipt = self.w3.eth.wait_for_transaction_receipt(
+                    tx_hash, timeout=self.receipt_timeout)
+            else:
+                on_replace = None
+                if key is not None:
+                    def on_replace(original, new_hash, raw, cancel):
+                        self.journal.replace(key, new_hash, raw, cancel)
+                self.accelerator.track(tx, tx_hash, on_replace)
+                receipt = self.accelerator.wait(tx_hash, timeout=self.receipt_timeout)
+                if receipt.transactionHash != tx_hash:
+                    tx_hash = receipt.transactionHash
+                    cancelled = self.accelerator.policy == 'cancel'
+            span.set_attribute('block_number', receipt.blockNumber)
+            span.set_attribute('gas_used', receipt.gasUsed)
+        if key is not None:
+            status = DROPPED if cancelled else INCLUDED if receipt.status == 1 else FAILED
+            self.journal.mark(key, status, receipt.blockNumber, receipt.gasUsed,
+                              tx_hash=Web3.to_hex(tx_hash))
         return {
             'tx_hash': tx_hash.hex(),
             'block_number': receipt.blockNumber,
             'gas_used': receipt.gasUsed,
-            'status': receipt.status
+            'status': 0 if cancelled else receipt.status
         }
 
 
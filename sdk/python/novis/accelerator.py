@@ -0,0 +1,312 @@
+"""
+NOVIS Transaction Accelerator
+
+Watches transactions sent by the SDK and replaces the ones that stay
+unmined, so one underpriced transaction cannot hold up every later nonce
+of the wallet.
+
+A transaction that is still pending ``stuck_blocks`` blocks after it was
+sent is re-signed at the same nonce with EIP-1559 fees bumped by
+``bump`` (at least the 10% mempools require for a replacement) and
+re-broadcast. ``policy='replace'`` re-sends the same call;
+``policy='cancel'`` sends a zero-value self-transfer instead, so the
+original call never executes. Whichever version is mined, ``wait()``
+returns its receipt.
+
+Every inclusion is recorded (seconds and blocks from first broadcast,
+number of bumps) and summarised by ``report()`` for tuning.
+
+Example:
+    from novis import NOVISClient
+    from novis.accelerator import Accelerator
+
+    client = NOVISClient(private_key='0x...')
+    client.accelerator = Accelerator(client.w3, client.account, stuck_blocks=3).start()
+    client.transfer('0x...', 10)    # bumped automatically if it gets stuck
+    client.accelerator.report()
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from .journal import rebroadcast
+from .tracing import NOOP_TRACER
+
+
+class Inclusion:
+    """How long one tracked transaction took to be mined."""
+
+    __slots__ = ('original_hash', 'tx_hash', 'nonce', 'bumps', 'blocks', 'seconds',
+                 'cancelled', 'status')
+
+    def __init__(self, original_hash, tx_hash, nonce, bumps, blocks, seconds, cancelled, status):
+        self.original_hash = original_hash
+        self.tx_hash = tx_hash
+        self.nonce = nonce
+        self.bumps = bumps
+        self.blocks = blocks
+        self.seconds = seconds
+        self.cancelled = cancelled
+        self.status = status
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _Tracked:
+    __slots__ = ('tx', 'original_hash', 'hashes', 'cancels', 'sent_block', 'sent_at',
+                 'bumped_block', 'bumps', 'on_replace', 'done', 'receipt', 'inclusion')
+
+    def __init__(self, tx, tx_hash, block, on_replace):
+        self.tx = dict(tx)
+        self.original_hash = tx_hash
+        self.hashes = [tx_hash]     # newest last
+        self.cancels = set()
+        self.sent_block = block
+        self.sent_at = time.time()
+        self.bumped_block = block
+        self.bumps = 0
+        self.on_replace = on_replace
+        self.done = threading.Event()
+        self.receipt = None
+        self.inclusion = None
+
+
+def _hex(tx_hash) -> str:
+    if isinstance(tx_hash, str):
+        return tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+    return Web3.to_hex(tx_hash)
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Accelerator:
+    """
+    Replace-by-fee watcher for one signing account.
+
+    Args:
+        w3: Web3 instance
+        account: eth_account LocalAccount that signed the transactions
+        stuck_blocks: Blocks without inclusion before a transaction is bumped
+        bump: Fractional fee increase per replacement (min 0.1)
+        max_fee_per_gas: Never bid above this (wei); None for no cap
+        max_bumps: Replacements per transaction before giving up bumping
+        policy: 'replace' (same call, higher fee) or 'cancel' (self-transfer)
+        poll_interval: Seconds between checks in the background thread
+        tracer: novis.tracing.Tracer (optional)
+    """
+
+    def __init__(self, w3, account, stuck_blocks: int = 3, bump: float = 0.125,
+                 max_fee_per_gas: int = None, max_bumps: int = 5, policy: str = 'replace',
+                 poll_interval: float = 1.0, tracer=None):
+        if policy not in ('replace', 'cancel'):
+            raise ValueError(f'unknown policy {policy!r}')
+        self.w3 = w3
+        self.account = account
+        self.stuck_blocks = stuck_blocks
+        self.bump = max(bump, 0.1)
+        self.max_fee_per_gas = max_fee_per_gas
+        self.max_bumps = max_bumps
+        self.policy = policy
+        self.poll_interval = poll_interval
+        self.tracer = tracer or NOOP_TRACER
+        self.inclusions = deque(maxlen=10000)
+        self._tracked = {}    # original hash -> _Tracked
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---- lifecycle ----
+
+    def start(self) -> 'Accelerator':
+        """Watch in a background thread (otherwise ``wait()`` polls inline)."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._tracked:
+                try:
+                    self.poll()
+                except Exception:
+                    pass    # transient RPC failure; try again next tick
+            self._stop.wait(self.poll_interval)
+
+    # ---- tracking ----
+
+    def track(self, tx: dict, tx_hash, on_replace=None) -> str:
+        """
+        Watch a transaction that has already been broadcast.
+
+        Args:
+            tx: The unsigned transaction dict it was signed from
+            tx_hash: Its hash
+            on_replace: Optional callback(original_hash, new_hash, raw, cancel)
+                run before each replacement is broadcast (e.g. to journal it)
+
+        Returns:
+            The original hash, used as the handle for ``wait()``
+        """
+        tx_hash = _hex(tx_hash)
+        block = self.w3.eth.block_number
+        with self._lock:
+            self._tracked[tx_hash] = _Tracked(tx, tx_hash, block, on_replace)
+        return tx_hash
+
+    def wait(self, tx_hash, timeout: float = None):
+        """
+        Receipt of whichever version of the transaction is mined.
+
+        Raises TimeoutError after ``timeout`` seconds.
+        """
+        tx_hash = _hex(tx_hash)
+        entry = self._tracked.get(tx_hash)
+        if entry is None:
+            # Not tracked (or already waited for): plain receipt wait
+            return self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout or 120)
+        deadline = None if timeout is None else time.time() + timeout
+        while not entry.done.is_set():
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f'{tx_hash} not mined after {timeout}s ({entry.bumps} bumps)')
+            if self._thread is None:
+                self.poll()
+                if entry.done.is_set():
+                    break
+            entry.done.wait(self.poll_interval)
+        self.forget(tx_hash)
+        return entry.receipt
+
+    def forget(self, tx_hash):
+        with self._lock:
+            self._tracked.pop(_hex(tx_hash), None)
+
+    # ---- polling ----
+
+    def poll(self):
+        """One pass: settle mined transactions and bump stuck ones."""
+        block = self.w3.eth.block_number
+        with self._lock:
+            pending = [e for e in self._tracked.values() if not e.done.is_set()]
+        for entry in pending:
+            receipt = self._find_receipt(entry)
+            if receipt is not None:
+                self._finish(entry, receipt)
+            elif (block - entry.bumped_block >= self.stuck_blocks
+                  and entry.bumps < self.max_bumps):
+                self._replace(entry, block)
+        with self._lock:
+            # Drop finished entries nobody waited for
+            for tx_hash in [h for h, e in self._tracked.items()
+                            if e.done.is_set() and time.time() - e.sent_at > 600]:
+                del self._tracked[tx_hash]
+
+    def _find_receipt(self, entry):
+        for tx_hash in reversed(entry.hashes):
+            try:
+                return self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def _finish(self, entry, receipt):
+        mined = Web3.to_hex(receipt.transactionHash)
+        entry.receipt = receipt
+        entry.inclusion = Inclusion(
+            entry.original_hash, mined, entry.tx['nonce'], entry.bumps,
+            receipt.blockNumber - entry.sent_block, time.time() - entry.sent_at,
+            mined in entry.cancels, receipt.status)
+        self.inclusions.append(entry.inclusion)
+        entry.done.set()
+
+    def next_fees(self, tx: dict):
+        """
+        (maxFeePerGas, maxPriorityFeePerGas) for a replacement of ``tx``,
+        or None when the cap leaves no room for a valid bump.
+        """
+        old_max = tx.get('maxFeePerGas', tx.get('gasPrice'))
+        old_tip = tx.get('maxPriorityFeePerGas', tx.get('gasPrice'))
+        base = self.w3.eth.get_block('latest').get('baseFeePerGas', 0)
+        tip = max(math.ceil(old_tip * (1 + self.bump)), self.w3.eth.max_priority_fee)
+        max_fee = max(math.ceil(old_max * (1 + self.bump)), 2 * base + tip)
+        if self.max_fee_per_gas is not None:
+            max_fee = min(max_fee, self.max_fee_per_gas)
+            tip = min(tip, max_fee)
+        if max_fee * 10 < old_max * 11 or tip * 10 < old_tip * 11:
+            return None
+        return max_fee, tip
+
+    def _replace(self, entry, block):
+        fees = self.next_fees(entry.tx)
+        if fees is None:
+            # Capped out; try again next window in case the base fee falls
+            entry.bumped_block = block
+            return
+        tx = {k: v for k, v in entry.tx.items() if k not in ('gasPrice', 'type')}
+        cancel = self.policy == 'cancel'
+        if cancel:
+            tx = {'from': self.account.address, 'to': self.account.address, 'value': 0,
+                  'data': b'', 'gas': 21000, 'nonce': tx['nonce'], 'chainId': tx['chainId']}
+        tx['maxFeePerGas'], tx['maxPriorityFeePerGas'] = fees
+        with self.tracer.span('replace', nonce=tx['nonce'], bump=entry.bumps + 1,
+                              max_fee_per_gas=fees[0], cancel=cancel):
+            signed = self.account.sign_transaction(tx)
+            new_hash = Web3.to_hex(signed.hash)
+            if entry.on_replace is not None:
+                entry.on_replace(entry.original_hash, new_hash,
+                                 Web3.to_hex(signed.raw_transaction), cancel)
+            try:
+                rebroadcast(self.w3, signed.raw_transaction)
+            except Exception as e:
+                if 'underpriced' not in str(e).lower():
+                    raise
+                # Someone else's replacement is already higher; retry next round
+                entry.bumped_block = block
+                return
+        entry.tx = tx
+        entry.hashes.append(new_hash)
+        if cancel:
+            entry.cancels.add(new_hash)
+        entry.bumps += 1
+        entry.bumped_block = block
+
+    # ---- reporting ----
+
+    def report(self) -> dict:
+        """Time-to-inclusion summary over recorded inclusions."""
+        records = list(self.inclusions)
+        seconds = [r.seconds for r in records]
+        blocks = [r.blocks for r in records]
+        return {
+            'count': len(records),
+            'bumped': sum(1 for r in records if r.bumps),
+            'cancelled': sum(1 for r in records if r.cancelled),
+            'p50_seconds': _percentile(seconds, 0.5),
+            'p90_seconds': _percentile(seconds, 0.9),
+            'max_seconds': max(seconds) if seconds else None,
+            'p50_blocks': _percentile(blocks, 0.5),
+            'p90_blocks': _percentile(blocks, 0.9),
+            'max_blocks': max(blocks) if blocks else None,
+            'pending': sum(1 for e in list(self._tracked.values()) if not e.done.is_set())
+        }
+
+
+__all__ = ['Accelerator', 'Inclusion']
@@ -0,0 +1,243 @@
+"""
+NOVIS Account Index
+
+Owner <-> smart-account index built from the factory's
+``AccountCreated(account, owner, dailyLimit)`` events.
+
+Replaces ``getAccountsByOwner`` (an unbounded storage scan in an
+eth_call) with an incrementally synced local index: lookups are dict
+reads, pages are slices, and the index persists in SQLite so each run
+only fetches logs for blocks it has not seen.
+
+Example:
+    from novis.account_index import AccountIndex
+
+    index = AccountIndex(w3, ADDRESSES['SMART_ACCOUNTS'], path='accounts.db',
+                         start_block=23_000_000)
+    index.sync()
+    page = index.accounts_of(owner, limit=50)
+    more = index.accounts_of(owner, limit=50, after=page[-1])
+    index.owner_of(page[0])
+"""
+
+import bisect
+import sqlite3
+import threading
+
+from web3 import Web3
+
+from .addresses import to_address
+
+ACCOUNT_CREATED_TOPIC = Web3.keccak(text='AccountCreated(address,address,uint256)')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    daily_limit TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accounts_by_owner ON accounts (owner, block, log_index);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class AccountRecord:
+    """One AccountCreated event."""
+
+    __slots__ = ('account', 'owner', 'daily_limit', 'block', 'log_index')
+
+    def __init__(self, account: str, owner: str, daily_limit: int, block: int, log_index: int):
+        self.account = account
+        self.owner = owner
+        self.daily_limit = daily_limit
+        self.block = block
+        self.log_index = log_index
+
+    @property
+    def position(self) -> tuple:
+        return (self.block, self.log_index)
+
+    def to_dict(self) -> dict:
+        return {
+            'account': self.account,
+            'owner': self.owner,
+            'daily_limit': self.daily_limit,
+            'block': self.block,
+            'log_index': self.log_index
+        }
+
+
+class AccountIndex:
+    """
+    Incrementally synced owner <-> account index for one factory.
+
+    Args:
+        w3: Web3 instance
+        factory: NOVISAccountFactoryV4 address
+        path: SQLite file to persist to (None keeps the index in memory)
+        start_block: First block to scan (the factory's deployment block)
+        chunk_size: Blocks per eth_getLogs request; halved automatically
+            when the node rejects a range
+        confirmations: Stay this many blocks behind the head
+    """
+
+    def __init__(self, w3, factory: str, path: str = None, start_block: int = 0,
+                 chunk_size: int = 10000, confirmations: int = 0):
+        self.w3 = w3
+        self.factory = to_address(factory)
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.synced_block = start_block - 1
+        # Keyed by lowercase address so lookups skip checksumming
+        self._by_account = {}
+        self._by_owner = {}      # owner -> [AccountRecord] in creation order
+        self._positions = {}     # owner -> [(block, log_index)], parallel to _by_owner
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+            self._load()
+
+    # ---- persistence ----
+
+    def _load(self):
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (self._meta_key(),)).fetchone()
+        if row is not None:
+            self.synced_block = max(self.synced_block, int(row[0]))
+        for account, owner, limit, block, log_index in self._db.execute(
+                "SELECT account, owner, daily_limit, block, log_index FROM accounts "
+                "ORDER BY block, log_index"):
+            self._add(AccountRecord(account, owner, int(limit), block, log_index))
+
+    def _meta_key(self) -> str:
+        return f'synced_block:{self.factory}'
+
+    def _persist(self, records: list):
+        if self._db is None:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?, ?, ?)",
+                [(r.account, r.owner, str(r.daily_limit), r.block, r.log_index) for r in records])
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                (self._meta_key(), str(self.synced_block)))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ---- sync ----
+
+    def _add(self, record: AccountRecord):
+        account, owner = record.account.lower(), record.owner.lower()
+        if account in self._by_account:
+            return
+        self._by_account[account] = record
+        owned = self._by_owner.setdefault(owner, [])
+        positions = self._positions.setdefault(owner, [])
+        i = bisect.bisect(positions, record.position)
+        owned.insert(i, record)
+        positions.insert(i, record.position)
+
+    def sync(self, to_block='latest') -> int:
+        """Fetch AccountCreated logs up to ``to_block``; returns new accounts."""
+        if to_block == 'latest':
+            to_block = self.w3.eth.block_number - self.confirmations
+        added = 0
+        chunk = self.chunk_size
+        while self.synced_block < to_block:
+            start = self.synced_block + 1
+            end = min(start + chunk - 1, to_block)
+            try:
+                logs = self.w3.eth.get_logs({
+                    'address': self.factory,
+                    'fromBlock': start,
+                    'toBlock': end,
+                    'topics': [Web3.to_hex(ACCOUNT_CREATED_TOPIC)]
+                })
+            except Exception:
+                if chunk == 1:
+                    raise
+                chunk = max(1, chunk // 2)
+                continue
+            records = [self._record(log) for log in logs]
+            with self._lock:
+                for record in records:
+                    self._add(record)
+                self.synced_block = end
+                self._persist(records)
+            added += len(records)
+        return added
+
+    @staticmethod
+    def _record(log) -> AccountRecord:
+        return AccountRecord(
+            to_address(bytes(log['topics'][1])[12:]),
+            to_address(bytes(log['topics'][2])[12:]),
+            int.from_bytes(bytes(log['data'])[:32], 'big'),
+            log['blockNumber'],
+            log['logIndex']
+        )
+
+    def add_receipt(self, receipt) -> list:
+        """Index AccountCreated logs from our own createAccount receipts."""
+        records = [self._record(log) for log in receipt['logs']
+                   if log['address'] == self.factory
+                   and bytes(log['topics'][0]) == ACCOUNT_CREATED_TOPIC]
+        with self._lock:
+            for record in records:
+                self._add(record)
+            self._persist(records)
+        return [r.account for r in records]
+
+    # ---- lookups ----
+
+    def owner_of(self, account: str):
+        """Owner at creation, or None if the account is not from this factory."""
+        record = self._by_account.get(account.lower())
+        return record.owner if record else None
+
+    def get(self, account: str):
+        return self._by_account.get(account.lower())
+
+    def count(self, owner: str = None) -> int:
+        if owner is None:
+            return len(self._by_account)
+        return len(self._by_owner.get(owner.lower(), ()))
+
+    def accounts_of(self, owner: str, limit: int = 100, after: str = None,
+                    before: str = None, reverse: bool = False) -> list:
+        """
+        One page of an owner's accounts in creation order.
+
+        Page forward with ``after=<last account of previous page>`` and
+        backward with ``before=<first account of previous page>``;
+        ``reverse=True`` starts from the newest.
+        """
+        owned = self._by_owner.get(owner.lower(), [])
+        lo, hi = 0, len(owned)
+        if after is not None:
+            lo = self._position(owner, after) + 1
+        if before is not None:
+            hi = self._position(owner, before)
+        if reverse:
+            return [r.account for r in owned[max(lo, hi - limit):hi][::-1]]
+        return [r.account for r in owned[lo:min(hi, lo + limit)]]
+
+    def _position(self, owner: str, account: str) -> int:
+        record = self._by_account.get(account.lower())
+        if record is None or record.owner.lower() != owner.lower():
+            raise KeyError(account)
+        return bisect.bisect_left(self._positions[owner.lower()], record.position)
+
+    def owners(self) -> list:
+        return [owned[0].owner for owned in self._by_owner.values()]
+
+
+__all__ = ['AccountIndex', 'AccountRecord']
@@ -0,0 +1,273 @@
+"""
+NOVIS Smart Account Factory
+
+Offline CREATE2 address prediction for NOVISAccountFactoryV4 and
+pipelined fleet provisioning.
+
+The factory deploys each account as
+``ERC1967Proxy(accountImplementation, initialize(owner, entryPoint, novisToken, dailyLimit))``
+with ``create2(keccak256(abi.encodePacked(owner, salt)))``, so the address
+depends only on the factory, its immutables, the proxy creation code,
+the owner, the daily limit and the salt. ``AccountFactory.load()`` reads
+those once; after that ``predict()`` is pure computation.
+
+Example:
+    from novis.accounts import AccountFactory, account_salt
+
+    factory = AccountFactory(w3, ADDRESSES['SMART_ACCOUNTS']).load()
+    factory.predict(owner, daily_limit_wei, account_salt('agents', 7))
+    factory.provision(w3, account, chain_id, n=100, daily_limit_wei=10**21)
+"""
+
+import json
+import re
+import threading
+
+from web3 import Web3
+
+from .addresses import to_address
+from .tracing import NOOP_TRACER
+
+FACTORY_ABI = [
+    {"name": "createAccount", "type": "function",
+     "inputs": [
+         {"name": "owner", "type": "address"},
+         {"name": "dailyLimit", "type": "uint256"},
+         {"name": "salt", "type": "bytes32"}
+     ],
+     "outputs": [{"type": "address"}]},
+    {"name": "accountImplementation", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"type": "address"}]},
+    {"name": "entryPoint", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"type": "address"}]},
+    {"name": "novisToken", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"type": "address"}]},
+    {"name": "AccountCreated", "type": "event", "anonymous": False,
+     "inputs": [
+         {"name": "account", "type": "address", "indexed": True},
+         {"name": "owner", "type": "address", "indexed": True},
+         {"name": "dailyLimit", "type": "uint256", "indexed": False}
+     ]}
+]
+
+INITIALIZE_SELECTOR = Web3.keccak(text='initialize(address,address,address,uint256)')[:4]
+CREATE_ACCOUNT_SELECTOR = Web3.keccak(text='createAccount(address,uint256,bytes32)')[:4]
+ACCOUNT_CREATED_TOPIC = Web3.keccak(text='AccountCreated(address,address,uint256)')
+
+# Solidity prologue and CBOR metadata trailer (ipfs + solc version)
+_PROLOGUE = bytes.fromhex('6080604052')
+_METADATA = re.compile(rb'\xa2\x64ipfs\x58\x22\x12\x20.{32}\x64solc\x43.{3}\x00\x33', re.DOTALL)
+
+
+class PredictionError(Exception):
+    """Raised when the factory's proxy creation code cannot be determined."""
+
+
+def account_salt(namespace: str, index: int) -> bytes:
+    """
+    Deterministic createAccount salt: keccak256("novis:<namespace>:<index>").
+
+    The factory mixes the owner into the final CREATE2 salt, so the same
+    (namespace, index) never collides across owners.
+    """
+    return Web3.keccak(text=f'novis:{namespace}:{index}')
+
+
+def extract_proxy_creation_code(runtime_code: bytes) -> bytes:
+    """
+    Find ``type(ERC1967Proxy).creationCode`` embedded in the factory's
+    runtime code: the first contract prologue after offset 0, up to the
+    end of the next metadata trailer.
+    """
+    start = runtime_code.find(_PROLOGUE, 1)
+    if start < 0:
+        raise PredictionError('no embedded creation code in factory bytecode')
+    match = _METADATA.search(runtime_code, start)
+    if match is None:
+        raise PredictionError('embedded creation code has no metadata trailer')
+    return bytes(runtime_code[start:match.end()])
+
+
+def _word(value: int) -> bytes:
+    return value.to_bytes(32, 'big')
+
+
+def _address_word(address: str) -> bytes:
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+class AccountFactory:
+    """
+    NOVISAccountFactoryV4 address predictor and provisioner.
+
+    Args:
+        w3: Web3 instance
+        address: Factory address
+        proxy_creation_code: ERC1967Proxy creation code (default: extracted
+            from the factory's runtime code by ``load()``)
+    """
+
+    def __init__(self, w3, address: str, proxy_creation_code: bytes = None):
+        self.w3 = w3
+        self.address = to_address(address)
+        self.contract = w3.eth.contract(address=self.address, abi=FACTORY_ABI)
+        self.proxy_creation_code = proxy_creation_code
+        self.implementation = None
+        self.entry_point = None
+        self.novis_token = None
+        self._factory_bytes = bytes.fromhex(self.address[2:])
+        self._lock = threading.Lock()
+
+    # ---- setup ----
+
+    def load(self) -> 'AccountFactory':
+        """Read the factory immutables and proxy creation code (4 RPCs, once)."""
+        fn = self.contract.functions
+        self.implementation = fn.accountImplementation().call()
+        self.entry_point = fn.entryPoint().call()
+        self.novis_token = fn.novisToken().call()
+        if self.proxy_creation_code is None:
+            self.proxy_creation_code = extract_proxy_creation_code(
+                bytes(self.w3.eth.get_code(self.address)))
+        return self
+
+    @classmethod
+    def from_artifact(cls, w3, address: str, artifact_path: str) -> 'AccountFactory':
+        """Use the ERC1967Proxy creation code from a Foundry/Hardhat artifact."""
+        with open(artifact_path) as fh:
+            artifact = json.load(fh)
+        bytecode = artifact['bytecode']
+        if isinstance(bytecode, dict):
+            bytecode = bytecode['object']
+        return cls(w3, address, bytes.fromhex(bytecode.removeprefix('0x')))
+
+    def to_dict(self) -> dict:
+        """Everything predict() needs, for caching across runs."""
+        return {
+            'address': self.address,
+            'implementation': self.implementation,
+            'entry_point': self.entry_point,
+            'novis_token': self.novis_token,
+            'proxy_creation_code': '0x' + self.proxy_creation_code.hex()
+        }
+
+    @classmethod
+    def from_dict(cls, w3, data: dict) -> 'AccountFactory':
+        factory = cls(w3, data['address'], bytes.fromhex(data['proxy_creation_code'][2:]))
+        factory.implementation = data['implementation']
+        factory.entry_point = data['entry_point']
+        factory.novis_token = data['novis_token']
+        return factory
+
+    # ---- prediction ----
+
+    def init_code(self, owner: str, daily_limit_wei: int) -> bytes:
+        """Proxy creation code + abi.encode(implementation, initData)."""
+        init_data = (INITIALIZE_SELECTOR + _address_word(owner) + _address_word(self.entry_point)
+                     + _address_word(self.novis_token) + _word(daily_limit_wei))
+        return (self.proxy_creation_code + _address_word(self.implementation) + _word(64)
+                + _word(len(init_data)) + init_data + bytes(-len(init_data) % 32))
+
+    def predict(self, owner: str, daily_limit_wei: int, salt: bytes) -> str:
+        """Address createAccount(owner, dailyLimit, salt) will deploy to (no RPC)."""
+        full_salt = Web3.keccak(bytes.fromhex(owner[2:]) + bytes(salt))
+        init_hash = Web3.keccak(self.init_code(owner, daily_limit_wei))
+        return to_address(
+            Web3.keccak(b'\xff' + self._factory_bytes + full_salt + init_hash)[12:])
+
+    def predict_many(self, owner: str, daily_limit_wei: int, namespace: str = 'default',
+                     start: int = 0, count: int = 1) -> list:
+        """Predicted addresses for salts account_salt(namespace, start .. start+count-1)."""
+        return [self.predict(owner, daily_limit_wei, account_salt(namespace, i))
+                for i in range(start, start + count)]
+
+    def verify(self, tx_hash) -> bool:
+        """
+        Check prediction against a mined createAccount transaction.
+
+        Useful once after ``load()`` to confirm the extracted creation code.
+        """
+        tx = self.w3.eth.get_transaction(tx_hash)
+        data = bytes(tx['input'])
+        if data[:4] != CREATE_ACCOUNT_SELECTOR:
+            raise PredictionError('not a direct createAccount call')
+        owner = to_address(data[16:36])
+        daily_limit = int.from_bytes(data[36:68], 'big')
+        salt = data[68:100]
+        receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        for log in receipt['logs']:
+            if bytes(log['topics'][0]) == ACCOUNT_CREATED_TOPIC:
+                deployed = to_address(bytes(log['topics'][1])[12:])
+                return deployed == self.predict(owner, daily_limit, salt)
+        raise PredictionError('no AccountCreated event in receipt')
+
+    # ---- provisioning ----
+
+    def provision(self, w3, account, chain_id: int, n: int, daily_limit_wei: int,
+                  namespace: str = 'default', start: int = 0, owner: str = None,
+                  skip_existing: bool = True, gas: int = 500000, tracer=None) -> list:
+        """
+        Create ``n`` accounts with salts ``account_salt(namespace, start+i)``.
+
+        Transactions are signed with consecutive nonces and all sent before
+        any receipt is awaited. Addresses come from ``predict()``; nothing
+        is read back from the factory.
+
+        Args:
+            w3: Web3 instance to send through
+            account: eth_account LocalAccount paying for the transactions
+            chain_id: Chain ID for signing
+            n: Number of accounts
+            daily_limit_wei: Daily limit for every account
+            namespace: Salt namespace
+            start: First salt index
+            owner: Account owner (default: the sender)
+            skip_existing: Skip predicted addresses that already have code
+                (makes re-running an interrupted provision safe)
+            gas: Gas limit per createAccount
+
+        Returns:
+            Predicted addresses, in salt order (including skipped ones)
+        """
+        tracer = tracer or NOOP_TRACER
+        owner = to_address(owner or account.address)
+        salts = [account_salt(namespace, i) for i in range(start, start + n)]
+        addresses = [self.predict(owner, daily_limit_wei, s) for s in salts]
+        with tracer.span('provision_accounts', n=n, namespace=namespace) as span:
+            todo = list(range(n))
+            if skip_existing:
+                with tracer.span('skip_existing'):
+                    todo = [i for i in todo if len(w3.eth.get_code(addresses[i])) == 0]
+            span.set_attribute('created', len(todo))
+            if not todo:
+                return addresses
+            with self._lock:
+                nonce = w3.eth.get_transaction_count(account.address, 'pending')
+                gas_price = w3.eth.gas_price
+                tx_hashes = []
+                with tracer.span('send'):
+                    for offset, i in enumerate(todo):
+                        tx = self.contract.functions.createAccount(
+                            owner, daily_limit_wei, salts[i]
+                        ).build_transaction({
+                            'from': account.address,
+                            'nonce': nonce + offset,
+                            'gas': gas,
+                            'gasPrice': gas_price,
+                            'chainId': chain_id
+                        })
+                        signed = account.sign_transaction(tx)
+                        tx_hashes.append(w3.eth.send_raw_transaction(signed.raw_transaction))
+            with tracer.span('wait'):
+                for i, tx_hash in zip(todo, tx_hashes):
+                    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+                    if receipt.status != 1:
+                        raise PredictionError(
+                            f'createAccount for {addresses[i]} reverted: {tx_hash.hex()}')
+        return addresses
+
+
+__all__ = [
+    'AccountFactory', 'PredictionError', 'account_salt', 'extract_proxy_creation_code',
+    'FACTORY_ABI'
+]
@@ -0,0 +1,162 @@
+"""
+NOVIS Addresses
+
+Interned checksum addresses. ``Web3.to_checksum_address`` hashes its
+input on every call, and the SDK sees the same few addresses (contracts,
+its own wallet, repeat payees) over and over. Here each distinct address
+is normalised and checksummed once; later lookups, in any spelling, hit
+a bounded LRU table and return the same ``Address`` object.
+
+``Address`` is a ``str`` subclass, so it can be passed anywhere web3
+expects a checksummed address.
+
+Example:
+    from novis.addresses import to_address, validate_addresses
+
+    to_address('0xd3cda913deb6f67967b99d67acdfa1712c293601')
+    # '0xd3CdA913deB6f67967B99D67aCDFa1712C293601'
+
+    valid, invalid = validate_addresses(recipients)
+    for index, value in invalid:
+        ...
+"""
+
+import functools
+
+from eth_utils import keccak
+
+CACHE_SIZE = 65536
+_HEX = frozenset('0123456789abcdef')
+
+
+class Address(str):
+    """Checksummed address; ``Address(value)`` goes through the intern table."""
+
+    __slots__ = ()
+
+    def __new__(cls, value):
+        return to_address(value)
+
+    @property
+    def word(self) -> bytes:
+        """ABI encoding: the 20 bytes left-padded to 32."""
+        return address_word(self)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _intern(lower: str) -> Address:
+    """One Address per distinct address (40 lowercase hex characters)."""
+    digest = keccak(lower.encode('ascii')).hex()
+    return str.__new__(Address, '0x' + ''.join(
+        c.upper() if d >= '8' else c for c, d in zip(lower, digest)))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _lookup(value) -> Address:
+    """Address for ``value`` exactly as given (str spelling or 20 bytes)."""
+    if isinstance(value, bytes):
+        if len(value) != 20:
+            raise ValueError(f'address must be 20 bytes, got {len(value)}')
+        return _intern(value.hex())
+    if not isinstance(value, str):
+        raise TypeError(f'address must be str or bytes, not {type(value).__name__}')
+    lower = value.lower()
+    if lower.startswith('0x'):
+        lower = lower[2:]
+    if len(lower) != 40 or not _HEX.issuperset(lower):
+        raise ValueError(f'invalid address: {value!r}')
+    return _intern(lower)
+
+
+def to_address(value) -> Address:
+    """
+    Checksummed address for a hex string (any case, with or without 0x)
+    or 20 bytes. Raises ValueError if it is not an address.
+    """
+    if isinstance(value, bytearray):
+        value = bytes(value)
+    return _lookup(value)
+
+
+def _bad_checksum(value, address: str) -> bool:
+    # Mixed-case input claims to be checksummed; it must be the right checksum
+    if not isinstance(value, str):
+        return False
+    body = value[2:] if value[:2] in ('0x', '0X') else value
+    return body != body.lower() and body != body.upper() and body != address[2:]
+
+
+def is_valid(value, strict: bool = False) -> bool:
+    """
+    Same answer as ``Web3.is_address``, through the intern table.
+    ``strict`` also rejects mixed-case strings with a wrong checksum.
+    """
+    try:
+        address = to_address(value)
+    except (TypeError, ValueError):
+        return False
+    return not (strict and _bad_checksum(value, address))
+
+
+def validate_addresses(values, strict: bool = True) -> tuple:
+    """
+    Validate and checksum a list of addresses in one pass.
+
+    Args:
+        values: Hex strings or 20-byte values
+        strict: Reject mixed-case strings whose checksum is wrong (likely
+            typos), as web3 does when such a string is passed to a contract
+
+    Returns:
+        (addresses, invalid): one checksummed Address per value (None where
+        invalid), and (index, value) for each invalid one
+    """
+    addresses, invalid = [], []
+    lookup = _lookup
+    for i, value in enumerate(values):
+        try:
+            address = lookup(value)
+        except (TypeError, ValueError):
+            try:
+                address = to_address(value)
+            except (TypeError, ValueError):
+                address = None
+        if address is None or (strict and value is not address
+                               and _bad_checksum(value, address)):
+            invalid.append((i, value))
+            address = None
+        addresses.append(address)
+    return addresses, invalid
+
+
+def to_addresses(values, strict: bool = True) -> list:
+    """Checksummed addresses for ``values``; ValueError naming the first bad entry."""
+    addresses, invalid = validate_addresses(values, strict)
+    if invalid:
+        index, value = invalid[0]
+        raise ValueError(f'invalid address at index {index}: {value!r} '
+                         f'({len(invalid)} invalid in total)')
+    return addresses
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def address_word(value) -> bytes:
+    """32-byte ABI word for an address (any spelling accepted by to_address)."""
+    return bytes(12) + bytes.fromhex(to_address(value)[2:])
+
+
+def cache_info() -> dict:
+    """Hit/miss counters of the intern table and the spelling lookup."""
+    return {'interned': _intern.cache_info()._asdict(), 'lookups': _lookup.cache_info()._asdict()}
+
+
+def clear_cache():
+    _intern.cache_clear()
+    _lookup.cache_clear()
+    address_word.cache_clear()
+
+
+__all__ = [
+    'Address', 'to_address', 'to_addresses', 'is_valid', 'validate_addresses', 'address_word',
+    'cache_info', 'clear_cache', 'CACHE_SIZE'
+]
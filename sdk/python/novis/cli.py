@@ -0,0 +1,183 @@
+"""
+NOVIS command line.
+
+Usage:
+    novis payout payroll.csv                        # resumes from payroll.csv.ckpt
+    novis payout payouts.jsonl --chunk-size 200 --in-flight 8
+    novis payout payroll.csv --dry-run
+    novis relayer --port 8080
+    novis balances holders.txt --block 24000000 --store novis-transfers --verify 100
+    novis reconcile tasks.csv --payer 0x... --index memos.db
+
+The paying key is read from NOVIS_PRIVATE_KEY; relayer hot wallet keys
+from NOVIS_RELAYER_KEYS (comma-separated).
+"""
+
+import argparse
+import os
+import sys
+
+from . import NETWORK, NOVISClient
+from .payout import Payout, PayoutError, read_rows, validate_file
+
+
+def payout(args) -> int:
+    if args.dry_run:
+        summary = validate_file(args.file, args.format)
+        for line, message in summary['errors']:
+            print(f'{args.file}:{line}: {message}', file=sys.stderr)
+        print(f"{summary['rows']} valid rows, {summary['total_wei'] / 10**18} NOVIS, "
+              f"{len(summary['errors'])} invalid")
+        return 1 if summary['errors'] else 0
+
+    private_key = os.environ.get('NOVIS_PRIVATE_KEY')
+    if not private_key:
+        print('NOVIS_PRIVATE_KEY is not set', file=sys.stderr)
+        return 2
+    client = NOVISClient(private_key, rpc_url=args.rpc_url)
+
+    def progress(chunk):
+        print(f"chunk {chunk['tx_hash']} block {chunk['block_number']}: "
+              f"{chunk['paid_rows']} paid")
+
+    try:
+        result = Payout(client, args.file, checkpoint=args.checkpoint or args.file + '.ckpt',
+                        chunk_size=args.chunk_size, in_flight=args.in_flight,
+                        skip_invalid=args.skip_invalid, fmt=args.format,
+                        on_chunk=progress, preflight=args.preflight).run()
+    except PayoutError as e:
+        print(f'payout stopped: {e}', file=sys.stderr)
+        return 1
+    print(f"paid {result['paid_rows']} rows, {result['paid_wei'] / 10**18} NOVIS "
+          f"in {result['chunks']} chunks ({result['elapsed']:.1f}s)")
+    for line, message in result['skipped']:
+        print(f'skipped {args.file}:{line}: {message}', file=sys.stderr)
+    for to, amount, memo, reason in result['quarantined']:
+        print(f'quarantined {to} {int(amount) / 10**18} NOVIS {memo!r}: {reason}', file=sys.stderr)
+    return 0
+
+
+def relayer(args) -> int:
+    from web3 import Web3
+
+    from .relayer import RelayerService
+
+    keys = [k.strip() for k in os.environ.get('NOVIS_RELAYER_KEYS', '').split(',') if k.strip()]
+    if not keys:
+        print('NOVIS_RELAYER_KEYS is not set', file=sys.stderr)
+        return 2
+    w3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    service = RelayerService(w3, keys, host=args.host, port=args.port,
+                             batch_size=args.batch_size, batch_wait=args.batch_wait)
+    print(f'relaying on {service.url} with {len(keys)} wallets')
+    service.serve_forever()
+    return 0
+
+
+def balances(args) -> int:
+    from web3 import Web3
+
+    from . import ADDRESSES
+    from .ledger import TransferStore
+
+    with open(args.file) as f:
+        addresses = [line.strip() for line in f if line.strip()]
+    w3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    store = TransferStore(args.store, w3, ADDRESSES['NOVIS_TOKEN'], start_block=args.start_block,
+                          multicall=ADDRESSES['MULTICALL3'])
+    added = store.sync()
+    print(f'synced {added} transfers to block {store.synced_block}', file=sys.stderr)
+    block = store.synced_block if args.block is None else args.block
+    print('address,balance')
+    for address, balance in zip(addresses, store.balances_at(addresses, block)):
+        print(f"{address},{Web3.from_wei(balance, 'ether')}")
+    if args.verify:
+        check = store.verify(block, sample=args.verify)
+        for address, stored, on_chain in check['mismatches']:
+            print(f'mismatch {address}: store {stored}, balanceOf {on_chain}', file=sys.stderr)
+        print(f"verified {check['checked']} balances at block {block}, "
+              f"{len(check['mismatches'])} mismatches", file=sys.stderr)
+        return 1 if check['mismatches'] else 0
+    return 0
+
+
+def reconcile(args) -> int:
+    from web3 import Web3
+
+    from . import ADDRESSES
+    from .memos import MemoIndex
+
+    w3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    index = MemoIndex(w3, ADDRESSES['PAYMENT_ROUTER'], path=args.index,
+                      start_block=args.start_block, payer=args.payer)
+    added = index.sync()
+    print(f'indexed {added} memo payments to block {index.synced_block}', file=sys.stderr)
+    result = index.reconcile((row for _, row in read_rows(args.file, args.format)),
+                             payer=args.payer)
+    print('status,memo,tx_hash')
+    for memo in result['missing']:
+        print(f'missing,{memo},')
+    for memo, payments in result['duplicate'].items():
+        for payment in payments:
+            print(f'duplicate,{memo},{payment.tx_hash}')
+    for status in ('amount_mismatch', 'payee_mismatch'):
+        for memo, payment in result[status].items():
+            print(f'{status},{memo},{payment.tx_hash}')
+    print(', '.join(f'{len(result[k])} {k}' for k in result), file=sys.stderr)
+    return 0 if len(result['paid']) == sum(len(v) for v in result.values()) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='novis')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('payout', help='Pay every row of a CSV/JSONL file via batchPay')
+    p.add_argument('file', help='CSV (to,amount,memo header) or JSONL input')
+    p.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the extension')
+    p.add_argument('--checkpoint', help='Checkpoint file (default: <file>.ckpt)')
+    p.add_argument('--chunk-size', type=int, default=100, help='Payments per batchPay')
+    p.add_argument('--in-flight', type=int, default=4, help='Unconfirmed chunks at once')
+    p.add_argument('--skip-invalid', action='store_true',
+                   help='Record invalid rows and keep going instead of stopping')
+    p.add_argument('--preflight', action='store_true',
+                   help='Simulate each chunk; quarantine payments that would revert it')
+    p.add_argument('--dry-run', action='store_true', help='Validate only; send nothing')
+    p.add_argument('--rpc-url', default=NETWORK['rpc_url'])
+    p.set_defaults(handler=payout)
+
+    p = commands.add_parser('relayer', help='Run a self-hosted metaTransfer relayer')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--batch-size', type=int, default=64, help='Relays verified together')
+    p.add_argument('--batch-wait', type=float, default=0.005,
+                   help='Seconds to wait for a batch to fill')
+    p.add_argument('--rpc-url', default=NETWORK['rpc_url'])
+    p.set_defaults(handler=relayer)
+
+    p = commands.add_parser('balances', help='NOVIS balances at a block from a local transfer store')
+    p.add_argument('file', help='Addresses, one per line')
+    p.add_argument('--block', type=int, help='Default: the last synced block')
+    p.add_argument('--store', default='novis-transfers', help='Transfer store directory')
+    p.add_argument('--start-block', type=int, default=0,
+                   help="First block to index (the token's deployment block)")
+    p.add_argument('--verify', type=int, default=0, metavar='N',
+                   help='Check N sampled balances against balanceOf (archive node)')
+    p.add_argument('--rpc-url', default=NETWORK['rpc_url'])
+    p.set_defaults(handler=balances)
+
+    p = commands.add_parser('reconcile', help='Match a task/payout file against memo payments')
+    p.add_argument('file', help='CSV (memo[,to,amount] header) or JSONL of expected payments')
+    p.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the extension')
+    p.add_argument('--payer', help='Only count payments from this address')
+    p.add_argument('--index', default='novis-memos.db', help='Memo index SQLite file')
+    p.add_argument('--start-block', type=int, default=0,
+                   help="First block to index (the router's deployment block)")
+    p.add_argument('--rpc-url', default=NETWORK['rpc_url'])
+    p.set_defaults(handler=reconcile)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+NOVIS Calldata Encoders
+
+Fast-path calldata for the hot write methods, built straight from
+precomputed selectors instead of going through
+``contract.functions.X(...).build_transaction`` (which re-resolves the
+ABI, validates and checksums every argument on each call).
+
+Validation is deliberately minimal: addresses must be 40 hex characters
+(any case) or 20 bytes, integers must fit in a uint256. Single addresses
+go through the ``novis.addresses`` intern table, so a repeat payee costs
+a dict lookup.
+Output is byte-for-byte what web3 would encode.
+
+``build_tx`` assembles the same transaction dict ``build_transaction``
+returns from values the caller already has, with no RPC or middleware
+in between.
+
+Example:
+    from novis import encoders
+
+    data = encoders.batch_pay(recipients, amounts, memos)
+    tx = encoders.build_tx(client.address, router, data, nonce=7, gas=900000,
+                           gas_price=gas_price, chain_id=8453)
+    signed = client.account.sign_transaction(tx)
+"""
+
+from web3 import Web3
+
+from .addresses import address_word
+
+MAX_UINT256 = 2**256 - 1
+
+
+def _selector(signature: str) -> bytes:
+    return Web3.keccak(text=signature)[:4]
+
+
+TRANSFER = _selector('transfer(address,uint256)')
+BALANCE_OF = _selector('balanceOf(address)')
+APPROVE = _selector('approve(address,uint256)')
+PAY_WITH_MEMO = _selector('payWithMemo(address,uint256,string)')
+BATCH_PAY = _selector('batchPay(address[],uint256[],string[])')
+META_TRANSFER = _selector('metaTransfer(address,address,uint256,uint256,bytes)')
+META_TRANSFER_V2 = _selector('metaTransferV2(address,address,uint256,uint256,uint256,bytes)')
+CREATE_ESCROW = _selector('createEscrow(address,uint256,uint256)')
+RELEASE_ESCROW = _selector('releaseEscrow(uint256)')
+REFUND_ESCROW = _selector('refundEscrow(uint256)')
+DEPOSIT = _selector('deposit(uint256)')
+REDEEM = _selector('redeem(uint256)')
+
+_ZERO_PAD = '0' * 24
+
+
+# ---- words ----
+
+def _address(address) -> bytes:
+    # Interned: each distinct address is parsed once (novis.addresses)
+    if isinstance(address, bytearray):
+        address = bytes(address)
+    return address_word(address)
+
+
+def _uint(value: int) -> bytes:
+    try:
+        return value.to_bytes(32, 'big')
+    except OverflowError:
+        raise ValueError(f'not a uint256: {value!r}') from None
+
+
+def _dynamic(data: bytes) -> bytes:
+    """Length word + data right-padded to a whole word."""
+    return len(data).to_bytes(32, 'big') + data + bytes(-len(data) % 32)
+
+
+def _address_array(addresses: list) -> bytes:
+    # One fromhex over the whole array instead of one per element
+    try:
+        words = bytes.fromhex(''.join([_ZERO_PAD + a[2:] for a in addresses
+                                       if len(a) == 42 and a[:2] in ('0x', '0X')]))
+        if len(words) != 32 * len(addresses):
+            raise ValueError
+        return len(addresses).to_bytes(32, 'big') + words
+    except (TypeError, ValueError):
+        # Slow path: bytes addresses, or find the bad entry for the message
+        return len(addresses).to_bytes(32, 'big') + b''.join([_address(a) for a in addresses])
+
+
+def _uint_array(values: list) -> bytes:
+    try:
+        return len(values).to_bytes(32, 'big') + b''.join([v.to_bytes(32, 'big') for v in values])
+    except OverflowError:
+        bad = next(v for v in values if not 0 <= v <= MAX_UINT256)
+        raise ValueError(f'not a uint256: {bad!r}') from None
+
+
+def _string_array(strings: list) -> bytes:
+    heads, tails = [], []
+    offset = 32 * len(strings)
+    for s in strings:
+        tail = _dynamic(s.encode('utf-8'))
+        heads.append(offset.to_bytes(32, 'big'))
+        tails.append(tail)
+        offset += len(tail)
+    return len(strings).to_bytes(32, 'big') + b''.join(heads) + b''.join(tails)
+
+
+# ---- calldata ----
+
+def transfer(to, amount: int) -> bytes:
+    """NOVIS ``transfer(address,uint256)``."""
+    return TRANSFER + _address(to) + _uint(amount)
+
+
+def balance_of(account) -> bytes:
+    """ERC-20 ``balanceOf(address)`` (for ``eth_call``)."""
+    return BALANCE_OF + _address(account)
+
+
+def approve(spender, amount: int) -> bytes:
+    """ERC-20 ``approve(address,uint256)``."""
+    return APPROVE + _address(spender) + _uint(amount)
+
+
+def pay_with_memo(to, amount: int, memo: str) -> bytes:
+    """PaymentRouter ``payWithMemo(address,uint256,string)``."""
+    return (PAY_WITH_MEMO + _address(to) + _uint(amount) + _uint(96)
+            + _dynamic(memo.encode('utf-8')))
+
+
+def batch_pay(recipients: list, amounts: list, memos: list) -> bytes:
+    """PaymentRouter ``batchPay(address[],uint256[],string[])``."""
+    if not len(recipients) == len(amounts) == len(memos):
+        raise ValueError('recipients, amounts and memos must have the same length')
+    recipients = _address_array(recipients)
+    amounts = _uint_array(amounts)
+    memos = _string_array(memos)
+    return (BATCH_PAY + _uint(96) + _uint(96 + len(recipients))
+            + _uint(96 + len(recipients) + len(amounts)) + recipients + amounts + memos)
+
+
+def _signature(signature) -> bytes:
+    if isinstance(signature, str):
+        return bytes.fromhex(signature[2:] if signature.startswith('0x') else signature)
+    return bytes(signature)
+
+
+def meta_transfer(from_address, to, amount: int, deadline: int, signature: bytes) -> bytes:
+    """NOVIS ``metaTransfer(address,address,uint256,uint256,bytes)`` (nonce kept on-chain)."""
+    return (META_TRANSFER + _address(from_address) + _address(to) + _uint(amount)
+            + _uint(deadline) + _uint(160) + _dynamic(_signature(signature)))
+
+
+def meta_transfer_v2(from_address, to, amount: int, nonce: int, deadline: int,
+                     signature: bytes) -> bytes:
+    """NOVIS ``metaTransferV2(address,address,uint256,uint256,uint256,bytes)``."""
+    return (META_TRANSFER_V2 + _address(from_address) + _address(to) + _uint(amount)
+            + _uint(nonce) + _uint(deadline) + _uint(192) + _dynamic(_signature(signature)))
+
+
+def create_escrow(to, amount: int, timeout: int) -> bytes:
+    """PaymentRouter ``createEscrow(address,uint256,uint256)``."""
+    return CREATE_ESCROW + _address(to) + _uint(amount) + _uint(timeout)
+
+
+def release_escrow(escrow_id: int) -> bytes:
+    """PaymentRouter ``releaseEscrow(uint256)``."""
+    return RELEASE_ESCROW + _uint(escrow_id)
+
+
+def refund_escrow(escrow_id: int) -> bytes:
+    """PaymentRouter ``refundEscrow(uint256)``."""
+    return REFUND_ESCROW + _uint(escrow_id)
+
+
+def deposit(usdc_amount: int) -> bytes:
+    """Vault ``deposit(uint256)`` (USDC units, 6 decimals)."""
+    return DEPOSIT + _uint(usdc_amount)
+
+
+def redeem(novis_amount: int) -> bytes:
+    """Vault ``redeem(uint256)`` (NOVIS wei)."""
+    return REDEEM + _uint(novis_amount)
+
+
+# ---- transactions ----
+
+def build_tx(sender: str, to: str, data: bytes, nonce: int, gas: int, gas_price: int,
+             chain_id: int, value: int = 0) -> dict:
+    """
+    Legacy transaction dict, same shape as ``build_transaction`` returns.
+
+    No RPC round-trips: nonce, gas and gas price must be supplied.
+    """
+    return {
+        'value': value,
+        'from': sender,
+        'nonce': nonce,
+        'gas': gas,
+        'gasPrice': gas_price,
+        'chainId': chain_id,
+        'to': to,
+        'data': '0x' + data.hex()
+    }
+
+
+__all__ = [
+    'transfer', 'balance_of', 'approve', 'pay_with_memo', 'batch_pay', 'meta_transfer',
+    'meta_transfer_v2', 'create_escrow', 'release_escrow', 'refund_escrow', 'deposit', 'redeem',
+    'build_tx', 'TRANSFER', 'BALANCE_OF', 'APPROVE', 'PAY_WITH_MEMO', 'BATCH_PAY', 'META_TRANSFER',
+    'META_TRANSFER_V2', 'CREATE_ESCROW', 'RELEASE_ESCROW', 'REFUND_ESCROW', 'DEPOSIT', 'REDEEM'
+]
@@ -0,0 +1,235 @@
+"""
+NOVIS Fleet Inspector
+
+Read the state of many NOVISSmartAccountV4 accounts through Multicall3.
+
+Every snapshot is pinned to one block: the block is resolved once and
+every chunk's ``aggregate3`` eth_call names it by hash (EIP-1898,
+``requireCanonical``), so all columns are mutually consistent. A reorg
+between chunks makes the later calls fail instead of mixing two blocks.
+Chunks run in parallel.
+
+Example:
+    from novis.fleet import FleetInspector
+
+    inspector = FleetInspector(client.w3)
+    snap = inspector.snapshot(accounts)
+    snap.novis[snap.index[account]]
+
+    for snap, changes in inspector.watch(accounts, interval=10):
+        for account, field, old, new in changes:
+            ...
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_abi import decode as abi_decode, encode as abi_encode
+from web3 import Web3
+
+from . import ADDRESSES
+from .addresses import to_address, to_addresses
+
+AGGREGATE3_SELECTOR = Web3.keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+
+
+def _selector(signature: str) -> bytes:
+    return Web3.keccak(text=signature)[:4]
+
+
+OWNER = _selector('owner()')
+DAILY_SPENDING = _selector('getDailySpending()')
+PER_TX_LIMIT = _selector('perTxLimit()')
+IS_PAUSED = _selector('isPaused()')
+BALANCE_OF = _selector('balanceOf(address)')
+SESSION_KEYS = _selector('sessionKeys(address)')
+
+# Columns in FleetSnapshot, in call order per account
+FIELDS = ('owner', 'spent', 'daily_limit', 'remaining', 'per_tx_limit', 'paused',
+          'novis', 'usdc')
+_CALLS_PER_ACCOUNT = 6
+
+
+def _uint(data: bytes, word: int = 0) -> int:
+    return int.from_bytes(data[word * 32:(word + 1) * 32], 'big')
+
+
+class FleetSnapshot:
+    """
+    Columnar fleet state at one block.
+
+    Each field in FIELDS is a list aligned with ``accounts``; entries are
+    None where the call failed (e.g. the address is not a smart account).
+    ``session_keys`` maps account -> {key: (expiresAt, spendingLimit,
+    spent, isActive)} for the keys that were asked for.
+    """
+
+    __slots__ = ('block', 'block_hash', 'accounts', 'index', 'session_keys') + FIELDS
+
+    def __init__(self, block: int, accounts: list, block_hash: bytes = None):
+        self.block = block
+        self.block_hash = block_hash
+        self.accounts = accounts
+        self.index = {a: i for i, a in enumerate(accounts)}
+        self.session_keys = {}
+        for field in FIELDS:
+            setattr(self, field, [None] * len(accounts))
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def row(self, account: str) -> dict:
+        i = self.index[account]
+        row = {'account': account}
+        for field in FIELDS:
+            row[field] = getattr(self, field)[i]
+        if account in self.session_keys:
+            row['session_keys'] = self.session_keys[account]
+        return row
+
+    def rows(self):
+        for account in self.accounts:
+            yield self.row(account)
+
+    def column(self, field: str) -> list:
+        return getattr(self, field)
+
+    def total(self, field: str) -> int:
+        return sum(v for v in getattr(self, field) if v is not None)
+
+
+def diff(old: FleetSnapshot, new: FleetSnapshot):
+    """Yield (account, field, old_value, new_value) for every changed cell."""
+    for field in FIELDS:
+        old_col, new_col = getattr(old, field), getattr(new, field)
+        for i, account in enumerate(new.accounts):
+            j = old.index.get(account)
+            before = old_col[j] if j is not None else None
+            if new_col[i] != before:
+                yield account, field, before, new_col[i]
+    for account, keys in new.session_keys.items():
+        before = old.session_keys.get(account, {})
+        for key, value in keys.items():
+            if before.get(key) != value:
+                yield account, 'session_key:' + key, before.get(key), value
+
+
+class FleetInspector:
+    """
+    Multicall3 reader for NOVISSmartAccountV4 fleets.
+
+    Args:
+        w3: Web3 instance
+        addresses: Address map (default: novis.ADDRESSES); uses
+            NOVIS_TOKEN, USDC and MULTICALL3
+        chunk_size: Accounts per aggregate3 call
+        max_workers: Parallel eth_calls per snapshot
+    """
+
+    def __init__(self, w3, addresses: dict = None, chunk_size: int = 200, max_workers: int = 8):
+        addresses = {**ADDRESSES, **(addresses or {})}
+        self.w3 = w3
+        self.token = to_address(addresses['NOVIS_TOKEN'])
+        self.usdc = to_address(addresses['USDC'])
+        self.multicall = to_address(addresses['MULTICALL3'])
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+    def _calls(self, account: str, keys: list) -> list:
+        padded = bytes(12) + bytes.fromhex(account[2:])
+        calls = [
+            (account, True, OWNER),
+            (account, True, DAILY_SPENDING),
+            (account, True, PER_TX_LIMIT),
+            (account, True, IS_PAUSED),
+            (self.token, True, BALANCE_OF + padded),
+            (self.usdc, True, BALANCE_OF + padded),
+        ]
+        for key in keys:
+            calls.append((account, True, SESSION_KEYS + bytes(12) + bytes.fromhex(key[2:])))
+        return calls
+
+    def _aggregate(self, calls: list, block_id) -> list:
+        data = AGGREGATE3_SELECTOR + abi_encode(['(address,bool,bytes)[]'], [calls])
+        raw = self.w3.eth.call({'to': self.multicall, 'data': data}, block_id)
+        return abi_decode(['(bool,bytes)[]'], raw)[0]
+
+    def snapshot(self, accounts: list, block='latest', session_keys: dict = None) -> FleetSnapshot:
+        """
+        Read every account at one block.
+
+        Args:
+            accounts: Smart account addresses
+            block: Block number or tag (resolved to one block hash once)
+            session_keys: Optional {account: [session key addresses]} to read
+        """
+        header = self.w3.eth.get_block(block)
+        block = header['number']
+        block_hash = bytes(header['hash'])
+        # EIP-1898: every chunk reads this exact block or fails
+        block_id = {'blockHash': '0x' + block_hash.hex(), 'requireCanonical': True}
+        accounts = to_addresses(accounts, strict=False)
+        session_keys = {to_address(a): list(keys)
+                        for a, keys in (session_keys or {}).items()}
+        snap = FleetSnapshot(block, accounts, block_hash)
+        chunks = [accounts[i:i + self.chunk_size]
+                  for i in range(0, len(accounts), self.chunk_size)]
+
+        def run(chunk):
+            calls, layout = [], []
+            for account in chunk:
+                keys = session_keys.get(account, [])
+                calls.extend(self._calls(account, keys))
+                layout.append((account, keys))
+            return layout, self._aggregate(calls, block_id)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(chunks)))) as pool:
+            for layout, results in pool.map(run, chunks):
+                pos = 0
+                for account, keys in layout:
+                    self._fill(snap, snap.index[account], account, keys,
+                               results[pos:pos + _CALLS_PER_ACCOUNT + len(keys)])
+                    pos += _CALLS_PER_ACCOUNT + len(keys)
+        return snap
+
+    def _fill(self, snap, i, account, keys, results):
+        (ok_owner, owner), (ok_spend, spend), (ok_tx, per_tx), (ok_paused, paused), \
+            (ok_novis, novis), (ok_usdc, usdc) = results[:_CALLS_PER_ACCOUNT]
+        if ok_owner and len(owner) == 32:
+            snap.owner[i] = to_address(owner[12:])
+        if ok_spend and len(spend) == 96:
+            snap.spent[i], snap.daily_limit[i], snap.remaining[i] = (
+                _uint(spend, 0), _uint(spend, 1), _uint(spend, 2))
+        if ok_tx and len(per_tx) == 32:
+            snap.per_tx_limit[i] = _uint(per_tx)
+        if ok_paused and len(paused) == 32:
+            snap.paused[i] = bool(_uint(paused))
+        if ok_novis and len(novis) == 32:
+            snap.novis[i] = _uint(novis)
+        if ok_usdc and len(usdc) == 32:
+            snap.usdc[i] = _uint(usdc)
+        if keys:
+            snap.session_keys[account] = {
+                key: (_uint(data, 0), _uint(data, 1), _uint(data, 2), bool(_uint(data, 3)))
+                for key, (ok, data) in zip(keys, results[_CALLS_PER_ACCOUNT:])
+                if ok and len(data) == 128
+            }
+
+    def watch(self, accounts: list, interval: float = 12, session_keys: dict = None):
+        """
+        Poll forever, yielding (snapshot, changes) whenever the head moves.
+
+        The first yield has every populated cell as a change from None.
+        """
+        previous = FleetSnapshot(-1, [])
+        while True:
+            block = self.w3.eth.block_number
+            if block != previous.block:
+                snap = self.snapshot(accounts, block, session_keys)
+                changes = list(diff(previous, snap))
+                previous = snap
+                yield snap, changes
+            time.sleep(interval)
+
+
+__all__ = ['FleetInspector', 'FleetSnapshot', 'diff', 'FIELDS']
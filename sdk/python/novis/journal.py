@@ -0,0 +1,338 @@
+"""
+NOVIS Submission Journal
+
+Write-ahead journal for signed transactions, so a crash between
+``send_raw_transaction`` and the receipt never leaves us guessing what
+went out.
+
+Every transaction is recorded (raw bytes, sender, nonce, idempotency key)
+and committed *before* it is broadcast, and marked included or failed
+once its receipt arrives. On restart ``recover()`` settles whatever is
+still pending: mined entries are marked, unmined ones are re-broadcast
+with the same signed bytes (same nonce, so at most one copy lands), and
+entries whose nonce was taken by another transaction are marked dropped.
+
+Writes are group-committed: concurrent callers' records are batched into
+one SQLite transaction (one fsync) by a single writer thread, so the
+journal does not cap pipelined throughput.
+
+Example:
+    from novis import NOVISClient
+    from novis.journal import SubmissionJournal
+
+    journal = SubmissionJournal('submissions.db')
+    client = NOVISClient(private_key='0x...', journal=journal)
+    journal.recover(client.w3)
+    client.transfer('0x...', 10, idempotency_key='invoice-881')
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound, Web3RPCError
+
+from .addresses import to_address
+
+PENDING = 'pending'
+INCLUDED = 'included'
+FAILED = 'failed'
+DROPPED = 'dropped'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    key TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    nonce INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    status TEXT NOT NULL,
+    block_number INTEGER,
+    gas_used INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_by_status ON submissions (status, sender, nonce);
+CREATE TABLE IF NOT EXISTS replacements (
+    key TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    cancel INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replacements_by_key ON replacements (key);
+"""
+
+_FIELDS = ('key', 'sender', 'nonce', 'tx_hash', 'raw', 'status', 'block_number', 'gas_used',
+           'created', 'updated')
+
+
+def rebroadcast(w3, raw) -> bool:
+    """
+    Send signed bytes that may already be in the mempool or mined.
+
+    Returns False instead of raising when the node reports the
+    transaction as known or its nonce as used.
+    """
+    try:
+        w3.eth.send_raw_transaction(raw)
+        return True
+    except Exception as e:
+        message = str(e).lower()
+        if 'known' in message or 'nonce too low' in message:
+            return False
+        raise
+
+
+class JournalEntry:
+    """One journaled submission."""
+
+    __slots__ = _FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(_FIELDS, values):
+            setattr(self, field, value)
+
+    def result(self) -> dict:
+        """Same shape as NOVISClient._send_tx returns."""
+        return {
+            'tx_hash': self.tx_hash,
+            'block_number': self.block_number,
+            'gas_used': self.gas_used,
+            'status': 1 if self.status == INCLUDED else 0
+        }
+
+
+class SubmissionJournal:
+    """
+    SQLite write-ahead journal with group commit.
+
+    Args:
+        path: SQLite file (WAL mode, synchronous=FULL)
+        max_batch: Most writes folded into one commit
+    """
+
+    def __init__(self, path: str, max_batch: int = 512):
+        self.path = path
+        self.max_batch = max_batch
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.commits = 0
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    # ---- group commit ----
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            errors = [None] * len(batch)
+            with self._read_lock:
+                try:
+                    with self._db:
+                        for i, (sql, params, _, _) in enumerate(batch):
+                            if self._db.execute(sql, params).rowcount == 0 \
+                                    and sql.startswith('INSERT'):
+                                errors[i] = sqlite3.IntegrityError(
+                                    f'idempotency key already journaled: {params[0]}')
+                    self.commits += 1
+                except sqlite3.Error as e:
+                    errors = [e] * len(batch)
+            for (_, _, done, box), error in zip(batch, errors):
+                if done is not None:
+                    box.append(error)
+                    done.set()
+
+    def _write(self, sql: str, params: tuple, wait: bool = True):
+        if not wait:
+            self._queue.put((sql, params, None, None))
+            return
+        done, box = threading.Event(), []
+        self._queue.put((sql, params, done, box))
+        done.wait()
+        if box[0] is not None:
+            raise box[0]
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._db.close()
+
+    # ---- writes ----
+
+    def record(self, key: str, sender: str, nonce: int, tx_hash: str, raw: str):
+        """
+        Durably record a signed transaction before it is broadcast.
+
+        Blocks until the group commit containing it is on disk. Raises
+        sqlite3.IntegrityError if ``key`` is already journaled, unless the
+        earlier entry was dropped (never executed) and may be reused.
+        """
+        now = time.time()
+        self._write(
+            "INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET sender = excluded.sender, nonce = excluded.nonce, "
+            "tx_hash = excluded.tx_hash, raw = excluded.raw, status = excluded.status, "
+            "created = excluded.created, updated = excluded.updated "
+            "WHERE submissions.status = 'dropped'",
+            (key, sender, nonce, tx_hash, raw, PENDING, now, now))
+
+    def replace(self, key: str, tx_hash: str, raw: str, cancel: bool = False):
+        """
+        Durably record a same-nonce replacement before it is broadcast.
+
+        ``cancel`` marks a replacement that does not perform the original
+        call; if it is the one mined the entry settles as dropped.
+        """
+        self._write("INSERT INTO replacements VALUES (?, ?, ?, ?, ?)",
+                    (key, tx_hash, raw, int(cancel), time.time()))
+
+    def mark(self, key: str, status: str, block_number: int = None, gas_used: int = None,
+             wait: bool = False, tx_hash: str = None):
+        """
+        Update an entry after its receipt (or lack of one) is known.
+
+        ``tx_hash`` records which version was mined when a replacement won.
+        Not waited on by default: a lost update is harmless because
+        ``recover()`` re-checks pending entries against the chain.
+        """
+        self._write(
+            "UPDATE submissions SET status = ?, block_number = ?, gas_used = ?, updated = ?, "
+            "tx_hash = COALESCE(?, tx_hash) WHERE key = ?",
+            (status, block_number, gas_used, time.time(), tx_hash, key), wait)
+
+    def flush(self):
+        """Wait until every queued write is committed."""
+        self._write("SELECT 1", ())
+
+    # ---- reads ----
+
+    def get(self, key: str):
+        with self._read_lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM submissions WHERE key = ?", (key,)).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def pending(self, sender: str = None) -> list:
+        """Pending entries in nonce order."""
+        sql = f"SELECT {', '.join(_FIELDS)} FROM submissions WHERE status = ?"
+        params = (PENDING,)
+        if sender is not None:
+            sql += " AND sender = ?"
+            params += (to_address(sender),)
+        with self._read_lock:
+            rows = self._db.execute(sql + " ORDER BY sender, nonce", params).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def replacements(self, key: str) -> list:
+        """[(tx_hash, raw, cancel)] for ``key``, oldest first."""
+        with self._read_lock:
+            return [(h, raw, bool(cancel)) for h, raw, cancel in self._db.execute(
+                "SELECT tx_hash, raw, cancel FROM replacements WHERE key = ? ORDER BY rowid",
+                (key,))]
+
+    def counts(self) -> dict:
+        with self._read_lock:
+            return dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM submissions GROUP BY status").fetchall())
+
+    # ---- recovery ----
+
+    def settle(self, w3, entry: JournalEntry, timeout: float = 120) -> JournalEntry:
+        """
+        Bring one pending entry to a final status.
+
+        Checks the original and every journaled replacement. If none is
+        mined and the nonce is still open, the newest version is
+        re-broadcast and whichever version lands first decides the status.
+        The nonce is re-read while waiting, so an entry whose nonce another
+        transaction takes is marked dropped instead of timing out.
+        """
+        versions = [(entry.tx_hash, entry.raw, False)] + self.replacements(entry.key)
+        mined = self._mined(w3, versions)
+        if mined is None and entry.nonce >= w3.eth.get_transaction_count(entry.sender, 'latest'):
+            try:
+                rebroadcast(w3, versions[-1][1])
+            except Web3RPCError:
+                # The node rejects the signed bytes (underpriced, no funds, ...)
+                self.mark(entry.key, DROPPED, wait=True)
+                entry.status = DROPPED
+                return entry
+            deadline = time.time() + timeout
+            checked = time.time()
+            while mined is None and time.time() < deadline:
+                time.sleep(0.1)
+                mined = self._mined(w3, versions)
+                if mined is None and time.time() - checked >= 1:
+                    checked = time.time()
+                    if entry.nonce < w3.eth.get_transaction_count(entry.sender, 'latest'):
+                        # Nonce taken: by one of ours (read once more) or by another tx
+                        mined = self._mined(w3, versions)
+                        break
+            else:
+                if mined is None:
+                    raise TimeoutError(f'{entry.key} not mined after {timeout}s')
+        if mined is None:
+            entry.status = DROPPED
+        else:
+            receipt, cancel = mined
+            if cancel:
+                entry.status = DROPPED
+            else:
+                entry.status = INCLUDED if receipt.status == 1 else FAILED
+            entry.tx_hash = Web3.to_hex(receipt.transactionHash)
+            entry.block_number, entry.gas_used = receipt.blockNumber, receipt.gasUsed
+        self.mark(entry.key, entry.status, entry.block_number, entry.gas_used, wait=True,
+                  tx_hash=entry.tx_hash)
+        return entry
+
+    @staticmethod
+    def _mined(w3, versions: list):
+        for tx_hash, _, cancel in versions:
+            try:
+                return w3.eth.get_transaction_receipt(tx_hash), cancel
+            except TransactionNotFound:
+                continue
+        return None
+
+    def recover(self, w3, sender: str = None) -> dict:
+        """
+        Settle every pending entry (e.g. at startup).
+
+        Returns:
+            {status: count} for the entries settled; 'error' counts entries
+            that could not be settled this time (they stay pending)
+        """
+        summary = {}
+        for entry in self.pending(sender):
+            try:
+                status = self.settle(w3, entry).status
+            except Exception:
+                # Left pending for the next recover(); the rest still settle
+                status = 'error'
+            summary[status] = summary.get(status, 0) + 1
+        return summary
+
+
+__all__ = [
+    'SubmissionJournal', 'JournalEntry', 'rebroadcast', 'PENDING', 'INCLUDED', 'FAILED',
+    'DROPPED'
+]
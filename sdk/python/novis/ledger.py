@@ -0,0 +1,342 @@
+"""
+NOVIS Transfer Store
+
+Point-in-time NOVIS balances without an archive node. Each ``Transfer``
+event is decoded once into fixed-width column files (block, from id, to
+id, amount), and queries read those files through memory maps. Every
+``checkpoint_every`` events the store also writes out the balance of
+every address it knows. ``balances_at(addresses, block)`` starts from the
+last checkpoint at or before ``block`` and adds only the events between
+that checkpoint and ``block``. Queries make no RPC calls.
+
+Balances are rebuilt from the whole event history, so ``start_block``
+must be at or before the token's first Transfer (its deployment block).
+
+Example:
+    from novis.ledger import TransferStore
+
+    store = TransferStore('novis-transfers', w3, ADDRESSES['NOVIS_TOKEN'],
+                          start_block=23_000_000)
+    store.sync()
+    balances = store.balances_at(addresses, 24_000_000)
+    store.verify(24_000_000, sample=200)   # balanceOf spot check (archive node)
+"""
+
+import bisect
+import json
+import mmap
+import os
+import random
+import threading
+from array import array
+
+from web3 import Web3
+
+from .addresses import to_address
+from .snapshot import Snapshot
+
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text='Transfer(address,address,uint256)'))
+MULTICALL3 = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+# column -> typecode; amounts are uint128 stored as (low, high) uint64 pairs
+_COLUMNS = {'blocks': 'Q', 'from': 'I', 'to': 'I', 'amounts': 'Q'}
+_WIDTH = {'blocks': 1, 'from': 1, 'to': 1, 'amounts': 2}
+_MASK = (1 << 64) - 1
+_ZERO = '00' * 20        # id 0: mints come from it and burns go to it; never has a balance
+
+
+def _key(address: str) -> str:
+    return to_address(address)[2:].lower()
+
+
+def _map(path: str, typecode: str) -> memoryview:
+    """Read-only memory map of a column file as a typed memoryview."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return memoryview(b'').cast(typecode)
+    with open(path, 'rb') as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+
+class TransferStore:
+    """
+    Columnar, memory-mapped store of one token's Transfer events.
+
+    Args:
+        path: Directory of the store (created if missing)
+        w3: Web3 instance (only needed for sync and verify)
+        token: Token address (default: the one the store was created for)
+        start_block: First block to scan
+        checkpoint_every: Events between balance checkpoints
+        chunk_size: Blocks per eth_getLogs request; halved automatically
+            when the node rejects a range
+        confirmations: Stay this many blocks behind the head
+        multicall: Multicall3 address used by verify
+    """
+
+    def __init__(self, path: str, w3=None, token: str = None, start_block: int = 0,
+                 checkpoint_every: int = 100_000, chunk_size: int = 2000,
+                 confirmations: int = 0, multicall: str = MULTICALL3):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.w3 = w3
+        self.checkpoint_every = checkpoint_every
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.multicall = multicall
+        self._lock = threading.RLock()
+        self._views = None
+        self._checkpoint_views = {}
+        self._balances = None    # running balances by id, loaded on first sync
+
+        meta = self._read_meta()
+        if meta is None:
+            if token is None:
+                raise ValueError('token is required to create a store')
+            meta = {'token': to_address(token), 'synced_block': start_block - 1,
+                    'count': 0, 'addresses': 0, 'checkpoints': []}
+        elif token is not None and to_address(token) != meta['token']:
+            raise ValueError(f"store at {path} holds {meta['token']}, not {token}")
+        self.token = meta['token']
+        self.synced_block = meta['synced_block']
+        self.count = meta['count']
+        self.checkpoints = [tuple(c) for c in meta['checkpoints']]   # (block, count, addresses)
+
+        # Drop anything an interrupted sync appended after the last meta write
+        for name, typecode in _COLUMNS.items():
+            self._truncate(name + '.bin', self.count * _WIDTH[name] * array(typecode).itemsize)
+        self._truncate('addresses.bin', meta['addresses'] * 20)
+        with open(self._file('addresses.bin'), 'rb') as f:
+            raw = f.read()
+        self._addresses = [raw[i:i + 20].hex() for i in range(0, len(raw), 20)] or [_ZERO]
+        self._ids = {address: i for i, address in enumerate(self._addresses)}
+        self._persisted_addresses = meta['addresses']
+
+    # ---- files ----
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _truncate(self, name: str, size: int):
+        path = self._file(name)
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        elif os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _read_meta(self):
+        try:
+            with open(self._file('meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self):
+        meta = {'token': self.token, 'synced_block': self.synced_block, 'count': self.count,
+                'addresses': len(self._addresses), 'checkpoints': self.checkpoints}
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file('meta.json'))
+
+    def _columns(self) -> dict:
+        if self._views is None:
+            self._views = {name: _map(self._file(name + '.bin'), typecode)
+                           for name, typecode in _COLUMNS.items()}
+        return self._views
+
+    def _checkpoint(self, block: int) -> memoryview:
+        view = self._checkpoint_views.get(block)
+        if view is None:
+            view = self._checkpoint_views[block] = _map(self._file(f'checkpoint-{block}.bin'), 'Q')
+        return view
+
+    def _write_checkpoint(self, block: int, balances: list):
+        values = array('Q')
+        for balance in balances:
+            if balance < 0:
+                raise ValueError('negative balance: start_block is after the first Transfer')
+            values.append(balance & _MASK)
+            values.append(balance >> 64)
+        tmp = self._file('checkpoint.tmp')
+        with open(tmp, 'wb') as f:
+            values.tofile(f)
+        os.replace(tmp, self._file(f'checkpoint-{block}.bin'))
+        self.checkpoints.append((block, self.count, len(balances)))
+
+    # ---- sync ----
+
+    def _rpc(self, method: str, params: list):
+        response = self.w3.provider.make_request(method, params)
+        if response.get('error'):
+            raise RuntimeError(f"{method}: {response['error']}")
+        return response['result']
+
+    def _id(self, address: str) -> int:
+        i = self._ids.get(address)
+        if i is None:
+            i = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+            self._balances.append(0)
+        return i
+
+    def _running_balances(self) -> list:
+        """Balances of every id after the last stored event."""
+        if self._balances is None:
+            balances = [0] * len(self._addresses)
+            start = 0
+            if self.checkpoints:
+                block, start, known = self.checkpoints[-1]
+                stored = self._checkpoint(block)
+                for i in range(1, known):
+                    balances[i] = stored[2 * i] | stored[2 * i + 1] << 64
+            views = self._columns()
+            amounts = views['amounts']
+            for i, (frm, to) in enumerate(zip(views['from'][start:self.count],
+                                              views['to'][start:self.count]), start):
+                amount = amounts[2 * i] | amounts[2 * i + 1] << 64
+                balances[frm] -= amount
+                balances[to] += amount
+            balances[0] = 0
+            self._balances = balances
+        return self._balances
+
+    def sync(self, to_block='latest') -> int:
+        """Fetch and store Transfer events up to ``to_block``; returns new events."""
+        if to_block == 'latest':
+            to_block = self.w3.eth.block_number - self.confirmations
+        added = 0
+        chunk = self.chunk_size
+        with self._lock:
+            balances = self._running_balances()
+            last = self.checkpoints[-1][1] if self.checkpoints else 0
+            while self.synced_block < to_block:
+                start = self.synced_block + 1
+                end = min(start + chunk - 1, to_block)
+                try:
+                    logs = self._rpc('eth_getLogs', [{
+                        'address': self.token,
+                        'fromBlock': hex(start),
+                        'toBlock': hex(end),
+                        'topics': [TRANSFER_TOPIC]
+                    }])
+                except Exception:
+                    if chunk == 1:
+                        raise
+                    chunk = max(1, chunk // 2)
+                    continue
+                added += self._append(logs, balances)
+                self.synced_block = end
+                if self.count - last >= self.checkpoint_every:
+                    self._write_checkpoint(end, balances)
+                    last = self.count
+                self._write_meta()
+        return added
+
+    def _append(self, logs: list, balances: list) -> int:
+        columns = {name: array(typecode) for name, typecode in _COLUMNS.items()}
+        for log in logs:
+            topics = log['topics']
+            if len(topics) != 3 or log.get('removed'):
+                continue
+            frm = self._id(topics[1][26:].lower())
+            to = self._id(topics[2][26:].lower())
+            amount = int(log['data'], 16)
+            if amount >> 128:
+                raise ValueError(f"Transfer amount {amount} does not fit in 128 bits")
+            columns['blocks'].append(int(log['blockNumber'], 16))
+            columns['from'].append(frm)
+            columns['to'].append(to)
+            columns['amounts'].append(amount & _MASK)
+            columns['amounts'].append(amount >> 64)
+            if frm:
+                balances[frm] -= amount
+            if to:
+                balances[to] += amount
+        for name, values in columns.items():
+            with open(self._file(name + '.bin'), 'ab') as f:
+                values.tofile(f)
+        with open(self._file('addresses.bin'), 'ab') as f:
+            f.write(b''.join(bytes.fromhex(a) for a in self._addresses[self._persisted_addresses:]))
+        self._persisted_addresses = len(self._addresses)
+        self.count += len(columns['blocks'])
+        self._views = None
+        return len(columns['blocks'])
+
+    # ---- queries ----
+
+    def balances_at(self, addresses: list, block: int) -> list:
+        """
+        Balances (wei) of ``addresses`` at the end of ``block``, from the
+        store alone. Addresses that never appear in a Transfer hold 0.
+        """
+        with self._lock:
+            if block > self.synced_block:
+                raise ValueError(f'block {block} is past the synced block {self.synced_block}')
+            views = self._columns()
+            count = self.count
+            checkpoints = list(self.checkpoints)
+            ids = [self._ids.get(_key(a), 0) for a in addresses]
+        wanted = set(ids)
+        wanted.discard(0)
+        balances = dict.fromkeys(wanted, 0)
+        start = 0
+        c = bisect.bisect_right(checkpoints, (block, float('inf'))) - 1
+        if c >= 0:
+            checkpoint_block, start, known = checkpoints[c]
+            stored = self._checkpoint(checkpoint_block)
+            for i in wanted:
+                if i < known:
+                    balances[i] = stored[2 * i] | stored[2 * i + 1] << 64
+        end = bisect.bisect_right(views['blocks'][:count], block, start)
+        amounts = views['amounts']
+        for i, (frm, to) in enumerate(zip(views['from'][start:end], views['to'][start:end]), start):
+            if frm in wanted:
+                balances[frm] -= amounts[2 * i] | amounts[2 * i + 1] << 64
+            if to in wanted:
+                balances[to] += amounts[2 * i] | amounts[2 * i + 1] << 64
+        return [balances[i] if i else 0 for i in ids]
+
+    def balance_at(self, address: str, block: int) -> int:
+        return self.balances_at([address], block)[0]
+
+    def addresses(self) -> list:
+        """Every address seen in a Transfer (checksummed), in first-seen order."""
+        return [to_address('0x' + a) for a in self._addresses[1:]]
+
+    def verify(self, block: int = None, sample: int = 100, addresses: list = None,
+               seed=None) -> dict:
+        """
+        Compare stored balances at ``block`` (default: the synced block)
+        with on-chain ``balanceOf``, for ``addresses`` or a random sample
+        of known ones. Past blocks need an archive node.
+
+        Returns:
+            {'block', 'checked', 'mismatches': [(address, stored, on_chain)]}
+        """
+        block = self.synced_block if block is None else block
+        if addresses is None:
+            known = range(1, len(self._addresses))
+            picked = random.Random(seed).sample(known, min(sample, len(known)))
+            addresses = [to_address('0x' + self._addresses[i]) for i in picked]
+        stored = self.balances_at(addresses, block)
+        on_chain = Snapshot(self.w3, block, self.multicall).balances_of(self.token, addresses)
+        return {
+            'block': block,
+            'checked': len(addresses),
+            'mismatches': [(a, s, c) for a, s, c in zip(addresses, stored, on_chain) if s != c]
+        }
+
+    def __len__(self):
+        return self.count
+
+    def stats(self) -> dict:
+        return {
+            'events': self.count,
+            'addresses': len(self._addresses) - 1,
+            'checkpoints': len(self.checkpoints),
+            'synced_block': self.synced_block,
+            'bytes': sum(os.path.getsize(self._file(name)) for name in os.listdir(self.path))
+        }
+
+
+__all__ = ['TransferStore', 'TRANSFER_TOPIC']
@@ -0,0 +1,418 @@
+"""
+NOVIS Payment Listener
+
+Delivers incoming NOVIS payments to a watched set of addresses as blocks
+arrive, instead of polling balances.
+
+Each new head (from an ``eth_subscribe('newHeads')`` websocket when
+``ws_url`` is given, otherwise from polling ``eth_blockNumber``) goes
+through two filters before any log is decoded:
+
+- The header's ``logsBloom`` must contain a watched contract and payment
+  event, and, for watch sets up to ``bloom_limit`` addresses, one of the
+  watched recipients. Blocks failing it cost no ``eth_getLogs`` call.
+- Logs come back raw and are kept only if their recipient topic is in the
+  watched set (a set of hex strings, fine for hundreds of thousands of
+  addresses).
+
+Matching ``Transfer``, ``MetaTransferExecuted`` and router
+``PaymentWithMemo`` logs of one transaction are merged into one
+``Payment`` per transfer, carrying the memo and relayer when present.
+
+Delivery is at-most-once: an exception raised by a callback is logged and
+counted in ``counters['callback_errors']``, and the scan moves on, so a
+failing callback never makes the listener re-deliver a block range.
+
+Example:
+    from novis.listener import PaymentListener
+
+    listener = PaymentListener(w3, [my_address], on_payment=print).start()
+
+    # or, in asyncio code
+    async for payment in listener.payments():
+        print(payment.from_address, payment.amount, payment.memo)
+"""
+
+import asyncio
+import logging
+import threading
+
+from eth_abi import decode as abi_decode
+from eth_utils import keccak
+
+from . import ADDRESSES
+from .addresses import to_address
+from .records import EXPLORER_TX_URL, format_units
+
+TRANSFER = '0x' + keccak(text='Transfer(address,address,uint256)').hex()
+META_TRANSFER_EXECUTED = '0x' + keccak(
+    text='MetaTransferExecuted(address,address,uint256,address)').hex()
+PAYMENT_WITH_MEMO = '0x' + keccak(text='PaymentWithMemo(address,address,uint256,string)').hex()
+PAYMENT_TOPICS = (TRANSFER, META_TRANSFER_EXECUTED, PAYMENT_WITH_MEMO)
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# BLOOM
+# ============================================
+
+def bloom_bits(item: bytes) -> tuple:
+    """The three (byte index, mask) pairs ``item`` sets in a 2048-bit logs bloom."""
+    digest = keccak(item)
+    bits = []
+    for i in (0, 2, 4):
+        bit = int.from_bytes(digest[i:i + 2], 'big') & 2047
+        bits.append((255 - bit // 8, 1 << (bit % 8)))
+    return tuple(bits)
+
+
+def in_bloom(bloom: bytes, bits: tuple) -> bool:
+    """Whether every bit of ``bits`` (from bloom_bits) is set in ``bloom``."""
+    return all(bloom[index] & mask for index, mask in bits)
+
+
+def _bloom_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:])
+    return bytes(value)
+
+
+# ============================================
+# PAYMENT
+# ============================================
+
+class Payment:
+    """
+    One incoming transfer. ``amount_wei`` is what the recipient received
+    (after the token's transfer fee); ``gross_wei`` what the payer sent.
+    ``kind`` is 'transfer', 'meta_transfer' (relayed) or 'memo' (router).
+    """
+
+    __slots__ = ('kind', 'tx_hash', 'block_number', 'log_index', 'from_address', 'to_address',
+                 'amount_wei', 'gross_wei', 'memo', 'relayer')
+
+    def __init__(self, kind: str, tx_hash: str, block_number: int, log_index: int,
+                 from_address: str, to_address: str, amount_wei: int, gross_wei: int = None,
+                 memo: str = None, relayer: str = None):
+        self.kind = kind
+        self.tx_hash = tx_hash
+        self.block_number = block_number
+        self.log_index = log_index
+        self.from_address = from_address
+        self.to_address = to_address
+        self.amount_wei = amount_wei
+        self.gross_wei = amount_wei if gross_wei is None else gross_wei
+        self.memo = memo
+        self.relayer = relayer
+
+    @property
+    def amount(self) -> str:
+        return format_units(self.amount_wei)
+
+    @property
+    def explorer_url(self) -> str:
+        return EXPLORER_TX_URL + self.tx_hash
+
+    def to_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    def __repr__(self):
+        return (f'Payment(kind={self.kind!r}, from_address={self.from_address!r}, '
+                f'to_address={self.to_address!r}, amount={self.amount!r}, memo={self.memo!r}, '
+                f'block_number={self.block_number})')
+
+
+def _recipient_topic(address) -> str:
+    # No checksumming: 100k+ watched addresses would only churn the intern table
+    if isinstance(address, (bytes, bytearray)):
+        word = bytes(address)
+    else:
+        body = address.lower()
+        word = bytes.fromhex(body[2:] if body.startswith('0x') else body)
+    if len(word) != 20:
+        raise ValueError(f'invalid address: {address!r}')
+    return '0x' + '00' * 12 + word.hex()
+
+
+def _topic_address(topic: str):
+    return to_address(topic[-40:])
+
+
+def _merge(logs: list) -> list:
+    """
+    Payments from raw logs (already filtered to watched recipients).
+
+    A router or relayed payment emits a Transfer followed by its
+    PaymentWithMemo / MetaTransferExecuted; each of those is attached to
+    the earliest unclaimed Transfer of the same transaction, payer and
+    recipient.
+    """
+    payments = []
+    open_transfers = {}      # (tx, from topic, to topic) -> [Payment]
+    for log in sorted(logs, key=lambda l: (int(l['blockNumber'], 16), int(l['logIndex'], 16))):
+        topics = log['topics']
+        key = (log['transactionHash'], topics[1], topics[2])
+        data = bytes.fromhex(log['data'][2:])
+        if topics[0] == TRANSFER:
+            payment = Payment('transfer', log['transactionHash'], int(log['blockNumber'], 16),
+                              int(log['logIndex'], 16), _topic_address(topics[1]),
+                              _topic_address(topics[2]), int.from_bytes(data[:32], 'big'))
+            payments.append(payment)
+            open_transfers.setdefault(key, []).append(payment)
+            continue
+        pending = open_transfers.get(key)
+        if pending:
+            payment = pending.pop(0)
+        else:
+            # No Transfer seen (e.g. it fell outside the fetched range)
+            payment = Payment('transfer', log['transactionHash'], int(log['blockNumber'], 16),
+                              int(log['logIndex'], 16), _topic_address(topics[1]),
+                              _topic_address(topics[2]), int.from_bytes(data[:32], 'big'))
+            payments.append(payment)
+        payment.gross_wei = int.from_bytes(data[:32], 'big')
+        if topics[0] == PAYMENT_WITH_MEMO:
+            payment.kind = 'memo'
+            payment.memo = abi_decode(['uint256', 'string'], data)[1]
+        else:
+            payment.kind = 'meta_transfer'
+            payment.relayer = _topic_address(topics[3])
+    return payments
+
+
+# ============================================
+# LISTENER
+# ============================================
+
+class PaymentListener:
+    """
+    Watches NOVIS payments to a set of addresses.
+
+    Args:
+        w3: Web3 instance (HTTP is fine; heads are polled unless ws_url is set)
+        watch: Addresses to watch
+        on_payment: Optional callback, called with each Payment
+        addresses: Address overrides (default: novis.ADDRESSES); uses
+            NOVIS_TOKEN and PAYMENT_ROUTER
+        ws_url: Websocket RPC URL for eth_subscribe('newHeads')
+        poll_interval: Seconds between eth_blockNumber polls
+        confirmations: Blocks to wait before reporting (reorg margin)
+        from_block: First block to scan (default: the next one)
+        max_range: Most blocks per eth_getLogs when catching up
+        bloom_limit: Largest watch set whose addresses are checked against
+            each header's logs bloom
+    """
+
+    def __init__(self, w3, watch=(), on_payment=None, addresses: dict = None,
+                 ws_url: str = None, poll_interval: float = 1.0, confirmations: int = 0,
+                 from_block: int = None, max_range: int = 500, bloom_limit: int = 256):
+        addresses = {**ADDRESSES, **(addresses or {})}
+        self.w3 = w3
+        self.contracts = [to_address(addresses['NOVIS_TOKEN']),
+                          to_address(addresses['PAYMENT_ROUTER'])]
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.confirmations = confirmations
+        self.max_range = max_range
+        self.bloom_limit = bloom_limit
+        self.next_block = from_block
+        self.mode = None
+        self.counters = {'heads': 0, 'bloom_skipped': 0, 'get_logs': 0, 'logs': 0, 'payments': 0,
+                         'errors': 0, 'callback_errors': 0}
+        self._callbacks = [on_payment] if on_payment else []
+        self._streams = []       # (loop, asyncio.Queue) per payments() iterator
+        self._watched = set()    # recipient topics as '0x' + 64 lowercase hex
+        self._watched_bits = {}
+        self._contract_bits = [bloom_bits(bytes.fromhex(c[2:])) for c in self.contracts]
+        self._event_bits = [bloom_bits(bytes.fromhex(t[2:])) for t in PAYMENT_TOPICS]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.watch(watch)
+
+    # ---- watch set ----
+
+    def watch(self, addresses):
+        """Add addresses to the watched set."""
+        with self._lock:
+            for address in addresses:
+                topic = _recipient_topic(address)
+                self._watched.add(topic)
+                if len(self._watched) <= self.bloom_limit:
+                    self._watched_bits[topic] = bloom_bits(bytes.fromhex(topic[2:]))
+
+    def unwatch(self, addresses):
+        """Remove addresses from the watched set."""
+        with self._lock:
+            for address in addresses:
+                topic = _recipient_topic(address)
+                self._watched.discard(topic)
+                self._watched_bits.pop(topic, None)
+            if len(self._watched_bits) < len(self._watched) <= self.bloom_limit:
+                self._watched_bits = {t: bloom_bits(bytes.fromhex(t[2:])) for t in self._watched}
+
+    def __len__(self):
+        return len(self._watched)
+
+    def __contains__(self, address) -> bool:
+        return _recipient_topic(address) in self._watched
+
+    # ---- delivery ----
+
+    def on_payment(self, callback):
+        """Register a callback (usable as a decorator)."""
+        self._callbacks.append(callback)
+        return callback
+
+    async def payments(self):
+        """Async iterator over payments seen from now on."""
+        stream = (asyncio.get_running_loop(), asyncio.Queue())
+        self._streams.append(stream)
+        try:
+            while True:
+                yield await stream[1].get()
+        finally:
+            self._streams.remove(stream)
+
+    def _deliver(self, payment: Payment):
+        self.counters['payments'] += 1
+        for callback in list(self._callbacks):
+            try:
+                callback(payment)
+            except Exception:
+                # Never let one callback stop the scan: the cursor would not
+                # move and the whole range would be delivered again
+                self.counters['callback_errors'] += 1
+                logger.exception('payment callback failed for %s', payment.tx_hash)
+        for loop, stream in list(self._streams):
+            try:
+                loop.call_soon_threadsafe(stream.put_nowait, payment)
+            except RuntimeError:
+                # The iterator's event loop has closed
+                self.counters['callback_errors'] += 1
+
+    # ---- scanning ----
+
+    def _rpc(self, method: str, params: list):
+        response = self.w3.provider.make_request(method, params)
+        if response.get('error'):
+            raise RuntimeError(f"{method}: {response['error']}")
+        return response['result']
+
+    def _bloom_allows(self, bloom: bytes) -> bool:
+        if not any(in_bloom(bloom, bits) for bits in self._contract_bits):
+            return False
+        if not any(in_bloom(bloom, bits) for bits in self._event_bits):
+            return False
+        with self._lock:
+            if len(self._watched_bits) < len(self._watched):
+                return True
+            return any(in_bloom(bloom, bits) for bits in self._watched_bits.values())
+
+    def scan(self, from_block: int, to_block: int, bloom=None) -> list:
+        """
+        Deliver payments in [from_block, to_block]; returns them. ``bloom``
+        (the header's logsBloom, single-block scans only) can skip the fetch.
+        """
+        if bloom is not None and not self._bloom_allows(_bloom_bytes(bloom)):
+            self.counters['bloom_skipped'] += 1
+            return []
+        self.counters['get_logs'] += 1
+        logs = self._rpc('eth_getLogs', [{
+            'address': self.contracts,
+            'fromBlock': hex(from_block),
+            'toBlock': hex(to_block),
+            'topics': [list(PAYMENT_TOPICS)]
+        }])
+        self.counters['logs'] += len(logs)
+        watched = self._watched
+        matched = [log for log in logs
+                   if len(log['topics']) > 2 and log['topics'][2].lower() in watched
+                   and not log.get('removed')]
+        payments = _merge(matched)
+        for payment in payments:
+            self._deliver(payment)
+        return payments
+
+    def _advance(self, head: int, header: dict = None):
+        """Scan everything up to ``head`` minus confirmations."""
+        self.counters['heads'] += 1
+        target = head - self.confirmations
+        if self.next_block is None:
+            self.next_block = target + 1
+        while self.next_block <= target:
+            if self.next_block == target == head and header is not None:
+                self.scan(target, target, header.get('logsBloom'))
+                self.next_block = target + 1
+                continue
+            if self.next_block == target:
+                block = self._rpc('eth_getBlockByNumber', [hex(target), False])
+                self.scan(target, target, block.get('logsBloom') if block else None)
+                self.next_block = target + 1
+                continue
+            end = min(target, self.next_block + self.max_range - 1)
+            self.scan(self.next_block, end)
+            self.next_block = end + 1
+
+    def _poll(self):
+        self.mode = 'poll'
+        last = None
+        while not self._stop.is_set():
+            try:
+                head = int(self._rpc('eth_blockNumber', []), 16)
+                if head != last:
+                    self._advance(head)
+                    last = head
+            except Exception:
+                self.counters['errors'] += 1
+            self._stop.wait(self.poll_interval)
+
+    async def _subscribe(self):
+        from web3 import AsyncWeb3, WebSocketProvider
+
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as ws:
+            await ws.eth.subscribe('newHeads')
+            self.mode = 'websocket'
+            async for message in ws.socket.process_subscriptions():
+                if self._stop.is_set():
+                    break
+                header = message['result']
+                number = header['number']
+                self._advance(number if isinstance(number, int) else int(number, 16), header)
+
+    def _run(self):
+        if self.ws_url:
+            try:
+                asyncio.run(self._subscribe())
+            except Exception:
+                # No usable websocket (or it dropped): keep going by polling
+                self.counters['errors'] += 1
+        if not self._stop.is_set():
+            self._poll()
+
+    # ---- lifecycle ----
+
+    def start(self) -> 'PaymentListener':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        return {'mode': self.mode, 'watched': len(self._watched), 'next_block': self.next_block,
+                **self.counters}
+
+
+__all__ = ['PaymentListener', 'Payment', 'bloom_bits', 'in_bloom', 'PAYMENT_TOPICS']
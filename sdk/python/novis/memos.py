@@ -0,0 +1,341 @@
+"""
+NOVIS Memo Index
+
+Index of PaymentRouter ``PaymentWithMemo(payer, payee, amount, memo)``
+events, as sent by ``pay_with_memo`` and ``batch_pay``. Payments can be
+looked up by exact memo, by memo prefix (``task:research_``) and by payer
+or payee. The index is synced incrementally and kept in SQLite, so each
+run only fetches logs for blocks it has not seen yet.
+
+``reconcile`` checks a whole table of expected payments with one join.
+Each memo comes back as paid, missing, duplicate, amount mismatch or
+payee mismatch. The expected table can be the CSV/JSONL file a payout
+was made from.
+
+Example:
+    from novis.memos import MemoIndex
+    from novis.payout import read_rows
+
+    index = MemoIndex(w3, ADDRESSES['PAYMENT_ROUTER'], path='memos.db',
+                      start_block=23_000_000)
+    index.sync()
+    index.by_memo('task:research_topic_001')
+    index.by_prefix('task:research_', limit=50)
+
+    result = index.reconcile((row for _, row in read_rows('tasks.csv')),
+                             payer=client.address)
+    result['missing'], result['duplicate'], result['amount_mismatch']
+"""
+
+import itertools
+import sqlite3
+import threading
+
+from eth_abi import decode as abi_decode
+from web3 import Web3
+
+from .addresses import to_address
+from .payout import parse_amount
+
+PAYMENT_WITH_MEMO_TOPIC = Web3.to_hex(
+    Web3.keccak(text='PaymentWithMemo(address,address,uint256,string)'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    payer TEXT NOT NULL,
+    payee TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    memo TEXT NOT NULL,
+    PRIMARY KEY (block, log_index)
+);
+CREATE INDEX IF NOT EXISTS payments_by_memo ON payments (memo, block, log_index);
+CREATE INDEX IF NOT EXISTS payments_by_payer ON payments (payer, block, log_index);
+CREATE INDEX IF NOT EXISTS payments_by_payee ON payments (payee, block, log_index);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_COLUMNS = 'block, log_index, tx_hash, payer, payee, amount, memo'
+
+
+def _bytes(value) -> bytes:
+    return bytes.fromhex(value[2:]) if isinstance(value, str) else bytes(value)
+
+
+def _int(value) -> int:
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def _topic(address: str) -> str:
+    return '0x' + '00' * 12 + to_address(address)[2:].lower()
+
+
+class MemoPayment:
+    """One PaymentWithMemo event."""
+
+    __slots__ = ('block', 'log_index', 'tx_hash', 'payer', 'payee', 'amount_wei', 'memo')
+
+    def __init__(self, block: int, log_index: int, tx_hash: str, payer: str, payee: str,
+                 amount_wei: int, memo: str):
+        self.block = block
+        self.log_index = log_index
+        self.tx_hash = tx_hash
+        self.payer = payer
+        self.payee = payee
+        self.amount_wei = amount_wei
+        self.memo = memo
+
+    @classmethod
+    def _from_row(cls, row) -> 'MemoPayment':
+        block, log_index, tx_hash, payer, payee, amount, memo = row
+        return cls(block, log_index, tx_hash, to_address(payer), to_address(payee),
+                   int(amount), memo)
+
+    @property
+    def position(self) -> tuple:
+        return (self.block, self.log_index)
+
+    @property
+    def amount(self) -> float:
+        return self.amount_wei / 10**18
+
+    def __repr__(self):
+        return (f'MemoPayment(memo={self.memo!r}, payer={self.payer!r}, payee={self.payee!r}, '
+                f'amount={self.amount!r}, tx_hash={self.tx_hash!r})')
+
+    def to_dict(self) -> dict:
+        return {
+            'block': self.block,
+            'log_index': self.log_index,
+            'tx_hash': self.tx_hash,
+            'payer': self.payer,
+            'payee': self.payee,
+            'amount_wei': self.amount_wei,
+            'memo': self.memo
+        }
+
+
+class MemoIndex:
+    """
+    Incrementally synced memo / payer / payee index for one PaymentRouter.
+
+    Args:
+        w3: Web3 instance
+        router: PaymentRouter address
+        path: SQLite file to persist to (None keeps the index in memory)
+        start_block: First block to scan (the router's deployment block)
+        payer: Only index payments from this address
+        payee: Only index payments to this address
+        chunk_size: Blocks per eth_getLogs request; halved automatically
+            when the node rejects a range
+        confirmations: Stay this many blocks behind the head
+    """
+
+    def __init__(self, w3, router: str, path: str = None, start_block: int = 0,
+                 payer: str = None, payee: str = None, chunk_size: int = 10000,
+                 confirmations: int = 0):
+        self.w3 = w3
+        self.router = to_address(router)
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self._topics = [PAYMENT_WITH_MEMO_TOPIC,
+                        _topic(payer) if payer else None,
+                        _topic(payee) if payee else None]
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (self._meta_key(),)).fetchone()
+        self.synced_block = max(start_block - 1, int(row[0]) if row else -1)
+
+    def _meta_key(self) -> str:
+        return 'synced_block:' + ':'.join([self.router] + [t or '*' for t in self._topics[1:]])
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ---- sync ----
+
+    def _rpc(self, method: str, params: list):
+        response = self.w3.provider.make_request(method, params)
+        if response.get('error'):
+            raise RuntimeError(f"{method}: {response['error']}")
+        return response['result']
+
+    @staticmethod
+    def _row(log) -> tuple:
+        topics = log['topics']
+        amount, memo = abi_decode(['uint256', 'bytes'], _bytes(log['data']))
+        return (
+            _int(log['blockNumber']),
+            _int(log['logIndex']),
+            '0x' + _bytes(log['transactionHash']).hex(),
+            _bytes(topics[1])[12:].hex(),
+            _bytes(topics[2])[12:].hex(),
+            str(amount),
+            memo.decode('utf-8', 'replace')
+        )
+
+    def _insert(self, rows: list):
+        self._db.executemany(
+            f"INSERT OR IGNORE INTO payments ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def sync(self, to_block='latest') -> int:
+        """Fetch PaymentWithMemo logs up to ``to_block``; returns new payments."""
+        if to_block == 'latest':
+            to_block = self.w3.eth.block_number - self.confirmations
+        added = 0
+        chunk = self.chunk_size
+        while self.synced_block < to_block:
+            start = self.synced_block + 1
+            end = min(start + chunk - 1, to_block)
+            try:
+                logs = self._rpc('eth_getLogs', [{
+                    'address': self.router,
+                    'fromBlock': hex(start),
+                    'toBlock': hex(end),
+                    'topics': self._topics
+                }])
+            except Exception:
+                if chunk == 1:
+                    raise
+                chunk = max(1, chunk // 2)
+                continue
+            rows = [self._row(log) for log in logs if not log.get('removed')]
+            with self._lock, self._db:
+                self._insert(rows)
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                 (self._meta_key(), str(end)))
+                self.synced_block = end
+            added += len(rows)
+        return added
+
+    def add_receipt(self, receipt) -> int:
+        """Index PaymentWithMemo logs from our own pay_with_memo / batch_pay receipts."""
+        rows = [self._row(log) for log in receipt['logs']
+                if to_address(log['address']) == self.router
+                and '0x' + _bytes(log['topics'][0]).hex() == PAYMENT_WITH_MEMO_TOPIC]
+        with self._lock, self._db:
+            self._insert(rows)
+        return len(rows)
+
+    # ---- lookups ----
+
+    def _query(self, where: str, params: tuple, order: str, limit: int) -> list:
+        sql = f"SELECT {_COLUMNS} FROM payments WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [MemoPayment._from_row(row) for row in rows]
+
+    def by_memo(self, memo: str) -> list:
+        """Every payment carrying exactly ``memo``, oldest first."""
+        return self._query("memo = ?", (memo,), "block, log_index", None)
+
+    def by_prefix(self, prefix: str, limit: int = 100, after: str = None) -> list:
+        """
+        Payments whose memo starts with ``prefix``, in memo order. Page
+        with ``after=<memo of the last payment of the previous page>``.
+        """
+        # Range scan on the memo index; U+10FFFF sorts after any continuation
+        where, params = "memo >= ? AND memo < ?", (prefix, prefix + '\U0010ffff')
+        if after is not None:
+            where += " AND memo > ?"
+            params += (after,)
+        return self._query(where, params, "memo, block, log_index", limit)
+
+    def _by_party(self, column: str, address: str, limit: int, after: tuple) -> list:
+        where, params = f"{column} = ?", (to_address(address)[2:].lower(),)
+        if after is not None:
+            where += " AND (block, log_index) > (?, ?)"
+            params += tuple(after)
+        return self._query(where, params, "block, log_index", limit)
+
+    def by_payer(self, payer: str, limit: int = 100, after: tuple = None) -> list:
+        """A payer's payments, oldest first; ``after`` is a MemoPayment.position."""
+        return self._by_party('payer', payer, limit, after)
+
+    def by_payee(self, payee: str, limit: int = 100, after: tuple = None) -> list:
+        """A payee's payments, oldest first; ``after`` is a MemoPayment.position."""
+        return self._by_party('payee', payee, limit, after)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+
+    # ---- reconciliation ----
+
+    def reconcile(self, expected, payer: str = None) -> dict:
+        """
+        Match expected payments against the index in one pass.
+
+        Args:
+            expected: Iterable of dicts with ``memo`` and optionally ``to``
+                and ``amount`` (NOVIS, decimal string) or ``amount_wei``;
+                payout CSV/JSONL rows work as they are
+            payer: Only count payments from this address
+
+        Returns:
+            {'paid': {memo: MemoPayment}, 'missing': [memo],
+             'duplicate': {memo: [MemoPayment]},
+             'amount_mismatch': {memo: MemoPayment},
+             'payee_mismatch': {memo: MemoPayment}}
+        """
+        def rows():
+            for row in expected:
+                memo = row.get('memo')
+                if not memo:
+                    raise ValueError(f'expected payment without a memo: {row!r}')
+                to = row.get('to')
+                amount = row.get('amount_wei')
+                if amount is None and row.get('amount') not in (None, ''):
+                    amount = parse_amount(row['amount'])
+                yield (memo, to_address(to)[2:].lower() if to else None,
+                       None if amount is None else str(amount))
+
+        join = "p.memo = e.memo"
+        params = ()
+        if payer:
+            # Unary + keeps the planner on the memo index: by payer it
+            # would scan all of that payer's payments per expected row
+            join += " AND +p.payer = ?"
+            params = (to_address(payer)[2:].lower(),)
+        result = {'paid': {}, 'missing': [], 'duplicate': {},
+                  'amount_mismatch': {}, 'payee_mismatch': {}}
+        with self._lock:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS expected "
+                             "(memo TEXT PRIMARY KEY, payee TEXT, amount TEXT)")
+            self._db.execute("DELETE FROM expected")
+            try:
+                self._db.executemany("INSERT INTO expected VALUES (?, ?, ?)", rows())
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f'duplicate memo in expected payments: {e}') from None
+            cursor = self._db.execute(
+                f"SELECT e.memo, e.payee, e.amount, {', '.join('p.' + c for c in _COLUMNS.split(', '))} "
+                f"FROM expected e LEFT JOIN payments p ON {join} "
+                f"ORDER BY e.memo, p.block, p.log_index", params)
+            for memo, group in itertools.groupby(cursor, key=lambda row: row[0]):
+                group = list(group)
+                _, payee, amount, block = group[0][:4]
+                if block is None:
+                    result['missing'].append(memo)
+                    continue
+                payments = [MemoPayment._from_row(row[3:]) for row in group]
+                if len(payments) > 1:
+                    result['duplicate'][memo] = payments
+                elif payee is not None and group[0][7] != payee:
+                    result['payee_mismatch'][memo] = payments[0]
+                elif amount is not None and group[0][8] != amount:
+                    result['amount_mismatch'][memo] = payments[0]
+                else:
+                    result['paid'][memo] = payments[0]
+            self._db.execute("DELETE FROM expected")
+        return result
+
+
+__all__ = ['MemoIndex', 'MemoPayment', 'PAYMENT_WITH_MEMO_TOPIC']
@@ -0,0 +1,421 @@
+"""
+NOVIS Payouts
+
+Stream a CSV or JSONL file of payments through PaymentRouter.batchPay,
+with a durable checkpoint so an interrupted run resumes without paying
+anyone twice.
+
+Rows need ``to`` and ``amount`` (NOVIS, decimal string) and may have
+``memo``. The file is read one row at a time.
+
+Crash safety: each chunk's transaction is signed first, then written to
+the checkpoint (raw bytes, nonce, rows), and only then broadcast. On
+resume every in-flight chunk is reconciled against the chain: mined
+chunks are marked paid; unmined ones are re-broadcast with the *same*
+signed transaction (same nonce, so at most one copy can land); chunks
+whose nonce was consumed by something else, or that reverted, are sent
+again.
+
+With ``preflight=True`` each chunk is simulated before it is signed (see
+novis.preflight); payments that would revert it are recorded under
+``quarantined`` in the checkpoint and left out.
+
+Example:
+    from novis import NOVISClient
+    from novis.payout import Payout
+
+    client = NOVISClient(private_key='0x...')
+    result = Payout(client, 'payroll.csv', checkpoint='payroll.ckpt').run()
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from decimal import Decimal
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from . import encoders
+from .addresses import validate_addresses
+from .journal import rebroadcast
+from .preflight import Preflight
+
+_WEI = Decimal(10**18)
+
+
+class PayoutError(Exception):
+    """Raised when a payout cannot continue (bad row, revert, balance)."""
+
+
+# ============================================
+# INPUT
+# ============================================
+
+def read_rows(path: str, fmt: str = None):
+    """
+    Yield (line_number, row dict) from a CSV (with header) or JSONL file,
+    one row at a time.
+
+    Args:
+        path: Input file
+        fmt: 'csv' or 'jsonl' (default: from the file extension)
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as fh:
+        if fmt == 'jsonl':
+            for line_no, line in enumerate(fh, 1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            reader = csv.DictReader(fh)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def parse_amount(value) -> int:
+    """
+    Exact NOVIS -> wei conversion; rejects negatives, zero, >18 decimals,
+    NaN/Infinity and amounts that do not fit in a uint256.
+    """
+    try:
+        amount = Decimal(str(value).strip())
+        if not amount.is_finite():
+            raise ValueError(f'invalid amount {value!r}')
+        wei = amount * _WEI
+        if wei <= 0 or wei >= 2**256 or wei != wei.to_integral_value():
+            raise ValueError(f'invalid amount {value!r}')
+        return int(wei)
+    except ArithmeticError:
+        # InvalidOperation and Overflow from the decimal context
+        raise ValueError(f'invalid amount {value!r}') from None
+
+
+def validate_chunk(rows: list) -> tuple:
+    """
+    Validate and convert a chunk of (line, row) pairs.
+
+    Returns:
+        (payments, errors): payments as (to, amount_wei, memo) tuples,
+        errors as (line, message)
+    """
+    payments, errors = [], []
+    tos = [(row.get('to') or '').strip() for _, row in rows]
+    addresses, _ = validate_addresses(tos)
+    for (line, row), to, address in zip(rows, tos, addresses):
+        if address is None or not to.startswith('0x'):
+            errors.append((line, f'invalid address {to!r}'))
+            continue
+        try:
+            amount = parse_amount(row.get('amount'))
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        payments.append((address, amount, str(row.get('memo') or '')))
+    return payments, errors
+
+
+def validate_file(path: str, fmt: str = None, chunk_size: int = 1000) -> dict:
+    """
+    Validate every row of ``path`` without sending anything.
+
+    Returns:
+        {'rows': valid rows, 'total_wei': int, 'errors': [(line, message)]}
+    """
+    rows = total = 0
+    errors = []
+    buffer = []
+    for row in itertools.chain(read_rows(path, fmt), [None]):
+        if row is not None:
+            buffer.append(row)
+            if len(buffer) < chunk_size:
+                continue
+        payments, bad = validate_chunk(buffer)
+        errors.extend(bad)
+        rows += len(payments)
+        total += sum(p[1] for p in payments)
+        buffer = []
+    return {'rows': rows, 'total_wei': total, 'errors': errors}
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ============================================
+# CHECKPOINT
+# ============================================
+
+class Checkpoint:
+    """
+    JSON checkpoint, replaced atomically (write, fsync, rename) on save.
+
+    Fields: source digest, ``next_row`` (rows already assigned to a
+    chunk), ``pending`` (signed chunks not yet confirmed), ``retry``
+    (chunks that must be sent again) and running totals.
+    """
+
+    def __init__(self, path: str, source_digest: str):
+        self.path = path
+        self.state = {
+            'source': source_digest,
+            'next_row': 0,
+            'pending': [],
+            'retry': [],
+            'paid_rows': 0,
+            'paid_wei': '0',
+            'chunks': 0,
+            'skipped': []
+        }
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                saved = json.load(fh)
+            if saved['source'] != source_digest:
+                raise PayoutError(f'checkpoint {path} belongs to a different input file')
+            self.state = saved
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self.state, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    def mark_paid(self, entry: dict):
+        self.state['pending'].remove(entry)
+        self.state['paid_rows'] += len(entry['payments'])
+        self.state['paid_wei'] = str(int(self.state['paid_wei'])
+                                     + sum(int(p[1]) for p in entry['payments']))
+        self.state['chunks'] += 1
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+class Payout:
+    """
+    Chunked batchPay payout from a file.
+
+    Args:
+        client: novis.NOVISClient paying out
+        path: CSV or JSONL input
+        checkpoint: Checkpoint file (None disables resume)
+        chunk_size: Payments per batchPay transaction
+        in_flight: Chunks broadcast before waiting for the oldest receipt
+        skip_invalid: Record invalid rows and continue instead of stopping
+        fmt: 'csv' or 'jsonl' (default: from the extension)
+        on_chunk: Optional callback(summary dict) after each confirmed chunk
+        preflight: Simulate each chunk before signing it; payments that
+            would make it revert are quarantined and the rest are sent
+    """
+
+    def __init__(self, client, path: str, checkpoint: str = None, chunk_size: int = 100,
+                 in_flight: int = 4, skip_invalid: bool = False, fmt: str = None,
+                 on_chunk=None, preflight: bool = False):
+        self.client = client
+        self.w3 = client.w3
+        self.path = path
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.in_flight = max(1, in_flight)
+        self.skip_invalid = skip_invalid
+        self.on_chunk = on_chunk
+        self.tracer = client.tracer
+        self.checkpoint = Checkpoint(checkpoint, file_digest(path))
+        # 'pending' so that chunks still in flight are part of the simulated state
+        self.preflight = Preflight(client, block='pending') if preflight else None
+
+    # ---- chunks ----
+
+    def chunks(self):
+        """Yield (start_row, end_row, payments) for rows after the checkpoint."""
+        state = self.checkpoint.state
+        buffer, start = [], state['next_row']
+        for i, row in enumerate(read_rows(self.path, self.fmt)):
+            if i < state['next_row']:
+                continue
+            buffer.append(row)
+            if len(buffer) == self.chunk_size:
+                yield self._validated(start, buffer)
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield self._validated(start, buffer)
+
+    def _validated(self, start, rows):
+        payments, errors = validate_chunk(rows)
+        if errors:
+            if not self.skip_invalid:
+                line, message = errors[0]
+                raise PayoutError(f'{self.path}:{line}: {message}')
+            self.checkpoint.state['skipped'].extend(errors)
+        return start, start + len(rows), payments
+
+    def dry_run(self) -> dict:
+        """Validate the whole file without sending; returns totals."""
+        return validate_file(self.path, self.fmt, self.chunk_size)
+
+    # ---- sending ----
+
+    def _sign(self, payments: list, nonce: int, gas_price: int) -> dict:
+        router = self.client.addresses['PAYMENT_ROUTER']
+        data = encoders.batch_pay(
+            [p[0] for p in payments], [int(p[1]) for p in payments], [p[2] for p in payments])
+        gas = self.w3.eth.estimate_gas({'from': self.client.address, 'to': router, 'data': data})
+        tx = encoders.build_tx(self.client.address, router, data, nonce, gas * 5 // 4, gas_price,
+                               self.client.chain_id)
+        signed = self.client.account.sign_transaction(tx)
+        return {
+            'nonce': nonce,
+            'tx_hash': Web3.to_hex(signed.hash),
+            'raw': Web3.to_hex(signed.raw_transaction),
+            'payments': [[p[0], str(p[1]), p[2]] for p in payments]
+        }
+
+    def _broadcast(self, entry: dict):
+        rebroadcast(self.w3, entry['raw'])
+
+    def _receipt(self, entry: dict):
+        try:
+            return self.w3.eth.get_transaction_receipt(entry['tx_hash'])
+        except TransactionNotFound:
+            return None
+
+    def _confirm(self, entry: dict, timeout: float = 300):
+        receipt = self.w3.eth.wait_for_transaction_receipt(entry['tx_hash'], timeout=timeout)
+        state = self.checkpoint.state
+        if receipt.status != 1:
+            state['pending'].remove(entry)
+            state['retry'].append(entry['payments'])
+            self.checkpoint.save()
+            raise PayoutError(f"batchPay reverted: {entry['tx_hash']} (chunk kept for retry)")
+        self.checkpoint.mark_paid(entry)
+        self.checkpoint.save()
+        if self.on_chunk:
+            self.on_chunk({
+                'tx_hash': entry['tx_hash'],
+                'block_number': receipt.blockNumber,
+                'payments': len(entry['payments']),
+                'paid_rows': state['paid_rows'],
+                'next_row': state['next_row']
+            })
+
+    def reconcile(self):
+        """Settle chunks left in flight by a previous run."""
+        state = self.checkpoint.state
+        if not state['pending']:
+            return
+        with self.tracer.span('reconcile', pending=len(state['pending'])):
+            confirmed_nonce = self.w3.eth.get_transaction_count(self.client.address, 'latest')
+            for entry in sorted(state['pending'], key=lambda e: e['nonce']):
+                receipt = self._receipt(entry)
+                if receipt is None and entry['nonce'] >= confirmed_nonce:
+                    self._broadcast(entry)
+                    receipt = self.w3.eth.wait_for_transaction_receipt(entry['tx_hash'])
+                if receipt is not None and receipt.status == 1:
+                    self.checkpoint.mark_paid(entry)
+                else:
+                    # Reverted, or nonce consumed by another transaction
+                    state['pending'].remove(entry)
+                    state['retry'].append(entry['payments'])
+                self.checkpoint.save()
+
+    def run(self) -> dict:
+        """
+        Pay every remaining row.
+
+        Returns:
+            {'paid_rows', 'paid_wei', 'chunks', 'skipped', 'quarantined', 'elapsed'}
+        """
+        started = time.time()
+        state = self.checkpoint.state
+        with self.tracer.span('payout', path=self.path) as span:
+            self.reconcile()
+            nonce = self.w3.eth.get_transaction_count(self.client.address, 'pending')
+            gas_price = self.w3.eth.gas_price
+            router = self.client.addresses['PAYMENT_ROUTER']
+            allowance = self.client.token.functions.allowance(self.client.address, router).call()
+            balance = self.client.token.functions.balanceOf(self.client.address).call()
+
+            def approve():
+                nonlocal nonce, allowance
+                with self.tracer.span('approve'):
+                    tx = encoders.build_tx(
+                        self.client.address, self.client.addresses['NOVIS_TOKEN'],
+                        encoders.approve(router, 2**256 - 1), nonce, 100000, gas_price,
+                        self.client.chain_id)
+                    nonce += 1
+                    self.client._send_tx(tx)
+                allowance = 2**256 - 1
+
+            if self.preflight is not None and allowance < 2**255:
+                approve()    # simulations need the allowance in place
+
+            def send(payments, next_row=None):
+                nonlocal nonce, allowance, balance
+                if self.preflight is not None:
+                    with self.tracer.span('preflight', payments=len(payments)):
+                        result = self.preflight.batch_pay(payments)
+                    if result['quarantined']:
+                        state.setdefault('quarantined', []).extend(
+                            [p[0], str(p[1]), p[2], reason] for _, p, reason in result['quarantined'])
+                        payments = result['ok']
+                        if not payments:
+                            if next_row is not None:
+                                state['next_row'] = next_row
+                            self.checkpoint.save()
+                            return
+                total = sum(p[1] for p in payments)
+                if total > balance:
+                    raise PayoutError('insufficient NOVIS balance for the next chunk')
+                if total > allowance:
+                    approve()
+                entry = self._sign(payments, nonce, gas_price)
+                nonce += 1
+                allowance -= total
+                balance -= total
+                state['pending'].append(entry)
+                if next_row is not None:
+                    state['next_row'] = next_row
+                self.checkpoint.save()    # durable before broadcast
+                self._broadcast(entry)
+                while len(state['pending']) >= self.in_flight:
+                    self._confirm(state['pending'][0])
+
+            while state['retry']:
+                payments = state['retry'].pop(0)
+                send([(p[0], int(p[1]), p[2]) for p in payments])
+            for start, end, payments in self.chunks():
+                if payments:
+                    send(payments, end)
+                else:
+                    state['next_row'] = end
+                    self.checkpoint.save()
+            while state['pending']:
+                self._confirm(state['pending'][0])
+            span.set_attribute('paid_rows', state['paid_rows'])
+        return {
+            'paid_rows': state['paid_rows'],
+            'paid_wei': int(state['paid_wei']),
+            'chunks': state['chunks'],
+            'skipped': state['skipped'],
+            'quarantined': state.get('quarantined', []),
+            'elapsed': time.time() - started
+        }
+
+
+__all__ = [
+    'Payout', 'PayoutError', 'Checkpoint', 'read_rows', 'parse_amount', 'validate_chunk',
+    'validate_file'
+]
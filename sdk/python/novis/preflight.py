@@ -0,0 +1,238 @@
+"""
+NOVIS Pre-flight Simulation
+
+Run writes through ``eth_call`` before they are signed. A bad row then
+costs a simulation rather than a reverted transaction, and the result
+names the row.
+
+``batch_pay`` simulates the whole chunk first. If it reverts, the chunk
+is bisected. Both halves of every failing range are simulated in
+parallel, one level at a time, until the failing payments are isolated.
+That takes about 2·k·log2(n) calls for k bad rows. The isolated
+payments are quarantined with their revert reason. If the rest still
+fails as a whole, the failure is cumulative (balance, for example), and
+the longest passing prefix is kept; a parallel k-ary search finds it.
+
+``create_escrows``, ``mints`` and ``redeems`` send one transaction per
+item. Items are therefore simulated independently and in parallel. The
+items that pass are then checked in order against the balance the batch
+spends from. Simulations run against current state, so approvals must
+already be in place. ``NOVISClient`` approves on demand before it
+simulates.
+
+Example:
+    from novis.preflight import Preflight
+
+    result = Preflight(client).batch_pay(payments)
+    client.batch_pay(result['ok'])
+    for index, payment, reason in result['quarantined']:
+        print(index, payment, reason)
+
+    client.batch_pay(payments, preflight=True)    # the same, built in
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from web3.exceptions import ContractLogicError
+
+from . import encoders
+from .addresses import validate_addresses
+
+
+class PreflightError(Exception):
+    """Every item of a batch failed simulation."""
+
+    def __init__(self, message: str, quarantined: list):
+        super().__init__(message)
+        self.quarantined = quarantined
+
+
+class Preflight:
+    """
+    eth_call simulation of a client's batched writes.
+
+    Args:
+        client: novis.NOVISClient whose address the calls are simulated from
+        max_workers: Parallel simulations
+        block: Block tag to simulate against
+    """
+
+    def __init__(self, client, max_workers: int = 8, block='latest'):
+        self.client = client
+        self.w3 = client.w3
+        self.max_workers = max(1, max_workers)
+        self.block = block
+        self.simulations = 0
+        self._lock = threading.Lock()
+
+    def simulate(self, to: str, data: bytes):
+        """Revert reason of calling ``to`` with ``data``, or None if it succeeds."""
+        with self._lock:
+            self.simulations += 1
+        try:
+            self.w3.eth.call({'from': self.client.address, 'to': to, 'data': data}, self.block)
+        except ContractLogicError as e:
+            return e.message or 'execution reverted'
+        return None
+
+    def _result(self, items: list, keep: list, quarantined: list, started: int) -> dict:
+        return {
+            'ok': [items[i] for i in keep],
+            'quarantined': sorted(((i, items[i], reason) for i, reason in quarantined),
+                                  key=lambda q: q[0]),
+            'simulations': self.simulations - started
+        }
+
+    # ---- bisection (one call per batch) ----
+
+    def bisect(self, items: list, simulate) -> dict:
+        """
+        Split ``items`` into the ones that can go out together and the
+        ones that make the batch revert.
+
+        Args:
+            items: Batch rows
+            simulate: simulate(rows) -> revert reason or None, for a
+                sub-list of rows sent as one call
+
+        Returns:
+            {'ok': [item], 'quarantined': [(index, item, reason)], 'simulations': int}
+        """
+        started = self.simulations
+        quarantined = []
+        good = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def run(ranges):
+                return list(pool.map(lambda r: simulate(items[r[0]:r[1]]), ranges))
+
+            frontier = [(0, len(items))] if items else []
+            while frontier:
+                following = []
+                for (lo, hi), reason in zip(frontier, run(frontier)):
+                    if reason is None:
+                        good.append((lo, hi))
+                    elif hi - lo == 1:
+                        quarantined.append((lo, reason))
+                    else:
+                        mid = (lo + hi) // 2
+                        following += [(lo, mid), (mid, hi)]
+                frontier = following
+
+            keep = sorted(i for lo, hi in good for i in range(lo, hi))
+            if len(good) > 1:
+                reason = simulate([items[i] for i in keep])
+                if reason is not None:
+                    # Each part passes, the whole does not: keep the longest passing prefix
+                    lo, hi = 0, len(keep)
+                    while hi - lo > 1:
+                        cuts = sorted({lo + (hi - lo) * k // (self.max_workers + 1)
+                                       for k in range(1, self.max_workers + 1)} - {lo, hi})
+                        results = pool.map(lambda n: simulate([items[i] for i in keep[:n]]), cuts)
+                        for n, result in zip(cuts, results):
+                            if result is None:
+                                lo = max(lo, n)
+                            else:
+                                hi = min(hi, n)
+                    quarantined += [(i, reason) for i in keep[lo:]]
+                    keep = keep[:lo]
+        return self._result(items, keep, quarantined, started)
+
+    def batch_pay(self, payments: list) -> dict:
+        """
+        Pre-flight a PaymentRouter.batchPay chunk.
+
+        Args:
+            payments: {'to', 'amount' (NOVIS), 'memo'} dicts as taken by
+                NOVISClient.batch_pay, or (to, amount_wei, memo) tuples
+                as built by novis.payout
+        """
+        rows = []
+        invalid = []
+        addresses, _ = validate_addresses(
+            [p['to'] if isinstance(p, dict) else p[0] for p in payments])
+        for i, (payment, address) in enumerate(zip(payments, addresses)):
+            if address is None:
+                invalid.append((i, 'invalid address'))
+                continue
+            try:
+                if isinstance(payment, dict):
+                    amount = self.w3.to_wei(payment['amount'], 'ether')
+                    memo = payment.get('memo', '')
+                else:
+                    amount, memo = int(payment[1]), payment[2]
+            except (ValueError, TypeError, ArithmeticError, KeyError):
+                amount = None
+            if amount is None or not 0 <= amount < 2**256:
+                invalid.append((i, 'invalid amount'))
+                continue
+            rows.append((i, address, amount, memo))
+        router = self.client.addresses['PAYMENT_ROUTER']
+
+        def simulate(batch):
+            return self.simulate(router, encoders.batch_pay(
+                [r[1] for r in batch], [r[2] for r in batch], [r[3] for r in batch]))
+
+        result = self.bisect(rows, simulate)
+        quarantined = sorted([(rows[j][0], reason) for j, _, reason in result['quarantined']]
+                             + invalid)
+        return {
+            'ok': [payments[r[0]] for r in result['ok']],
+            'quarantined': [(i, payments[i], reason) for i, reason in quarantined],
+            'simulations': result['simulations']
+        }
+
+    # ---- independent calls (one transaction per item) ----
+
+    def independent(self, items: list, to: str, calls: list, costs: list = None,
+                    budget: int = None, budget_name: str = 'balance') -> dict:
+        """
+        Simulate one call per item in parallel, then charge the passing
+        ones in order against ``budget`` (what the batch spends from).
+
+        Returns:
+            {'ok': [item], 'quarantined': [(index, item, reason)], 'simulations': int}
+        """
+        started = self.simulations
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            reasons = list(pool.map(lambda data: self.simulate(to, data), calls))
+        keep, quarantined = [], []
+        for i, reason in enumerate(reasons):
+            if reason is None and budget is not None:
+                if costs[i] > budget:
+                    reason = f'exceeds {budget_name} left for the batch'
+                else:
+                    budget -= costs[i]
+            if reason is None:
+                keep.append(i)
+            else:
+                quarantined.append((i, reason))
+        return self._result(items, keep, quarantined, started)
+
+    def create_escrows(self, escrows: list) -> dict:
+        """Pre-flight createEscrow calls: {'to', 'amount' (NOVIS), 'timeout'} dicts."""
+        amounts = [self.w3.to_wei(e['amount'], 'ether') for e in escrows]
+        calls = [encoders.create_escrow(e['to'], amount, e.get('timeout', 3600))
+                 for e, amount in zip(escrows, amounts)]
+        balance = self.client._balance_of(self.client.addresses['NOVIS_TOKEN'], self.client.address)
+        return self.independent(escrows, self.client.addresses['PAYMENT_ROUTER'], calls,
+                                amounts, balance, 'NOVIS balance')
+
+    def mints(self, usdc_amounts: list) -> dict:
+        """Pre-flight vault deposits (USDC amounts, as taken by NOVISClient.mint)."""
+        units = [int(a * 1e6) for a in usdc_amounts]
+        balance = self.client._balance_of(self.client.addresses['USDC'], self.client.address)
+        return self.independent(usdc_amounts, self.client.addresses['VAULT'],
+                                [encoders.deposit(u) for u in units], units, balance,
+                                'USDC balance')
+
+    def redeems(self, novis_amounts: list) -> dict:
+        """Pre-flight vault redemptions (NOVIS amounts, as taken by NOVISClient.redeem)."""
+        amounts = [self.w3.to_wei(a, 'ether') for a in novis_amounts]
+        balance = self.client._balance_of(self.client.addresses['NOVIS_TOKEN'], self.client.address)
+        return self.independent(novis_amounts, self.client.addresses['VAULT'],
+                                [encoders.redeem(a) for a in amounts], amounts, balance,
+                                'NOVIS balance')
+
+
+__all__ = ['Preflight', 'PreflightError']
@@ -0,0 +1,348 @@
+"""
+NOVIS Rate Limiting
+
+Client-side rate and concurrency control for the relayer and the RPC
+provider, so throughput follows what they can sustain instead of
+collapsing into retries under burst load.
+
+Two controls sit in front of every request:
+
+- ``TokenBucket`` caps the request rate (``rate``/s, bursts of ``burst``)
+  and pauses everyone when a server sends ``Retry-After``.
+- ``AIMDLimiter`` caps requests in flight. The limit grows additively
+  while latency stays near its no-load baseline and is cut
+  multiplicatively on 429/5xx/timeouts.
+
+``Limiter`` combines both with retries (exponential backoff with full
+jitter, never shorter than ``Retry-After``). ``RateLimitedSession`` and
+``RateLimitedHTTPProvider`` apply it to ``requests`` and web3.
+
+Only reads are retried automatically: GET/HEAD requests and JSON-RPC
+calls other than transaction submission. A timed-out or 5xx write may
+already have gone through, so it is resubmitted only when the caller
+passes a ``retry`` check (``novis_sdk`` re-reads the meta-tx nonce
+before resending ``/relay``).
+
+Example:
+    from novis.ratelimit import Limiter
+    from novis_sdk import NOVISClient
+
+    client = NOVISClient(private_key='0x...', relayer_limiter=Limiter(rate=20),
+                         rpc_limiter=Limiter(rate=50, max_limit=32))
+    client.relayer_limiter.stats()
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from web3 import HTTPProvider
+
+OVERLOAD_STATUSES = frozenset([429, 500, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+WRITE_RPC_METHODS = frozenset(['eth_sendRawTransaction', 'eth_sendTransaction'])
+
+
+def retry_after_seconds(value) -> float:
+    """Parse a Retry-After header (seconds or HTTP date); None if absent/invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    Args:
+        rate: Tokens per second (None for unlimited)
+        burst: Bucket size (default: max(1, rate))
+    """
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Hold every acquire for ``seconds`` (Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Take one token, waiting as needed; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        return True
+                    self._tokens = min(self.burst,
+                                       self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Args:
+        initial: Starting limit
+        min_limit: Floor for the limit
+        max_limit: Ceiling for the limit
+        increase: Added per successful request while the limit is in use
+            and latency stays within ``tolerance`` x baseline
+        decrease: Multiplier applied on overload
+        tolerance: Latency ratio over the baseline still treated as flat
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 increase: float = 1.0, decrease: float = 0.5, tolerance: float = 2.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.baseline = None      # no-load latency estimate (seconds)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def on_success(self, latency: float):
+        with self._cond:
+            busy = self.in_flight * 2 >= self.limit
+            self.in_flight -= 1
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                # Let the baseline drift up slowly if the service gets slower for good
+                self.baseline += (latency - self.baseline) * 0.01
+            if busy and latency <= self.baseline * self.tolerance:
+                self.limit = min(self.max_limit, self.limit + self.increase)
+            self._cond.notify()
+
+    def on_overload(self):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            # One cut per round trip, not one per failed request in flight
+            if now - self._last_decrease > (self.baseline or 0.05):
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_decrease = now
+            self._cond.notify()
+
+    def on_ignore(self):
+        """Release a slot without learning from it (e.g. a client error)."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+
+class RetryBudgetExceeded(Exception):
+    """The service stayed overloaded through every retry."""
+
+    def __init__(self, message: str, last):
+        super().__init__(message)
+        self.last = last
+
+
+class Limiter:
+    """
+    Token bucket + AIMD concurrency limit + retries for one service.
+
+    Args:
+        rate: Requests per second cap (None: concurrency control only)
+        burst: Token bucket size
+        initial, min_limit, max_limit: AIMD concurrency bounds
+        max_retries: Retries on overload before giving up
+        base_backoff: First backoff (seconds); doubles per retry
+        max_backoff: Backoff ceiling (seconds)
+    """
+
+    def __init__(self, rate: float = None, burst: float = None, initial: int = 8,
+                 min_limit: int = 1, max_limit: int = 64, max_retries: int = 5,
+                 base_backoff: float = 0.1, max_backoff: float = 10.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.aimd = AIMDLimiter(initial, min_limit, max_limit)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.overloads = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(outcome):
+        """
+        (overloaded, retry_after) for a response or exception.
+
+        requests Responses/HTTPErrors with 429 or 5xx, connection errors
+        and timeouts count as overload.
+        """
+        response = outcome
+        if isinstance(outcome, requests.HTTPError):
+            response = outcome.response
+        elif isinstance(outcome, (requests.ConnectionError, requests.Timeout)):
+            return True, None
+        elif isinstance(outcome, BaseException):
+            return False, None
+        status = getattr(response, 'status_code', None)
+        if status in OVERLOAD_STATUSES:
+            return True, retry_after_seconds(response.headers.get('Retry-After'))
+        return False, None
+
+    @staticmethod
+    def _may_retry(retry) -> bool:
+        if not callable(retry):
+            return bool(retry)
+        try:
+            return bool(retry())
+        except Exception:
+            # Could not tell whether the request went through: don't resend
+            return False
+
+    def call(self, fn, retry=True):
+        """
+        Run ``fn()`` under the limits, retrying while the service is overloaded.
+
+        Returns fn's result; re-raises non-overload exceptions immediately.
+        After ``max_retries`` the last overloaded response is returned, or
+        RetryBudgetExceeded raised if the last outcome was an exception.
+
+        Args:
+            fn: The request
+            retry: True to retry overloads (idempotent requests), False to
+                make one attempt, or a callable asked before each retry
+                whether resending is safe
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.aimd.acquire()
+            with self._lock:
+                self.requests += 1
+            started = time.monotonic()
+            try:
+                outcome = fn()
+            except Exception as e:
+                outcome = e
+            overloaded, retry_after = self.classify(outcome)
+            if not overloaded:
+                if isinstance(outcome, BaseException):
+                    self.aimd.on_ignore()
+                    raise outcome
+                self.aimd.on_success(time.monotonic() - started)
+                return outcome
+            self.aimd.on_overload()
+            with self._lock:
+                self.overloads += 1
+            if retry_after is not None:
+                self.bucket.pause(retry_after)
+            if attempt == self.max_retries:
+                break
+            if retry is not False:
+                backoff = random.uniform(0, min(self.max_backoff,
+                                                self.base_backoff * 2 ** attempt))
+                time.sleep(max(backoff, retry_after or 0))
+            if not self._may_retry(retry):
+                # Not safe to resend: hand back the outcome as it is
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            with self._lock:
+                self.retries += 1
+        if isinstance(outcome, BaseException):
+            raise RetryBudgetExceeded(f'still overloaded after {self.max_retries} retries',
+                                      outcome) from outcome
+        return outcome
+
+    def stats(self) -> dict:
+        with self.aimd._cond:
+            limit, in_flight, baseline = self.aimd.limit, self.aimd.in_flight, self.aimd.baseline
+        with self._lock:
+            return {
+                'limit': int(limit),
+                'in_flight': in_flight,
+                'baseline_ms': None if baseline is None else baseline * 1000,
+                'requests': self.requests,
+                'overloads': self.overloads,
+                'retries': self.retries
+            }
+
+
+class RateLimitedSession:
+    """
+    ``requests``-style get/post through a Limiter.
+
+    Reads are retried on overload. Other methods are sent once unless
+    ``retry`` (see ``Limiter.call``) says resending is safe.
+    """
+
+    def __init__(self, limiter: Limiter, session: requests.Session = None):
+        self.limiter = limiter
+        self.session = session or requests.Session()
+
+    def request(self, method: str, url: str, retry=None, **kwargs) -> requests.Response:
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        return self.limiter.call(lambda: self.session.request(method, url, **kwargs), retry)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+
+class RateLimitedHTTPProvider(HTTPProvider):
+    """web3 HTTPProvider whose requests (single and batch) go through a Limiter."""
+
+    def __init__(self, endpoint_uri: str, limiter: Limiter, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.limiter = limiter
+
+    def make_request(self, method, params):
+        return self.limiter.call(lambda: super(RateLimitedHTTPProvider, self)
+                                 .make_request(method, params),
+                                 method not in WRITE_RPC_METHODS)
+
+    def make_batch_request(self, requests_):
+        return self.limiter.call(lambda: super(RateLimitedHTTPProvider, self)
+                                 .make_batch_request(requests_),
+                                 not any(method in WRITE_RPC_METHODS for method, _ in requests_))
+
+
+__all__ = [
+    'Limiter', 'TokenBucket', 'AIMDLimiter', 'RateLimitedSession', 'RateLimitedHTTPProvider',
+    'RetryBudgetExceeded', 'retry_after_seconds'
+]
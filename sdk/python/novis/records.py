@@ -0,0 +1,268 @@
+"""
+NOVIS Result Records
+
+Compact result types for code that keeps many results in memory
+(reconciliation, payout reports).
+
+Records are slotted and integer-backed: amounts are stored in wei and
+formatted only when the human-readable property is read. ``TransferBatch``
+goes further and stores results column-wise in flat arrays (32-byte
+hashes, 20-byte addresses, 32-byte amounts), materialising a record only
+on access.
+
+Example:
+    from novis.records import TransferBatch
+
+    batch = TransferBatch()
+    batch.append(tx_hash, block_number, sender, recipient, amount_wei)
+    batch.total_wei(), batch[0].amount, batch.to_address(0)
+"""
+
+from array import array
+from decimal import Decimal
+
+from .addresses import to_address as _address
+
+EXPLORER_TX_URL = 'https://basescan.org/tx/'
+
+
+def format_units(value: int, decimals: int = 18) -> str:
+    """Integer base units -> plain decimal string ('1.5', '10')."""
+    return format(Decimal(value).scaleb(-decimals).normalize(), 'f')
+
+
+class TransferResult:
+    """Result of a transfer; amounts in wei, display fields computed on read."""
+
+    __slots__ = ('success', 'tx_hash', 'block_number', 'from_address', 'to_address',
+                 'amount_wei')
+
+    def __init__(self, success: bool, tx_hash: str, block_number: int, from_address: str,
+                 to_address: str, amount_wei: int):
+        self.success = success
+        self.tx_hash = tx_hash
+        self.block_number = block_number
+        self.from_address = from_address
+        self.to_address = to_address
+        self.amount_wei = amount_wei
+
+    @property
+    def amount(self) -> str:
+        return format_units(self.amount_wei)
+
+    @property
+    def explorer_url(self) -> str:
+        return EXPLORER_TX_URL + self.tx_hash
+
+    def to_dict(self) -> dict:
+        return {
+            'success': self.success,
+            'tx_hash': self.tx_hash,
+            'block_number': self.block_number,
+            'from_address': self.from_address,
+            'to_address': self.to_address,
+            'amount': self.amount,
+            'amount_wei': self.amount_wei,
+            'explorer_url': self.explorer_url
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, TransferResult):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        return (f'TransferResult(tx_hash={self.tx_hash!r}, block_number={self.block_number}, '
+                f'to_address={self.to_address!r}, amount={self.amount!r}, '
+                f'success={self.success})')
+
+
+class FeeInfo:
+    """Transfer fee quote; amounts in wei."""
+
+    __slots__ = ('amount_wei', 'fee_wei', 'net_amount_wei')
+
+    def __init__(self, amount_wei: int, fee_wei: int, net_amount_wei: int):
+        self.amount_wei = amount_wei
+        self.fee_wei = fee_wei
+        self.net_amount_wei = net_amount_wei
+
+    @property
+    def amount(self) -> str:
+        return format_units(self.amount_wei)
+
+    @property
+    def fee(self) -> str:
+        return format_units(self.fee_wei)
+
+    @property
+    def net_amount(self) -> str:
+        return format_units(self.net_amount_wei)
+
+    @property
+    def fee_percent(self) -> str:
+        if not self.fee_wei:
+            return '0%'
+        return format_units(self.fee_wei * 10**20 // self.amount_wei) + '%'
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in (
+            'amount', 'amount_wei', 'fee', 'fee_wei', 'net_amount', 'net_amount_wei',
+            'fee_percent')}
+
+    def __eq__(self, other):
+        if not isinstance(other, FeeInfo):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        return (f'FeeInfo(amount={self.amount!r}, fee={self.fee!r}, '
+                f'net_amount={self.net_amount!r})')
+
+
+class ProtocolStats:
+    """Protocol statistics; NOVIS amounts in wei, USDC in 6-decimal units."""
+
+    __slots__ = ('total_supply_wei', 'total_assets_units', 'backing_ratio_bps',
+                 'total_fees_collected_wei', 'total_meta_tx_relayed', 'fee_threshold_wei',
+                 'fee_percentage_bps')
+
+    def __init__(self, total_supply_wei: int, total_assets_units: int, backing_ratio_bps: int,
+                 total_fees_collected_wei: int, total_meta_tx_relayed: int,
+                 fee_threshold_wei: int, fee_percentage_bps: int):
+        self.total_supply_wei = total_supply_wei
+        self.total_assets_units = total_assets_units
+        self.backing_ratio_bps = backing_ratio_bps
+        self.total_fees_collected_wei = total_fees_collected_wei
+        self.total_meta_tx_relayed = total_meta_tx_relayed
+        self.fee_threshold_wei = fee_threshold_wei
+        self.fee_percentage_bps = fee_percentage_bps
+
+    @property
+    def total_supply(self) -> str:
+        return format_units(self.total_supply_wei)
+
+    @property
+    def total_assets(self) -> str:
+        return format_units(self.total_assets_units, 6)
+
+    @property
+    def backing_ratio_percent(self) -> str:
+        return f'{self.backing_ratio_bps / 100:.2f}%'
+
+    @property
+    def total_fees_collected(self) -> str:
+        return format_units(self.total_fees_collected_wei)
+
+    @property
+    def fee_threshold(self) -> str:
+        return format_units(self.fee_threshold_wei)
+
+    @property
+    def fee_percentage(self) -> str:
+        return f'{self.fee_percentage_bps / 100:.2f}%'
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in (
+            'total_supply', 'total_assets', 'backing_ratio_bps', 'backing_ratio_percent',
+            'total_fees_collected', 'total_meta_tx_relayed', 'fee_threshold',
+            'fee_percentage')}
+
+    def __repr__(self):
+        return (f'ProtocolStats(total_supply={self.total_supply!r}, '
+                f'backing_ratio_percent={self.backing_ratio_percent!r})')
+
+
+class TransferBatch:
+    """
+    Column-wise store of transfer results.
+
+    113 bytes of buffer per transfer, against roughly 450 for a
+    dataclass of formatted strings (``python -m benchmarks.memory``).
+    ``batch[i]`` builds a TransferResult on demand.
+    """
+
+    __slots__ = ('_hashes', '_blocks', '_status', '_from', '_to', '_amounts')
+
+    def __init__(self):
+        self._hashes = bytearray()
+        self._blocks = array('Q')
+        self._status = array('B')
+        self._from = bytearray()
+        self._to = bytearray()
+        self._amounts = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def append(self, tx_hash, block_number: int, from_address: str, to_address: str,
+               amount_wei: int, success: bool = True):
+        if isinstance(tx_hash, str):
+            tx_hash = bytes.fromhex(tx_hash[2:] if tx_hash.startswith('0x') else tx_hash)
+        self._hashes += tx_hash
+        self._blocks.append(block_number)
+        self._status.append(1 if success else 0)
+        self._from += bytes.fromhex(from_address[2:])
+        self._to += bytes.fromhex(to_address[2:])
+        self._amounts += amount_wei.to_bytes(32, 'big')
+
+    def add(self, result: TransferResult):
+        self.append(result.tx_hash, result.block_number, result.from_address,
+                    result.to_address, result.amount_wei, result.success)
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    # ---- columns ----
+
+    def tx_hash(self, i: int) -> str:
+        return '0x' + self._hashes[i * 32:(i + 1) * 32].hex()
+
+    def block_number(self, i: int) -> int:
+        return self._blocks[i]
+
+    def success(self, i: int) -> bool:
+        return bool(self._status[i])
+
+    def from_address(self, i: int) -> str:
+        return _address(bytes(self._from[i * 20:(i + 1) * 20]))
+
+    def to_address(self, i: int) -> str:
+        return _address(bytes(self._to[i * 20:(i + 1) * 20]))
+
+    def amount_wei(self, i: int) -> int:
+        return int.from_bytes(self._amounts[i * 32:(i + 1) * 32], 'big')
+
+    def block_numbers(self) -> array:
+        return self._blocks
+
+    def total_wei(self) -> int:
+        amounts = self._amounts
+        return sum(int.from_bytes(amounts[i:i + 32], 'big') for i in range(0, len(amounts), 32))
+
+    def failed(self) -> list:
+        """Indexes of unsuccessful transfers."""
+        return [i for i, ok in enumerate(self._status) if not ok]
+
+    # ---- rows ----
+
+    def __getitem__(self, i: int) -> TransferResult:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return TransferResult(self.success(i), self.tx_hash(i), self._blocks[i],
+                              self.from_address(i), self.to_address(i), self.amount_wei(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers."""
+        return (len(self._hashes) + self._blocks.itemsize * len(self._blocks)
+                + len(self._status) + len(self._from) + len(self._to) + len(self._amounts))
+
+
+__all__ = ['TransferResult', 'FeeInfo', 'ProtocolStats', 'TransferBatch', 'format_units']
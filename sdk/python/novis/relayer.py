@@ -0,0 +1,647 @@
+"""
+NOVIS Relayer Service
+
+Self-hostable relayer implementing the hosted relayer's API
+(``docs/API.md``): ``/health``, ``/nonce/:address``, ``/domain``,
+``/fee/:from/:to/:amount`` and ``POST /relay``, so
+``novis_sdk.NOVISClient(relayer_url=...)`` can point at it unchanged.
+
+``/relay`` requests are queued and processed in batches (up to
+``batch_size``, or whatever arrived within ``batch_wait`` seconds):
+
+- Signatures are recovered together against a precomputed EIP-712
+  domain separator (in parallel threads when eth_keys has a C backend
+  such as coincurve installed).
+- Meta-tx nonces and NOVIS balances come from a cache that loads every
+  miss in the batch with one Multicall3 ``aggregate3`` call and is kept
+  current locally for relays still in flight, so a sender can have
+  several transfers queued.
+- Accepted transfers are sent as ``metaTransfer`` calls from a pool of
+  hot wallets. Each wallet assigns its own nonces locally and sends
+  without waiting for earlier receipts. All of one sender's transfers go
+  through the same wallet, whose single sender thread broadcasts batches
+  in the order they were accepted, so they are mined in meta-nonce order.
+
+Example:
+    from web3 import Web3
+    from novis.relayer import RelayerService
+
+    w3 = Web3(Web3.HTTPProvider('http://127.0.0.1:8545'))
+    with RelayerService(w3, [hot_key_1, hot_key_2], port=8080) as relayer:
+        client = NOVISClient(private_key='0x...', relayer_url=relayer.url)
+        client.transfer('0x...', '10')
+
+    # or: NOVIS_RELAYER_KEYS=0x..,0x.. novis relayer --rpc-url ... --port 8080
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_account import Account
+from eth_keys import keys
+from eth_utils import keccak
+from web3.exceptions import TimeExhausted
+
+from . import ADDRESSES, encoders
+from .addresses import address_word, to_address
+from .tracing import NOOP_TRACER
+
+DOMAIN_TYPEHASH = keccak(
+    text='EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)')
+META_TRANSFER_TYPEHASH = keccak(
+    text='MetaTransfer(address from,address to,uint256 amount,uint256 nonce,uint256 deadline)')
+
+AGGREGATE3 = keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+GET_META_TX_NONCE = keccak(text='getMetaTxNonce(address)')[:4]
+CALCULATE_TRANSFER_FEE = keccak(text='calculateTransferFee(address,address,uint256)')[:4]
+
+UINT256_LIMIT = 2**256
+
+
+class RelayError(Exception):
+    """A /relay request rejected with one of the API error codes."""
+
+    def __init__(self, message: str, code: str, status: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+# ============================================
+# EIP-712
+# ============================================
+
+def domain_separator(domain: dict) -> bytes:
+    """EIP-712 domain separator for a /domain payload."""
+    return keccak(
+        DOMAIN_TYPEHASH
+        + keccak(text=domain['name'])
+        + keccak(text=domain['version'])
+        + int(domain['chainId']).to_bytes(32, 'big')
+        + address_word(domain['verifyingContract']))
+
+
+def meta_transfer_digest(separator: bytes, frm: str, to: str, amount: int, nonce: int,
+                         deadline: int) -> bytes:
+    """Digest a MetaTransfer signature is made over (as the token's _hashTypedDataV4)."""
+    struct_hash = keccak(
+        META_TRANSFER_TYPEHASH + address_word(frm) + address_word(to)
+        + amount.to_bytes(32, 'big') + nonce.to_bytes(32, 'big') + deadline.to_bytes(32, 'big'))
+    return keccak(b'\x19\x01' + separator + struct_hash)
+
+
+def _recover(digest: bytes, signature: bytes):
+    """Signer address, or None for a malformed signature."""
+    if len(signature) != 65:
+        return None
+    v = signature[64]
+    try:
+        sig = keys.Signature(vrs=(v - 27 if v >= 27 else v, int.from_bytes(signature[:32], 'big'),
+                                  int.from_bytes(signature[32:64], 'big')))
+        return to_address(sig.recover_public_key_from_msg_hash(digest).to_canonical_address())
+    except Exception:
+        return None
+
+
+def _parallel_backend() -> bool:
+    # The pure-Python backend holds the GIL; threads only help with a C backend
+    return type(keys.backend).__name__ != 'NativeECCBackend'
+
+
+def recover_signers(items: list, workers: int = 1) -> list:
+    """Signer (or None) for each (digest, signature) pair."""
+    if workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda item: _recover(*item), items))
+    return [_recover(digest, signature) for digest, signature in items]
+
+
+# ============================================
+# STATE CACHE
+# ============================================
+
+class _SenderState:
+    __slots__ = ('nonce', 'balance', 'loaded_at', 'in_flight', 'reserved')
+
+    def __init__(self):
+        self.nonce = 0
+        self.balance = 0
+        self.loaded_at = None
+        self.in_flight = 0      # relays sent but not settled
+        self.reserved = 0       # wei those relays will move
+
+
+class StateCache:
+    """
+    Meta-tx nonces and NOVIS balances per sender.
+
+    Entries are loaded through Multicall3 and reloaded after ``ttl``
+    seconds, but only while the sender has nothing in flight: until then
+    the cached values plus the in-flight adjustments are authoritative.
+    """
+
+    def __init__(self, w3, token: str, multicall: str, ttl: float = 2.0):
+        self.w3 = w3
+        self.token = token
+        self.multicall = multicall
+        self.ttl = ttl
+        self.loads = 0
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, senders) -> None:
+        """Refresh stale entries for ``senders`` with one aggregate3 call."""
+        now = time.monotonic()
+        with self._lock:
+            stale = []
+            for sender in dict.fromkeys(senders):
+                state = self._states.setdefault(sender, _SenderState())
+                if state.in_flight == 0 and (state.loaded_at is None
+                                             or now - state.loaded_at > self.ttl):
+                    stale.append(sender)
+        if not stale:
+            return
+        calls = []
+        for sender in stale:
+            word = address_word(sender)
+            calls.append((self.token, False, GET_META_TX_NONCE + word))
+            calls.append((self.token, False, encoders.BALANCE_OF + word))
+        raw = self.w3.eth.call({'to': self.multicall,
+                                'data': AGGREGATE3 + abi_encode(['(address,bool,bytes)[]'], [calls])})
+        results = abi_decode(['(bool,bytes)[]'], raw)[0]
+        with self._lock:
+            self.loads += 1
+            for i, sender in enumerate(stale):
+                state = self._states[sender]
+                if state.in_flight:
+                    continue    # a relay started meanwhile; keep local view
+                state.nonce = int.from_bytes(results[2 * i][1], 'big')
+                state.balance = int.from_bytes(results[2 * i + 1][1], 'big')
+                state.loaded_at = now
+
+    def next_nonce(self, sender: str) -> int:
+        """Meta-tx nonce the sender's next transfer must be signed with."""
+        with self._lock:
+            state = self._states[sender]
+            return state.nonce + state.in_flight
+
+    def reserve(self, sender: str, amount: int) -> bool:
+        """Count a transfer as in flight if the sender can cover it."""
+        with self._lock:
+            state = self._states[sender]
+            if state.balance - state.reserved < amount:
+                return False
+            state.in_flight += 1
+            state.reserved += amount
+            return True
+
+    def settle(self, sender: str, amount: int, executed: bool):
+        """
+        Apply a finished relay. ``executed`` is False for transfers that
+        were never sent or reverted; the entry is then reloaded from chain.
+        """
+        with self._lock:
+            state = self._states[sender]
+            state.in_flight -= 1
+            state.reserved -= amount
+            if executed:
+                state.nonce += 1
+                state.balance -= amount
+            else:
+                state.loaded_at = None
+
+    def forget(self, address: str):
+        """Drop an entry (e.g. a recipient whose balance just changed)."""
+        with self._lock:
+            state = self._states.get(address)
+            if state is not None and state.in_flight == 0:
+                state.loaded_at = None
+
+
+# ============================================
+# HOT WALLETS
+# ============================================
+
+class HotWallet:
+    """One relayer key with a locally assigned, pipelined nonce."""
+
+    def __init__(self, account, nonce: int):
+        self.account = account
+        self.address = account.address
+        self.nonce = nonce
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def send(self, w3, tx: dict) -> str:
+        """Sign ``tx`` at the next nonce and broadcast it; returns the hash."""
+        with self.lock:
+            for attempt in range(2):
+                tx['nonce'] = self.nonce
+                signed = self.account.sign_transaction(tx)
+                try:
+                    w3.eth.send_raw_transaction(signed.raw_transaction)
+                except Exception as e:
+                    if attempt or 'nonce' not in str(e).lower():
+                        raise
+                    # Something else used this key; pick up from the chain
+                    self.nonce = w3.eth.get_transaction_count(self.address, 'pending')
+                    continue
+                self.nonce += 1
+                self.sent += 1
+                return '0x' + signed.hash.hex()
+
+
+class _Relay:
+    __slots__ = ('frm', 'to', 'amount', 'deadline', 'signature', 'nonce', 'wallet', 'tx_hash',
+                 'error', 'done')
+
+    def __init__(self, frm, to, amount, deadline, signature):
+        self.frm = frm
+        self.to = to
+        self.amount = amount
+        self.deadline = deadline
+        self.signature = signature
+        self.nonce = None
+        self.wallet = None
+        self.tx_hash = None
+        self.error = None
+        self.done = threading.Event()
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class RelayerService:
+    """
+    Batched metaTransfer relayer.
+
+    Args:
+        w3: Web3 instance for the chain
+        keys: Hot wallet private keys (each needs ETH for gas)
+        addresses: Address overrides (default: novis.ADDRESSES); uses
+            NOVIS_TOKEN and MULTICALL3
+        chain_id: Chain ID (default: asked from the node once)
+        domain: /domain payload (default: empty name and version, as the
+            deployed token uses)
+        batch_size: Most relays processed together
+        batch_wait: Seconds to wait for a batch to fill
+        cache_ttl: Seconds before an idle sender's nonce/balance is reloaded
+        gas: Gas limit per metaTransfer
+        receipt_timeout: Seconds /relay waits for inclusion
+        recover_workers: Threads for signature recovery (default: CPU count
+            with a C eth_keys backend, otherwise 1)
+        host, port: Listen address (port 0 picks a free one)
+        tracer: novis.tracing.Tracer (optional)
+    """
+
+    _routes = [
+        ('GET', re.compile(r'^/health$'), '_health'),
+        ('GET', re.compile(r'^/nonce/(0x[0-9a-fA-F]{40})$'), '_nonce'),
+        ('GET', re.compile(r'^/domain$'), '_domain'),
+        ('GET', re.compile(r'^/fee/(0x[0-9a-fA-F]{40})/(0x[0-9a-fA-F]{40})/(\d+)$'), '_fee'),
+        ('POST', re.compile(r'^/relay$'), '_relay'),
+    ]
+
+    def __init__(self, w3, keys: list, addresses: dict = None, chain_id: int = None,
+                 domain: dict = None, batch_size: int = 64, batch_wait: float = 0.005,
+                 cache_ttl: float = 2.0, gas: int = 150000, receipt_timeout: float = 120,
+                 recover_workers: int = None, host: str = '127.0.0.1', port: int = 8080,
+                 tracer=None):
+        if not keys:
+            raise ValueError('at least one hot wallet key is required')
+        addresses = {**ADDRESSES, **(addresses or {})}
+        self.w3 = w3
+        self.token = to_address(addresses['NOVIS_TOKEN'])
+        self.chain_id = chain_id or w3.eth.chain_id
+        self.domain = domain or {
+            'name': '',
+            'version': '',
+            'chainId': str(self.chain_id),
+            'verifyingContract': self.token
+        }
+        self.separator = domain_separator(self.domain)
+        self.cache = StateCache(w3, self.token, to_address(addresses['MULTICALL3']), cache_ttl)
+        self.accounts = [Account.from_key(k) for k in keys]
+        self.wallets = []
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.gas = gas
+        self.receipt_timeout = receipt_timeout
+        self.recover_workers = recover_workers or (os.cpu_count() if _parallel_backend() else 1)
+        self.tracer = tracer or NOOP_TRACER
+        self.counters = {'relayed': 0, 'reverted': 0, 'rejected': {}, 'batches': 0,
+                         'batched': 0}
+        self._gas_price = (0, 0.0)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._batcher = None
+        self._senders = None
+        self._httpd = self._server(host, port)
+        self._serve_thread = None
+
+    # ---- lifecycle ----
+
+    def start(self) -> 'RelayerService':
+        self.wallets = [HotWallet(a, self.w3.eth.get_transaction_count(a.address, 'pending'))
+                        for a in self.accounts]
+        self._stop.clear()
+        # One thread per wallet: its batches are signed and sent in order
+        self._senders = {wallet: ThreadPoolExecutor(max_workers=1) for wallet in self.wallets}
+        self._batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        self._batcher.start()
+        self._serve_thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._serve_thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._batcher is not None:
+            self._batcher.join()
+            self._batcher = None
+        if self._senders is not None:
+            for sender in self._senders.values():
+                sender.shutdown()
+            self._senders = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def serve_forever(self):
+        """Run until interrupted (for the CLI)."""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    # ---- HTTP ----
+
+    def _server(self, host, port):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                service._serve(self, 'GET')
+
+            def do_POST(self):
+                service._serve(self, 'POST')
+
+        httpd = ThreadingHTTPServer((host, port), Handler)
+        httpd.daemon_threads = True
+        return httpd
+
+    def _serve(self, handler, method):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        status, payload = 404, {'error': 'Not found'}
+        for route_method, pattern, name in self._routes:
+            match = pattern.match(handler.path)
+            if match and route_method == method:
+                try:
+                    status, payload = getattr(self, name)(body, *match.groups())
+                except RelayError as e:
+                    self._count_rejection(e.code)
+                    status, payload = e.status, {'error': str(e), 'code': e.code}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e), 'code': 'INTERNAL'}
+                break
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _health(self, body):
+        return 200, {
+            'status': 'ok',
+            'relayer': self.wallets[0].address,
+            'wallets': [w.address for w in self.wallets],
+            'queued': self._queue.qsize()
+        }
+
+    def _nonce(self, body, address):
+        address = to_address(address)
+        self.cache.load([address])
+        return 200, {'nonce': str(self.cache.next_nonce(address))}
+
+    def _domain(self, body):
+        return 200, self.domain
+
+    def _fee(self, body, frm, to, amount):
+        amount = int(amount)
+        if amount >= UINT256_LIMIT:
+            raise RelayError('Amount out of range', 'BAD_REQUEST')
+        raw = self.w3.eth.call({'to': self.token, 'data': CALCULATE_TRANSFER_FEE + address_word(frm)
+                                + address_word(to) + amount.to_bytes(32, 'big')})
+        fee = int.from_bytes(raw[:32], 'big')
+        return 200, {
+            'amount': str(amount),
+            'fee': str(fee),
+            'netAmount': str(int.from_bytes(raw[32:64], 'big')),
+            'feePercent': f'{fee * 100 / amount:g}%' if fee else '0%'
+        }
+
+    def _relay(self, body):
+        try:
+            req = json.loads(body)
+            signature = req['signature']
+            relay = _Relay(to_address(req['from']), to_address(req['to']), int(req['amount']),
+                           int(req['deadline']),
+                           bytes.fromhex(signature[2:] if signature.startswith('0x') else signature))
+        except (KeyError, TypeError, ValueError):
+            raise RelayError('Malformed request', 'BAD_REQUEST') from None
+        if not (0 <= relay.amount < UINT256_LIMIT and 0 <= relay.deadline < UINT256_LIMIT):
+            raise RelayError('Amount or deadline out of range', 'BAD_REQUEST')
+        self._queue.put(relay)
+        relay.done.wait()
+        if relay.error is not None:
+            raise relay.error
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(
+                relay.tx_hash, timeout=self.receipt_timeout, poll_latency=0.05)
+        except TimeExhausted:
+            threading.Thread(target=self._settle_later, args=(relay,), daemon=True).start()
+            return 202, {'success': False, 'txHash': relay.tx_hash, 'code': 'PENDING',
+                         'error': 'Submitted, not mined yet'}
+        self._settle(relay, receipt)
+        if receipt.status != 1:
+            raise RelayError('Transaction reverted', 'REVERTED')
+        return 200, {'success': True, 'txHash': relay.tx_hash, 'blockNumber': receipt.blockNumber}
+
+    # ---- batching ----
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Only batch-wide steps (the state load) get here; errors of
+                # single relays are handled in _process
+                for relay in batch:
+                    if not relay.done.is_set():
+                        relay.error = RelayError(str(e), 'INTERNAL', 500)
+                        relay.done.set()
+
+    def _reject(self, relay, message, code, status: int = 400):
+        relay.error = RelayError(message, code, status)
+        relay.done.set()
+
+    def _digest(self, relay, nonce: int) -> bytes:
+        return meta_transfer_digest(self.separator, relay.frm, relay.to, relay.amount, nonce,
+                                    relay.deadline)
+
+    def _process(self, batch: list):
+        with self.tracer.span('relay_batch', size=len(batch)) as span:
+            self.counters['batches'] += 1
+            self.counters['batched'] += len(batch)
+            now = time.time()
+            live = []
+            for relay in batch:
+                if relay.deadline < now:
+                    self._reject(relay, 'Signature expired', 'EXPIRED')
+                else:
+                    live.append(relay)
+            if not live:
+                return
+            with self.tracer.span('load'):
+                self.cache.load(r.frm for r in live)
+
+            # Nonces assume every earlier relay of the sender in this batch succeeds.
+            # A relay that fails here is rejected alone, never the whole batch.
+            ahead = {}
+            digests = []
+            for relay in live:
+                relay.nonce = self.cache.next_nonce(relay.frm) + ahead.get(relay.frm, 0)
+                try:
+                    digests.append((relay, self._digest(relay, relay.nonce)))
+                except Exception as e:
+                    self._reject(relay, str(e), 'INTERNAL', 500)
+                    continue
+                ahead[relay.frm] = ahead.get(relay.frm, 0) + 1
+            with self.tracer.span('recover'):
+                signers = recover_signers([(d, r.signature) for r, d in digests],
+                                          self.recover_workers)
+
+            by_wallet = {}
+            for (relay, _), signer in zip(digests, signers):
+                try:
+                    nonce = self.cache.next_nonce(relay.frm)
+                    if nonce != relay.nonce:
+                        # An earlier relay of this sender was rejected; check again
+                        relay.nonce = nonce
+                        signer = _recover(self._digest(relay, nonce), relay.signature)
+                    if signer != relay.frm:
+                        self._reject(relay, 'Invalid signature', 'INVALID_SIG')
+                    elif not self.cache.reserve(relay.frm, relay.amount):
+                        self._reject(relay, 'Insufficient balance', 'INSUFFICIENT_BALANCE')
+                    else:
+                        relay.wallet = self.wallets[int(relay.frm[-8:], 16) % len(self.wallets)]
+                        by_wallet.setdefault(relay.wallet, []).append(relay)
+                except Exception as e:
+                    self._reject(relay, str(e), 'INTERNAL', 500)
+            span.set_attribute('accepted', sum(len(v) for v in by_wallet.values()))
+            for wallet, relays in by_wallet.items():
+                self._senders[wallet].submit(self._send, wallet, relays)
+
+    def _gas_price_cached(self) -> int:
+        price, fetched = self._gas_price
+        if time.monotonic() - fetched > self.cache.ttl:
+            price = self.w3.eth.gas_price
+            self._gas_price = (price, time.monotonic())
+        return price
+
+    def _send(self, wallet: HotWallet, relays: list):
+        gas_price = self._gas_price_cached()
+        for relay in relays:
+            tx = encoders.build_tx(
+                wallet.address, self.token,
+                encoders.meta_transfer(relay.frm, relay.to, relay.amount, relay.deadline,
+                                       relay.signature),
+                None, self.gas, gas_price, self.chain_id)
+            try:
+                relay.tx_hash = wallet.send(self.w3, tx)
+            except Exception as e:
+                self.cache.settle(relay.frm, relay.amount, executed=False)
+                relay.error = RelayError(f'Broadcast failed: {e}', 'SEND_FAILED', 502)
+            relay.done.set()
+
+    # ---- settling ----
+
+    def _settle(self, relay, receipt):
+        executed = receipt.status == 1
+        self.cache.settle(relay.frm, relay.amount, executed)
+        self.cache.forget(relay.to)
+        if executed:
+            self.counters['relayed'] += 1
+        else:
+            self.counters['reverted'] += 1
+
+    def _settle_later(self, relay):
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(relay.tx_hash, timeout=3600)
+        except TimeExhausted:
+            self.cache.settle(relay.frm, relay.amount, executed=False)
+            return
+        self._settle(relay, receipt)
+
+    def _count_rejection(self, code: str):
+        rejected = self.counters['rejected']
+        rejected[code] = rejected.get(code, 0) + 1
+
+    def stats(self) -> dict:
+        batches = self.counters['batches']
+        return {
+            'relayed': self.counters['relayed'],
+            'reverted': self.counters['reverted'],
+            'rejected': dict(self.counters['rejected']),
+            'batches': batches,
+            'avg_batch': self.counters['batched'] / batches if batches else 0,
+            'cache_loads': self.cache.loads,
+            'wallets': {w.address: {'nonce': w.nonce, 'sent': w.sent} for w in self.wallets}
+        }
+
+
+__all__ = [
+    'RelayerService', 'RelayError', 'StateCache', 'HotWallet', 'domain_separator',
+    'meta_transfer_digest', 'recover_signers'
+]
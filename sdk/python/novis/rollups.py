@@ -0,0 +1,332 @@
+"""
+NOVIS Revenue Rollups
+
+Pre-aggregated, time-bucketed revenue built from protocol events:
+
+    transfer_fee      NOVIS FeeCollected(from, to, amount, fee)     by payer
+    deposit_fee       Vault Deposit(user, usdcAmount, minted, fee)  by depositor (USDC units)
+    gas_sponsored     Paymaster GasSponsored(account, amount, gasUsed, wasFree)
+    gas_sponsored_free  the subset with wasFree set
+    paymaster_fee     Paymaster FeeCollected(account, novisAmount, feeAmount)
+
+Each event is read once. It is added to one bucket per bucket size
+(hour and day by default), both under its account and under the total
+(account ''). A sync therefore costs O(new events). A window query
+covers the range with the largest buckets that fit and fills the edges
+with smaller ones. It reads at most a few dozen rows per account, and
+never logs. Buckets hold ``count``, ``volume`` (the amount the fee was
+charged on, or the sponsored op's amount) and ``value`` (the fee or the
+gas in wei).
+
+Example:
+    from novis.rollups import RevenueRollup
+
+    rollup = RevenueRollup(w3, path='revenue.db', start_block=23_000_000)
+    rollup.sync()
+    rollup.window('transfer_fee', start, end)           # {'count', 'volume', 'value'}
+    rollup.top('transfer_fee', start, end, n=10)        # biggest fee payers
+    rollup.series('gas_sponsored', start, end, size=HOUR)
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+from eth_abi import decode as abi_decode
+from web3 import Web3
+
+from . import ADDRESSES
+from .addresses import to_address
+
+HOUR = 3600
+DAY = 86400
+
+TRANSFER_FEE = 'transfer_fee'
+DEPOSIT_FEE = 'deposit_fee'
+GAS_SPONSORED = 'gas_sponsored'
+GAS_SPONSORED_FREE = 'gas_sponsored_free'
+PAYMASTER_FEE = 'paymaster_fee'
+
+
+def _topic(signature: str) -> str:
+    return Web3.to_hex(Web3.keccak(text=signature))
+
+
+TOKEN_FEE_COLLECTED = _topic('FeeCollected(address,address,uint256,uint256)')
+DEPOSIT = _topic('Deposit(address,uint256,uint256,uint256)')
+GAS_SPONSORED_TOPIC = _topic('GasSponsored(address,uint256,uint256,bool)')
+PAYMASTER_FEE_COLLECTED = _topic('FeeCollected(address,uint256,uint256)')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    metric TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    volume TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (metric, account, size, start)
+);
+CREATE INDEX IF NOT EXISTS buckets_by_time ON buckets (metric, size, start);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _seconds(t) -> int:
+    return int(t.timestamp()) if isinstance(t, datetime) else int(t)
+
+
+def _cover(start: int, end: int, sizes: tuple) -> list:
+    """[(size, start, end)] covering [start, end) with the largest aligned buckets."""
+    if start >= end:
+        return []
+    big = sizes[-1]
+    if len(sizes) == 1:
+        return [(big, start - start % big, end)]
+    lo = -(-start // big) * big
+    hi = end // big * big
+    if lo >= hi:
+        return _cover(start, end, sizes[:-1])
+    return _cover(start, lo, sizes[:-1]) + [(big, lo, hi)] + _cover(hi, end, sizes[:-1])
+
+
+def _empty() -> dict:
+    return {'count': 0, 'volume': 0, 'value': 0}
+
+
+class RevenueRollup:
+    """
+    Incrementally synced revenue buckets for the token, vault and paymaster.
+
+    Args:
+        w3: Web3 instance
+        addresses: Contract addresses (default: novis.ADDRESSES)
+        path: SQLite file to persist to (None keeps the rollup in memory)
+        start_block: First block to scan
+        sizes: Bucket sizes in seconds, ascending, each a multiple of the
+            previous (default: hour and day)
+        chunk_size: Blocks per eth_getLogs request; halved automatically
+            when the node rejects a range
+        confirmations: Stay this many blocks behind the head (buckets are
+            only ever added to, so reorged blocks must not be consumed)
+    """
+
+    def __init__(self, w3, addresses: dict = None, path: str = None, start_block: int = 0,
+                 sizes: tuple = (HOUR, DAY), chunk_size: int = 2000, confirmations: int = 0):
+        addresses = addresses or ADDRESSES
+        self.w3 = w3
+        self.token = to_address(addresses['NOVIS_TOKEN'])
+        self.vault = to_address(addresses['VAULT'])
+        self.paymaster = to_address(addresses['PAYMASTER'])
+        self.sizes = tuple(sorted(sizes))
+        if any(b % a for a, b in zip(self.sizes, self.sizes[1:])):
+            raise ValueError(f'bucket sizes must divide each other: {self.sizes}')
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self._decoders = {
+            (self.token, TOKEN_FEE_COLLECTED): self._transfer_fee,
+            (self.vault, DEPOSIT): self._deposit_fee,
+            (self.paymaster, GAS_SPONSORED_TOPIC): self._gas_sponsored,
+            (self.paymaster, PAYMASTER_FEE_COLLECTED): self._paymaster_fee
+        }
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (self._meta_key(),)).fetchone()
+        self.synced_block = max(start_block - 1, int(row[0]) if row else -1)
+
+    def _meta_key(self) -> str:
+        return f"synced_block:{self.token}:{self.vault}:{self.paymaster}:{','.join(map(str, self.sizes))}"
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ---- decoding ----
+
+    @staticmethod
+    def _account(topic: str) -> str:
+        return '0x' + topic[26:].lower()
+
+    def _transfer_fee(self, log, data):
+        amount, fee = abi_decode(['uint256', 'uint256'], data)
+        yield TRANSFER_FEE, self._account(log['topics'][1]), amount, fee
+
+    def _deposit_fee(self, log, data):
+        usdc_amount, _, fee = abi_decode(['uint256', 'uint256', 'uint256'], data)
+        yield DEPOSIT_FEE, self._account(log['topics'][1]), usdc_amount, fee
+
+    def _gas_sponsored(self, log, data):
+        amount, gas, free = abi_decode(['uint256', 'uint256', 'bool'], data)
+        account = self._account(log['topics'][1])
+        yield GAS_SPONSORED, account, amount, gas
+        if free:
+            yield GAS_SPONSORED_FREE, account, amount, gas
+
+    def _paymaster_fee(self, log, data):
+        amount, fee = abi_decode(['uint256', 'uint256'], data)
+        yield PAYMASTER_FEE, self._account(log['topics'][1]), amount, fee
+
+    # ---- sync ----
+
+    def _rpc(self, method: str, params: list):
+        response = self.w3.provider.make_request(method, params)
+        if response.get('error'):
+            raise RuntimeError(f"{method}: {response['error']}")
+        return response['result']
+
+    def _timestamps(self, logs: list) -> dict:
+        """Block number -> timestamp, from the logs where nodes include it."""
+        times = {}
+        for log in logs:
+            if log.get('blockTimestamp'):
+                times[log['blockNumber']] = int(log['blockTimestamp'], 16)
+        missing = sorted({log['blockNumber'] for log in logs} - times.keys())
+        for i in range(0, len(missing), 100):
+            requests = [('eth_getBlockByNumber', [n, False]) for n in missing[i:i + 100]]
+            try:
+                responses = self.w3.provider.make_batch_request(requests)
+            except (AttributeError, NotImplementedError):
+                responses = [self.w3.provider.make_request(*r) for r in requests]
+            if isinstance(responses, dict):
+                raise RuntimeError(f"eth_getBlockByNumber: {responses.get('error')}")
+            for response in responses:
+                if response.get('error'):
+                    raise RuntimeError(f"eth_getBlockByNumber: {response['error']}")
+                block = response['result']
+                times[block['number']] = int(block['timestamp'], 16)
+        return times
+
+    def sync(self, to_block='latest') -> int:
+        """Consume new events up to ``to_block``; returns events rolled up."""
+        if to_block == 'latest':
+            to_block = self.w3.eth.block_number - self.confirmations
+        added = 0
+        chunk = self.chunk_size
+        while self.synced_block < to_block:
+            start = self.synced_block + 1
+            end = min(start + chunk - 1, to_block)
+            try:
+                logs = self._rpc('eth_getLogs', [{
+                    'address': [self.token, self.vault, self.paymaster],
+                    'fromBlock': hex(start),
+                    'toBlock': hex(end),
+                    'topics': [[TOKEN_FEE_COLLECTED, DEPOSIT, GAS_SPONSORED_TOPIC,
+                                PAYMASTER_FEE_COLLECTED]]
+                }])
+            except Exception:
+                if chunk == 1:
+                    raise
+                chunk = max(1, chunk // 2)
+                continue
+            logs = [log for log in logs if not log.get('removed')]
+            added += self._apply(logs, self._timestamps(logs), end)
+        return added
+
+    def _apply(self, logs: list, times: dict, synced_block: int) -> int:
+        deltas = {}
+        events = 0
+        for log in logs:
+            decoder = self._decoders.get((to_address(log['address']), log['topics'][0]))
+            if decoder is None:
+                continue
+            events += 1
+            t = times[log['blockNumber']]
+            for metric, account, volume, value in decoder(log, bytes.fromhex(log['data'][2:])):
+                for size in self.sizes:
+                    for key in ((metric, account, size, t - t % size),
+                                (metric, '', size, t - t % size)):
+                        delta = deltas.get(key)
+                        if delta is None:
+                            delta = deltas[key] = [0, 0, 0]
+                        delta[0] += 1
+                        delta[1] += volume
+                        delta[2] += value
+        with self._lock, self._db:
+            rows = []
+            for (metric, account, size, start), (count, volume, value) in deltas.items():
+                row = self._db.execute(
+                    "SELECT count, volume, value FROM buckets "
+                    "WHERE metric = ? AND account = ? AND size = ? AND start = ?",
+                    (metric, account, size, start)).fetchone()
+                if row is not None:
+                    count, volume, value = count + row[0], volume + int(row[1]), value + int(row[2])
+                rows.append((metric, size, start, account, count, str(volume), str(value)))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO buckets (metric, size, start, account, count, volume, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             (self._meta_key(), str(synced_block)))
+            self.synced_block = synced_block
+        return events
+
+    # ---- queries ----
+
+    def _rows(self, metric: str, start, end, account=None):
+        """Bucket rows covering [start, end), rounded out to the smallest bucket size."""
+        start, end = _seconds(start), _seconds(end)
+        small = self.sizes[0]
+        start, end = start - start % small, -(-end // small) * small
+        where = "metric = ? AND size = ? AND start >= ? AND start < ?"
+        if account is None:
+            where += " AND account != ''"
+        sql = f"SELECT account, start, count, volume, value FROM buckets WHERE {where}"
+        if account is not None:
+            sql += " AND account = ?"
+        with self._lock:
+            for size, lo, hi in _cover(start, end, self.sizes):
+                params = (metric, size, lo, hi) + ((account,) if account is not None else ())
+                yield from self._db.execute(sql, params)
+
+    @staticmethod
+    def _add(totals: dict, count, volume, value):
+        totals['count'] += count
+        totals['volume'] += int(volume)
+        totals['value'] += int(value)
+
+    def window(self, metric: str, start, end, account: str = None) -> dict:
+        """
+        Totals over [start, end) (unix seconds or datetimes, at the
+        resolution of the smallest bucket) for everyone or one account.
+        """
+        key = '' if account is None else to_address(account).lower()
+        totals = _empty()
+        for _, _, count, volume, value in self._rows(metric, start, end, key):
+            self._add(totals, count, volume, value)
+        return totals
+
+    def by_account(self, metric: str, start, end) -> dict:
+        """{address: totals} over [start, end) for every account with events."""
+        accounts = {}
+        for account, _, count, volume, value in self._rows(metric, start, end):
+            totals = accounts.get(account)
+            if totals is None:
+                totals = accounts[account] = _empty()
+            self._add(totals, count, volume, value)
+        return {to_address(a): totals for a, totals in accounts.items()}
+
+    def top(self, metric: str, start, end, n: int = 10) -> list:
+        """[(address, totals)] of the ``n`` largest values over [start, end)."""
+        ranked = sorted(self.by_account(metric, start, end).items(),
+                        key=lambda item: item[1]['value'], reverse=True)
+        return ranked[:n]
+
+    def series(self, metric: str, start, end, size: int = HOUR, account: str = None) -> list:
+        """[(bucket_start, totals)] for each non-empty ``size`` bucket in [start, end)."""
+        if size not in self.sizes:
+            raise ValueError(f'no {size}s buckets (have {self.sizes})')
+        start, end = _seconds(start), _seconds(end)
+        key = '' if account is None else to_address(account).lower()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start, count, volume, value FROM buckets "
+                "WHERE metric = ? AND account = ? AND size = ? AND start >= ? AND start < ? "
+                "ORDER BY start", (metric, key, size, start - start % size, end)).fetchall()
+        return [(t, {'count': count, 'volume': int(volume), 'value': int(value)})
+                for t, count, volume, value in rows]
+
+
+__all__ = ['RevenueRollup', 'HOUR', 'DAY', 'TRANSFER_FEE', 'DEPOSIT_FEE', 'GAS_SPONSORED',
+           'GAS_SPONSORED_FREE', 'PAYMASTER_FEE']
@@ -0,0 +1,414 @@
+"""
+NOVIS Transfer Routing
+
+Chooses between the gasless relayer path and a direct ERC-20 transfer per
+payment, so a relayer brownout costs one slow payment instead of every
+payment until it recovers.
+
+``RelayerHealth`` keeps a rolling window of relay latencies and outcomes
+and runs a circuit breaker over it:
+
+- closed: relay. Opens when the window's p99 latency or error rate
+  breaches the SLO.
+- open: route direct. After ``cooldown`` seconds ``/health`` is probed;
+  a fast answer moves to half-open.
+- half-open: one trial relay at a time; success closes the breaker,
+  failure opens it again.
+
+``TransferRouter`` sends each payment through the relayer while the breaker
+allows it, and through ``transfer_direct`` while it is open or when a relay
+fails, as long as the wallet holds enough ETH for gas. A
+relay is only abandoned when it provably never executed: either the request
+never reached the relayer, the relayer refused it as overloaded, or the
+signature's (short) deadline passed with the meta-tx nonce unused. A
+payment is never sent both ways: if the nonce was used but no matching
+transfer can be found, ``RelayUnresolved`` is raised instead of failing
+over.
+
+Example:
+    from novis_sdk import NOVISClient
+    from novis.routing import RelayerHealth
+
+    client = NOVISClient(private_key='0x...')
+    client.smart_transfer('0x...', '10')
+    client.router.stats()   # {'routes': {'relay': 97, 'direct': 3}, 'failovers': 1, ...}
+
+    client.router.health = RelayerHealth(latency_slo=2.0, error_rate_slo=0.05)
+"""
+
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+
+import requests
+from eth_utils import keccak
+from urllib3.exceptions import NewConnectionError
+
+from .addresses import address_word, to_address
+from .ratelimit import RetryBudgetExceeded
+from .records import TransferResult
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+GET_META_TX_NONCE = keccak(text='getMetaTxNonce(address)')[:4]
+META_TRANSFER_EXECUTED = keccak(text='MetaTransferExecuted(address,address,uint256,address)')
+
+# Relayer answers that mean the request was turned away before submission
+REFUSED_STATUSES = frozenset([429, 503])
+
+
+class RelayUnresolved(Exception):
+    """
+    A relay's meta-tx nonce was used, but no matching transfer was found
+    after the relay was sent. The payment may have gone through, so it is
+    not retried; ``attempt`` holds the nonce, deadline and search start.
+    """
+
+    def __init__(self, message: str, attempt: dict):
+        super().__init__(message)
+        self.attempt = attempt
+
+
+def _quantile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RelayerHealth:
+    """
+    Rolling relay latency/error window with a circuit breaker.
+
+    Args:
+        latency_slo: Seconds the window's ``quantile`` latency may reach
+        error_rate_slo: Fraction of failed relays tolerated in the window
+        quantile: Latency quantile held to the SLO (0.99 = p99)
+        window: Most recent relays considered
+        window_seconds: Relays older than this are ignored
+        min_samples: Relays needed before the SLO is judged
+        cooldown: Seconds the breaker stays open before probing /health
+        probe_timeout: Timeout for the /health probe
+    """
+
+    def __init__(self, latency_slo: float = 5.0, error_rate_slo: float = 0.1,
+                 quantile: float = 0.99, window: int = 100, window_seconds: float = 60.0,
+                 min_samples: int = 5, cooldown: float = 30.0, probe_timeout: float = 2.0):
+        self.latency_slo = latency_slo
+        self.error_rate_slo = error_rate_slo
+        self.quantile = quantile
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.reason = None          # why the breaker last opened
+        self.opened = 0             # times it opened
+        self.probes = 0
+        self._samples = deque(maxlen=window)    # (time, latency, ok)
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    # ---- samples ----
+
+    def _window(self, now: float) -> list:
+        return [s for s in self._samples if now - s[0] <= self.window_seconds]
+
+    def breach(self, now: float = None) -> str:
+        """'latency' or 'error_rate' if the window breaches the SLO, else None."""
+        with self._lock:
+            return self._breach(time.monotonic() if now is None else now)
+
+    def _breach(self, now: float) -> str:
+        samples = self._window(now)
+        if len(samples) < self.min_samples:
+            return None
+        errors = sum(1 for _, _, ok in samples if not ok)
+        if errors / len(samples) > self.error_rate_slo:
+            return 'error_rate'
+        if _quantile([latency for _, latency, _ in samples], self.quantile) > self.latency_slo:
+            return 'latency'
+        return None
+
+    def record(self, latency: float, ok: bool):
+        """Add one relay outcome and move the breaker accordingly."""
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, latency, ok))
+            if self.state == HALF_OPEN:
+                self._trial = False
+                if ok and latency <= self.latency_slo:
+                    self.state = CLOSED
+                else:
+                    self._open(now, 'trial_failed')
+            elif self.state == CLOSED:
+                reason = self._breach(now)
+                if reason:
+                    self._open(now, reason)
+
+    def _open(self, now: float, reason: str):
+        self.state = OPEN
+        self.reason = reason
+        self.opened += 1
+        self._opened_at = now
+        self._trial = False
+
+    # ---- gate ----
+
+    def allow(self, relayer_url: str, http=requests) -> bool:
+        """
+        Whether the next payment may use the relayer. Probes /health when
+        an open breaker's cooldown is over.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.cooldown:
+                    return False
+                self._opened_at = now       # one prober per cooldown
+                probe = True
+            else:
+                probe = False
+            if not probe:
+                if self._trial:
+                    return False
+                self._trial = True
+                return True
+        healthy = self.probe(relayer_url, http)
+        with self._lock:
+            if healthy and self.state == OPEN:
+                # Start the new half-open period without the brownout's samples
+                self.state = HALF_OPEN
+                self._samples.clear()
+                self._trial = True
+                return True
+            return False
+
+    def probe(self, relayer_url: str, http=requests) -> bool:
+        """GET /health; healthy if it answers 'ok' within the latency SLO."""
+        self.probes += 1
+        started = time.monotonic()
+        try:
+            res = http.get(f'{relayer_url}/health', timeout=self.probe_timeout)
+            healthy = res.status_code == 200 and res.json().get('status') == 'ok'
+        except (requests.RequestException, RetryBudgetExceeded, ValueError):
+            return False
+        return healthy and time.monotonic() - started <= self.latency_slo
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = self._window(time.monotonic())
+        latencies = [latency for _, latency, _ in samples]
+        return {
+            'state': self.state,
+            'reason': self.reason,
+            'opened': self.opened,
+            'probes': self.probes,
+            'samples': len(samples),
+            'error_rate': (sum(1 for _, _, ok in samples if not ok) / len(samples)
+                           if samples else 0.0),
+            'p50_ms': _quantile(latencies, 0.5) * 1000 if latencies else None,
+            'p99_ms': _quantile(latencies, 0.99) * 1000 if latencies else None
+        }
+
+
+def _never_sent(error) -> bool:
+    """True if a requests failure happened before the request reached the server."""
+    if isinstance(error, RetryBudgetExceeded):
+        error = error.last
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class TransferRouter:
+    """
+    Per-payment choice between ``client.transfer`` and ``client.transfer_direct``.
+
+    Args:
+        client: novis_sdk.NOVISClient
+        health: RelayerHealth (default: one with default SLOs)
+        relay_timeout: Timeout for each relayer request (seconds)
+        relay_ttl: Deadline of routed meta-transfer signatures (seconds);
+            bounds how long an unanswered relay can keep a payment open
+        gas_limit: Gas limit of a direct transfer
+        eth_margin: Multiple of gas_limit x gas price the wallet must hold
+            to fail over
+        poll_interval: Seconds between nonce checks while a relay is unresolved
+        history: Routing decisions kept for ``decisions``
+    """
+
+    def __init__(self, client, health: RelayerHealth = None, relay_timeout: float = 10.0,
+                 relay_ttl: int = 60, gas_limit: int = 100000, eth_margin: float = 1.5,
+                 poll_interval: float = 1.0, history: int = 1000):
+        self.client = client
+        self.health = health or RelayerHealth()
+        self.relay_timeout = relay_timeout
+        self.relay_ttl = relay_ttl
+        self.gas_limit = gas_limit
+        self.eth_margin = eth_margin
+        self.poll_interval = poll_interval
+        self.decisions = deque(maxlen=history)  # (time, route, reason, latency)
+        self.routes = {'relay': 0, 'direct': 0}
+        self.reasons = {}
+        self.failovers = 0
+        self._latencies = {'relay': deque(maxlen=history), 'direct': deque(maxlen=history)}
+        self._lock = threading.Lock()
+
+    # ---- routing ----
+
+    def transfer(self, to: str, amount: str):
+        """Send ``amount`` NOVIS to ``to`` by whichever path is healthy; TransferResult."""
+        client = self.client
+        to = to_address(to)
+        with client.tracer.span('smart_transfer', to=to, amount=amount) as span:
+            if not self.health.allow(client.relayer_url, client._http):
+                reason = f'circuit_{self.health.state}'
+                if self._can_pay_gas():
+                    span.set_attribute('route', 'direct')
+                    return self._direct(to, amount, reason)
+                self._count('no_eth')
+            started = time.monotonic()
+            attempt = {}
+            try:
+                result = client._transfer(to, amount, span, timeout=self.relay_timeout,
+                                          ttl=self.relay_ttl, attempt=attempt)
+            except Exception as e:
+                latency = time.monotonic() - started
+                outcome = self._classify(e, attempt)
+                if outcome == 'rejected':
+                    # The relayer answered; the payment itself is invalid
+                    self.health.record(latency, True)
+                    raise
+                self.health.record(latency, False)
+                if outcome == 'uncertain':
+                    result = self._resolve(to, amount, attempt)
+                    if result is not None:
+                        span.set_attribute('route', 'relay')
+                        self._decide('relay', 'resolved', time.monotonic() - started)
+                        return result
+                    outcome = 'expired'
+                if not self._can_pay_gas():
+                    self._count('no_eth')
+                    raise
+                with self._lock:
+                    self.failovers += 1
+                span.set_attribute('route', 'direct')
+                return self._direct(to, amount, f'relay_{outcome}')
+            latency = time.monotonic() - started
+            self.health.record(latency, True)
+            span.set_attribute('route', 'relay')
+            self._decide('relay', 'healthy', latency)
+            return result
+
+    def _classify(self, error, attempt: dict) -> str:
+        """
+        'unavailable' (never executed, safe to fail over), 'uncertain'
+        (may still execute) or 'rejected' (a client error: re-raise).
+        """
+        if attempt.get('phase') != 'relay':
+            if isinstance(error, (requests.RequestException, RetryBudgetExceeded, ValueError)):
+                return 'unavailable'
+            return 'rejected'
+        status = attempt.get('status_code')
+        if status is None:
+            return 'unavailable' if _never_sent(error) else 'uncertain'
+        if status in REFUSED_STATUSES:
+            return 'unavailable'
+        if status >= 500:
+            return 'uncertain'
+        return 'rejected'
+
+    def _resolve(self, to: str, amount: str, attempt: dict):
+        """
+        Wait out an unanswered relay: TransferResult if it executed, None
+        once its deadline has passed with the nonce unused. Raises
+        RelayUnresolved if the nonce was used but no matching transfer was
+        logged since the relay was sent.
+        """
+        w3 = self.client.w3
+        token = to_address(self.client.addresses['NOVIS_TOKEN'])
+        sender = self.client.address
+        call = {'to': token, 'data': '0x' + (GET_META_TX_NONCE + address_word(sender)).hex()}
+        while True:
+            expired = time.time() > attempt['deadline']
+            if int.from_bytes(w3.eth.call(call), 'big') > attempt['nonce']:
+                result = self._find_relay(token, sender, to, int(Decimal(amount) * 10**18),
+                                          attempt['from_block'])
+                if result is None:
+                    raise RelayUnresolved(
+                        f"meta-tx nonce {attempt['nonce']} was used, but no matching "
+                        f"transfer was logged from block {attempt['from_block']}", attempt)
+                return result
+            if expired:
+                # Mined blocks are past the deadline too once the next one lands
+                if w3.eth.get_block('latest')['timestamp'] > attempt['deadline']:
+                    return None
+            time.sleep(self.poll_interval)
+
+    def _find_relay(self, token: str, sender: str, to: str, amount_wei: int, from_block: int):
+        logs = self.client.w3.eth.get_logs({
+            'address': token,
+            'fromBlock': from_block,
+            'toBlock': 'latest',
+            'topics': ['0x' + META_TRANSFER_EXECUTED.hex(), '0x' + address_word(sender).hex(),
+                       '0x' + address_word(to).hex()]
+        })
+        ours = [log for log in logs if int.from_bytes(log['data'], 'big') == amount_wei]
+        if not ours:
+            return None
+        log = ours[-1]
+        return TransferResult(success=True, tx_hash='0x' + log['transactionHash'].hex(),
+                              block_number=log['blockNumber'], from_address=sender,
+                              to_address=to, amount_wei=amount_wei)
+
+    def _can_pay_gas(self) -> bool:
+        w3 = self.client.w3
+        need = self.gas_limit * w3.eth.gas_price * self.eth_margin
+        return w3.eth.get_balance(self.client.address) >= need
+
+    def _direct(self, to: str, amount: str, reason: str):
+        started = time.monotonic()
+        sent = self.client.transfer_direct(to, amount)
+        self._decide('direct', reason, time.monotonic() - started)
+        tx_hash = sent['tx_hash']
+        return TransferResult(success=sent['success'],
+                              tx_hash=tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash,
+                              block_number=sent['block_number'],
+                              from_address=self.client.address, to_address=to,
+                              amount_wei=int(Decimal(amount) * 10**18))
+
+    # ---- metrics ----
+
+    def _count(self, reason: str):
+        with self._lock:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def _decide(self, route: str, reason: str, latency: float):
+        with self._lock:
+            self.routes[route] += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            self._latencies[route].append(latency)
+            self.decisions.append((time.time(), route, reason, latency))
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = {route: list(values) for route, values in self._latencies.items()}
+            stats = {
+                'routes': dict(self.routes),
+                'reasons': dict(self.reasons),
+                'failovers': self.failovers
+            }
+        for route, values in latencies.items():
+            stats[f'{route}_p50_ms'] = _quantile(values, 0.5) * 1000 if values else None
+            stats[f'{route}_p99_ms'] = _quantile(values, 0.99) * 1000 if values else None
+        stats['relayer'] = self.health.stats()
+        return stats
+
+
+__all__ = ['RelayerHealth', 'TransferRouter', 'RelayUnresolved', 'CLOSED', 'OPEN', 'HALF_OPEN']
@@ -0,0 +1,272 @@
+"""
+NOVIS Block Snapshots
+
+Reads pinned to one block. Every ``eth_call`` of a ``Snapshot`` names
+the same block by hash (EIP-1898, ``requireCanonical``). A report built
+from several reads (total supply and vault assets, balances of many
+accounts) therefore sees one consistent state.
+
+State at a given block never changes, so results are cached without
+expiry in a ``ReadCache`` shared by all snapshots of a client. Entries
+are keyed by block hash. After a reorg, a new snapshot of that height
+gets a new hash and misses the cache. It never returns reads of the
+abandoned block, and calls through an old snapshot fail rather than read
+the new block. Reads that miss are batched through Multicall3
+``aggregate3``, one ``eth_call`` per ``chunk_size`` reads.
+
+Both clients have ``at_block`` and ``snapshot``; ``novis.NOVISClient``
+returns a ``BlockView``, ``novis_sdk.NOVISClient`` its own view with
+``get_protocol_stats``.
+
+Example:
+    snap = client.snapshot()                 # pinned to the current head
+    snap.get_protocol_stats()                # one multicall, consistent (novis_sdk)
+    snap.get_balances(addresses)             # batched balanceOf
+
+    month_end = client.at_block(12_345_678)  # historical; needs an archive node
+    month_end.get_balance('0x...')           # cached for good
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_utils import keccak
+from web3.exceptions import ContractLogicError
+
+from . import encoders
+from .addresses import address_word, to_address
+
+AGGREGATE3 = keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+GET_ETH_BALANCE = keccak(text='getEthBalance(address)')[:4]
+
+
+def selector(signature: str) -> bytes:
+    """4-byte selector of a function signature, e.g. 'totalSupply()'."""
+    return keccak(text=signature)[:4]
+
+
+class CallReverted(Exception):
+    """A pinned call reverted (at that block, it always will)."""
+
+
+_REVERTED = object()
+
+
+class ReadCache:
+    """
+    Thread-safe LRU of pinned call results.
+
+    Args:
+        maxsize: Most results kept (None for unbounded)
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class Snapshot:
+    """
+    Raw reads at one block.
+
+    Args:
+        w3: Web3 instance (historical blocks need an archive node)
+        block: Block number or tag; resolved to a number and hash once
+        multicall: Multicall3 address
+        cache: ReadCache (default: a private one)
+        chunk_size: Reads per aggregate3 call
+        max_workers: Parallel aggregate3 calls for large batches
+    """
+
+    def __init__(self, w3, block, multicall: str, cache: ReadCache = None,
+                 chunk_size: int = 500, max_workers: int = 4):
+        header = w3.eth.get_block(block)
+        self.w3 = w3
+        self.block_number = header['number']
+        self.block_hash = bytes(header['hash'])
+        # EIP-1898: calls name the block by hash, so a reorg after this
+        # point makes them fail instead of reading the replacement block
+        self.block_id = {'blockHash': '0x' + self.block_hash.hex(), 'requireCanonical': True}
+        self.timestamp = header['timestamp']
+        self.multicall = to_address(multicall)
+        self.cache = cache if cache is not None else ReadCache()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+    def _key(self, to: str, data: bytes):
+        return (self.block_hash, to, data)
+
+    # ---- calls ----
+
+    def call(self, to: str, data: bytes) -> bytes:
+        """Return data of one call; CallReverted if it reverts."""
+        result = self.call_many([(to, data)])[0]
+        if result is None:
+            raise CallReverted(f'call to {to} reverted at block {self.block_number}')
+        return result
+
+    def call_many(self, calls: list) -> list:
+        """
+        Results of ``[(to, data), ...]`` in order, None where a call
+        reverted. Cached results are served locally; the rest go out
+        through aggregate3 in chunks.
+        """
+        calls = [(to_address(to), bytes(data)) for to, data in calls]
+        results = [self.cache.get(self._key(to, data)) for to, data in calls]
+        missing = [i for i, result in enumerate(results) if result is None]
+        fetched = []
+        if len(missing) == 1:
+            to, data = calls[missing[0]]
+            try:
+                fetched = [bytes(self.w3.eth.call({'to': to, 'data': data}, self.block_id))]
+            except ContractLogicError:
+                fetched = [_REVERTED]
+        elif missing:
+            chunks = [missing[i:i + self.chunk_size]
+                      for i in range(0, len(missing), self.chunk_size)]
+
+            def run(chunk):
+                return self._aggregate([(to, True, data)
+                                        for to, data in (calls[i] for i in chunk)])
+
+            workers = min(self.max_workers, len(chunks))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    fetched = [r for chunk in pool.map(run, chunks) for r in chunk]
+            else:
+                fetched = [r for chunk in chunks for r in run(chunk)]
+        for i, result in zip(missing, fetched):
+            self.cache.put(self._key(*calls[i]), result)
+            results[i] = result
+        return [None if result is _REVERTED else result for result in results]
+
+    def _aggregate(self, calls: list) -> list:
+        data = AGGREGATE3 + abi_encode(['(address,bool,bytes)[]'], [calls])
+        raw = self.w3.eth.call({'to': self.multicall, 'data': data}, self.block_id)
+        return [bytes(result) if ok else _REVERTED
+                for ok, result in abi_decode(['(bool,bytes)[]'], raw)[0]]
+
+    # ---- typed reads ----
+
+    def uints(self, calls: list) -> list:
+        """First return word of each call as an int (None where reverted)."""
+        return [None if r is None else int.from_bytes(r[:32], 'big')
+                for r in self.call_many(calls)]
+
+    def uint(self, to: str, data: bytes) -> int:
+        return int.from_bytes(self.call(to, data)[:32], 'big')
+
+    def balance_of(self, token: str, account: str) -> int:
+        return self.uint(token, encoders.balance_of(account))
+
+    def balances_of(self, token: str, accounts: list) -> list:
+        """ERC-20 balances of many accounts, one multicall per chunk."""
+        return self.uints([(token, encoders.balance_of(a)) for a in accounts])
+
+    def eth_balances(self, accounts: list) -> list:
+        """ETH balances via Multicall3.getEthBalance."""
+        return self.uints([(self.multicall, GET_ETH_BALANCE + address_word(a)) for a in accounts])
+
+    def decode(self, to: str, data: bytes, types: list) -> tuple:
+        """Call and ABI-decode the result."""
+        return abi_decode(types, self.call(to, data))
+
+
+# ============================================
+# CLIENT VIEW
+# ============================================
+
+TOTAL_BACKING_USDC = selector('totalBackingUSDC()')
+GET_ESCROW = selector('getEscrow(uint256)')
+_ESCROW_TYPES = ['address', 'address', 'uint256', 'uint256', 'bool', 'bool']
+
+
+class BlockView:
+    """
+    ``novis.NOVISClient`` reads pinned to one block (``client.at_block``,
+    ``client.snapshot``). Same return values as the client's own methods.
+    """
+
+    def __init__(self, client, snapshot: Snapshot):
+        self.client = client
+        self.snapshot = snapshot
+        self.block_number = snapshot.block_number
+        self.timestamp = snapshot.timestamp
+
+    def get_balance(self, address: str = None) -> float:
+        """Get NOVIS balance."""
+        return self.get_balances([address or self.client.address])[0]
+
+    def get_balances(self, addresses: list) -> list:
+        """NOVIS balances of many addresses (batched)."""
+        balances = self.snapshot.balances_of(self.client.addresses['NOVIS_TOKEN'], addresses)
+        return [float(self.client.w3.from_wei(b, 'ether')) for b in balances]
+
+    def get_usdc_balance(self, address: str = None) -> float:
+        """Get USDC balance."""
+        balance = self.snapshot.balance_of(self.client.addresses['USDC'],
+                                           address or self.client.address)
+        return float(balance) / 1e6
+
+    def get_total_backing(self) -> float:
+        """Get total USDC backing in vault."""
+        return float(self.snapshot.uint(self.client.addresses['VAULT'], TOTAL_BACKING_USDC)) / 1e6
+
+    def get_escrow(self, escrow_id: int) -> dict:
+        """Get escrow details."""
+        return self.get_escrows([escrow_id])[0]
+
+    def get_escrows(self, escrow_ids: list) -> list:
+        """Escrow details for many ids (batched)."""
+        router = self.client.addresses['PAYMENT_ROUTER']
+        results = self.snapshot.call_many([(router, GET_ESCROW + i.to_bytes(32, 'big'))
+                                           for i in escrow_ids])
+        escrows = []
+        for escrow_id, raw in zip(escrow_ids, results):
+            if raw is None:
+                raise CallReverted(f'getEscrow({escrow_id}) reverted at block {self.block_number}')
+            payer, payee, amount, deadline, released, refunded = abi_decode(_ESCROW_TYPES, raw)
+            escrows.append({
+                'payer': to_address(payer),
+                'payee': to_address(payee),
+                'amount': float(self.client.w3.from_wei(amount, 'ether')),
+                'deadline': deadline,
+                'released': released,
+                'refunded': refunded
+            })
+        return escrows
+
+
+__all__ = ['Snapshot', 'ReadCache', 'BlockView', 'CallReverted', 'selector']
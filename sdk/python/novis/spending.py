@@ -0,0 +1,255 @@
+"""
+NOVIS Spending Ledger
+
+Local mirror of a NOVISSmartAccountV4 daily limit, so payments that would
+revert in ``_checkSpendingLimits`` are refused before anything is signed.
+
+The ledger is seeded from ``getDailySpending()``/``perTxLimit()``, kept
+current from ``SpendingTracked`` and ``DailyLimitSet`` events, and counts
+our own in-flight submissions as reserved. Days roll over exactly as on
+chain: ``block.timestamp / 1 days``.
+
+Example:
+    from novis.spending import SpendingLedger
+
+    ledger = SpendingLedger(client.w3, account).seed()
+    ops = SmartAccountOps(client, account, bundler_url, ledger=ledger)
+    ops.transfer('0x...', 25)   # raises DailyLimitExceeded locally if over
+"""
+
+import itertools
+import threading
+import time
+
+from web3 import Web3
+
+from .addresses import to_address
+
+TRANSFER_SELECTOR = Web3.keccak(text='transfer(address,uint256)')[:4]
+SPENDING_TRACKED_TOPIC = Web3.keccak(text='SpendingTracked(uint256,uint256,uint256)')
+DAILY_LIMIT_SET_TOPIC = Web3.keccak(text='DailyLimitSet(uint256)')
+
+DAY = 86400
+
+ACCOUNT_LIMITS_ABI = [
+    {"name": "getDailySpending", "type": "function", "stateMutability": "view",
+     "inputs": [],
+     "outputs": [
+         {"name": "spent", "type": "uint256"},
+         {"name": "limit", "type": "uint256"},
+         {"name": "remaining", "type": "uint256"}
+     ]},
+    {"name": "perTxLimit", "type": "function", "stateMutability": "view",
+     "inputs": [],
+     "outputs": [{"type": "uint256"}]}
+]
+
+
+class DailyLimitExceeded(Exception):
+    """A spend would exceed the smart account's per-tx or daily limit."""
+
+    code = 'DAILY_LIMIT'
+
+    def __init__(self, message: str, amount: int, remaining: int):
+        super().__init__(message)
+        self.amount = amount
+        self.remaining = remaining
+
+
+def tracked_amount(token: str, to: str, value: int, data: bytes) -> int:
+    """
+    Amount NOVISSmartAccountV4.execute(to, value, data) charges to the limit.
+
+    NOVIS transfer(recipient, amount) calls count ``amount``; everything
+    else counts the ETH ``value``.
+    """
+    if to.lower() == token.lower() and len(data) >= 68 and data[:4] == TRANSFER_SELECTOR:
+        return int.from_bytes(data[36:68], 'big')
+    return value
+
+
+class SpendingLedger:
+    """
+    Per-account daily spending ledger.
+
+    ``spent`` is the last on-chain ``dailySpent`` we know of (as of
+    ``synced_block``); reservations cover everything submitted since.
+
+    Args:
+        w3: Web3 instance
+        account: Smart account address
+        queue: Wait for the next day instead of raising when over the limit
+    """
+
+    def __init__(self, w3, account: str, queue: bool = False):
+        self.w3 = w3
+        self.account = to_address(account)
+        self.contract = w3.eth.contract(address=self.account, abi=ACCOUNT_LIMITS_ABI)
+        self.queue = queue
+        self.spent = 0
+        self.daily_limit = 0
+        self.per_tx_limit = 0
+        self.day = 0
+        self.synced_block = 0
+        self._reserved = {}    # handle -> [amount, day, block_number or None]
+        self._ids = itertools.count(1)
+        self._clock_offset = 0
+        self._block_times = {}
+        self._cond = threading.Condition()
+
+    # ---- chain state ----
+
+    def seed(self, block='latest') -> 'SpendingLedger':
+        """Load spent/limit from the contract at ``block``."""
+        header = self.w3.eth.get_block(block)
+        spent, limit, _ = self.contract.functions.getDailySpending().call(
+            block_identifier=header.number)
+        per_tx = self.contract.functions.perTxLimit().call(block_identifier=header.number)
+        with self._cond:
+            self._clock_offset = header.timestamp - time.time()
+            self.spent, self.daily_limit, self.per_tx_limit = spent, limit, per_tx
+            self.day = header.timestamp // DAY
+            self.synced_block = header.number
+            self._drop_confirmed()
+            self._cond.notify_all()
+        return self
+
+    def sync(self, to_block='latest') -> int:
+        """Apply SpendingTracked/DailyLimitSet logs since the last sync."""
+        to_block = self.w3.eth.block_number if to_block == 'latest' else to_block
+        if to_block <= self.synced_block:
+            return 0
+        logs = self.w3.eth.get_logs({
+            'address': self.account,
+            'fromBlock': self.synced_block + 1,
+            'toBlock': to_block,
+            'topics': [[Web3.to_hex(SPENDING_TRACKED_TOPIC), Web3.to_hex(DAILY_LIMIT_SET_TOPIC)]]
+        })
+        for log in logs:
+            self.apply_log(log, self._block_time(log['blockNumber']))
+        with self._cond:
+            self.synced_block = max(self.synced_block, to_block)
+            self._drop_confirmed()
+            self._cond.notify_all()
+        return len(logs)
+
+    def apply_log(self, log, timestamp: int = None):
+        """Apply one SpendingTracked or DailyLimitSet log (e.g. from a receipt)."""
+        topic = bytes(log['topics'][0])
+        data = bytes(log['data'])
+        block = log['blockNumber']
+        if timestamp is None:
+            timestamp = int(self.chain_time())
+        with self._cond:
+            if topic == SPENDING_TRACKED_TOPIC:
+                if block < self.synced_block:
+                    return
+                self.spent = int.from_bytes(data[32:64], 'big')
+                self.daily_limit = int.from_bytes(data[64:96], 'big')
+                self.day = timestamp // DAY
+                self.synced_block = max(self.synced_block, block)
+            elif topic == DAILY_LIMIT_SET_TOPIC:
+                self.daily_limit = int.from_bytes(data[:32], 'big')
+            self._drop_confirmed()
+            self._cond.notify_all()
+
+    def _block_time(self, number: int) -> int:
+        ts = self._block_times.get(number)
+        if ts is None:
+            ts = self._block_times[number] = self.w3.eth.get_block(number).timestamp
+        return ts
+
+    def _drop_confirmed(self):
+        for handle, (_, _, block) in list(self._reserved.items()):
+            if block is not None and block <= self.synced_block:
+                del self._reserved[handle]
+
+    # ---- local checks ----
+
+    def chain_time(self) -> float:
+        """Local estimate of block.timestamp (offset measured at seed)."""
+        return time.time() + self._clock_offset
+
+    def _roll(self, today: int):
+        if today > self.day:
+            self.spent = 0
+            self.day = today
+            for handle, (_, day, block) in list(self._reserved.items()):
+                if block is not None and day < today:
+                    del self._reserved[handle]
+
+    def remaining(self) -> int:
+        """Daily headroom after on-chain spend and our reservations (no RPC)."""
+        with self._cond:
+            self._roll(int(self.chain_time()) // DAY)
+            return self.daily_limit - self.spent - sum(r[0] for r in self._reserved.values())
+
+    def check(self, amount: int):
+        """Raise DailyLimitExceeded if ``amount`` (wei) cannot be spent now."""
+        if amount > self.per_tx_limit:
+            raise DailyLimitExceeded(
+                f'{amount} exceeds per-tx limit {self.per_tx_limit}', amount, self.per_tx_limit)
+        remaining = self.remaining()
+        if amount > remaining:
+            raise DailyLimitExceeded(
+                f'{amount} exceeds remaining daily limit {remaining}', amount, remaining)
+
+    def reserve(self, amount: int, timeout: float = None) -> int:
+        """
+        Reserve ``amount`` wei against today's limit and return a handle.
+
+        With ``queue=True`` an over-limit reservation waits (up to
+        ``timeout``) for headroom: a released reservation, a raised limit
+        or the next day.
+        """
+        if amount == 0:
+            return 0
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                try:
+                    self.check(amount)
+                    break
+                except DailyLimitExceeded:
+                    if not self.queue or amount > self.per_tx_limit:
+                        raise
+                    wait = (self.day + 1) * DAY - self.chain_time()
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.time())
+                        if wait <= 0:
+                            raise
+                    self._cond.wait(max(wait, 0.01))
+            handle = next(self._ids)
+            self._reserved[handle] = [amount, self.day, None]
+            return handle
+
+    def confirm(self, handle: int, block_number: int):
+        """Mark a reservation as mined; it is dropped once synced past that block."""
+        with self._cond:
+            entry = self._reserved.get(handle)
+            if entry is None:
+                return
+            if block_number <= self.synced_block:
+                del self._reserved[handle]
+            else:
+                entry[2] = block_number
+
+    def release(self, handle: int):
+        """Return a reservation whose submission failed or reverted."""
+        with self._cond:
+            self._reserved.pop(handle, None)
+            self._cond.notify_all()
+
+    def state(self) -> dict:
+        return {
+            'spent': self.spent,
+            'reserved': sum(r[0] for r in self._reserved.values()),
+            'daily_limit': self.daily_limit,
+            'per_tx_limit': self.per_tx_limit,
+            'remaining': self.remaining(),
+            'day': self.day,
+            'synced_block': self.synced_block
+        }
+
+
+__all__ = ['SpendingLedger', 'DailyLimitExceeded', 'tracked_amount']
@@ -0,0 +1,319 @@
+"""
+NOVIS tracing
+
+Opt-in per-call span trees for the NOVIS clients.
+
+Each high-level call (``transfer``, ``mint``, ...) opens a root span and
+every phase underneath it (relayer requests, signing, approvals, receipt
+waits) opens a child span. When the root span closes the whole trace is
+handed to a sink as a list of span dicts.
+
+Example:
+    from novis import NOVISClient
+    from novis.tracing import Tracer, JSONLSink
+
+    tracer = Tracer(JSONLSink('traces.jsonl'), sample_rate=0.05)
+    client = NOVISClient(private_key='0x...', tracer=tracer)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+
+# ============================================
+# SPANS
+# ============================================
+
+class Span:
+    """A single timed phase inside a trace."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start',
+                 'end', 'attributes', 'error', '_trace')
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None,
+                 attributes: dict = None, trace=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+        self._trace = trace
+
+    @property
+    def duration_ms(self) -> float:
+        """Span duration in milliseconds (None while open)."""
+        if self.end is None:
+            return None
+        return (self.end - self.start) * 1000
+
+    def set_attribute(self, key: str, value):
+        """Attach an attribute (tx hash, nonce, ...) to the span."""
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'end': self.end,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class _NoopSpan:
+    """Span handed out when tracing is off or the trace was not sampled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current = ContextVar('novis_current_span', default=None)
+
+
+class _UnsampledScope:
+    """
+    Root scope of an unsampled call: marks the context so child spans
+    inherit the decision instead of being sampled as new roots.
+    """
+
+    __slots__ = ('token',)
+
+    def __init__(self):
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current.set(NOOP_SPAN)
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        return False
+
+
+class _Trace:
+    """Spans collected for one sampled root call."""
+
+    __slots__ = ('trace_id', 'spans')
+
+    def __init__(self):
+        self.trace_id = '%032x' % random.getrandbits(128)
+        self.spans = []
+
+
+class _SpanScope:
+    """Context manager that opens and closes a recorded span."""
+
+    __slots__ = ('tracer', 'span', 'token')
+
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end = time.time()
+        if exc is not None:
+            span.error = f'{exc_type.__name__}: {exc}'
+        _current.reset(self.token)
+        span._trace.spans.append(span)
+        if span.parent_id is None:
+            self.tracer._finish(span)
+        return False
+
+
+# ============================================
+# TRACER
+# ============================================
+
+class Tracer:
+    """
+    Records span trees and exports them to a sink.
+
+    Args:
+        sink: Object with an ``export(spans)`` method (None disables tracing)
+        sample_rate: Fraction of root calls to record (0.0 - 1.0)
+        min_duration_ms: Only export traces whose root took at least this long
+        always_export_errors: Export failed traces even if too fast
+
+    Sampling is decided once per root span; unsampled calls get a shared
+    no-op span so the hot path only pays for one random draw.
+    """
+
+    def __init__(self, sink=None, sample_rate: float = 1.0,
+                 min_duration_ms: float = 0, always_export_errors: bool = True):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.min_duration_ms = min_duration_ms
+        self.always_export_errors = always_export_errors
+
+    @property
+    def enabled(self) -> bool:
+        return self.sink is not None and self.sample_rate > 0
+
+    def span(self, name: str, **attributes):
+        """
+        Open a span under the current one (or a new trace if none).
+
+        Use as a context manager:
+            with tracer.span('/relay', to=to) as span:
+                span.set_attribute('tx_hash', tx_hash)
+        """
+        parent = _current.get()
+        if parent is None:
+            if not self.enabled:
+                return NOOP_SPAN
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledScope()
+            trace = _Trace()
+            return _SpanScope(self, Span(name, trace.trace_id, None, attributes, trace))
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        trace = parent._trace
+        return _SpanScope(self, Span(name, trace.trace_id, parent.span_id, attributes, trace))
+
+    def _finish(self, root: Span):
+        if root.duration_ms < self.min_duration_ms:
+            failed = any(s.error for s in root._trace.spans)
+            if not (failed and self.always_export_errors):
+                return
+        self.sink.export([s.to_dict() for s in root._trace.spans])
+
+
+def current_span():
+    """Return the active span (or a no-op span outside any trace)."""
+    return _current.get() or NOOP_SPAN
+
+
+NOOP_TRACER = Tracer()
+
+
+# ============================================
+# SINKS
+# ============================================
+
+class MemorySink:
+    """
+    In-memory ring buffer of the most recent traces.
+
+    Args:
+        maxlen: Number of traces to keep
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.traces = deque(maxlen=maxlen)
+
+    def export(self, spans: list):
+        self.traces.append(spans)
+
+    def slowest(self, n: int = 10) -> list:
+        """Return the n slowest traces, root span first."""
+        return sorted(self.traces, key=lambda t: -(t[-1]['duration_ms'] or 0))[:n]
+
+    def clear(self):
+        self.traces.clear()
+
+
+class JSONLSink:
+    """
+    Append one JSON line per trace to a file.
+
+    Args:
+        path: Output file (opened in append mode)
+        flush: Flush after every trace (default True)
+    """
+
+    def __init__(self, path: str, flush: bool = True):
+        self.path = os.fspath(path)
+        self.flush = flush
+        self._lock = threading.Lock()
+        self._fh = open(self.path, 'a', encoding='utf-8')
+
+    def export(self, spans: list):
+        line = json.dumps({'trace_id': spans[-1]['trace_id'], 'spans': spans},
+                          default=str)
+        with self._lock:
+            self._fh.write(line + '\n')
+            if self.flush:
+                self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class OpenTelemetrySink:
+    """
+    Replay finished traces into an OpenTelemetry tracer.
+
+    Requires the ``opentelemetry-api`` package; configure the provider and
+    exporter (OTLP, Jaeger, ...) as usual.
+
+    Args:
+        tracer_provider: Optional provider (defaults to the global one)
+        name: Instrumentation scope name
+    """
+
+    def __init__(self, tracer_provider=None, name: str = 'novis'):
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError as e:
+            raise ImportError(
+                'OpenTelemetrySink requires opentelemetry-api: '
+                'pip install opentelemetry-api opentelemetry-sdk'
+            ) from e
+        self._otel = otel_trace
+        self._tracer = otel_trace.get_tracer(name, tracer_provider=tracer_provider)
+
+    def export(self, spans: list):
+        started = {}
+        # Spans are appended as they close, so parents come after children.
+        for span in reversed(spans):
+            parent = started.get(span['parent_id'])
+            context = self._otel.set_span_in_context(parent) if parent else None
+            otel_span = self._tracer.start_span(
+                span['name'],
+                context=context,
+                start_time=int(span['start'] * 1e9),
+                attributes={k: v if isinstance(v, (bool, int, float, str)) else str(v)
+                            for k, v in span['attributes'].items()}
+            )
+            if span['error']:
+                otel_span.set_status(self._otel.Status(
+                    self._otel.StatusCode.ERROR, span['error']
+                ))
+            started[span['span_id']] = otel_span
+        for span in spans:
+            started[span['span_id']].end(end_time=int(span['end'] * 1e9))
+
+
+__all__ = [
+    'Tracer', 'Span', 'NOOP_TRACER', 'NOOP_SPAN', 'current_span',
+    'MemorySink', 'JSONLSink', 'OpenTelemetrySink'
+]
@@ -0,0 +1,558 @@
+"""
+NOVIS ERC-4337 UserOperations
+
+Build, sign and submit UserOperations for NOVISSmartAccountV4 through the
+v0.6 EntryPoint and any ERC-4337 bundler.
+
+Nonces use the EntryPoint's 2D scheme (``key << 64 | sequence``): each
+key is an independent lane, so one smart account can have as many
+UserOps in flight as it has lanes.
+
+Example:
+    from novis import NOVISClient
+    from novis.userop import SmartAccountOps
+
+    client = NOVISClient(private_key='0x...')
+    ops = SmartAccountOps(client, '0xSmartAccount...', bundler_url, lanes=8)
+    results = ops.transfer_many([('0xA...', 10), ('0xB...', 5)])
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from eth_abi import encode as abi_encode
+from eth_account.messages import encode_defunct
+from web3 import Web3
+
+from . import ADDRESSES
+from .addresses import address_word, to_address
+from .spending import tracked_amount
+from .tracing import NOOP_TRACER
+
+EXECUTE_SELECTOR = Web3.keccak(text='execute(address,uint256,bytes)')[:4]
+TRANSFER_SELECTOR = Web3.keccak(text='transfer(address,uint256)')[:4]
+EMPTY_HASH = Web3.keccak(b'')
+
+# 64-byte r/s + v, recovers to a random address without reverting
+DUMMY_SIGNATURE = b'\xff' * 64 + b'\x1c'
+
+ENTRYPOINT_ABI = [
+    {"name": "getNonce", "type": "function", "stateMutability": "view",
+     "inputs": [{"name": "sender", "type": "address"}, {"name": "key", "type": "uint192"}],
+     "outputs": [{"type": "uint256"}]}
+]
+
+PAYMASTER_ABI = [
+    {"name": "getStats", "type": "function", "stateMutability": "view",
+     "inputs": [],
+     "outputs": [
+         {"name": "ethBalance", "type": "uint256"},
+         {"name": "totalGasSponsored", "type": "uint256"},
+         {"name": "totalFeesCollected", "type": "uint256"},
+         {"name": "freeThreshold", "type": "uint256"},
+         {"name": "feePercentageBps", "type": "uint256"}
+     ]}
+]
+
+
+class UserOpError(Exception):
+    """Raised when the bundler rejects or fails a UserOperation."""
+
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+
+# ============================================
+# ENCODING & HASHING
+# ============================================
+
+def _word(value: int) -> bytes:
+    return value.to_bytes(32, 'big')
+
+
+def _hexbytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith('0x') else value)
+    return bytes(value)
+
+
+def encode_execute(to: str, value: int, data: bytes) -> bytes:
+    """Calldata for NOVISSmartAccountV4.execute(to, value, data)."""
+    return EXECUTE_SELECTOR + abi_encode(['address', 'uint256', 'bytes'], [to, value, data])
+
+
+def encode_transfer(to: str, amount_wei: int) -> bytes:
+    """Calldata for ERC20 transfer(to, amount)."""
+    return TRANSFER_SELECTOR + address_word(to) + _word(amount_wei)
+
+
+class UserOperation:
+    """
+    EntryPoint v0.6 UserOperation.
+
+    Byte fields are stored as bytes; ``to_rpc()`` gives the hex form the
+    bundler JSON-RPC expects.
+    """
+
+    __slots__ = ('sender', 'nonce', 'init_code', 'call_data', 'call_gas_limit',
+                 'verification_gas_limit', 'pre_verification_gas', 'max_fee_per_gas',
+                 'max_priority_fee_per_gas', 'paymaster_and_data', 'signature')
+
+    def __init__(self, sender: str, nonce: int, call_data: bytes, init_code: bytes = b'',
+                 call_gas_limit: int = 200000, verification_gas_limit: int = 200000,
+                 pre_verification_gas: int = 50000, max_fee_per_gas: int = 0,
+                 max_priority_fee_per_gas: int = 0, paymaster_and_data: bytes = b'',
+                 signature: bytes = b''):
+        self.sender = to_address(sender)
+        self.nonce = nonce
+        self.init_code = init_code
+        self.call_data = call_data
+        self.call_gas_limit = call_gas_limit
+        self.verification_gas_limit = verification_gas_limit
+        self.pre_verification_gas = pre_verification_gas
+        self.max_fee_per_gas = max_fee_per_gas
+        self.max_priority_fee_per_gas = max_priority_fee_per_gas
+        self.paymaster_and_data = paymaster_and_data
+        self.signature = signature
+
+    def pack(self) -> bytes:
+        """ABI-encoded UserOp with dynamic fields hashed (as the EntryPoint does)."""
+        return b''.join((
+            address_word(self.sender),
+            _word(self.nonce),
+            Web3.keccak(self.init_code) if self.init_code else EMPTY_HASH,
+            Web3.keccak(self.call_data),
+            _word(self.call_gas_limit),
+            _word(self.verification_gas_limit),
+            _word(self.pre_verification_gas),
+            _word(self.max_fee_per_gas),
+            _word(self.max_priority_fee_per_gas),
+            Web3.keccak(self.paymaster_and_data) if self.paymaster_and_data else EMPTY_HASH
+        ))
+
+    def hash(self, entry_point: str, chain_id: int) -> bytes:
+        """userOpHash as returned by EntryPoint.getUserOpHash()."""
+        return user_op_hash(self, entry_point, chain_id)
+
+    def to_rpc(self) -> dict:
+        return {
+            'sender': self.sender,
+            'nonce': hex(self.nonce),
+            'initCode': '0x' + self.init_code.hex(),
+            'callData': '0x' + self.call_data.hex(),
+            'callGasLimit': hex(self.call_gas_limit),
+            'verificationGasLimit': hex(self.verification_gas_limit),
+            'preVerificationGas': hex(self.pre_verification_gas),
+            'maxFeePerGas': hex(self.max_fee_per_gas),
+            'maxPriorityFeePerGas': hex(self.max_priority_fee_per_gas),
+            'paymasterAndData': '0x' + self.paymaster_and_data.hex(),
+            'signature': '0x' + self.signature.hex()
+        }
+
+    @classmethod
+    def from_rpc(cls, op: dict) -> 'UserOperation':
+        return cls(
+            sender=op['sender'],
+            nonce=int(op['nonce'], 16),
+            init_code=_hexbytes(op.get('initCode', '0x')),
+            call_data=_hexbytes(op['callData']),
+            call_gas_limit=int(op['callGasLimit'], 16),
+            verification_gas_limit=int(op['verificationGasLimit'], 16),
+            pre_verification_gas=int(op['preVerificationGas'], 16),
+            max_fee_per_gas=int(op['maxFeePerGas'], 16),
+            max_priority_fee_per_gas=int(op['maxPriorityFeePerGas'], 16),
+            paymaster_and_data=_hexbytes(op.get('paymasterAndData', '0x')),
+            signature=_hexbytes(op.get('signature', '0x'))
+        )
+
+
+_hash_suffix_cache = {}
+
+
+def user_op_hash(op: UserOperation, entry_point: str, chain_id: int) -> bytes:
+    """
+    Compute the v0.6 userOpHash locally (no getUserOpHash eth_call).
+
+    keccak256(abi.encode(keccak256(pack(op)), entryPoint, chainId))
+    """
+    suffix = _hash_suffix_cache.get((entry_point, chain_id))
+    if suffix is None:
+        suffix = address_word(entry_point) + _word(chain_id)
+        _hash_suffix_cache[(entry_point, chain_id)] = suffix
+    return Web3.keccak(Web3.keccak(op.pack()) + suffix)
+
+
+def sign_user_op(op: UserOperation, account, entry_point: str, chain_id: int) -> bytes:
+    """Sign the userOpHash as NOVISSmartAccountV4.validateUserOp expects (EIP-191)."""
+    op_hash = user_op_hash(op, entry_point, chain_id)
+    op.signature = bytes(account.sign_message(encode_defunct(primitive=op_hash)).signature)
+    return op_hash
+
+
+# ============================================
+# 2D NONCE LANES
+# ============================================
+
+class NonceLanes:
+    """
+    Pool of EntryPoint nonce keys for one sender.
+
+    Each lane (key) carries at most one UserOp in flight. ``acquire()``
+    blocks until a lane is free and returns (key, nonce); ``release()``
+    advances the lane once the op is included, or leaves it unchanged if
+    the op never made it on-chain.
+
+    Args:
+        entry_point: web3 contract with getNonce(address,uint192)
+        sender: Smart account address
+        lanes: Number of parallel keys
+        first_key: First key to use (keys are first_key .. first_key+lanes-1)
+    """
+
+    def __init__(self, entry_point, sender: str, lanes: int = 8, first_key: int = 0):
+        self.entry_point = entry_point
+        self.sender = to_address(sender)
+        self._free = list(range(first_key, first_key + lanes))
+        self._seq = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                raise TimeoutError('no free nonce lane')
+            key = self._free.pop(0)
+            seq = self._seq.get(key)
+        if seq is None:
+            nonce = self.entry_point.functions.getNonce(self.sender, key).call()
+            seq = nonce & (2**64 - 1)
+            with self._cond:
+                self._seq[key] = seq
+        return key, (key << 64) | seq
+
+    def release(self, key: int, included: bool):
+        with self._cond:
+            if included:
+                self._seq[key] += 1
+            else:
+                # Unknown on-chain state: re-read the lane on next use
+                self._seq.pop(key, None)
+            self._free.append(key)
+            self._cond.notify()
+
+
+# ============================================
+# BUNDLER & PAYMASTER
+# ============================================
+
+class BundlerClient:
+    """
+    Minimal ERC-4337 bundler JSON-RPC client.
+
+    Args:
+        url: Bundler RPC endpoint
+        entry_point: EntryPoint address (default: v0.6 on Base)
+    """
+
+    def __init__(self, url: str, entry_point: str = None, timeout: float = 30):
+        self.url = url
+        self.entry_point = entry_point or ADDRESSES['ENTRYPOINT']
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._id = 0
+        self._lock = threading.Lock()
+
+    def request(self, method: str, params: list):
+        with self._lock:
+            self._id += 1
+            request_id = self._id
+        res = self.session.post(self.url, json={
+            'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params
+        }, timeout=self.timeout)
+        res.raise_for_status()
+        body = res.json()
+        if body.get('error'):
+            raise UserOpError(body['error'].get('message', 'bundler error'),
+                              body['error'].get('code'))
+        return body.get('result')
+
+    def supported_entry_points(self) -> list:
+        return self.request('eth_supportedEntryPoints', [])
+
+    def estimate_gas(self, op: UserOperation) -> dict:
+        """Return callGasLimit, verificationGasLimit and preVerificationGas as ints."""
+        result = self.request('eth_estimateUserOperationGas', [op.to_rpc(), self.entry_point])
+        return {k: int(v, 16) if isinstance(v, str) else int(v) for k, v in result.items()
+                if k in ('callGasLimit', 'verificationGasLimit', 'preVerificationGas')}
+
+    def send(self, op: UserOperation) -> str:
+        return self.request('eth_sendUserOperation', [op.to_rpc(), self.entry_point])
+
+    def get_receipt(self, op_hash: str):
+        return self.request('eth_getUserOperationReceipt', [op_hash])
+
+    def sponsor(self, op: UserOperation) -> dict:
+        """Ask a sponsoring paymaster service (pm_sponsorUserOperation)."""
+        return self.request('pm_sponsorUserOperation',
+                            [op.to_rpc(), {'entryPoint': self.entry_point}])
+
+    def wait_for_receipt(self, op_hash: str, timeout: float = 120,
+                         poll_interval: float = 1.0) -> dict:
+        deadline = time.time() + timeout
+        while True:
+            receipt = self.get_receipt(op_hash)
+            if receipt:
+                return receipt
+            if time.time() > deadline:
+                raise TimeoutError(f'UserOp {op_hash} not included after {timeout}s')
+            time.sleep(poll_interval)
+
+
+class NOVISPaymaster:
+    """
+    paymasterAndData and fee preview for the NOVISPaymaster contract.
+
+    Fee parameters are read once from ``getStats()`` and cached, so
+    ``fee()`` needs no RPC.
+
+    Args:
+        w3: Web3 instance
+        address: Paymaster address (default: ADDRESSES['PAYMASTER'])
+        data: Extra bytes appended after the paymaster address
+    """
+
+    def __init__(self, w3, address: str = None, data: bytes = b''):
+        self.address = to_address(address or ADDRESSES['PAYMASTER'])
+        self.contract = w3.eth.contract(address=self.address, abi=PAYMASTER_ABI)
+        self.data = data
+        self._params = None
+
+    def paymaster_and_data(self, op: UserOperation = None) -> bytes:
+        return _hexbytes(self.address) + self.data
+
+    def refresh(self):
+        stats = self.contract.functions.getStats().call()
+        self._params = (stats[3], stats[4])
+
+    def fee(self, amount_wei: int) -> int:
+        """NOVIS fee charged for sponsoring a transfer of amount_wei."""
+        if self._params is None:
+            self.refresh()
+        free_threshold, fee_bps = self._params
+        if amount_wei < free_threshold:
+            return 0
+        return amount_wei * fee_bps // 10000
+
+
+# ============================================
+# PIPELINE
+# ============================================
+
+class SmartAccountOps:
+    """
+    Send NOVISSmartAccountV4.execute calls as UserOperations.
+
+    Args:
+        client: novis.NOVISClient whose key owns the smart account
+        account: Smart account address
+        bundler: BundlerClient or bundler URL
+        paymaster: NOVISPaymaster, 'sponsor' (use pm_sponsorUserOperation) or None
+        lanes: Parallel 2D nonce keys (max UserOps in flight)
+        fee_ttl: Seconds to reuse fetched gas prices
+        gas_multiplier: Safety margin applied to bundler gas estimates
+        ledger: novis.spending.SpendingLedger to pre-check daily limits
+    """
+
+    def __init__(self, client, account: str, bundler, paymaster=None, lanes: int = 8,
+                 fee_ttl: float = 12, gas_multiplier: float = 1.2, ledger=None):
+        self.client = client
+        self.w3 = client.w3
+        self.account = to_address(account)
+        if not isinstance(bundler, BundlerClient):
+            bundler = BundlerClient(bundler, client.addresses['ENTRYPOINT'])
+        self.bundler = bundler
+        self.entry_point = to_address(self.bundler.entry_point)
+        self.chain_id = client.chain_id
+        self.paymaster = paymaster
+        self.lanes = NonceLanes(
+            self.w3.eth.contract(address=self.entry_point, abi=ENTRYPOINT_ABI),
+            self.account, lanes
+        )
+        self.lane_count = lanes
+        self.fee_ttl = fee_ttl
+        self.gas_multiplier = gas_multiplier
+        self.ledger = ledger
+        self.tracer = getattr(client, 'tracer', NOOP_TRACER)
+        self._fees = None
+        self._gas_cache = {}
+        self._lock = threading.Lock()
+
+    # ---- building ----
+
+    def fees(self) -> tuple:
+        """(maxFeePerGas, maxPriorityFeePerGas), cached for fee_ttl seconds."""
+        with self._lock:
+            if self._fees and time.time() - self._fees[0] < self.fee_ttl:
+                return self._fees[1]
+        base_fee = self.w3.eth.get_block('latest').get('baseFeePerGas', 0)
+        priority = self.w3.eth.max_priority_fee
+        fees = (2 * base_fee + priority, priority)
+        with self._lock:
+            self._fees = (time.time(), fees)
+        return fees
+
+    def build(self, to: str, value: int, data: bytes, nonce: int) -> UserOperation:
+        max_fee, priority = self.fees()
+        op = UserOperation(
+            sender=self.account,
+            nonce=nonce,
+            call_data=encode_execute(to, value, data),
+            max_fee_per_gas=max_fee,
+            max_priority_fee_per_gas=priority
+        )
+        if isinstance(self.paymaster, NOVISPaymaster):
+            op.paymaster_and_data = self.paymaster.paymaster_and_data(op)
+        return op
+
+    def estimate(self, op: UserOperation, to: str, data: bytes):
+        """
+        Fill gas limits from the bundler.
+
+        Estimates are cached per (target, selector): ops of the same shape
+        reuse the first estimate instead of a round-trip each.
+        """
+        key = (to, bytes(data[:4]))
+        gas = self._gas_cache.get(key)
+        if gas is None:
+            op.signature = DUMMY_SIGNATURE
+            estimate = self.bundler.estimate_gas(op)
+            gas = {k: int(v * self.gas_multiplier) for k, v in estimate.items()}
+            self._gas_cache[key] = gas
+        op.call_gas_limit = gas.get('callGasLimit', op.call_gas_limit)
+        op.verification_gas_limit = gas.get('verificationGasLimit', op.verification_gas_limit)
+        op.pre_verification_gas = gas.get('preVerificationGas', op.pre_verification_gas)
+
+    def _sponsor(self, op: UserOperation):
+        if self.paymaster != 'sponsor':
+            return
+        op.signature = DUMMY_SIGNATURE
+        result = self.bundler.sponsor(op)
+        op.paymaster_and_data = _hexbytes(result['paymasterAndData'])
+        for field, attr in (('callGasLimit', 'call_gas_limit'),
+                            ('verificationGasLimit', 'verification_gas_limit'),
+                            ('preVerificationGas', 'pre_verification_gas')):
+            if result.get(field):
+                setattr(op, attr, int(result[field], 16))
+
+    # ---- sending ----
+
+    def execute(self, to: str, value: int = 0, data: bytes = b'', wait: bool = True,
+                lanes: NonceLanes = None, signer=None) -> dict:
+        """
+        Run one execute(to, value, data) through the EntryPoint.
+
+        ``lanes`` overrides the shared nonce lanes (see novis.workers);
+        ``signer`` the owner key, for accounts that validate other signers.
+
+        Returns:
+            {'user_op_hash', 'nonce', 'success', 'tx_hash', 'block_number', 'gas_used'}
+        """
+        to = to_address(to)
+        reservation = None
+        if self.ledger is not None:
+            reservation = self.ledger.reserve(
+                tracked_amount(self.client.addresses['NOVIS_TOKEN'], to, value, data))
+        try:
+            result = self._execute(to, value, data, wait, lanes, signer)
+        except Exception:
+            if reservation:
+                self.ledger.release(reservation)
+            raise
+        if reservation:
+            if not wait:
+                result['reservation'] = reservation
+            elif result['success']:
+                self.ledger.confirm(reservation, result['block_number'])
+            else:
+                self.ledger.release(reservation)
+        return result
+
+    def _execute(self, to, value, data, wait, lanes, signer):
+        with self.tracer.span('user_op', to=to) as span:
+            lanes = lanes or self.lanes
+            key, nonce = lanes.acquire()
+            span.set_attribute('nonce', nonce)
+            included = False
+            try:
+                with self.tracer.span('build'):
+                    op = self.build(to, value, data, nonce)
+                    self.estimate(op, to, data)
+                    self._sponsor(op)
+                with self.tracer.span('sign'):
+                    sign_user_op(op, signer or self.client.account, self.entry_point, self.chain_id)
+                with self.tracer.span('eth_sendUserOperation'):
+                    op_hash = self.bundler.send(op)
+                span.set_attribute('user_op_hash', op_hash)
+                result = {'user_op_hash': op_hash, 'nonce': nonce}
+                if not wait:
+                    # Caller owns the lane until it calls lanes.release()
+                    result['lane'] = key
+                    return result
+                with self.tracer.span('wait'):
+                    receipt = self.bundler.wait_for_receipt(op_hash)
+                included = True
+                tx_receipt = receipt.get('receipt', {})
+                result.update({
+                    'success': bool(receipt.get('success')),
+                    'tx_hash': tx_receipt.get('transactionHash'),
+                    'block_number': _int(tx_receipt.get('blockNumber')),
+                    'gas_used': _int(receipt.get('actualGasUsed'))
+                })
+                span.set_attribute('tx_hash', result['tx_hash'])
+                return result
+            finally:
+                if wait:
+                    lanes.release(key, included)
+
+    def transfer(self, to: str, amount: float, wait: bool = True, **kwargs) -> dict:
+        """Send NOVIS from the smart account via execute(token, 0, transfer(...))."""
+        amount_wei = self.w3.to_wei(amount, 'ether')
+        return self.execute(self.client.addresses['NOVIS_TOKEN'], 0,
+                            encode_transfer(to, amount_wei), wait, **kwargs)
+
+    def execute_many(self, calls: list, max_workers: int = None) -> list:
+        """
+        Run many (to, value, data) calls in parallel, one per free lane.
+
+        Results are returned in input order; failures are returned as
+        {'error': str} instead of raising.
+        """
+        def run(call):
+            try:
+                return self.execute(*call)
+            except Exception as e:
+                return {'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.lane_count) as pool:
+            return list(pool.map(run, calls))
+
+    def transfer_many(self, transfers: list, max_workers: int = None) -> list:
+        """Parallel NOVIS transfers: list of (to, amount)."""
+        token = self.client.addresses['NOVIS_TOKEN']
+        calls = [(token, 0, encode_transfer(to, self.w3.to_wei(amount, 'ether')))
+                 for to, amount in transfers]
+        return self.execute_many(calls, max_workers)
+
+
+def _int(value):
+    if value is None:
+        return None
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+__all__ = [
+    'UserOperation', 'UserOpError', 'BundlerClient', 'NOVISPaymaster', 'NonceLanes',
+    'SmartAccountOps', 'encode_execute', 'encode_transfer', 'user_op_hash', 'sign_user_op'
+]
@@ -0,0 +1,358 @@
+"""
+NOVIS Vault Pipeline
+
+Pipelined, bulk mint and redeem across many wallets.
+
+``NOVISClient.mint`` takes three round-trips and two block waits: it reads
+the allowance, sends ``approve`` and waits, then sends ``deposit`` and
+waits. Here each wallet signs its ``approve`` (only if the allowance is
+short) and every deposit or redemption with consecutive nonces. It
+broadcasts them back to back and waits for receipts only once all are
+out. Wallets run in parallel.
+
+Amounts are previewed offline before anything is signed. ``VaultParams``
+holds the deposit fee parameters: threshold, bps and the fee switch.
+They are read once in one multicall and can be cached with
+``to_dict``/``from_dict``. From them ``preview_mint`` and
+``preview_redeem`` apply the vault's own integer arithmetic:
+
+- deposit fee = amount * bps / 10000 at or above the threshold
+- 1e12 NOVIS wei per USDC unit, both ways
+
+Receipts report the amount actually minted or returned, next to the
+preview. A mismatch means the parameters changed after they were read.
+Transactions sent but not mined within ``timeout`` are returned under
+``pending`` (and stay pending in the client's journal), so a caller never
+loses the hash of a deposit or redemption that may still land.
+
+Example:
+    from novis.vault import VaultParams, VaultPipeline
+
+    params = VaultParams.load(client.w3)
+    params.preview_mint(5_000 * 10**6)      # {'usdc', 'fee', 'novis'}
+
+    pipeline = VaultPipeline(params)
+    results = pipeline.mint_many([(client_a, [1000, 2500]), (client_b, [40])])
+    results[0]['transactions'][0]['minted']
+    pipeline.redeem(client_a, [500])
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from . import ADDRESSES, encoders
+from .addresses import address_word
+from .journal import DROPPED, FAILED, INCLUDED
+from .snapshot import Snapshot, selector
+
+SCALE = 10**12          # NOVIS wei per USDC unit
+BPS_DENOMINATOR = 10_000
+
+FEE_THRESHOLD = selector('feeThreshold()')
+DEPOSIT_FEE_BPS = selector('depositFeeBps()')
+FEES_ENABLED = selector('feesEnabled()')
+ALLOWANCE = selector('allowance(address,address)')
+
+DEPOSIT_TOPIC = Web3.keccak(text='Deposit(address,uint256,uint256,uint256)')
+REDEEM_TOPIC = Web3.keccak(text='Redeem(address,uint256,uint256)')
+
+
+class VaultError(Exception):
+    pass
+
+
+class VaultParams:
+    """
+    Vault deposit fee parameters, for offline previews.
+
+    Args:
+        fee_threshold: Deposits below this (USDC units) pay no fee
+        deposit_fee_bps: Fee on deposits at or above the threshold
+        fees_enabled: The vault's fee switch
+        block_number: Block the values were read at (informational)
+    """
+
+    __slots__ = ('fee_threshold', 'deposit_fee_bps', 'fees_enabled', 'block_number')
+
+    def __init__(self, fee_threshold: int, deposit_fee_bps: int, fees_enabled: bool = True,
+                 block_number: int = None):
+        self.fee_threshold = fee_threshold
+        self.deposit_fee_bps = deposit_fee_bps
+        self.fees_enabled = fees_enabled
+        self.block_number = block_number
+
+    @classmethod
+    def load(cls, w3, addresses: dict = None, block='latest') -> 'VaultParams':
+        """Read the parameters in one multicall."""
+        addresses = addresses or ADDRESSES
+        vault = addresses['VAULT']
+        snapshot = Snapshot(w3, block, addresses['MULTICALL3'])
+        values = snapshot.uints([(vault, FEE_THRESHOLD), (vault, DEPOSIT_FEE_BPS),
+                                 (vault, FEES_ENABLED)])
+        if None in values:
+            raise VaultError(f'vault {vault} has no fee parameters at block {snapshot.block_number}')
+        threshold, bps, enabled = values
+        return cls(threshold, bps, bool(enabled), snapshot.block_number)
+
+    def to_dict(self) -> dict:
+        return {
+            'fee_threshold': self.fee_threshold,
+            'deposit_fee_bps': self.deposit_fee_bps,
+            'fees_enabled': self.fees_enabled,
+            'block_number': self.block_number
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'VaultParams':
+        return cls(data['fee_threshold'], data['deposit_fee_bps'], data['fees_enabled'],
+                   data.get('block_number'))
+
+    # ---- previews ----
+
+    def deposit_fee(self, usdc: int) -> int:
+        """Fee in USDC units that ``deposit(usdc)`` charges."""
+        if not self.fees_enabled or usdc < self.fee_threshold:
+            return 0
+        return usdc * self.deposit_fee_bps // BPS_DENOMINATOR
+
+    def preview_mint(self, usdc: int) -> dict:
+        """
+        What ``deposit(usdc)`` mints.
+
+        Returns:
+            {'usdc': units in, 'fee': units to the treasury, 'novis': wei minted}
+        """
+        fee = self.deposit_fee(usdc)
+        return {'usdc': usdc, 'fee': fee, 'novis': (usdc - fee) * SCALE}
+
+    @staticmethod
+    def preview_redeem(novis: int) -> int:
+        """USDC units that ``redeem(novis)`` returns (0: the vault reverts). No fee."""
+        return novis // SCALE
+
+
+class VaultPipeline:
+    """
+    Pipelined deposits and redemptions, one nonce sequence per wallet.
+
+    Args:
+        params: VaultParams for previews (default: loaded through the
+            first wallet that is used)
+        max_workers: Wallets processed in parallel
+        approve_gas: Gas limit of an approve
+        gas: Gas limit of each deposit or redeem
+        timeout: Seconds to wait for each receipt
+    """
+
+    def __init__(self, params: VaultParams = None, max_workers: int = 8,
+                 approve_gas: int = 100000, gas: int = 300000, timeout: float = 300):
+        self.params = params
+        self.max_workers = max(1, max_workers)
+        self.approve_gas = approve_gas
+        self.gas = gas
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def _params(self, client) -> VaultParams:
+        with self._lock:
+            if self.params is None:
+                self.params = VaultParams.load(client.w3, client.addresses)
+            return self.params
+
+    # ---- previews ----
+
+    def preview_mints(self, usdc_amounts: list, client=None) -> list:
+        """preview_mint of each amount (USDC, as taken by NOVISClient.mint)."""
+        params = self._params(client) if client is not None else self.params
+        return [params.preview_mint(int(a * 1e6)) for a in usdc_amounts]
+
+    def preview_redeems(self, novis_amounts: list) -> list:
+        """preview_redeem of each amount (NOVIS, as taken by NOVISClient.redeem)."""
+        return [VaultParams.preview_redeem(Web3.to_wei(a, 'ether')) for a in novis_amounts]
+
+    # ---- one wallet ----
+
+    def mint(self, client, usdc_amounts: list) -> dict:
+        """
+        Deposit each amount from ``client``'s wallet.
+
+        Returns:
+            {'address', 'approve': tx_hash or None, 'transactions': [{'tx_hash',
+            'block_number', 'gas_used', 'status', 'amount', 'preview', 'minted',
+            'fee'}], 'pending': [{'tx_hash', 'nonce', 'index', 'amount'}],
+            'skipped': [(index, amount, reason)], 'error'?}
+
+            ``pending`` holds transactions sent but without a receipt
+            (``index`` None for the approve). Amounts not sent because an
+            earlier broadcast failed are in ``skipped``.
+        """
+        params = self._params(client)
+        units = [int(a * 1e6) for a in usdc_amounts]
+        previews = [params.preview_mint(u) for u in units]
+        return self._submit(client, 'mint', usdc_amounts, units, previews,
+                            client.addresses['USDC'], encoders.deposit)
+
+    def redeem(self, client, novis_amounts: list) -> dict:
+        """
+        Redeem each amount from ``client``'s wallet. Same shape as mint(),
+        with 'returned' (USDC units) instead of 'minted' and 'fee'.
+        """
+        units = [Web3.to_wei(a, 'ether') for a in novis_amounts]
+        previews = [VaultParams.preview_redeem(u) for u in units]
+        return self._submit(client, 'redeem', novis_amounts, units, previews,
+                            client.addresses['NOVIS_TOKEN'], encoders.redeem)
+
+    def _submit(self, client, kind: str, amounts: list, units: list, previews: list,
+                token: str, encode) -> dict:
+        w3 = client.w3
+        vault = client.addresses['VAULT']
+        result = {'address': client.address, 'approve': None, 'transactions': [],
+                  'pending': [], 'skipped': []}
+        with client.tracer.span(f'vault_{kind}', n=len(units)) as span:
+            with client.tracer.span('read'):
+                balance = client._balance_of(token, client.address)
+                allowance = int.from_bytes(w3.eth.call({
+                    'to': token,
+                    'data': ALLOWANCE + address_word(client.address) + address_word(vault)
+                }), 'big')
+                nonce = w3.eth.get_transaction_count(client.address, 'pending')
+                gas_price = w3.eth.gas_price
+
+            # Offline checks, in order: what the vault would revert on
+            todo = []
+            for i, (amount, unit, preview) in enumerate(zip(amounts, units, previews)):
+                if unit <= 0:
+                    reason = 'amount zero'
+                elif kind == 'redeem' and preview == 0:
+                    reason = 'amount too small'
+                elif unit > balance:
+                    reason = 'exceeds balance left for the batch'
+                else:
+                    balance -= unit
+                    todo.append(i)
+                    continue
+                result['skipped'].append((i, amount, reason))
+            span.set_attribute('skipped', len(result['skipped']))
+            if not todo:
+                return result
+
+            txs = []
+            if allowance < sum(units[i] for i in todo):
+                txs.append((None, encoders.build_tx(
+                    client.address, token, encoders.approve(vault, encoders.MAX_UINT256),
+                    nonce, self.approve_gas, gas_price, client.chain_id)))
+            for i in todo:
+                txs.append((i, encoders.build_tx(
+                    client.address, vault, encode(units[i]), nonce + len(txs), self.gas,
+                    gas_price, client.chain_id)))
+
+            sent = []
+            with client.tracer.span('send', nonce=nonce, n=len(txs)):
+                for position, (i, tx) in enumerate(txs):
+                    signed = client.account.sign_transaction(tx)
+                    tx_hash = Web3.to_hex(signed.hash)
+                    if client.journal is not None:
+                        client.journal.record(tx_hash, client.address, tx['nonce'], tx_hash,
+                                              Web3.to_hex(signed.raw_transaction))
+                    try:
+                        w3.eth.send_raw_transaction(signed.raw_transaction)
+                    except Exception as e:
+                        # Later nonces cannot land without this one
+                        result['error'] = f'nonce {tx["nonce"]}: {e}'
+                        if client.journal is not None:
+                            client.journal.mark(tx_hash, DROPPED)
+                        result['skipped'].extend(
+                            (j, amounts[j], 'not sent: an earlier transaction failed to send')
+                            for j, _ in txs[position:] if j is not None)
+                        break
+                    sent.append((i, tx['nonce'], tx_hash))
+
+            waiting = True
+            with client.tracer.span('wait', n=len(sent)):
+                for i, tx_nonce, tx_hash in sent:
+                    if i is None:
+                        result['approve'] = tx_hash
+                    try:
+                        if waiting:
+                            receipt = w3.eth.wait_for_transaction_receipt(tx_hash,
+                                                                          timeout=self.timeout)
+                        else:
+                            # An earlier nonce is not mined: don't wait again per transaction
+                            receipt = w3.eth.get_transaction_receipt(tx_hash)
+                    except Exception as e:
+                        if not isinstance(e, TransactionNotFound):
+                            waiting = False
+                            result.setdefault('error', f'nonce {tx_nonce}: {e}')
+                        # Sent and may still land: left pending in the journal too
+                        result['pending'].append({
+                            'tx_hash': tx_hash,
+                            'nonce': tx_nonce,
+                            'index': i,
+                            'amount': None if i is None else amounts[i]
+                        })
+                        continue
+                    if client.journal is not None:
+                        client.journal.mark(tx_hash, INCLUDED if receipt.status == 1 else FAILED,
+                                            receipt.blockNumber, receipt.gasUsed)
+                    if i is None:
+                        continue
+                    entry = {
+                        'tx_hash': tx_hash,
+                        'block_number': receipt.blockNumber,
+                        'gas_used': receipt.gasUsed,
+                        'status': receipt.status,
+                        'amount': amounts[i],
+                        'preview': previews[i]
+                    }
+                    entry.update(self._outcome(kind, receipt, vault))
+                    result['transactions'].append(entry)
+        return result
+
+    @staticmethod
+    def _outcome(kind: str, receipt, vault: str) -> dict:
+        topic = DEPOSIT_TOPIC if kind == 'mint' else REDEEM_TOPIC
+        for log in receipt.logs:
+            if log['address'].lower() == vault.lower() and bytes(log['topics'][0]) == topic:
+                data = bytes(log['data'])
+                words = [int.from_bytes(data[j:j + 32], 'big') for j in range(0, len(data), 32)]
+                if kind == 'mint':
+                    return {'minted': words[1], 'fee': words[2]}
+                return {'returned': words[1]}
+        return {'minted': None, 'fee': None} if kind == 'mint' else {'returned': None}
+
+    # ---- many wallets ----
+
+    def mint_many(self, orders: list) -> list:
+        """
+        mint() for each ``(client, usdc_amounts)`` in parallel, one entry
+        per wallet. A wallet that fails gets {'address', 'error'} and
+        does not stop the others.
+        """
+        return self._many(self.mint, orders)
+
+    def redeem_many(self, orders: list) -> list:
+        """redeem() for each ``(client, novis_amounts)`` in parallel."""
+        return self._many(self.redeem, orders)
+
+    def _many(self, run, orders: list) -> list:
+        addresses = [client.address for client, _ in orders]
+        if len(set(addresses)) != len(addresses):
+            raise VaultError('each wallet may appear once (its transactions share one nonce sequence)')
+
+        def one(order):
+            client, amounts = order
+            try:
+                return run(client, amounts)
+            except Exception as e:
+                return {'address': client.address, 'error': str(e)}
+
+        if not orders:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(orders))) as pool:
+            return list(pool.map(one, orders))
+
+
+__all__ = ['VaultParams', 'VaultPipeline', 'VaultError']
@@ -0,0 +1,172 @@
+"""
+NOVIS Worker Budgets
+
+Parallel smart-account spending: one local budget and one EntryPoint
+nonce lane per worker.
+
+Every worker leases its own ``WorkerBudget``. A budget has a spending
+limit that renews every ``duration`` seconds, and its own 2D nonce lane,
+so workers never wait on each other's UserOps. UserOps are signed with
+the owner key. Signing is a local operation with no shared lock, so it
+does not serialize the workers.
+
+Why not on-chain session keys: NOVISSmartAccountV4 records them
+(``createSessionKey``), but its ``validateUserOp`` only accepts the
+owner's signature, and ``execute`` never charges
+``sessionKeys[key].spent``. A session key can therefore neither sign a
+UserOp nor limit one, and creating it would cost a transaction for
+nothing. The limits here are enforced client-side only.
+
+Example:
+    from novis.userop import SmartAccountOps
+    from novis.workers import WorkerPool
+
+    ops = SmartAccountOps(client, account, bundler_url)
+    pool = WorkerPool(ops, size=16, duration=86400, spending_limit=500)
+
+    with pool.lease() as worker:          # in each worker
+        worker.transfer('0x...', 25)
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from .spending import tracked_amount
+from .userop import ENTRYPOINT_ABI, NonceLanes, SmartAccountOps, encode_transfer
+
+# Worker lanes start here, clear of SmartAccountOps' shared lanes (0, 1, ...)
+FIRST_WORKER_LANE = 1 << 128
+
+
+class BudgetExceeded(Exception):
+    """Raised when a spend does not fit in a worker's remaining budget."""
+
+
+class WorkerBudget:
+    """
+    One worker's budget window and nonce lane.
+
+    Spending methods mirror SmartAccountOps and check the budget before
+    anything is signed.
+    """
+
+    __slots__ = ('pool', 'lane', 'window_start', 'spending_limit', 'spent', 'lanes', '_lock')
+
+    def __init__(self, pool, lane: int, spending_limit: int):
+        self.pool = pool
+        self.lane = lane
+        self.window_start = time.time()
+        self.spending_limit = spending_limit
+        self.spent = 0
+        self.lanes = NonceLanes(pool.entry_point, pool.ops.account, lanes=1, first_key=lane)
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        """Unspent budget in wei for the current window."""
+        return self.spending_limit - self.spent
+
+    def _renew(self):
+        if time.time() - self.window_start >= self.pool.duration:
+            self.window_start = time.time()
+            self.spent = 0
+
+    def reserve(self, amount_wei: int):
+        with self._lock:
+            self._renew()
+            if amount_wei > self.remaining:
+                raise BudgetExceeded(
+                    f'worker lane {self.lane:#x} budget exceeded: '
+                    f'{amount_wei} > {self.remaining} remaining')
+            self.spent += amount_wei
+
+    def refund(self, amount_wei: int):
+        with self._lock:
+            self.spent -= amount_wei
+
+    def execute(self, to: str, value: int = 0, data: bytes = b'', spend: int = None) -> dict:
+        """
+        execute() through the EntryPoint on this worker's nonce lane.
+
+        ``spend`` is the amount charged to the budget. It defaults to what
+        the account's daily limit counts (the amount of a NOVIS transfer,
+        otherwise ``value``) and is returned to the budget if the UserOp
+        fails.
+        """
+        if spend is None:
+            spend = tracked_amount(self.pool.ops.client.addresses['NOVIS_TOKEN'], to, value,
+                                   data)
+        self.reserve(spend)
+        try:
+            result = self.pool.ops.execute(to, value, data, lanes=self.lanes)
+        except Exception:
+            self.refund(spend)
+            raise
+        if not result.get('success', True):
+            self.refund(spend)
+        return result
+
+    def transfer(self, to: str, amount: float) -> dict:
+        """NOVIS transfer charged to this worker's budget."""
+        ops = self.pool.ops
+        amount_wei = ops.w3.to_wei(amount, 'ether')
+        return self.execute(ops.client.addresses['NOVIS_TOKEN'], 0,
+                            encode_transfer(to, amount_wei))
+
+
+class WorkerPool:
+    """
+    Lease per-worker budgets and nonce lanes for one smart account.
+
+    Args:
+        ops: SmartAccountOps for the account (its client must be the owner)
+        size: Number of workers (budgets and lanes)
+        duration: Budget window in seconds
+        spending_limit: Per-worker budget per window, in NOVIS
+        first_lane: Nonce key of the first worker (the rest follow)
+    """
+
+    def __init__(self, ops: SmartAccountOps, size: int = 8, duration: int = 86400,
+                 spending_limit: float = 100, first_lane: int = FIRST_WORKER_LANE):
+        self.ops = ops
+        self.w3 = ops.w3
+        self.size = size
+        self.duration = duration
+        self.spending_limit = self.w3.to_wei(spending_limit, 'ether')
+        self.entry_point = self.w3.eth.contract(address=ops.entry_point, abi=ENTRYPOINT_ABI)
+        self.workers = [WorkerBudget(self, first_lane + i, self.spending_limit)
+                        for i in range(size)]
+        self._idle = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+
+    # ---- leasing ----
+
+    def acquire(self, timeout: float = None) -> WorkerBudget:
+        """Take an idle worker budget (blocks while all are leased)."""
+        return self._idle.get(timeout=timeout)
+
+    def release(self, worker: WorkerBudget):
+        self._idle.put(worker)
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        """Context manager giving the calling worker exclusive use of one budget."""
+        worker = self.acquire(timeout)
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    def stats(self) -> dict:
+        return {
+            'workers': len(self.workers),
+            'idle': self._idle.qsize(),
+            'spent': sum(w.spent for w in self.workers),
+            'remaining': sum(w.remaining for w in self.workers)
+        }
+
+
+__all__ = ['WorkerBudget', 'WorkerPool', 'BudgetExceeded', 'FIRST_WORKER_LANE']
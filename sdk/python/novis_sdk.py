@@ -10,7 +10,6 @@ License: MIT
 import json
 import time
 from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
 from decimal import Decimal
 
 import requests
@@ -18,6 +17,17 @@ from web3 import Web3
 from eth_account import Account
 from eth_account.messages import encode_typed_data
 
+from novis.account_index import AccountIndex
+from novis.accounts import AccountFactory, account_salt
+from novis.addresses import address_word, is_valid, to_address
+from novis import encoders
+from novis import records as _records
+from novis.listener import PaymentListener
+from novis.ratelimit import Limiter, RateLimitedHTTPProvider, RateLimitedSession
+from novis.routing import TransferRouter
+from novis.snapshot import ReadCache, Snapshot, selector
+from novis.tracing import NOOP_TRACER
+
 # =============================================================================
 # CONSTANTS
 # =============================================================================
@@ -31,6 +41,7 @@ ADDRESSES = {
     "TREASURY": "0x4709280aef7A496EA84e72dB3CAbAd5e324d593e",
     "USDC": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
     "ENTRYPOINT": "0x5FF137D4b0FDCD49DcA30c7CF57E578a026d2789",
+    "MULTICALL3": "0xcA11bde05977b3631167028862bE2a173976CA11",
     "RELAYER_API": "https://novis-relayer-production.up.railway.app",
     "RPC_URL": "https://mainnet.base.org",
     "CHAIN_ID": 8453
@@ -75,38 +86,11 @@ USDC_ABI = [
 # DATA CLASSES
 # =============================================================================
 
-@dataclass
-class TransferResult:
-    success: bool
-    tx_hash: str
-    block_number: int
-    from_address: str
-    to_address: str
-    amount: str
-    explorer_url: str
-
-
-@dataclass
-class FeeInfo:
-    amount: str
-    amount_wei: str
-    fee: str
-    fee_wei: str
-    net_amount: str
-    net_amount_wei: str
-    fee_percent: str
-
-
-@dataclass
-class ProtocolStats:
-    total_supply: str
-    total_assets: str
-    backing_ratio_bps: int
-    backing_ratio_percent: str
-    total_fees_collected: str
-    total_meta_tx_relayed: int
-    fee_threshold: str
-    fee_percentage: str
+# Slotted, wei-backed records; human-readable fields are computed on read.
+# See novis.records (also TransferBatch for column-wise bulk storage).
+TransferResult = _records.TransferResult
+FeeInfo = _records.FeeInfo
+ProtocolStats = _records.ProtocolStats
 
 
 # =============================================================================
@@ -127,7 +111,11 @@ class NOVISClient:
         self,
         private_key: str,
         rpc_url: str = None,
-        relayer_url: str = None
+        relayer_url: str = None,
+        tracer=None,
+        addresses: Dict[str, Any] = None,
+        relayer_limiter: Optional[Limiter] = None,
+        rpc_limiter: Optional[Limiter] = None
     ):
         """
         Initialize NOVIS client
@@ -136,29 +124,44 @@ class NOVISClient:
             private_key: Wallet private key (with or without 0x prefix)
             rpc_url: Optional custom RPC URL
             relayer_url: Optional custom relayer URL
+            tracer: Optional novis.tracing.Tracer for per-call span trees
+            addresses: Optional overrides merged over ADDRESSES (e.g. a local deployment)
+            relayer_limiter: Optional novis.ratelimit.Limiter for relayer requests
+            rpc_limiter: Optional novis.ratelimit.Limiter for RPC requests
         """
-        self.rpc_url = rpc_url or ADDRESSES["RPC_URL"]
-        self.relayer_url = relayer_url or ADDRESSES["RELAYER_API"]
+        self.addresses = {**ADDRESSES, **(addresses or {})}
+        self.rpc_url = rpc_url or self.addresses["RPC_URL"]
+        self.relayer_url = relayer_url or self.addresses["RELAYER_API"]
+        self.tracer = tracer or NOOP_TRACER
+        self.relayer_limiter = relayer_limiter
+        self.rpc_limiter = rpc_limiter
+        self._http = RateLimitedSession(relayer_limiter) if relayer_limiter else requests
         
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        if rpc_limiter:
+            self.w3 = Web3(RateLimitedHTTPProvider(self.rpc_url, rpc_limiter))
+        else:
+            self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
         self.account = Account.from_key(private_key)
         
         self.novis = self.w3.eth.contract(
-            address=Web3.to_checksum_address(ADDRESSES["NOVIS_TOKEN"]),
+            address=to_address(self.addresses["NOVIS_TOKEN"]),
             abi=NOVIS_ABI
         )
         self.vault = self.w3.eth.contract(
-            address=Web3.to_checksum_address(ADDRESSES["VAULT"]),
+            address=to_address(self.addresses["VAULT"]),
             abi=VAULT_ABI
         )
         self.factory = self.w3.eth.contract(
-            address=Web3.to_checksum_address(ADDRESSES["FACTORY"]),
+            address=to_address(self.addresses["FACTORY"]),
             abi=FACTORY_ABI
         )
         self.usdc = self.w3.eth.contract(
-            address=Web3.to_checksum_address(ADDRESSES["USDC"]),
+            address=to_address(self.addresses["USDC"]),
             abi=USDC_ABI
         )
+        self._account_factory: Optional[AccountFactory] = None
+        self._router: Optional[TransferRouter] = None
+        self.read_cache = ReadCache()
     
     @property
     def address(self) -> str:
@@ -179,22 +182,25 @@ class NOVISClient:
         Returns:
             Balance in NOVIS (human readable)
         """
-        addr = Web3.to_checksum_address(address or self.address)
-        balance = self.novis.functions.balanceOf(addr).call()
+        balance = self._balance_of(self.novis.address, address or self.address)
         return str(Web3.from_wei(balance, 'ether'))
     
     def get_usdc_balance(self, address: str = None) -> str:
         """Get USDC balance (6 decimals)"""
-        addr = Web3.to_checksum_address(address or self.address)
-        balance = self.usdc.functions.balanceOf(addr).call()
+        balance = self._balance_of(self.usdc.address, address or self.address)
         return str(Decimal(balance) / Decimal(10**6))
     
     def get_eth_balance(self, address: str = None) -> str:
         """Get ETH balance"""
-        addr = Web3.to_checksum_address(address or self.address)
+        addr = to_address(address or self.address)
         balance = self.w3.eth.get_balance(addr)
         return str(Web3.from_wei(balance, 'ether'))
     
+    def _balance_of(self, token: str, address: str) -> int:
+        """ERC-20 balanceOf as a raw eth_call (no per-call ABI validation)"""
+        result = self.w3.eth.call({"to": token, "data": encoders.balance_of(address)})
+        return int.from_bytes(result, "big")
+    
     def get_protocol_stats(self) -> ProtocolStats:
         """Get protocol statistics"""
         total_supply = self.novis.functions.totalSupply().call()
@@ -206,16 +212,32 @@ class NOVISClient:
         fee_bps = self.novis.functions.feePercentageBps().call()
         
         return ProtocolStats(
-            total_supply=str(Web3.from_wei(total_supply, 'ether')),
-            total_assets=str(Decimal(total_assets) / Decimal(10**6)),
+            total_supply_wei=total_supply,
+            total_assets_units=total_assets,
             backing_ratio_bps=backing_ratio,
-            backing_ratio_percent=f"{backing_ratio / 100:.2f}%",
-            total_fees_collected=str(Web3.from_wei(total_fees, 'ether')),
+            total_fees_collected_wei=total_fees,
             total_meta_tx_relayed=total_meta_tx,
-            fee_threshold=str(Web3.from_wei(fee_threshold, 'ether')),
-            fee_percentage=f"{fee_bps / 100:.2f}%"
+            fee_threshold_wei=fee_threshold,
+            fee_percentage_bps=fee_bps
         )
     
+    def at_block(self, block) -> "BlockView":
+        """
+        View whose reads are all pinned to one block
+        
+        Args:
+            block: Block number or tag (resolved once; history needs an archive node)
+            
+        Returns:
+            BlockView; its results are cached in read_cache for good
+        """
+        return BlockView(self, Snapshot(self.w3, block, self.addresses["MULTICALL3"],
+                                        self.read_cache))
+    
+    def snapshot(self) -> "BlockView":
+        """View pinned to the current head (consistent multi-read reports)"""
+        return self.at_block("latest")
+    
     # =========================================================================
     # GASLESS TRANSFER
     # =========================================================================
@@ -231,21 +253,34 @@ class NOVISClient:
         Returns:
             TransferResult with transaction details
         """
-        to = Web3.to_checksum_address(to)
+        with self.tracer.span("transfer", to=to, amount=amount) as span:
+            return self._transfer(to, amount, span)
+    
+    def _transfer(self, to: str, amount: str, span, timeout: float = None, ttl: int = 3600,
+                  attempt: Dict[str, Any] = None) -> TransferResult:
+        # attempt (optional) is filled with nonce, deadline, phase, the head
+        # block before /relay and the /relay status code so a caller can
+        # tell how far a failed call got
+        tracked = attempt is not None
+        attempt = {} if attempt is None else attempt
+        attempt["phase"] = "prepare"
+        to = to_address(to)
         amount_wei = Web3.to_wei(Decimal(amount), 'ether')
         
         # 1. Get nonce
-        nonce_res = requests.get(f"{self.relayer_url}/nonce/{self.address}")
-        nonce_res.raise_for_status()
-        nonce = int(nonce_res.json()["nonce"])
+        with self.tracer.span("/nonce"):
+            nonce = self._meta_nonce(timeout)
+        span.set_attribute("nonce", nonce)
         
         # 2. Get domain
-        domain_res = requests.get(f"{self.relayer_url}/domain")
-        domain_res.raise_for_status()
-        domain_data = domain_res.json()
+        with self.tracer.span("/domain"):
+            domain_res = self._http.get(f"{self.relayer_url}/domain", timeout=timeout)
+            domain_res.raise_for_status()
+            domain_data = domain_res.json()
         
         # 3. Build EIP-712 typed data
-        deadline = int(time.time()) + 3600  # 1 hour
+        deadline = int(time.time()) + ttl  # 1 hour by default
+        attempt["nonce"], attempt["deadline"] = nonce, deadline
         
         typed_data = {
             "types": {
@@ -280,25 +315,43 @@ class NOVISClient:
         }
         
         # 4. Sign
-        encoded = encode_typed_data(full_message=typed_data)
-        signed = self.account.sign_message(encoded)
-        signature = signed.signature.hex()
+        with self.tracer.span("sign"):
+            encoded = encode_typed_data(full_message=typed_data)
+            signed = self.account.sign_message(encoded)
+            signature = signed.signature.hex()
         
         # 5. Relay
-        relay_res = requests.post(
-            f"{self.relayer_url}/relay",
-            json={
-                "from": self.address,
-                "to": to,
-                "amount": str(amount_wei),
-                "deadline": str(deadline),
-                "signature": signature
-            }
-        )
-        result = relay_res.json()
+        relay_options = {}
+        if self.relayer_limiter:
+            # A timed-out or 5xx /relay may have been submitted anyway: only
+            # resend while the relayer still reports the signed nonce as next
+            relay_options["retry"] = lambda: self._meta_nonce(timeout) == nonce
+        if tracked:
+            # Where to search for the relay's logs if its answer is lost
+            attempt["from_block"] = self.w3.eth.block_number
+        with self.tracer.span("/relay") as relay_span:
+            attempt["phase"] = "relay"
+            relay_res = self._http.post(
+                f"{self.relayer_url}/relay",
+                json={
+                    "from": self.address,
+                    "to": to,
+                    "amount": str(amount_wei),
+                    "deadline": str(deadline),
+                    "signature": signature
+                },
+                timeout=timeout,
+                **relay_options
+            )
+            attempt["status_code"] = relay_res.status_code
+            result = relay_res.json()
+            relay_span.set_attribute("status_code", relay_res.status_code)
+            
+            if not result.get("success"):
+                raise Exception(result.get("error", "Relay failed"))
         
-        if not result.get("success"):
-            raise Exception(result.get("error", "Relay failed"))
+        span.set_attribute("tx_hash", result["txHash"])
+        span.set_attribute("block_number", result["blockNumber"])
         
         return TransferResult(
             success=True,
@@ -306,28 +359,25 @@ class NOVISClient:
             block_number=result["blockNumber"],
             from_address=self.address,
             to_address=to,
-            amount=amount,
-            explorer_url=f"https://basescan.org/tx/{result['txHash']}"
+            amount_wei=amount_wei
         )
     
+    def _meta_nonce(self, timeout: float = None) -> int:
+        """Next meta-transaction nonce of this account, as the relayer sees it"""
+        nonce_res = self._http.get(f"{self.relayer_url}/nonce/{self.address}", timeout=timeout)
+        nonce_res.raise_for_status()
+        return int(nonce_res.json()["nonce"])
+    
     def calculate_fee(self, to: str, amount: str) -> FeeInfo:
         """Calculate fee for a transfer"""
-        to = Web3.to_checksum_address(to)
+        to = to_address(to)
         amount_wei = Web3.to_wei(Decimal(amount), 'ether')
         
         fee, net = self.novis.functions.calculateTransferFee(
             self.address, to, amount_wei
         ).call()
         
-        return FeeInfo(
-            amount=amount,
-            amount_wei=str(amount_wei),
-            fee=str(Web3.from_wei(fee, 'ether')),
-            fee_wei=str(fee),
-            net_amount=str(Web3.from_wei(net, 'ether')),
-            net_amount_wei=str(net),
-            fee_percent="0.1%" if fee > 0 else "0%"
-        )
+        return FeeInfo(amount_wei=amount_wei, fee_wei=fee, net_amount_wei=net)
     
     # =========================================================================
     # DIRECT TRANSFER
@@ -344,19 +394,27 @@ class NOVISClient:
         Returns:
             Transaction result dict
         """
-        to = Web3.to_checksum_address(to)
-        amount_wei = Web3.to_wei(Decimal(amount), 'ether')
-        
-        tx = self.novis.functions.transfer(to, amount_wei).build_transaction({
-            'from': self.address,
-            'nonce': self.w3.eth.get_transaction_count(self.address),
-            'gas': 100000,
-            'gasPrice': self.w3.eth.gas_price
-        })
-        
-        signed = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        with self.tracer.span("transfer_direct", to=to, amount=amount) as span:
+            to = to_address(to)
+            amount_wei = Web3.to_wei(Decimal(amount), 'ether')
+            
+            with self.tracer.span("build"):
+                tx = self.novis.functions.transfer(to, amount_wei).build_transaction({
+                    'from': self.address,
+                    'nonce': self.w3.eth.get_transaction_count(self.address),
+                    'gas': 100000,
+                    'gasPrice': self.w3.eth.gas_price
+                })
+            span.set_attribute("nonce", tx['nonce'])
+            
+            with self.tracer.span("sign"):
+                signed = self.account.sign_transaction(tx)
+            with self.tracer.span("send"):
+                tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            span.set_attribute("tx_hash", tx_hash.hex())
+            with self.tracer.span("wait"):
+                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            span.set_attribute("block_number", receipt.blockNumber)
         
         return {
             "success": receipt.status == 1,
@@ -366,47 +424,234 @@ class NOVISClient:
             "explorer_url": f"https://basescan.org/tx/{tx_hash.hex()}"
         }
     
+    # =========================================================================
+    # ROUTED TRANSFER
+    # =========================================================================
+    
+    @property
+    def router(self) -> TransferRouter:
+        """Relayer/direct router used by smart_transfer (created on first use)"""
+        if self._router is None:
+            self._router = TransferRouter(self)
+        return self._router
+    
+    @router.setter
+    def router(self, router: TransferRouter):
+        self._router = router
+    
+    def smart_transfer(self, to: str, amount: str) -> TransferResult:
+        """
+        Send NOVIS through the relayer, or directly while the relayer is
+        breaching its SLO and the wallet holds enough ETH for gas
+        
+        Args:
+            to: Recipient address
+            amount: Amount in NOVIS (e.g., "10.0")
+            
+        Returns:
+            TransferResult with transaction details; see router.stats()
+            for which path was taken and why
+        """
+        return self.router.transfer(to, amount)
+    
+    # =========================================================================
+    # INCOMING PAYMENTS
+    # =========================================================================
+    
+    def listen(self, on_payment=None, addresses: List[str] = None, **kwargs) -> PaymentListener:
+        """
+        Start a listener for payments to this wallet (or ``addresses``)
+        
+        Args:
+            on_payment: Optional callback, called with each novis.listener.Payment
+            addresses: Addresses to watch (default: this wallet)
+            **kwargs: PaymentListener options (ws_url, poll_interval, confirmations, ...)
+            
+        Returns:
+            Running PaymentListener; also an async iterator via .payments()
+        """
+        listener = PaymentListener(self.w3, addresses or [self.address], on_payment,
+                                   addresses=self.addresses, **kwargs)
+        return listener.start()
+    
     # =========================================================================
     # SMART ACCOUNTS
     # =========================================================================
     
-    def create_smart_account(self, daily_limit: str) -> str:
+    @property
+    def account_factory(self) -> AccountFactory:
+        """CREATE2 predictor for the smart account factory (loaded on first use)"""
+        if self._account_factory is None:
+            self._account_factory = AccountFactory(self.w3, self.addresses["FACTORY"]).load()
+        return self._account_factory
+    
+    def predict_smart_account(self, daily_limit: str, index: int, namespace: str = "default") -> str:
+        """
+        Address of the smart account with salt account_salt(namespace, index)
+        
+        Computed offline; the account need not exist yet.
+        """
+        daily_limit_wei = Web3.to_wei(Decimal(daily_limit), 'ether')
+        return self.account_factory.predict(
+            self.address, daily_limit_wei, account_salt(namespace, index)
+        )
+    
+    def create_smart_account(self, daily_limit: str, index: int = None,
+                             namespace: str = "default") -> str:
         """
         Create a smart account for AI agent
         
         Args:
             daily_limit: Daily spending limit in NOVIS
+            index: Salt index (default: the sending nonce, unique per owner)
+            namespace: Salt namespace, see novis.accounts.account_salt
             
         Returns:
             Smart account address
         """
-        daily_limit_wei = Web3.to_wei(Decimal(daily_limit), 'ether')
-        salt = Web3.keccak(text=str(time.time()))
-        
-        tx = self.factory.functions.createAccount(
-            self.address,
-            daily_limit_wei,
-            salt
-        ).build_transaction({
-            'from': self.address,
-            'nonce': self.w3.eth.get_transaction_count(self.address),
-            'gas': 500000,
-            'gasPrice': self.w3.eth.gas_price
-        })
+        with self.tracer.span("create_smart_account", daily_limit=daily_limit) as span:
+            daily_limit_wei = Web3.to_wei(Decimal(daily_limit), 'ether')
+            
+            with self.tracer.span("build"):
+                nonce = self.w3.eth.get_transaction_count(self.address)
+                salt = account_salt(namespace, nonce if index is None else index)
+                tx = self.factory.functions.createAccount(
+                    self.address,
+                    daily_limit_wei,
+                    salt
+                ).build_transaction({
+                    'from': self.address,
+                    'nonce': nonce,
+                    'gas': 500000,
+                    'gasPrice': self.w3.eth.gas_price
+                })
+            account_address = self.account_factory.predict(self.address, daily_limit_wei, salt)
+            
+            with self.tracer.span("sign"):
+                signed = self.account.sign_transaction(tx)
+            with self.tracer.span("send"):
+                tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            span.set_attribute("tx_hash", tx_hash.hex())
+            with self.tracer.span("wait"):
+                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            if receipt.status != 1:
+                raise Exception(f"createAccount reverted: {tx_hash.hex()}")
+            span.set_attribute("account", account_address)
+            
+            return account_address
+    
+    def provision_accounts(self, n: int, daily_limit: str, namespace: str = "fleet",
+                           start: int = 0) -> List[str]:
+        """
+        Create n smart accounts in one pipelined batch
         
-        signed = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-        self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        Salts are account_salt(namespace, start .. start+n-1), so re-running
+        with the same arguments returns the same addresses and only creates
+        the ones that are missing.
         
-        # Get account address
-        count = self.factory.functions.accountCount().call()
-        account_address = self.factory.functions.accounts(count - 1).call()
+        Args:
+            n: Number of accounts
+            daily_limit: Daily spending limit in NOVIS for each account
+            namespace: Salt namespace
+            start: First salt index
+            
+        Returns:
+            Smart account addresses, in salt order
+        """
+        daily_limit_wei = Web3.to_wei(Decimal(daily_limit), 'ether')
+        return self.account_factory.provision(
+            self.w3, self.account, self.w3.eth.chain_id, n, daily_limit_wei,
+            namespace=namespace, start=start, tracer=self.tracer
+        )
+    
+    def get_my_smart_accounts(self, index: Optional[AccountIndex] = None,
+                              limit: int = None) -> List[str]:
+        """
+        Get all smart accounts owned by this wallet
         
-        return account_address
+        Args:
+            index: Optional novis.account_index.AccountIndex; it is synced
+                and queried locally instead of calling getAccountsByOwner
+            limit: Page size when using an index (default: all)
+        """
+        if index is None:
+            return self.factory.functions.getAccountsByOwner(self.address).call()
+        index.sync()
+        return index.accounts_of(self.address, limit=limit or index.count(self.address))
+
+
+# =============================================================================
+# BLOCK VIEW
+# =============================================================================
+
+_STATS_CALLS = [
+    ("NOVIS_TOKEN", selector("totalSupply()")),
+    ("VAULT", selector("totalAssets()")),
+    ("VAULT", selector("backingRatioBps()")),
+    ("NOVIS_TOKEN", selector("totalFeesCollected()")),
+    ("NOVIS_TOKEN", selector("totalMetaTxRelayed()")),
+    ("NOVIS_TOKEN", selector("feeThreshold()")),
+    ("NOVIS_TOKEN", selector("feePercentageBps()")),
+]
+_CALCULATE_TRANSFER_FEE = selector("calculateTransferFee(address,address,uint256)")
+
+
+class BlockView:
+    """
+    NOVISClient reads pinned to one block (see NOVISClient.at_block).
+    
+    Same return values as the client's methods; every read names
+    block_number and multi-value reads go out as one Multicall3 call.
+    """
+    
+    def __init__(self, client: NOVISClient, snapshot: Snapshot):
+        self.client = client
+        self.snapshot = snapshot
+        self.block_number = snapshot.block_number
+        self.timestamp = snapshot.timestamp
+    
+    def get_balance(self, address: str = None) -> str:
+        """Get NOVIS balance"""
+        return self.get_balances([address or self.client.address])[0]
+    
+    def get_balances(self, addresses: List[str]) -> List[str]:
+        """NOVIS balances of many addresses (batched)"""
+        balances = self.snapshot.balances_of(self.client.novis.address, addresses)
+        return [str(Web3.from_wei(b, 'ether')) for b in balances]
+    
+    def get_usdc_balance(self, address: str = None) -> str:
+        """Get USDC balance (6 decimals)"""
+        balance = self.snapshot.balance_of(self.client.usdc.address, address or self.client.address)
+        return str(Decimal(balance) / Decimal(10**6))
     
-    def get_my_smart_accounts(self) -> List[str]:
-        """Get all smart accounts owned by this wallet"""
-        return self.factory.functions.getAccountsByOwner(self.address).call()
+    def get_eth_balance(self, address: str = None) -> str:
+        """Get ETH balance"""
+        balance = self.snapshot.eth_balances([address or self.client.address])[0]
+        return str(Web3.from_wei(balance, 'ether'))
+    
+    def get_protocol_stats(self) -> ProtocolStats:
+        """Get protocol statistics, all from this block"""
+        addresses = self.client.addresses
+        values = self.snapshot.uints([(addresses[name], data) for name, data in _STATS_CALLS])
+        (total_supply, total_assets, backing_ratio, total_fees, total_meta_tx,
+         fee_threshold, fee_bps) = values
+        return ProtocolStats(
+            total_supply_wei=total_supply,
+            total_assets_units=total_assets,
+            backing_ratio_bps=backing_ratio,
+            total_fees_collected_wei=total_fees,
+            total_meta_tx_relayed=total_meta_tx,
+            fee_threshold_wei=fee_threshold,
+            fee_percentage_bps=fee_bps
+        )
+    
+    def calculate_fee(self, to: str, amount: str) -> FeeInfo:
+        """Calculate fee for a transfer at this block"""
+        amount_wei = Web3.to_wei(Decimal(amount), 'ether')
+        data = (_CALCULATE_TRANSFER_FEE + address_word(self.client.address)
+                + address_word(to) + amount_wei.to_bytes(32, "big"))
+        fee, net = self.snapshot.decode(self.client.novis.address, data, ["uint256", "uint256"])
+        return FeeInfo(amount_wei=amount_wei, fee_wei=fee, net_amount_wei=net)
 
 
 # =============================================================================
@@ -431,7 +676,7 @@ def parse_usdc(amount: str) -> int:
 
 def is_valid_address(address: str) -> bool:
     """Check if address is valid"""
-    return Web3.is_address(address)
+    return is_valid(address)
 
 
 # =============================================================================
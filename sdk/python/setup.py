@@ -28,7 +28,10 @@ setup(
         "Programming Language :: Python :: 3.12",
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
+    entry_points={
+        "console_scripts": ["novis=novis.cli:main"],
+    },
     python_requires=">=3.9",
     install_requires=[
         "web3>=6.0.0",
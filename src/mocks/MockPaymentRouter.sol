@@ -0,0 +1,87 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.24;
+
+import {IERC20} from "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import {SafeERC20} from "@openzeppelin/contracts/token/ERC20/utils/SafeERC20.sol";
+
+/**
+ * @title MockPaymentRouter
+ * @notice Local stand-in for the deployed PaymentRouter, used by the SDK's
+ *         simulated-chain backend. Same external interface as the SDK ABI:
+ *         payWithMemo, batchPay and escrow create/release/refund.
+ */
+contract MockPaymentRouter {
+    using SafeERC20 for IERC20;
+
+    IERC20 public immutable novis;
+
+    struct Escrow {
+        address payer;
+        address payee;
+        uint256 amount;
+        uint256 deadline;
+        bool released;
+        bool refunded;
+    }
+
+    Escrow[] private escrows;
+
+    event PaymentWithMemo(address indexed from, address indexed to, uint256 amount, string memo);
+    event EscrowCreated(uint256 indexed escrowId, address indexed payer, address indexed payee, uint256 amount, uint256 deadline);
+    event EscrowReleased(uint256 indexed escrowId);
+    event EscrowRefunded(uint256 indexed escrowId);
+
+    constructor(address _novis) {
+        require(_novis != address(0), "zero addr");
+        novis = IERC20(_novis);
+    }
+
+    function payWithMemo(address to, uint256 amount, string calldata memo) public {
+        novis.safeTransferFrom(msg.sender, to, amount);
+        emit PaymentWithMemo(msg.sender, to, amount, memo);
+    }
+
+    function batchPay(address[] calldata recipients, uint256[] calldata amounts, string[] calldata memos) external {
+        require(recipients.length == amounts.length && amounts.length == memos.length, "Length mismatch");
+        for (uint256 i = 0; i < recipients.length; i++) {
+            payWithMemo(recipients[i], amounts[i], memos[i]);
+        }
+    }
+
+    function createEscrow(address to, uint256 amount, uint256 timeout) external returns (uint256 escrowId) {
+        novis.safeTransferFrom(msg.sender, address(this), amount);
+        escrowId = escrows.length;
+        escrows.push(Escrow(msg.sender, to, amount, block.timestamp + timeout, false, false));
+        emit EscrowCreated(escrowId, msg.sender, to, amount, block.timestamp + timeout);
+    }
+
+    function releaseEscrow(uint256 escrowId) external {
+        Escrow storage e = _open(escrowId);
+        require(msg.sender == e.payer, "Not payer");
+        e.released = true;
+        novis.safeTransfer(e.payee, e.amount);
+        emit EscrowReleased(escrowId);
+    }
+
+    function refundEscrow(uint256 escrowId) external {
+        Escrow storage e = _open(escrowId);
+        require(msg.sender == e.payer || block.timestamp > e.deadline, "Not refundable");
+        e.refunded = true;
+        novis.safeTransfer(e.payer, e.amount);
+        emit EscrowRefunded(escrowId);
+    }
+
+    function getEscrow(uint256 escrowId) external view returns (
+        address payer, address payee, uint256 amount, uint256 deadline, bool released, bool refunded
+    ) {
+        if (escrowId >= escrows.length) return (address(0), address(0), 0, 0, false, false);
+        Escrow storage e = escrows[escrowId];
+        return (e.payer, e.payee, e.amount, e.deadline, e.released, e.refunded);
+    }
+
+    function _open(uint256 escrowId) internal view returns (Escrow storage e) {
+        require(escrowId < escrows.length, "Escrow not found");
+        e = escrows[escrowId];
+        require(!e.released && !e.refunded, "Escrow closed");
+    }
+}